@@ -6,11 +6,13 @@
 #SBATCH --mail-type=ALL
 #SBATCH --nodes={{ cookiecutter.nodes }}
 #SBATCH --ntasks-per-node={{ cookiecutter.ntasks_per_node }}
+#SBATCH --cpus-per-task={{ cookiecutter.cpus_per_task }}
 #SBATCH --mem-per-cpu={{ cookiecutter.mem_per_cpu }}
 #SBATCH --exclude=gra[801-803]
 #SBATCH --time={{ cookiecutter.walltime }}
 #SBATCH --output={{ cookiecutter.job_dir }}/glost-job.stdout
 #SBATCH --error={{ cookiecutter.job_dir }}/glost-job.stderr
+#SBATCH --signal=B:USR1@{{ cookiecutter.drain_seconds }}
 
 module load StdEnv/2016.4
 module load glost/0.3.1
@@ -19,7 +21,65 @@ module load proj4-fortran/1.0
 module load nco/4.6.6
 
 export MONTE_CARLO={{ cookiecutter.job_dir }}
+{%- if cookiecutter.task_runner == "queue" %}
+JOB_START=$(date +%s)
+# The task queue directory may be given as an argument to share a queue between jobs
+TASK_QUEUE=${1:-${MONTE_CARLO}/queue}
+{%- else %}
+# The task list file may be given as an argument to run a shard of the job's tasks
+GLOST_TASKS=${1:-${MONTE_CARLO}/glost-tasks.txt}
+{%- endif %}
+TIMING="${MONTE_CARLO}/timing.jsonl"
+
+# Slurm signals the job to drain {{ cookiecutter.drain_seconds }} seconds before its time limit.
+# Tasks stop starting new runs when they find the drain file,
+# and runs that are still going at the drain deadline are interrupted
+# so that there is time to gather the results of runs that are complete.
+DRAIN_FILE="${MONTE_CARLO}/drain/${SLURM_JOB_ID}"
+DRAIN_DEADLINE=
+drain() {
+  echo "Draining at $(date)"
+  mkdir -p $(dirname ${DRAIN_FILE})
+  touch ${DRAIN_FILE}
+  DRAIN_DEADLINE=$(($(date +%s) + {{ cookiecutter.drain_grace_seconds }}))
+}
+trap drain USR1
 
 echo "Starting glost at $(date)"
-srun glost_launch {{ cookiecutter.job_dir }}/glost-tasks.txt
+GLOST_WALL=$(date +%s.%N)
+read -r GLOST_MONO_START _ </proc/uptime
+{%- if cookiecutter.task_runner == "queue" %}
+srun {{ cookiecutter.mohid_command }} worker ${TASK_QUEUE} \
+  --deadline ${SLURM_JOB_END_TIME:-$((JOB_START + {{ cookiecutter.walltime_seconds }}))} --task-time {{ cookiecutter.run_walltime_seconds }} \
+  --drain-file ${DRAIN_FILE} &
+GLOST_WORKERS=${SLURM_NTASKS:-0}
+{%- else %}
+srun glost_launch ${GLOST_TASKS} &
+GLOST_WORKERS=$((${SLURM_NTASKS:-1} - 1))
+{%- endif %}
+SRUN_PID=$!
+# The drain signal interrupts wait, so keep waiting until srun finishes
+while kill -0 ${SRUN_PID} 2>/dev/null
+do
+  if test -n "${DRAIN_DEADLINE}"
+  then
+    while kill -0 ${SRUN_PID} 2>/dev/null && test $(date +%s) -lt ${DRAIN_DEADLINE}
+    do
+      sleep 10
+    done
+    kill -TERM ${SRUN_PID} 2>/dev/null
+    DRAIN_DEADLINE=
+  fi
+  wait ${SRUN_PID}
+done
+wait ${SRUN_PID}
+GLOST_EXIT_CODE=$?
+read -r GLOST_MONO_END _ </proc/uptime
 echo "Ended glost at $(date)"
+if test -f ${DRAIN_FILE}
+then
+  {{ cookiecutter.mohid_command }} drain ${MONTE_CARLO} --slurm-job-id ${SLURM_JOB_ID}
+fi
+printf '{"job_id": "%s", "phase": "glost", "host": "%s", "wall": %s, "mono_start": %s, "mono_end": %s, "ntasks": %s, "workers": %s, "exit_code": %s}\n' \
+  "{{ cookiecutter.job_id }}" "${HOSTNAME}" "${GLOST_WALL}" "${GLOST_MONO_START}" "${GLOST_MONO_END}" "${SLURM_NTASKS:-0}" "${GLOST_WORKERS}" "${GLOST_EXIT_CODE}" >>${TIMING}
+exit ${GLOST_EXIT_CODE}
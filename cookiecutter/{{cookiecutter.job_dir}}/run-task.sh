@@ -0,0 +1,31 @@
+#!/bin/bash
+
+# Execute the GLOST task script for run number $1 of the job
+# and record its timing in the run's results directory,
+# and its exit code in the run's status file.
+
+RUN_ID="{{ cookiecutter.job_id }}-$1"
+RESULTS_DIR="${MONTE_CARLO}/results/${RUN_ID}"
+
+if test -f ${MONTE_CARLO}/drain/${SLURM_JOB_ID:-local}
+then
+  # The job is draining before its time limit, so leave the run for a retry job
+  echo "Not starting ${RUN_ID} because job ${SLURM_JOB_ID} is draining"
+  exit 75
+fi
+# Record the Slurm job that is executing the run so that mohid drain can find it
+mkdir -p ${RESULTS_DIR}
+echo "${SLURM_JOB_ID:-local}" >${RESULTS_DIR}/slurm-job-id
+
+TASK_WALL=${EPOCHREALTIME:-$(date +%s.%N)}
+read -r TASK_MONO_START _ </proc/uptime
+bash ${MONTE_CARLO}/glost-tasks/${RUN_ID}.sh
+TASK_EXIT_CODE=$?
+read -r TASK_MONO_END _ </proc/uptime
+TASK_WALL_END=${EPOCHREALTIME:-$(date +%s.%N)}
+
+printf '{"run_id": "%s", "phase": "task", "host": "%s", "wall": %s, "wall_end": %s, "mono_start": %s, "mono_end": %s, "bytes": 0, "exit_code": %s}\n' \
+  "${RUN_ID}" "${HOSTNAME}" "${TASK_WALL/,/.}" "${TASK_WALL_END/,/.}" "${TASK_MONO_START}" "${TASK_MONO_END}" "${TASK_EXIT_CODE}" >>${RESULTS_DIR}/timing.jsonl
+# Record the task outcome in the run's status file for mohid index --sync
+{{ cookiecutter.mohid_command }} index ${MONTE_CARLO} --task-exit $1 ${TASK_EXIT_CODE}
+exit ${TASK_EXIT_CODE}
@@ -0,0 +1,163 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""Content store that deduplicates the small results files of Monte Carlo runs.
+
+Many of the files that are gathered into the results directories of the runs of a
+Monte Carlo job are byte-identical,
+like the run data files that are copied into each run,
+and the VCS revision records.
+The content store of a job,
+:file:`JOB_DIR/content-store/`,
+holds one copy of each distinct small file,
+named by the SHA-256 digest of its contents.
+The results directories hold hard links to those copies,
+so the storage and inodes used by the files grow with the number of distinct files,
+not with the number of runs.
+
+The files in the store are shared by all of the runs whose results directories link
+to them,
+so files in results directories should be replaced rather than modified in place.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import stat
+
+logger = logging.getLogger(__name__)
+
+#: Name of the directory in a Monte Carlo job directory that holds its content store.
+STORE_DIR = "content-store"
+#: Largest file, in bytes, that is deduplicated;
+#: larger files are results that are unique to each run.
+MAX_BYTES = 1024 * 1024
+#: Number of bytes to read at a time when hashing files.
+READ_SIZE = 64 * 1024
+
+
+def job_store(results_dir):
+    """Find the content store of the Monte Carlo job that a results directory
+    belongs to.
+
+    Monte Carlo run results directories are :file:`JOB_DIR/results/RUN_ID/`.
+
+    :param :py:class:`pathlib.Path` results_dir:
+
+    :returns: Content store directory,
+              which may not exist yet;
+              :py:obj:`None` if :kbd:`results_dir` is not the results directory of
+              a Monte Carlo run.
+    :rtype: :py:class:`pathlib.Path`
+    """
+    if results_dir.parent.name != "results":
+        return None
+    return results_dir.parent.parent / STORE_DIR
+
+
+def digest(path):
+    """Calculate the SHA-256 digest of the contents of a file.
+
+    :param :py:class:`pathlib.Path` path:
+
+    :rtype: str
+    """
+    sha256 = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(READ_SIZE), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def add(store, path):
+    """Add the contents of a file to a content store,
+    unless they are already there.
+
+    The file is hard linked into the store if it is on the same file system,
+    otherwise it is copied.
+    Concurrent additions of the same contents are safe because the store file is
+    created by a hard link,
+    which fails if another process has already created it.
+
+    :param :py:class:`pathlib.Path` store: Content store directory.
+    :param :py:class:`pathlib.Path` path: File to add.
+
+    :returns: Path of the file in the store that has the contents of :kbd:`path`.
+    :rtype: :py:class:`pathlib.Path`
+    """
+    hexdigest = digest(path)
+    stored = store / hexdigest[:2] / hexdigest
+    if stored.exists():
+        return stored
+    stored.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(path, stored)
+    except FileExistsError:
+        pass
+    except OSError:
+        # Not on the same file system as the store
+        tmp = stored.with_name(f".{hexdigest}.{os.getpid()}.tmp")
+        shutil.copyfile(path, tmp)
+        try:
+            os.link(tmp, stored)
+        except FileExistsError:
+            pass
+        finally:
+            tmp.unlink()
+    return stored
+
+
+def link(stored, dest):
+    """Hard link a file in a content store to a path,
+    replacing the file that is there.
+
+    :param :py:class:`pathlib.Path` stored: File in a content store.
+    :param :py:class:`pathlib.Path` dest:
+    """
+    tmp = dest.with_name(f".{dest.name}.link")
+    if tmp.exists():
+        tmp.unlink()
+    os.link(stored, tmp)
+    os.replace(tmp, dest)
+
+
+def dedup(path, dest, store):
+    """Gather a small file into a results directory as a hard link to a copy of its
+    contents in a content store,
+    and delete the file.
+
+    Directories,
+    symbolic links,
+    and files larger than :py:data:`MAX_BYTES` are not deduplicated.
+    Neither are files that can't be linked,
+    for example because their store file has reached the file system's limit on
+    the number of links to a file.
+
+    :param :py:class:`pathlib.Path` path: File to gather.
+    :param :py:class:`pathlib.Path` dest: Path of the file in the results directory.
+    :param :py:class:`pathlib.Path` store: Content store directory.
+
+    :returns: :py:obj:`True` if the file was deduplicated.
+    :rtype: boolean
+    """
+    path_stat = os.lstat(path)
+    if not stat.S_ISREG(path_stat.st_mode) or path_stat.st_size > MAX_BYTES:
+        return False
+    try:
+        link(add(store, path), dest)
+    except OSError as exc:
+        logger.warning(f"{path} not deduplicated: {exc}")
+        return False
+    path.unlink()
+    return True
@@ -0,0 +1,698 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd command plug-in for convert sub-command.
+
+Convert a MOHID Lagrangian HDF5 results file to a compressed netCDF4 file.
+
+MOHID stores each output time step of a results variable as a separate HDF5 dataset,
+e.g. :kbd:`/Results/OilSpill/Data_2D/OilConcentration_2D/OilConcentration_2D_00001`,
+and the output times as :kbd:`/Time/Time_00001` datasets of
+year, month, day, hour, minute, and second values.
+The time step datasets of each variable are stacked into a netCDF4 variable
+with a time dimension,
+a block of time steps at a time,
+so the memory needed is a few blocks per worker thread.
+
+Compressing the netCDF4 storage chunks takes most of the conversion time,
+and the netCDF4 library compresses them one at a time.
+So,
+the file's structure is defined with the netCDF4 library,
+and the chunks are shuffled and deflated by a pool of threads
+(:py:mod:`zlib` releases the GIL while it compresses),
+then written directly into the file's HDF5 datasets with :py:mod:`h5py`.
+That is the same encoding that the netCDF4 library would do,
+so the file is read like any other netCDF4 file.
+"""
+import argparse
+import collections
+import concurrent.futures
+import logging
+import os
+import re
+import time
+import zlib
+from pathlib import Path
+
+import arrow
+import cliff.command
+import h5py
+import netCDF4
+import numpy
+
+import mohid_cmd.ensemble
+
+logger = logging.getLogger(__name__)
+
+#: Name of the time dimension and coordinate variable in netCDF4 files.
+TIME_DIM = mohid_cmd.ensemble.TIME_DIM
+#: Number of time steps in the netCDF4 storage chunks of time series variables
+#: unless chunk sizes are given;
+#: it matches the number of time steps that ensemble statistics are read in.
+DEFAULT_TIME_CHUNK = mohid_cmd.ensemble.TIME_CHUNK
+#: zlib compression level of netCDF4 variables unless another level is given.
+DEFAULT_COMPLEVEL = 4
+#: Names of the grid dimensions of 2D and 3D variables, in netCDF4 storage order.
+GRID_DIMS = ("grid_z", "grid_y", "grid_x")
+#: Pattern of the names of the time step datasets of MOHID results variables.
+TIME_STEP_RE = re.compile(r"(?P<name>.+)_(?P<step>\d{5})")
+
+
+class Convert(cliff.command.Command):
+    """Convert a MOHID Lagrangian HDF5 results file to netCDF4."""
+
+    def get_parser(self, prog_name):
+        parser = super().get_parser(prog_name)
+        parser.description = """
+            Convert the MOHID Lagrangian HDF5 results file HDF5_FILE to the compressed
+            netCDF4 file NETCDF4_FILE.
+            The time step datasets of each results variable are stacked into a
+            variable with a time dimension,
+            a block of time steps at a time.
+            The storage chunks of the blocks are compressed concurrently by a pool
+            of threads.
+        """
+        parser.add_argument(
+            "hdf5_file", metavar="HDF5_FILE", type=Path, help="MOHID HDF5 results file"
+        )
+        parser.add_argument(
+            "netcdf4_file",
+            metavar="NETCDF4_FILE",
+            type=Path,
+            help="netCDF4 file to write",
+        )
+        parser.add_argument(
+            "--var",
+            dest="var_names",
+            action="append",
+            default=None,
+            metavar="NAME",
+            help="""
+            Name of a results variable to convert;
+            e.g. OilConcentration_2D.
+            Use more than once to convert several variables.
+            Defaults to all of the variables in HDF5_FILE.
+            """,
+        )
+        parser.add_argument(
+            "--chunk",
+            dest="chunk_sizes",
+            type=chunk_size,
+            action="append",
+            default=[],
+            metavar="DIM=SIZE",
+            help=f"""
+            Storage chunk size of dimension DIM in NETCDF4_FILE;
+            e.g. time=24.
+            Use more than once to set the chunk sizes of several dimensions.
+            Chunks hold {DEFAULT_TIME_CHUNK} time steps of the whole grid
+            unless they are set.
+            """,
+        )
+        parser.add_argument(
+            "--time-stride",
+            dest="time_stride",
+            type=int,
+            default=1,
+            metavar="N",
+            help="""
+            Convert every Nth output time step,
+            starting with the first;
+            defaults to 1 for all of the time steps.
+            """,
+        )
+        parser.add_argument(
+            "--complevel",
+            type=int,
+            choices=range(10),
+            default=DEFAULT_COMPLEVEL,
+            metavar="LEVEL",
+            help=f"""
+            zlib compression level of the variables in NETCDF4_FILE;
+            0 for no compression to 9 for the most;
+            defaults to {DEFAULT_COMPLEVEL}.
+            """,
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="""
+            Maximum number of threads to read and compress blocks of variables in
+            concurrently;
+            defaults to the number of CPUs available to the process.
+            """,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute the `mohid convert` sub-command.
+
+        :param parsed_args: Arguments and options parsed from the command-line.
+        :type parsed_args: :class:`argparse.Namespace` instance
+        """
+        t_start = time.perf_counter()
+        var_names = convert(
+            parsed_args.hdf5_file,
+            parsed_args.netcdf4_file,
+            var_names=parsed_args.var_names,
+            chunk_sizes=dict(parsed_args.chunk_sizes),
+            time_stride=parsed_args.time_stride,
+            complevel=parsed_args.complevel,
+            workers=parsed_args.workers,
+        )
+        logger.info(
+            f"converted {len(var_names)} variable(s) from {parsed_args.hdf5_file} "
+            f"to {parsed_args.netcdf4_file} in {time.perf_counter() - t_start:.1f}s"
+        )
+
+
+def chunk_size(value):
+    """Parse a :kbd:`DIM=SIZE` chunk size command-line option value.
+
+    :param str value:
+
+    :returns: Dimension name and chunk size.
+    :rtype: 2-tuple
+
+    :raises: :py:exc:`argparse.ArgumentTypeError`
+    """
+    dim, _, size = value.partition("=")
+    try:
+        size = int(size)
+    except ValueError:
+        size = 0
+    if not dim or size < 1:
+        raise argparse.ArgumentTypeError(
+            f"invalid chunk size: {value!r}; expected DIM=SIZE, e.g. time=24"
+        )
+    return dim, size
+
+
+class MohidVariable:
+    """A results variable in a MOHID HDF5 file.
+
+    :param str name: Name of the variable.
+
+    :param datasets: Paths in the HDF5 file of the time step datasets of the variable,
+                     in time order,
+                     or of the single dataset of a variable that has no time steps.
+    :type datasets: list of str
+
+    :param bool time_series: The variable has a dataset for each output time.
+    """
+
+    def __init__(self, name, datasets, time_series=True):
+        self.name = name
+        self.datasets = datasets
+        self.time_series = time_series
+
+    def __repr__(self):
+        return (
+            f"MohidVariable({self.name!r}, {len(self.datasets)} dataset(s), "
+            f"time_series={self.time_series})"
+        )
+
+    def block_starts(self, time_chunk):
+        """
+        :param int time_chunk: Number of time steps in a block.
+
+        :returns: Index of the first time step of each block of the variable;
+                  :py:obj:`None` for a variable that has no time steps.
+        :rtype: list
+        """
+        if not self.time_series:
+            return [None]
+        return list(range(0, len(self.datasets), time_chunk))
+
+    def read_block(self, h5file, start, time_chunk):
+        """Read a block of time steps of the variable.
+
+        The values are returned in netCDF4 storage order;
+        see :py:func:`to_storage_order`.
+
+        :param h5file: MOHID HDF5 results file.
+        :type h5file: :py:class:`h5py.File`
+
+        :param start: Index of the first time step of the block;
+                      :py:obj:`None` for a variable that has no time steps.
+        :type start: int or None
+
+        :param int time_chunk: Number of time steps in a block.
+
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        if start is None:
+            return to_storage_order(h5file[self.datasets[0]][()])
+        paths = self.datasets[start : start + time_chunk]
+        first = h5file[paths[0]]
+        block = numpy.empty((len(paths),) + first.shape, dtype=first.dtype)
+        for i, path in enumerate(paths):
+            h5file[path].read_direct(block[i])
+        return to_storage_order(block)
+
+
+def to_storage_order(values):
+    """Reorder the axes of MOHID HDF5 array values to netCDF4 storage order.
+
+    MOHID writes its arrays from Fortran in (i, j, k) index order,
+    so they are read as (k, j, i);
+    i.e. the latitude-wise and longitude-wise axes are swapped.
+    Swapping the last 2 axes puts the values in (time, z, y, x) order.
+
+    :param :py:class:`numpy.ndarray` values:
+
+    :rtype: :py:class:`numpy.ndarray`
+    """
+    return numpy.ascontiguousarray(numpy.swapaxes(values, -1, -2))
+
+
+def convert(
+    hdf5_file,
+    netcdf4_file,
+    var_names=None,
+    chunk_sizes=None,
+    time_stride=1,
+    complevel=DEFAULT_COMPLEVEL,
+    workers=None,
+):
+    """Convert a MOHID Lagrangian HDF5 results file to a compressed netCDF4 file.
+
+    The structure of the netCDF4 file is defined with the netCDF4 library.
+    Then time series variables are read a block of time steps at a time,
+    with the blocks aligned to the storage chunks of the netCDF4 variables,
+    and the chunks are compressed by a pool of threads and written directly into
+    the file's HDF5 datasets;
+    see :py:func:`_write_variables`.
+    The netCDF4 file is written to a temporary file that is renamed into place,
+    so an interrupted conversion does not leave an incomplete file.
+
+    :param hdf5_file: MOHID HDF5 results file.
+    :type hdf5_file: :py:class:`pathlib.Path`
+
+    :param netcdf4_file: netCDF4 file to write.
+    :type netcdf4_file: :py:class:`pathlib.Path`
+
+    :param var_names: Names of the variables to convert;
+                      defaults to all of the results variables in :kbd:`hdf5_file`.
+    :type var_names: sequence of str
+
+    :param dict chunk_sizes: Storage chunk sizes of netCDF4 dimensions;
+                             dimensions that are not included are not divided into
+                             chunks,
+                             except for :py:data:`TIME_DIM` which is divided into
+                             chunks of :py:data:`DEFAULT_TIME_CHUNK` time steps.
+
+    :param int time_stride: Convert every :kbd:`time_stride` th output time step,
+                            starting with the first.
+
+    :param int complevel: zlib compression level; 0 for no compression.
+
+    :param int workers: Maximum number of threads to read and compress blocks in;
+                        defaults to the number of CPUs available to the process.
+
+    :returns: Names of the converted variables.
+    :rtype: list of str
+    """
+    hdf5_file, netcdf4_file = Path(hdf5_file), Path(netcdf4_file)
+    chunk_sizes = dict(chunk_sizes or {})
+    tmp_file = netcdf4_file.with_name(f".{netcdf4_file.name}.tmp")
+    with h5py.File(hdf5_file, "r") as h5file:
+        times = read_times(h5file)
+        variables = find_variables(h5file)
+        if var_names:
+            unknown = [name for name in var_names if name not in variables]
+            if unknown:
+                logger.error(
+                    f"variable(s) not found in {hdf5_file}: {', '.join(unknown)}; "
+                    f"expected one or more of: {', '.join(variables)}"
+                )
+                raise SystemExit(2)
+            variables = {name: variables[name] for name in var_names}
+        mismatched = [
+            name
+            for name, variable in variables.items()
+            if variable.time_series and len(variable.datasets) != len(times)
+        ]
+        if mismatched:
+            logger.error(
+                f"number of time steps of variable(s) in {hdf5_file} differ from "
+                f"the {len(times)} output times: {', '.join(mismatched)}"
+            )
+            raise SystemExit(2)
+        if time_stride < 1:
+            logger.error(f"time stride must be a positive integer: {time_stride}")
+            raise SystemExit(2)
+        # Time steps that are skipped are never read
+        times = times[::time_stride]
+        for variable in variables.values():
+            if variable.time_series:
+                variable.datasets = variable.datasets[::time_stride]
+        workers = workers or _available_cpus()
+        try:
+            with netCDF4.Dataset(tmp_file, "w") as dataset:
+                _define_time(dataset, times)
+                _copy_grid(h5file, dataset, chunk_sizes, complevel)
+                for variable in variables.values():
+                    _define_variable(h5file, dataset, variable, chunk_sizes, complevel)
+                dataset.history = (
+                    f"[{arrow.now().format('ddd YYYY-MM-DD HH:mm:ss ZZ')}] "
+                    f"created by mohid convert {hdf5_file}"
+                )
+            with h5py.File(tmp_file, "r+") as h5out:
+                _write_variables(h5file, h5out, list(variables.values()), workers)
+        except BaseException:
+            if tmp_file.exists():
+                tmp_file.unlink()
+            raise
+    tmp_file.rename(netcdf4_file)
+    return list(variables)
+
+
+def read_times(h5file):
+    """Read the output times from a MOHID HDF5 results file.
+
+    :param h5file: MOHID HDF5 results file.
+    :type h5file: :py:class:`h5py.File`
+
+    :returns: Output times.
+    :rtype: list of :py:class:`arrow.Arrow`
+    """
+    time_group = h5file["Time"]
+    return [
+        arrow.get(*(int(value) for value in time_group[name][()]))
+        for name in sorted(time_group)
+    ]
+
+
+def find_variables(h5file):
+    """Find the results variables in a MOHID HDF5 results file.
+
+    Each group of datasets named like :kbd:`NAME_00001`, :kbd:`NAME_00002`, etc.
+    under :kbd:`/Results` is a time series variable named :kbd:`NAME`.
+    Other 2D and 3D datasets under :kbd:`/Results` are variables that have no time
+    steps,
+    like :kbd:`Beaching_Time`.
+    Variables with the same name in different groups are named with their group
+    path,
+    e.g. :kbd:`OilSpill_Data_3D_Density`.
+
+    :param h5file: MOHID HDF5 results file.
+    :type h5file: :py:class:`h5py.File`
+
+    :returns: Variables in the order that they are found.
+    :rtype: dict of :py:class:`MohidVariable` keyed by name
+    """
+    variables = {}
+
+    def add(name, group, datasets, time_series):
+        if name in variables:
+            path = group.name.split("/")[2:]
+            if path and path[-1] == name:
+                # Time step datasets are in a group named for their variable
+                path = path[:-1]
+            name = "_".join(path + [name])
+        variables[name] = MohidVariable(name, datasets, time_series)
+
+    def visit(group):
+        time_steps = {}
+        for member_name, member in group.items():
+            if isinstance(member, h5py.Group):
+                visit(member)
+                continue
+            match = TIME_STEP_RE.fullmatch(member_name)
+            if match:
+                time_steps.setdefault(match["name"], []).append(member.name)
+            elif member.ndim in (2, 3):
+                add(member_name, group, [member.name], time_series=False)
+        for name, datasets in time_steps.items():
+            add(name, group, sorted(datasets), time_series=True)
+
+    visit(h5file["Results"])
+    return variables
+
+
+def _available_cpus():
+    """
+    :returns: Number of CPUs that the process may run on;
+              in a Slurm job that is the number of CPUs allocated to the task.
+    :rtype: int
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _define_time(dataset, times):
+    """
+    :param :py:class:`netCDF4.Dataset` dataset:
+    :param list times:
+    """
+    dataset.createDimension(TIME_DIM, len(times))
+    time_var = dataset.createVariable(TIME_DIM, "f8", (TIME_DIM,))
+    if times:
+        time_var.units = f"seconds since {times[0].format('YYYY-MM-DD HH:mm:ss')}"
+        time_var.calendar = "gregorian"
+        time_var[:] = [(t - times[0]).total_seconds() for t in times]
+
+
+def _grid_dims(dataset, shape):
+    """Get the names of the grid dimensions of values with a shape,
+    creating the dimensions that are not already in a netCDF4 dataset.
+
+    Dimensions whose sizes differ from those of the dimensions that are already
+    defined,
+    like the grid cell corner coordinates that MOHID stores,
+    are named with their size appended.
+
+    :param :py:class:`netCDF4.Dataset` dataset:
+    :param tuple shape: Shape of the values in netCDF4 storage order.
+
+    :rtype: tuple of str
+    """
+    dims = []
+    for dim, size in zip(GRID_DIMS[-len(shape) :], shape):
+        if dim in dataset.dimensions and len(dataset.dimensions[dim]) != size:
+            dim = f"{dim}_{size}"
+        if dim not in dataset.dimensions:
+            dataset.createDimension(dim, size)
+        dims.append(dim)
+    return tuple(dims)
+
+
+def _create_variable(dataset, name, dtype, dims, chunk_sizes, complevel, units):
+    """
+    :param :py:class:`netCDF4.Dataset` dataset:
+    :param str name:
+    :param :py:class:`numpy.dtype` dtype:
+    :param tuple dims:
+    :param dict chunk_sizes:
+    :param int complevel:
+    :param units: Units attribute of the HDF5 dataset.
+    :type units: str or bytes
+    """
+    chunksizes = [
+        min(
+            chunk_sizes.get(dim, len(dataset.dimensions[dim])),
+            len(dataset.dimensions[dim]),
+        )
+        for dim in dims
+    ]
+    var = dataset.createVariable(
+        name,
+        # HDF5 dtypes have explicit byte order, which netCDF4 warns about
+        numpy.dtype(dtype).newbyteorder("="),
+        dims,
+        zlib=complevel > 0,
+        complevel=complevel or 1,
+        shuffle=complevel > 0,
+        chunksizes=chunksizes if all(chunksizes) else None,
+    )
+    if units is not None:
+        var.units = units.decode() if isinstance(units, bytes) else str(units)
+    return var
+
+
+def _copy_grid(h5file, dataset, chunk_sizes, complevel):
+    """Copy the 2D and 3D grid datasets,
+    like :kbd:`Latitude`, :kbd:`Longitude`, and :kbd:`Bathymetry`,
+    from a MOHID HDF5 results file.
+
+    :param :py:class:`h5py.File` h5file:
+    :param :py:class:`netCDF4.Dataset` dataset:
+    :param dict chunk_sizes:
+    :param int complevel:
+    """
+    if "Grid" not in h5file:
+        return
+    for name, member in h5file["Grid"].items():
+        if not isinstance(member, h5py.Dataset) or member.ndim not in (2, 3):
+            continue
+        values = to_storage_order(member[()])
+        dims = _grid_dims(dataset, values.shape)
+        var = _create_variable(
+            dataset,
+            name,
+            values.dtype,
+            dims,
+            chunk_sizes,
+            complevel,
+            member.attrs.get("Units"),
+        )
+        var[:] = values
+
+
+def _define_variable(h5file, dataset, variable, chunk_sizes, complevel):
+    """
+    :param :py:class:`h5py.File` h5file:
+    :param :py:class:`netCDF4.Dataset` dataset:
+    :param :py:class:`MohidVariable` variable:
+    :param dict chunk_sizes:
+    :param int complevel:
+    """
+    first = h5file[variable.datasets[0]]
+    grid_shape = first.shape[:-2] + first.shape[-2:][::-1]
+    dims = _grid_dims(dataset, grid_shape)
+    if variable.time_series:
+        dims = (TIME_DIM,) + dims
+        chunk_sizes = dict(
+            chunk_sizes,
+            **{TIME_DIM: chunk_sizes.get(TIME_DIM, DEFAULT_TIME_CHUNK)},
+        )
+    _create_variable(
+        dataset,
+        variable.name,
+        first.dtype,
+        dims,
+        chunk_sizes,
+        complevel,
+        first.attrs.get("Units"),
+    )
+
+
+class _ChunkEncoding:
+    """The storage chunk shape and filters of a netCDF4 variable,
+    read from its HDF5 dataset in the main thread so that encoding threads
+    don't need to use :py:mod:`h5py`.
+
+    :param :py:class:`h5py.Dataset` dataset:
+    """
+
+    def __init__(self, dataset):
+        self.dtype = dataset.dtype
+        self.chunks = dataset.chunks
+        self.shuffle = dataset.shuffle and dataset.dtype.itemsize > 1
+        self.complevel = (
+            dataset.compression_opts if dataset.compression == "gzip" else None
+        )
+
+    def encode(self, values, start):
+        """Divide values into storage chunks,
+        and apply the shuffle and deflate filters of the variable to them.
+
+        Chunks at the edges of the variable are padded to the full chunk shape,
+        as HDF5 stores them.
+
+        :param :py:class:`numpy.ndarray` values: Block of the variable's values
+                                                 in netCDF4 storage order.
+        :param start: Index of the first time step of the block;
+                      :py:obj:`None` for a variable that has no time steps.
+        :type start: int or None
+
+        :returns: Offset of each chunk in the variable, and its encoded bytes.
+        :rtype: list of 2-tuples
+        """
+        values = numpy.asarray(values, dtype=self.dtype)
+        n_chunks = [-(-size // chunk) for size, chunk in zip(values.shape, self.chunks)]
+        encoded = []
+        for index in numpy.ndindex(*n_chunks):
+            offset = tuple(i * chunk for i, chunk in zip(index, self.chunks))
+            chunk = values[
+                tuple(
+                    slice(first, first + size)
+                    for first, size in zip(offset, self.chunks)
+                )
+            ]
+            if chunk.shape != self.chunks:
+                padded = numpy.zeros(self.chunks, dtype=self.dtype)
+                padded[tuple(slice(0, size) for size in chunk.shape)] = chunk
+                chunk = padded
+            chunk = numpy.ascontiguousarray(chunk)
+            if self.shuffle:
+                data = chunk.view(numpy.uint8).reshape(-1, chunk.itemsize).T.tobytes()
+            else:
+                data = chunk.tobytes()
+            if self.complevel is not None:
+                data = zlib.compress(data, self.complevel)
+            if start is not None:
+                offset = (offset[0] + start,) + offset[1:]
+            encoded.append((offset, data))
+        return encoded
+
+
+def _write_variables(h5file, h5out, variables, workers):
+    """Read variables from a MOHID HDF5 results file a block at a time,
+    encode the storage chunks of the blocks,
+    and write the encoded chunks into the HDF5 datasets of a netCDF4 file.
+
+    Each block of a time series variable holds the time steps of a storage chunk,
+    so each chunk is encoded once.
+    With more than 1 worker,
+    blocks are read and encoded by a pool of threads,
+    and written in order in this thread.
+    The number of blocks in flight is limited to twice the number of workers
+    so that the memory needed stays bounded.
+
+    :param :py:class:`h5py.File` h5file:
+    :param h5out: netCDF4 file opened for writing with :py:mod:`h5py`.
+    :type h5out: :py:class:`h5py.File`
+
+    :param list variables:
+    :param int workers:
+    """
+    tasks = []
+    for variable in variables:
+        dataset = h5out[variable.name]
+        if dataset.chunks is None:
+            # A variable with a zero length dimension has no values to write
+            continue
+        encoding = _ChunkEncoding(dataset)
+        time_chunk = encoding.chunks[0] if variable.time_series else None
+        tasks.extend(
+            (variable, encoding, start, time_chunk)
+            for start in variable.block_starts(time_chunk)
+        )
+
+    def encode_block(variable, encoding, start, time_chunk):
+        block = variable.read_block(h5file, start, time_chunk)
+        return variable.name, encoding.encode(block, start)
+
+    def write(name, chunks):
+        dataset_id = h5out[name].id
+        for offset, data in chunks:
+            dataset_id.write_direct_chunk(offset, data)
+
+    if workers <= 1:
+        for task in tasks:
+            write(*encode_block(*task))
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight = collections.deque()
+        for task in tasks:
+            in_flight.append(pool.submit(encode_block, *task))
+            if len(in_flight) >= 2 * workers:
+                write(*in_flight.popleft().result())
+        while in_flight:
+            write(*in_flight.popleft().result())
@@ -0,0 +1,220 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd command plug-in for drain sub-command.
+
+Gather the results of Monte Carlo runs whose model execution finished before their
+glost job was drained at its time limit,
+and record the runs that were interrupted.
+"""
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+
+import cliff.command
+
+import mohid_cmd.content_store
+import mohid_cmd.gather
+import mohid_cmd.prepare
+import mohid_cmd.profile
+import mohid_cmd.run
+
+logger = logging.getLogger(__name__)
+
+#: Name of the file in a run's results directory in which :file:`run-task.sh` records
+#: the id of the Slurm job that is executing the run.
+SLURM_JOB_ID_FILE = "slurm-job-id"
+#: Name of the file in a job directory in which drained runs are recorded.
+DRAINED_RUNS_FILE = "drained-runs.jsonl"
+
+
+class Drain(cliff.command.Command):
+    """Gather complete results and record interrupted runs of a drained job."""
+
+    def get_parser(self, prog_name):
+        parser = super().get_parser(prog_name)
+        parser.description = """
+            Find the runs of the Monte Carlo job in JOB_DIR that did not finish.
+            Gather the results of the runs whose MOHID model execution finished,
+            and record the runs that were interrupted in the job directory's
+            drained-runs.jsonl file so that they can be re-run with
+            `mohid monte-carlo --retry-failed`.
+            The glost job script runs this command when Slurm signals the job to
+            drain before its time limit.
+        """
+        parser.add_argument(
+            "job_dir", metavar="JOB_DIR", type=Path, help="Monte Carlo job directory"
+        )
+        parser.add_argument(
+            "--slurm-job-id",
+            dest="slurm_job_id",
+            default=None,
+            help="""
+            Only drain the runs that were executed by this Slurm job;
+            defaults to all of the unfinished runs of the Monte Carlo job.
+            """,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute the `mohid drain` sub-command.
+
+        :param parsed_args: Arguments and options parsed from the command-line.
+        :type parsed_args: :class:`argparse.Namespace` instance
+        """
+        summary = drain(parsed_args.job_dir, slurm_job_id=parsed_args.slurm_job_id)
+        logger.info(summary)
+
+
+def drain(job_dir, slurm_job_id=None):
+    """Gather the results of the unfinished runs of a Monte Carlo job whose MOHID model
+    execution finished, and record the runs that were interrupted.
+
+    A run is unfinished if its results directory has no :kbd:`task` timing record.
+    If its :kbd:`model` timing record has a zero exit code,
+    its results are gathered from its temporary run directory,
+    and a :kbd:`task` timing record is appended so that the run is not retried.
+    Otherwise the run was interrupted,
+    and its temporary run directory is left for debugging.
+    Both outcomes are appended to the job directory's :py:data:`DRAINED_RUNS_FILE`.
+
+    :param job_dir: Monte Carlo job directory.
+    :type job_dir: :py:class:`pathlib.Path`
+
+    :param str slurm_job_id: Only drain the runs that were executed by this Slurm job.
+
+    :returns: Summary of the drained runs.
+    :rtype: str
+    """
+    drained = []
+    for results_dir in mohid_cmd.profile.iter_results_dirs(job_dir / "results"):
+        if mohid_cmd.profile.task_exit_code(results_dir) is not None:
+            continue
+        run_slurm_job_id = _read_slurm_job_id(results_dir)
+        if slurm_job_id is not None and run_slurm_job_id != slurm_job_id:
+            continue
+        records = mohid_cmd.profile.read_timing_records(
+            results_dir / mohid_cmd.run.TIMING_FILE
+        )
+        model = next((record for record in records if record["phase"] == "model"), None)
+        work_dir = _read_work_dir(results_dir)
+        state = "interrupted"
+        if model is not None and model["exit_code"] == 0 and work_dir is not None:
+            _gather(work_dir, results_dir, model)
+            state = "gathered"
+        drained.append(
+            {
+                "run_id": results_dir.name,
+                "slurm_job_id": run_slurm_job_id,
+                "state": state,
+                "work_dir": os.fspath(work_dir) if work_dir is not None else None,
+                "wall": time.time(),
+            }
+        )
+    with (job_dir / DRAINED_RUNS_FILE).open("at") as f:
+        for record in drained:
+            f.write(f"{json.dumps(record)}\n")
+    n_gathered = sum(1 for record in drained if record["state"] == "gathered")
+    return (
+        f"drained {len(drained)} unfinished run(s) in {job_dir}: "
+        f"{n_gathered} gathered, {len(drained) - n_gathered} interrupted"
+    )
+
+
+def _read_slurm_job_id(results_dir):
+    """
+    :param :py:class:`pathlib.Path` results_dir:
+
+    :returns: Id of the Slurm job that executed the run,
+              or :py:obj:`None` if it wasn't recorded.
+    :rtype: str
+    """
+    try:
+        return (results_dir / SLURM_JOB_ID_FILE).read_text().strip()
+    except FileNotFoundError:
+        return None
+
+
+def _read_work_dir(results_dir):
+    """Get the temporary run directory of a run from the first line that the run
+    script writes to the :file:`stdout` file in the results directory.
+
+    :param :py:class:`pathlib.Path` results_dir:
+
+    :returns: Temporary run directory,
+              or :py:obj:`None` if it is not recorded or no longer exists.
+    :rtype: :py:class:`pathlib.Path`
+    """
+    try:
+        with (results_dir / "stdout").open("rt") as f:
+            first_line = f.readline()
+    except FileNotFoundError:
+        return None
+    prefix = "working dir: "
+    if not first_line.startswith(prefix):
+        return None
+    work_dir = Path(first_line[len(prefix) :].strip())
+    return work_dir if work_dir.is_dir() else None
+
+
+def _gather(work_dir, results_dir, model):
+    """Gather the results of a run from its temporary run directory,
+    delete the directory,
+    and record the run's completion.
+
+    :param :py:class:`pathlib.Path` work_dir:
+    :param :py:class:`pathlib.Path` results_dir:
+
+    :param dict model: :kbd:`model` timing record of the run.
+    """
+    _recover_node_local_results(work_dir, results_dir.name)
+    cwd = Path.cwd()
+    os.chdir(work_dir)
+    try:
+        # Runs of jobs that have a content store were gathered with deduplication
+        store = mohid_cmd.content_store.job_store(results_dir)
+        mohid_cmd.gather.gather(results_dir, dedup=store is not None and store.is_dir())
+    finally:
+        os.chdir(cwd)
+    try:
+        work_dir.rmdir()
+    except OSError:
+        logger.warning(f"files left in {work_dir} after gathering results")
+    # The task phase ended when the job drained, so only the model timing is known
+    record = dict(model, phase="task", bytes=0, exit_code=0, drained=True)
+    with (results_dir / mohid_cmd.run.TIMING_FILE).open("at") as f:
+        f.write(f"{json.dumps(record)}\n")
+
+
+def _recover_node_local_results(work_dir, run_id):
+    """Move the Lagrangian HDF5 results file of a run whose conversion to netCDF4 was
+    interrupted from node-local storage into the run's :file:`res/` directory
+    so that it is gathered.
+
+    The file is only reachable if the node-local storage that the run directory's
+    :py:data:`mohid_cmd.prepare.NODE_LOCAL_LINK` symbolic link points at is on the
+    node that the drain is executing on.
+
+    :param :py:class:`pathlib.Path` work_dir:
+    :param str run_id:
+    """
+    node_local = work_dir / mohid_cmd.prepare.NODE_LOCAL_LINK
+    if not node_local.is_dir():
+        return
+    for hdf5_file in node_local.glob(f"*_{run_id}.hdf5"):
+        logger.info(f"Moving {hdf5_file.name} from node-local storage to res/")
+        shutil.move(os.fspath(hdf5_file), os.fspath(work_dir / "res" / hdf5_file.name))
@@ -0,0 +1,366 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""Streaming statistics of Lagrangian results across the runs of a Monte Carlo ensemble.
+
+Each run's :file:`Lagrangian_*.nc` file holds gridded oil fields for every output time
+of the run.
+Loading the files of hundreds of runs to calculate ensemble statistics needs more
+memory than a node has,
+so the files are read lazily,
+a few time steps at a time,
+and each run is reduced to a field with the shape of the model grid
+that is accumulated into running ensemble statistics.
+The memory needed is proportional to the size of the grid,
+not to the number of runs or output times.
+"""
+import logging
+from pathlib import Path
+
+import netCDF4
+import numpy
+
+logger = logging.getLogger(__name__)
+
+#: Glob pattern of the Lagrangian results file in a run results directory.
+LAGRANGIAN_PATTERN = "Lagrangian_*.nc"
+#: Name of the time dimension in Lagrangian results files.
+TIME_DIM = "time"
+#: Number of time steps read at a time from variables that are not chunked.
+TIME_CHUNK = 24
+#: Reductions of the time steps of a variable to a single field.
+TIME_REDUCTIONS = ("max", "mean")
+
+
+class LagrangianFile:
+    """Lazy reader for the Lagrangian results netCDF file of a run.
+
+    No variable values are read when the file is opened.
+    Values are read from the file's compressed HDF5 chunks as they are iterated over.
+
+    :param path: Lagrangian results netCDF file.
+    :type path: :py:class:`pathlib.Path`
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.dataset = netCDF4.Dataset(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.dataset.close()
+
+    def grid_shape(self, var_name):
+        """
+        :param str var_name:
+
+        :returns: Shape of the variable without its time dimension.
+        :rtype: tuple
+        """
+        var = self.dataset.variables[var_name]
+        if var.dimensions[:1] == (TIME_DIM,):
+            return var.shape[1:]
+        return var.shape
+
+    def iter_time_chunks(self, var_name, time_chunk=None):
+        """Generate the values of a variable a few time steps at a time.
+
+        Masked values,
+        e.g. land points,
+        are returned as NaNs.
+        Variables without a time dimension are returned as a single chunk with
+        a time dimension of length 1.
+
+        :param str var_name:
+
+        :param int time_chunk: Number of time steps in each chunk;
+                               defaults to the size of the variable's storage chunks
+                               along its time dimension,
+                               or :py:data:`TIME_CHUNK` if it is not chunked.
+
+        :returns: Arrays with the time dimension first.
+        :rtype: generator of :py:class:`numpy.ndarray`
+        """
+        var = self.dataset.variables[var_name]
+        if var.dimensions[:1] != (TIME_DIM,):
+            yield _as_float(var[:])[numpy.newaxis]
+            return
+        if time_chunk is None:
+            chunking = var.chunking()
+            time_chunk = TIME_CHUNK if chunking == "contiguous" else chunking[0]
+        for start in range(0, var.shape[0], time_chunk):
+            yield _as_float(var[start : start + time_chunk])
+
+    def reduce_time(self, var_name, how="max", time_chunk=None):
+        """Reduce the time steps of a variable to a single field,
+        reading a chunk of time steps at a time.
+
+        NaNs are ignored,
+        so grid points are only NaN in the result if they are NaN at all time steps.
+
+        :param str var_name:
+        :param str how: Reduction; one of :py:data:`TIME_REDUCTIONS`.
+        :param int time_chunk: Number of time steps read at a time.
+
+        :returns: Field with the shape of the variable without its time dimension.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        if how not in TIME_REDUCTIONS:
+            raise ValueError(
+                f"unknown time reduction: {how}; expected one of {TIME_REDUCTIONS}"
+            )
+        shape = self.grid_shape(var_name)
+        if how == "max":
+            field = numpy.full(shape, numpy.nan)
+            for chunk in self.iter_time_chunks(var_name, time_chunk):
+                numpy.fmax(field, numpy.fmax.reduce(chunk, axis=0), out=field)
+            return field
+        total = numpy.zeros(shape)
+        n_valid = numpy.zeros(shape, dtype=numpy.int64)
+        for chunk in self.iter_time_chunks(var_name, time_chunk):
+            valid = ~numpy.isnan(chunk)
+            total += numpy.where(valid, chunk, 0).sum(axis=0)
+            n_valid += valid.sum(axis=0)
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            return numpy.where(n_valid > 0, total / n_valid, numpy.nan)
+
+
+class EnsembleStats:
+    """Running statistics of a field across the runs of an ensemble.
+
+    Fields are accumulated one run at a time,
+    so the memory needed is a few arrays the size of the field,
+    plus one for each threshold and histogram bin.
+    NaNs in a run's field are treated as missing values for that run.
+    The variance is accumulated with Welford's algorithm so that it is not degraded
+    by cancellation when the variance is small compared to the mean.
+    Statistics from subsets of the runs can be combined with :py:meth:`merge`.
+
+    :param thresholds: Values for which the number of runs in which each grid point
+                       exceeds the value are counted.
+    :type thresholds: sequence of float
+
+    :param bin_edges: Monotonically increasing edges of histogram bins in which
+                      the number of runs with values in each bin are counted at each
+                      grid point.
+                      As for :py:func:`numpy.histogram`,
+                      the bins are half-open except for the last,
+                      and values outside of the bins are not counted.
+    :type bin_edges: sequence of float
+    """
+
+    def __init__(self, thresholds=(), bin_edges=()):
+        self.thresholds = tuple(thresholds)
+        self.bin_edges = tuple(bin_edges)
+        if len(self.bin_edges) == 1:
+            raise ValueError("at least 2 histogram bin edges are required")
+        self.n_runs = 0
+        self.total = None
+        self.n_valid = None
+        self.max = None
+        self.m2 = None
+        self.exceedances = None
+        self.histogram = None
+        self._mean = None
+
+    def add(self, field):
+        """Accumulate the field of a run.
+
+        :param field: Field of a run.
+        :type field: :py:class:`numpy.ndarray`
+        """
+        field = numpy.asarray(field, dtype=numpy.float64)
+        if self.total is None:
+            self._allocate(field.shape)
+        elif field.shape != self.total.shape:
+            raise ValueError(
+                f"field shape {field.shape} does not match ensemble shape "
+                f"{self.total.shape}"
+            )
+        valid = ~numpy.isnan(field)
+        values = numpy.where(valid, field, 0)
+        self.total += values
+        self.n_valid += valid
+        delta = numpy.where(valid, values - self._mean, 0)
+        self._mean += delta / numpy.maximum(self.n_valid, 1)
+        self.m2 += delta * numpy.where(valid, values - self._mean, 0)
+        numpy.fmax(self.max, field, out=self.max)
+        for counts, threshold in zip(self.exceedances, self.thresholds):
+            counts += field > threshold
+        if self.bin_edges:
+            self._add_to_histogram(field)
+        self.n_runs += 1
+
+    def merge(self, other):
+        """Combine the statistics of another subset of the runs into these statistics.
+
+        The means and variances are combined with the pairwise algorithm of
+        Chan, Golub & LeVeque.
+
+        :param other: Statistics of other runs, with the same thresholds and
+                      histogram bins.
+        :type other: :py:class:`EnsembleStats`
+        """
+        if (other.thresholds, other.bin_edges) != (self.thresholds, self.bin_edges):
+            raise ValueError(
+                f"cannot merge statistics with thresholds {other.thresholds} "
+                f"and bin edges {other.bin_edges} into statistics with thresholds "
+                f"{self.thresholds} and bin edges {self.bin_edges}"
+            )
+        if other.total is None:
+            return
+        if self.total is None:
+            self._allocate(other.total.shape)
+        n_valid = self.n_valid + other.n_valid
+        delta = other._mean - self._mean
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            weight = numpy.where(n_valid > 0, other.n_valid / n_valid, 0)
+        self._mean += delta * weight
+        self.m2 += other.m2 + delta**2 * self.n_valid * weight
+        self.n_valid = n_valid
+        self.total += other.total
+        numpy.fmax(self.max, other.max, out=self.max)
+        for counts, other_counts in zip(self.exceedances, other.exceedances):
+            counts += other_counts
+        if self.bin_edges:
+            self.histogram += other.histogram
+        self.n_runs += other.n_runs
+
+    @property
+    def mean(self):
+        """Mean of the runs' fields;
+        NaN at grid points where all of the runs' values are missing.
+
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        return numpy.where(self.n_valid > 0, self._mean, numpy.nan)
+
+    @property
+    def variance(self):
+        """Sample variance of the runs' fields;
+        NaN at grid points where fewer than 2 of the runs' values are not missing.
+
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            return numpy.where(
+                self.n_valid > 1, self.m2 / (self.n_valid - 1), numpy.nan
+            )
+
+    def exceedance_probability(self, threshold):
+        """Fraction of the runs in which each grid point exceeds a threshold.
+
+        :param float threshold: One of the :py:attr:`thresholds`.
+
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        counts = self.exceedances[self.thresholds.index(threshold)]
+        return counts / self.n_runs
+
+    def _allocate(self, shape):
+        """
+        :param tuple shape:
+        """
+        self.total = numpy.zeros(shape)
+        self.n_valid = numpy.zeros(shape, dtype=numpy.int64)
+        self.max = numpy.full(shape, numpy.nan)
+        self.m2 = numpy.zeros(shape)
+        self._mean = numpy.zeros(shape)
+        self.exceedances = [
+            numpy.zeros(shape, dtype=numpy.int64) for _ in self.thresholds
+        ]
+        if self.bin_edges:
+            n_bins = len(self.bin_edges) - 1
+            self.histogram = numpy.zeros((n_bins,) + shape, dtype=numpy.int64)
+
+    def _add_to_histogram(self, field):
+        """
+        :param :py:class:`numpy.ndarray` field:
+        """
+        values = field.ravel()
+        n_bins = len(self.bin_edges) - 1
+        bins = numpy.searchsorted(self.bin_edges, values, side="right") - 1
+        # The last bin includes its upper edge
+        bins[values == self.bin_edges[-1]] = n_bins - 1
+        in_bins = (bins >= 0) & (bins < n_bins)
+        points = numpy.arange(values.size)
+        self.histogram.reshape(n_bins, -1)[bins[in_bins], points[in_bins]] += 1
+
+
+def find_lagrangian_files(results_dirs):
+    """Find the Lagrangian results files in a collection of run results directories.
+
+    Results directories that do not contain a Lagrangian results file,
+    e.g. those of failed runs,
+    are logged and skipped.
+
+    :param results_dirs: Run results directories;
+                         e.g. from :py:func:`mohid_cmd.query.query`.
+    :type results_dirs: sequence of :py:class:`pathlib.Path`
+
+    :rtype: list of :py:class:`pathlib.Path`
+    """
+    lagrangian_files = []
+    for results_dir in results_dirs:
+        found = sorted(Path(results_dir).glob(LAGRANGIAN_PATTERN))
+        if not found:
+            logger.warning(f"no {LAGRANGIAN_PATTERN} file found in {results_dir}")
+            continue
+        lagrangian_files.append(found[0])
+    return lagrangian_files
+
+
+def reduce_ensemble(
+    lagrangian_files, var_name, how="max", thresholds=(), time_chunk=None
+):
+    """Calculate the ensemble statistics of a variable in one pass through
+    the Lagrangian results files of a collection of runs.
+
+    Each run's variable is reduced over time with :py:meth:`LagrangianFile.reduce_time`
+    and accumulated into an :py:class:`EnsembleStats`.
+
+    :param lagrangian_files: Lagrangian results files of the runs.
+    :type lagrangian_files: sequence of :py:class:`pathlib.Path`
+
+    :param str var_name:
+    :param str how: Time reduction; one of :py:data:`TIME_REDUCTIONS`.
+
+    :param thresholds: Values for which exceedances are counted.
+    :type thresholds: sequence of float
+
+    :param int time_chunk: Number of time steps read at a time.
+
+    :rtype: :py:class:`EnsembleStats`
+    """
+    stats = EnsembleStats(thresholds)
+    for lagrangian_file in lagrangian_files:
+        with LagrangianFile(lagrangian_file) as lagrangian:
+            stats.add(lagrangian.reduce_time(var_name, how, time_chunk))
+    return stats
+
+
+def _as_float(values):
+    """
+    :param values: Values read from a netCDF variable.
+    :type values: :py:class:`numpy.ndarray` or :py:class:`numpy.ma.MaskedArray`
+
+    :returns: Values with masked values replaced by NaNs.
+    :rtype: :py:class:`numpy.ndarray`
+    """
+    return numpy.ma.filled(numpy.ma.asarray(values, dtype=numpy.float64), numpy.nan)
@@ -0,0 +1,143 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""Executor backends that :command:`mohid run` and :command:`mohid monte-carlo` use
+to execute the job scripts that they generate.
+
+The :kbd:`sbatch` executor submits job scripts to the Slurm scheduler.
+The :kbd:`local` executor runs them on the local machine in a bounded pool of
+processes,
+so that small ensembles and benchmarks can be run without Slurm.
+"""
+import concurrent.futures
+import itertools
+import logging
+import os
+import shlex
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+
+class SbatchExecutor:
+    """Submit job scripts to the Slurm scheduler via :command:`sbatch`.
+
+    Tasks are executed within the Slurm job by the job script (e.g. via GLOST),
+    so they are ignored by :py:meth:`submit`.
+    """
+
+    name = "sbatch"
+
+    def submit(self, job_script, tasks=(), env=None):
+        """Submit :kbd:`job_script` to the scheduler.
+
+        :param job_script: Path of the job script.
+        :type job_script: :py:class:`pathlib.Path`
+
+        :param tasks: Ignored.
+        :param env: Ignored.
+
+        :returns: Message generated by :command:`sbatch` upon submission of the job.
+        :rtype: str
+        """
+        sbatch_cmd = f"sbatch {job_script}"
+        return subprocess.run(
+            shlex.split(sbatch_cmd),
+            check=True,
+            universal_newlines=True,
+            stdout=subprocess.PIPE,
+        ).stdout
+
+
+class LocalExecutor:
+    """Run job scripts, or the tasks of a job, as bash commands in a pool of local
+    processes.
+
+    :param int cpus: Maximum number of commands to run concurrently;
+                     defaults to the number of CPUs on the machine.
+    """
+
+    name = "local"
+
+    def __init__(self, cpus=None):
+        self.cpus = cpus or os.cpu_count() or 1
+
+    def submit(self, job_script, tasks=(), env=None):
+        """Run the :kbd:`tasks` command lines,
+        or :kbd:`job_script` if there are no tasks,
+        and wait for them to finish.
+
+        :param job_script: Path of the job script.
+        :type job_script: :py:class:`pathlib.Path`
+
+        :param tasks: bash command lines of the tasks of the job,
+                      e.g. the lines of a GLOST task list file.
+        :type tasks: sequence of str
+
+        :param dict env: Environment variables to add to the environment of the commands.
+
+        :returns: Summary of the task exit codes.
+        :rtype: str
+        """
+        commands = list(tasks) or [f"bash {job_script}"]
+        workers = min(self.cpus, len(commands))
+        cmd_env = dict(os.environ, **(env or {}))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            exit_codes = list(
+                pool.map(_run_command, commands, itertools.repeat(cmd_env))
+            )
+        n_failed = sum(1 for exit_code in exit_codes if exit_code)
+        if n_failed:
+            logger.warning(f"{n_failed} of {len(commands)} local task(s) failed")
+        return (
+            f"Ran {len(commands)} task(s) locally on {workers} CPU(s); "
+            f"{n_failed} failed"
+        )
+
+
+#: Executor backends by name.
+EXECUTORS = {
+    SbatchExecutor.name: SbatchExecutor,
+    LocalExecutor.name: LocalExecutor,
+}
+
+
+def get_executor(name="sbatch", cpus=None):
+    """Return an instance of the executor backend called :kbd:`name`.
+
+    :param str name: Name of the executor backend; :kbd:`sbatch` or :kbd:`local`.
+
+    :param int cpus: Maximum number of commands that the :kbd:`local` executor runs
+                     concurrently.
+
+    :rtype: :py:class:`SbatchExecutor` or :py:class:`LocalExecutor`
+    """
+    if name == LocalExecutor.name:
+        return LocalExecutor(cpus)
+    return EXECUTORS[name]()
+
+
+def _run_command(command, env):
+    """Run a bash command line.
+
+    This is a module-level function so that it can be pickled for execution
+    in a worker process.
+
+    :param str command:
+    :param dict env:
+
+    :returns: Exit code of the command.
+    :rtype: int
+    """
+    return subprocess.run(["bash", "-c", command], env=env).returncode
@@ -16,15 +16,26 @@
 
 Gather results files from a MIDOSS-MOHID run into a specified directory.
 """
+import concurrent.futures
 import logging
+import os
 import shutil
 from pathlib import Path
 
 import cliff.command
 import nemo_cmd
 
+import mohid_cmd.content_store
+import mohid_cmd.job_index
+
 logger = logging.getLogger(__name__)
 
+#: Maximum number of threads that delete the files in a directory concurrently.
+DELETE_WORKERS = 4
+#: Smallest number of files in a directory that are deleted by a pool of threads;
+#: fewer files are deleted serially.
+MIN_CONCURRENT_DELETES = 64
+
 
 class Gather(cliff.command.Command):
     """Gather results files from a MIDOSS-MOHID run."""
@@ -47,6 +58,25 @@ class Gather(cliff.command.Command):
             metavar="RESULTS_DIR",
             help="directory to store results into",
         )
+        parser.add_argument(
+            "--dedup",
+            action="store_true",
+            help="""
+            Gather small files as hard links to copies of their contents in the
+            content-store/ directory of the Monte Carlo job that RESULTS_DIR
+            belongs to,
+            so that files that are identical in all of the job's runs are stored
+            once.
+            """,
+        )
+        parser.add_argument(
+            "--plan",
+            action="store_true",
+            help="""
+            Print the moves and deletions that gathering the results would do,
+            without doing them.
+            """,
+        )
         return parser
 
     def take_action(self, parsed_args):
@@ -58,71 +88,219 @@ class Gather(cliff.command.Command):
         `nomfich.dat` file,
         and other files that define the run are also gathered into the
         directory given by `parsed_args.results_dir`.
+
+        With `parsed_args.plan`,
+        the gather plan is written to stdout instead.
         """
-        gather(parsed_args.results_dir)
+        if parsed_args.plan:
+            plan = make_plan(
+                Path.cwd(), nemo_cmd.resolved_path(parsed_args.results_dir)
+            )
+            self.app.stdout.write("".join(f"{line}\n" for line in plan.lines()))
+            return
+        gather(parsed_args.results_dir, dedup=parsed_args.dedup)
+
+
+class GatherPlan:
+    """The moves and deletions that gather the results of a run from its temporary
+    run directory into its results directory.
 
+    :param :py:class:`pathlib.Path` tmp_run_dir:
+    :param :py:class:`pathlib.Path` results_dir:
+    """
+
+    def __init__(self, tmp_run_dir, results_dir):
+        self.tmp_run_dir = tmp_run_dir
+        self.results_dir = results_dir
+        #: Paths relative to the temporary run directory of the files and directories
+        #: to move into the results directory,
+        #: and whether each one is a regular file.
+        self.moves = []
+        #: Names of the symbolic links in the temporary run directory to delete.
+        self.symlinks = []
+        #: The temporary run directory has a :file:`res/` directory to delete.
+        self.res_dir = False
+
+    def lines(self):
+        """
+        :returns: Description of each step of the plan, in the order they are done.
+        :rtype: list of str
+        """
+        lines = [
+            f"move {src} {self.results_dir / Path(src).name}" for src, _ in self.moves
+        ]
+        lines.extend(f"unlink {name}" for name in self.symlinks)
+        if self.res_dir:
+            lines.append("rmdir res")
+        return lines
+
+
+def make_plan(tmp_run_dir, results_dir):
+    """Plan the gathering of the results of a run.
+
+    The temporary run directory and its :file:`res/` directory are each scanned once.
+    The kinds of their entries come from the directory listings,
+    so no entries are :py:func:`os.stat`-ed.
+    The plan is empty if the temporary run directory is the results directory.
+
+    :param :py:class:`pathlib.Path` tmp_run_dir:
+
+    :param results_dir: Resolved path of the results directory.
+    :type results_dir: :py:class:`pathlib.Path`
 
-def gather(results_dir):
+    :rtype: :py:class:`GatherPlan`
+    """
+    plan = GatherPlan(tmp_run_dir, results_dir)
+    if tmp_run_dir == results_dir:
+        return plan
+    with os.scandir(tmp_run_dir) as entries:
+        for entry in sorted(entries, key=lambda entry: entry.name):
+            if entry.is_symlink():
+                plan.symlinks.append(entry.name)
+            elif entry.name == "res" and entry.is_dir(follow_symlinks=False):
+                plan.res_dir = True
+            else:
+                plan.moves.append((entry.name, entry.is_file(follow_symlinks=False)))
+    if plan.res_dir:
+        with os.scandir(tmp_run_dir / "res") as entries:
+            plan.moves.extend(
+                (f"res/{entry.name}", entry.is_file(follow_symlinks=False))
+                for entry in sorted(entries, key=lambda entry: entry.name)
+            )
+    return plan
+
+
+def gather(results_dir, dedup=False):
     """Move all of the files and directories from the present working directory
     into results_dir.
 
     If results_dir doesn't exist, create it.
 
+    If results_dir is the results directory of a run in an indexed Monte Carlo job,
+    record that the run's results have been gathered in the run's status file.
+
     Delete any symbolic links and sub-directories so that the present working directory is empty.
 
     :param results_dir: Path of the directory into which to store the run
                         results.
     :type results_dir: :py:class:`pathlib.Path`
+
+    :param boolean dedup: Gather small files as hard links into the content store of
+                          the Monte Carlo job that results_dir belongs to;
+                          see :py:mod:`mohid_cmd.content_store`.
+
+    :returns: Plan that was carried out.
+    :rtype: :py:class:`GatherPlan`
     """
     results_dir = nemo_cmd.resolved_path(results_dir)
     results_dir.mkdir(parents=True, exist_ok=True)
-    symlinks = {p for p in Path.cwd().glob("*") if p.is_symlink()}
-    res_files = {p for p in (Path.cwd() / "res").glob("*")}
-    try:
-        _move_results(results_dir, symlinks, res_files)
-    except Exception:
-        raise
+    plan = make_plan(Path.cwd(), results_dir)
+    store = None
+    if dedup:
+        store = mohid_cmd.content_store.job_store(results_dir)
+        if store is None:
+            logger.warning(
+                f"{results_dir} is not the results directory of a Monte Carlo run, "
+                f"so files will not be deduplicated"
+            )
+    _execute_plan(plan, store)
+    mohid_cmd.job_index.record_gathered(results_dir)
+    return plan
 
 
-def _move_results(results_dir, symlinks, res_files):
+def _execute_plan(plan, store=None):
     """
-    :param :py:class:`pathlib.Path` results_dir:
-    :param set symlinks:
-    :param set res_files:
+    :param :py:class:`GatherPlan` plan:
+
+    :param store: Content store directory to deduplicate small files into;
+                  :py:obj:`None` to move all of the files.
+    :type store: :py:class:`pathlib.Path`
     """
-    tmp_run_dir = Path.cwd()
-    if tmp_run_dir.samefile(results_dir):
+    if not plan.moves and not plan.symlinks and not plan.res_dir:
         return
     logger.info("Moving run definition and results files...")
-    for p in tmp_run_dir.glob("*"):
-        if p not in symlinks and p != tmp_run_dir / "res":
-            _move_file(tmp_run_dir, p, results_dir)
-    for p in res_files:
-        _move_file(tmp_run_dir, p, results_dir)
-    _delete_symlinks_and_res_dir(symlinks)
+    n_deduped = 0
+    for src, is_file in plan.moves:
+        n_deduped += _move_file(src, is_file, plan.results_dir, store)
+    if store is not None:
+        logger.info(f"{n_deduped} file(s) linked from content store {store}")
+    _delete_symlinks_and_res_dir(plan.symlinks, res_dir=plan.res_dir)
 
 
-def _move_file(tmp_run_dir, path, results_dir):
+def _move_file(src, is_file, results_dir, store=None):
     """
-    :param :py:class:`pathlib.Path` tmp_run_dir:
-    :param :py:class:`pathlib.Path` path:
+    :param str src: Path relative to the temporary run directory.
+    :param boolean is_file: src is a regular file.
     :param :py:class:`pathlib.Path` results_dir:
+    :param store: Content store directory, or :py:obj:`None`.
+
+    :returns: :py:obj:`True` if the file was gathered as a link into the content
+              store.
+    :rtype: boolean
     """
-    src = path.relative_to(tmp_run_dir)
-    logger.info(f"Moving {src} to {results_dir / src.name}")
-    shutil.move(src, results_dir / src.name)
+    src = Path(src)
+    dest = results_dir / src.name
+    if (
+        store is not None
+        and is_file
+        and mohid_cmd.content_store.dedup(src, dest, store)
+    ):
+        logger.info(f"Linked {src} to {dest} from content store")
+        return True
+    logger.info(f"Moving {src} to {dest}")
+    shutil.move(src, dest)
+    return False
 
 
-def _delete_symlinks_and_res_dir(symlinks):
+def _delete_symlinks_and_res_dir(symlinks, res_dir=True):
+    """Delete symbolic links in the present working directory,
+    and its empty :file:`res/` directory.
+
+    The deletions are relative to a file descriptor of the directory,
+    so the file system resolves its path once.
+
+    :param symlinks: Names of the symbolic links in the present working directory.
+    :type symlinks: list of str
+
+    :param boolean res_dir: Delete :file:`res/`.
     """
-    :param set symlinks:
+    cwd_fd = os.open(".", os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        n_symlinks = unlink_all(cwd_fd, list(symlinks))
+        logger.info(f"Deleted {n_symlinks} symbolic link(s)")
+        if res_dir:
+            os.rmdir("res", dir_fd=cwd_fd)
+            logger.info("Deleted res/")
+    finally:
+        os.close(cwd_fd)
+
+
+def unlink_all(dir_fd, names, workers=DELETE_WORKERS):
+    """Delete files and symbolic links in a directory.
+
+    The names are unlinked relative to a file descriptor of the directory.
+    Deleting files is bound by the latency of the file system's metadata server,
+    not by CPU,
+    and :py:func:`os.unlink` releases the GIL,
+    so the names are divided into batches that are unlinked concurrently
+    by a small pool of threads
+    unless there are fewer than :py:data:`MIN_CONCURRENT_DELETES` of them.
+
+    :param int dir_fd: File descriptor of the directory.
+    :param list names: Names of the files and symbolic links in the directory.
+    :param int workers: Maximum number of threads to delete files in.
+
+    :returns: Number of files and symbolic links deleted.
+    :rtype: int
     """
-    logger.info("Deleting symbolic links...")
-    for ln in symlinks:
-        ln.unlink()
-    logger.info("Deleting files left in res/...")
-    cwd = Path.cwd()
-    for p in (cwd / "res").glob("*"):
-        p.unlink()
-    logger.info("Deleting res/...")
-    (cwd / "res").rmdir()
+
+    def unlink_batch(batch):
+        for name in batch:
+            os.unlink(name, dir_fd=dir_fd)
+        return len(batch)
+
+    if workers <= 1 or len(names) < MIN_CONCURRENT_DELETES:
+        return unlink_batch(names)
+    batches = [names[i::workers] for i in range(workers)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(unlink_batch, batches))
@@ -0,0 +1,185 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd command plug-in for index sub-command.
+
+Build the run index of a Monte Carlo job directory,
+fold the status files of its runs into the index,
+or record the exit code of one of its run tasks.
+"""
+import logging
+import sqlite3
+from pathlib import Path
+
+import cliff.command
+
+import mohid_cmd.job_index
+
+logger = logging.getLogger(__name__)
+
+
+class Index(cliff.command.Command):
+    """Build or update the run index of a Monte Carlo job."""
+
+    def get_parser(self, prog_name):
+        parser = super().get_parser(prog_name)
+        parser.description = f"""
+            Build the {mohid_cmd.job_index.INDEX_FILE} run index of the Monte Carlo job
+            in JOB_DIR from the job's CSV file and the task timing records in its
+            results directories.
+            The index is created by `mohid monte-carlo`,
+            so building it is only necessary for jobs that were created before
+            run indexes were introduced, or to recover a damaged index.
+        """
+        parser.add_argument(
+            "job_dir",
+            metavar="JOB_DIR",
+            type=Path,
+            help="Monte Carlo job directory",
+        )
+        parser.add_argument(
+            "--task-exit",
+            dest="task_exit",
+            type=int,
+            nargs=2,
+            default=None,
+            metavar=("RUN_NUMBER", "EXIT_CODE"),
+            help="""
+            Record the exit code of the task for run RUN_NUMBER in the run's status
+            file instead of building the index.
+            This is used by the job's run-task.sh script.
+            """,
+        )
+        parser.add_argument(
+            "--sync",
+            action="store_true",
+            help="""
+            Fold the status files in the job's results directories into the
+            existing index instead of building it.
+            """,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute the `mohid index` sub-command.
+
+        :param parsed_args: Arguments and options parsed from the command-line.
+        :type parsed_args: :class:`argparse.Namespace` instance
+        """
+        if parsed_args.task_exit is not None:
+            run_number, exit_code = parsed_args.task_exit
+            mohid_cmd.job_index.record_task_exit(
+                parsed_args.job_dir, run_number, exit_code
+            )
+            return
+        if parsed_args.sync:
+            try:
+                n_runs = mohid_cmd.job_index.sync(parsed_args.job_dir)
+            except sqlite3.Error as exc:
+                logger.error(
+                    f"could not update "
+                    f"{parsed_args.job_dir / mohid_cmd.job_index.INDEX_FILE}: {exc}"
+                )
+                raise SystemExit(2)
+            logger.info(
+                f"updated the status of {n_runs} runs in "
+                f"{parsed_args.job_dir / mohid_cmd.job_index.INDEX_FILE}"
+            )
+            return
+        n_runs = build_index(parsed_args.job_dir)
+        logger.info(
+            f"indexed {n_runs} runs in "
+            f"{parsed_args.job_dir / mohid_cmd.job_index.INDEX_FILE}"
+        )
+
+
+def build_index(job_dir):
+    """Build the run index of a Monte Carlo job from the job's description
+    and CSV files, and the status files and task timing records in its results
+    directories.
+
+    The status of a run is :py:data:`mohid_cmd.job_index.PENDING` if it has no
+    results directory,
+    the status in its status file if it has one,
+    :py:data:`mohid_cmd.job_index.DONE` or :py:data:`mohid_cmd.job_index.FAILED`
+    if its results directory contains a :kbd:`task` timing record,
+    and :py:data:`mohid_cmd.job_index.STARTED` otherwise.
+
+    :param :py:class:`pathlib.Path` job_dir:
+
+    :returns: Number of runs in the index.
+    :rtype: int
+    """
+    # Imported here so that `mohid index --task-exit`,
+    # which run-task.sh runs at the end of every task,
+    # doesn't pay for importing pandas and NEMO-Cmd
+    import nemo_cmd.prepare
+
+    import mohid_cmd.monte_carlo
+
+    job_dir = Path(job_dir).resolve()
+    job_id = job_dir.name.rpartition("_")[0]
+    desc_file = _job_file(job_dir, "*.yaml", "glost job description YAML")
+    csv_file = _job_file(job_dir, "*.csv", "runs CSV")
+    job_desc = nemo_cmd.prepare.load_run_desc(desc_file)
+    forcing_dir = nemo_cmd.prepare.get_run_desc_value(
+        job_desc,
+        ("paths", "forcing directory"),
+        expand_path=True,
+        resolve_path=True,
+    )
+    runs = mohid_cmd.monte_carlo._get_runs_info(csv_file)
+    rows = []
+    for row in mohid_cmd.job_index.run_rows(job_id, forcing_dir, runs):
+        results_dir = job_dir / row["results_dir"]
+        if results_dir.is_dir():
+            row.update(_run_status(results_dir))
+        rows.append(row)
+    return mohid_cmd.job_index.create(job_dir, rows)
+
+
+def _run_status(results_dir):
+    """
+    :param :py:class:`pathlib.Path` results_dir:
+
+    :returns: Index row :kbd:`status` and :kbd:`exit_code` items,
+              and :kbd:`updated` item if the run has a status file.
+    :rtype: dict
+    """
+    import mohid_cmd.profile
+
+    record = mohid_cmd.job_index.read_status(results_dir)
+    if record is not None:
+        return record
+    exit_code = mohid_cmd.profile.task_exit_code(results_dir)
+    if exit_code is None:
+        return {"status": mohid_cmd.job_index.STARTED, "exit_code": None}
+    if exit_code == 0:
+        return {"status": mohid_cmd.job_index.DONE, "exit_code": exit_code}
+    return {"status": mohid_cmd.job_index.FAILED, "exit_code": exit_code}
+
+
+def _job_file(job_dir, pattern, kind):
+    """
+    :param :py:class:`pathlib.Path` job_dir:
+    :param str pattern:
+    :param str kind:
+
+    :rtype: :py:class:`pathlib.Path`
+    """
+    job_files = list(job_dir.glob(pattern))
+    if len(job_files) != 1:
+        logger.error(f"expected 1 {kind} file in {job_dir}")
+        raise SystemExit(2)
+    return job_files[0]
@@ -0,0 +1,308 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""Run index of a Monte Carlo job.
+
+The index is an SQLite database in the job directory with a row for each run
+that holds the run's parameters from the CSV file,
+the paths of its forcing, temporary run, and results directories,
+and its status.
+The spill date/time and location columns are indexed,
+so runs can be found by B-tree searches instead of by listing the :file:`results/`
+directory and re-reading the CSV file.
+
+Runs don't write to the index while the job is running.
+Instead, each run writes its status to a :file:`run-status.json` file in its own
+results directory,
+and :command:`mohid index --sync` and :command:`mohid query` fold those files into
+the index.
+That keeps hundreds of concurrent tasks from contending for a lock on one SQLite file
+on the shared file system.
+
+This module only depends on the standard library so that importing it does not
+slow down :command:`mohid gather`,
+which records the status of a run at the end of the run.
+"""
+import json
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+#: Name of the run index file in a job directory.
+INDEX_FILE = "job-index.sqlite"
+#: Version of the index schema, stored in the database's :kbd:`user_version`.
+SCHEMA_VERSION = 1
+#: Name of the run status file in a run results directory.
+STATUS_FILE = "run-status.json"
+#: Seconds to wait for another process to finish writing to the index.
+LOCK_TIMEOUT = 60
+#: Run has not started.
+PENDING = "pending"
+#: Run results directory exists, but its task has not finished.
+STARTED = "started"
+#: Run results have been gathered into its results directory.
+GATHERED = "gathered"
+#: Run task finished with a zero exit code.
+DONE = "done"
+#: Run task finished with a non-zero exit code.
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE runs (
+    run_number INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL UNIQUE,
+    spill_date_hour TEXT,
+    run_days INTEGER,
+    spill_lon REAL,
+    spill_lat REAL,
+    spill_volume REAL,  -- litres
+    lagrangian_template TEXT,
+    forcing_dir TEXT,
+    tmp_run_dir TEXT,
+    results_dir TEXT,
+    status TEXT NOT NULL,
+    exit_code INTEGER,
+    updated REAL
+);
+"""
+INDEXES = """
+CREATE INDEX runs_spill_date_hour ON runs (spill_date_hour);
+CREATE INDEX runs_spill_lat_lon ON runs (spill_lat, spill_lon);
+CREATE INDEX runs_status ON runs (status);
+"""
+
+
+def run_rows(job_id, forcing_dir, runs):
+    """Generate the index rows of the runs of a Monte Carlo job.
+
+    The temporary run and results directory paths are relative to the job directory
+    so that the index stays valid if the job directory is moved.
+
+    :param str job_id:
+    :param :py:class:`pathlib.Path` forcing_dir: Directory in which the forcing
+                                                 directories of the runs are created.
+    :param :py:class:`pandas.DataFrame` runs: Run parameters from the CSV file.
+
+    :rtype: generator of dict
+    """
+    now = time.time()
+    forcing_root = os.fspath(forcing_dir)
+    # Columns are converted to lists of Python values in bulk
+    # because that is much faster than converting the values of each row
+    columns = zip(
+        runs.index.tolist(),
+        runs.spill_date_hour.dt.strftime("%Y-%m-%d %H:%M:%S").tolist(),
+        runs.run_days.tolist(),
+        runs.spill_lon.tolist(),
+        runs.spill_lat.tolist(),
+        runs.spill_volume.tolist(),
+        runs.Lagrangian_template.tolist(),
+    )
+    for run_number, spill_date_hour, run_days, lon, lat, volume, template in columns:
+        run_id = f"{job_id}-{run_number}"
+        yield {
+            "run_number": run_number,
+            "run_id": run_id,
+            "spill_date_hour": spill_date_hour,
+            "run_days": int(run_days),
+            "spill_lon": float(lon),
+            "spill_lat": float(lat),
+            "spill_volume": float(volume),
+            "lagrangian_template": str(template),
+            "forcing_dir": f"{forcing_root}/{run_id}",
+            "tmp_run_dir": run_id,
+            "results_dir": f"results/{run_id}",
+            "status": PENDING,
+            "exit_code": None,
+            "updated": now,
+        }
+
+
+def create(job_dir, rows):
+    """Write the run index of a Monte Carlo job.
+
+    The index is written to a temporary file that is renamed into place,
+    so an existing index is replaced atomically.
+    That also makes it safe to write the temporary file without a rollback journal.
+    The column indexes are built after the rows are inserted because that is faster
+    than maintaining them during the inserts.
+
+    :param :py:class:`pathlib.Path` job_dir:
+    :param rows: Index rows like those from :py:func:`run_rows`.
+    :type rows: iterable of dict
+
+    :returns: Number of runs in the index.
+    :rtype: int
+    """
+    index_file = job_dir / INDEX_FILE
+    tmp_file = index_file.with_name(f"{INDEX_FILE}.tmp")
+    tmp_file.unlink(missing_ok=True)
+    connection = sqlite3.connect(tmp_file)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        with connection:
+            connection.executescript(SCHEMA)
+            connection.executemany(
+                """
+                INSERT INTO runs VALUES (
+                    :run_number, :run_id, :spill_date_hour, :run_days,
+                    :spill_lon, :spill_lat, :spill_volume, :lagrangian_template,
+                    :forcing_dir, :tmp_run_dir, :results_dir,
+                    :status, :exit_code, :updated
+                )
+                """,
+                rows,
+            )
+            connection.executescript(INDEXES)
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        (n_runs,) = connection.execute("SELECT count(*) FROM runs").fetchone()
+    finally:
+        connection.close()
+    tmp_file.rename(index_file)
+    return n_runs
+
+
+def connect(job_dir):
+    """
+    :param :py:class:`pathlib.Path` job_dir:
+
+    :returns: Connection to the run index of the job,
+              with rows that can be accessed by column name.
+    :rtype: :py:class:`sqlite3.Connection`
+    """
+    connection = sqlite3.connect(job_dir / INDEX_FILE, timeout=LOCK_TIMEOUT)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+def write_status(results_dir, status, exit_code=None):
+    """Write the status of a run to the status file in its results directory.
+
+    Each run only writes to its own status file,
+    so run tasks never contend for the run index on the shared file system.
+    The file is written under a temporary name and renamed into place
+    so that readers never see a partly written status.
+    The statuses are folded into the run index by :py:func:`sync`.
+
+    :param :py:class:`pathlib.Path` results_dir:
+    :param str status:
+    :param exit_code: Exit code of the run's GLOST task.
+    :type exit_code: int or None
+    """
+    results_dir.mkdir(parents=True, exist_ok=True)
+    status_file = results_dir / STATUS_FILE
+    tmp_file = results_dir / f".{STATUS_FILE}.{os.getpid()}"
+    record = {"status": status, "exit_code": exit_code, "updated": time.time()}
+    tmp_file.write_text(f"{json.dumps(record)}\n")
+    os.replace(tmp_file, status_file)
+
+
+def read_status(results_dir):
+    """Read the status file in the results directory of a run.
+
+    :param :py:class:`pathlib.Path` results_dir:
+
+    :returns: Status record with :kbd:`status`, :kbd:`exit_code`, and :kbd:`updated`
+              items, or :py:obj:`None` if the run has no valid status file.
+    :rtype: dict or None
+    """
+    status_file = results_dir / STATUS_FILE
+    try:
+        record = json.loads(status_file.read_text())
+    except FileNotFoundError:
+        return None
+    except ValueError as exc:
+        logger.warning(f"ignored invalid run status file {status_file}: {exc}")
+        return None
+    return record
+
+
+def sync(job_dir):
+    """Fold the status files in the results directories of a Monte Carlo job
+    into the job's run index.
+
+    The updates are done in a single transaction,
+    and only rows whose status or exit code have changed are written.
+    Database errors are raised so that callers don't work from a stale index.
+
+    :param :py:class:`pathlib.Path` job_dir:
+
+    :returns: Number of runs whose index rows were updated.
+    :rtype: int
+    """
+    results_root = job_dir / "results"
+    try:
+        entries = list(os.scandir(results_root))
+    except FileNotFoundError:
+        return 0
+    records = []
+    for entry in entries:
+        if not entry.is_dir():
+            continue
+        record = read_status(Path(entry.path))
+        if record is not None:
+            records.append(dict(record, run_id=entry.name))
+    if not records:
+        return 0
+    connection = connect(job_dir)
+    try:
+        with connection:
+            cursor = connection.executemany(
+                """
+                UPDATE runs SET status = :status, exit_code = :exit_code,
+                    updated = :updated
+                WHERE run_id = :run_id
+                    AND (status IS NOT :status OR exit_code IS NOT :exit_code)
+                """,
+                records,
+            )
+    finally:
+        connection.close()
+    return cursor.rowcount
+
+
+def record_task_exit(job_dir, run_number, exit_code):
+    """Record the exit code of the GLOST task of a run in its status file.
+
+    :param :py:class:`pathlib.Path` job_dir:
+    :param int run_number:
+    :param int exit_code:
+    """
+    job_id = job_dir.resolve().name.rpartition("_")[0]
+    status = DONE if exit_code == 0 else FAILED
+    results_dir = job_dir / "results" / f"{job_id}-{run_number}"
+    write_status(results_dir, status, exit_code)
+
+
+def record_gathered(results_dir):
+    """Record that the results of a run have been gathered in its status file,
+    if the run is part of an indexed Monte Carlo job.
+
+    Monte Carlo run results directories are :file:`JOB_DIR/results/RUN_ID/`.
+
+    :param :py:class:`pathlib.Path` results_dir:
+
+    :returns: :py:obj:`True` if the status was recorded.
+    :rtype: boolean
+    """
+    job_dir = results_dir.parent.parent
+    if results_dir.parent.name != "results" or not (job_dir / INDEX_FILE).exists():
+        return False
+    write_status(results_dir, GATHERED)
+    return True
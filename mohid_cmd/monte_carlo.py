@@ -17,25 +17,57 @@
 Prepare for and execute a collection of Monte Carlo runs of the MIDOSS-MOHID model.
 """
 import datetime
+import json
 import logging
 import math
 import os
-import shlex
+import re
 import shutil
-import subprocess
+import socket
+import time
 from pathlib import Path
 
 import arrow
 import cliff.command
-import cookiecutter.main
 import jinja2
+import jinja2.meta
 import nemo_cmd.prepare
 import pandas
 
+import mohid_cmd.executors
+import mohid_cmd.job_index
+import mohid_cmd.profile
+import mohid_cmd.resources
 import mohid_cmd.run
+import mohid_cmd.scaffold
+import mohid_cmd.slurm
+import mohid_cmd.task_queue
+import mohid_cmd.validate
 
 logger = logging.getLogger(__name__)
 
+#: Seconds before its time limit at which Slurm signals a glost job to drain.
+DRAIN_SECONDS = 600
+#: Seconds that a draining glost job keeps at the end of its time limit to gather
+#: the results of runs that are complete after interrupting the runs that are not.
+DRAIN_CLEANUP_SECONDS = 120
+#: Number of runs that `mohid monte-carlo --dry-run` renders in memory.
+DRY_RUN_SAMPLE_SIZE = 100
+#: CSV file columns used to render the files of the runs, and the kind of values
+#: that they must contain.
+RUNS_COLUMNS = {
+    "spill_date_hour": "datetime",
+    "run_days": "integer",
+    "spill_lon": "number",
+    "spill_lat": "number",
+    "spill_volume": "number",
+    "Lagrangian_template": "string",
+}
+#: Templates in the :file:`templates/` directory of the MOHID config that are
+#: rendered for every run.
+#: The :file:`Lagrangian.dat` template is chosen per run by the CSV file.
+RUN_TEMPLATES = ("make-hdf5.yaml", "mohid-run.yaml", "Model.dat", "glost-task.sh")
+
 
 class MonteCarlo(cliff.command.Command):
     """Prepare for and execute a collection of Monte Carlo runs of the MIDOSS-MOHID model."""
@@ -48,17 +80,21 @@ class MonteCarlo(cliff.command.Command):
 
             The glost job is described in DESC_FILE.
             The parameters of the MIDOSS-MOHID runs are defined in CSV_FILE.
+            Alternatively,
+            use --retry-failed to re-run the failed and incomplete runs of a previous job.
         """
         parser.add_argument(
             "desc_file",
             metavar="DESC_FILE",
             type=Path,
+            nargs="?",
             help="glost job description YAML file",
         )
         parser.add_argument(
             "csv_file",
             metavar="CSV_FILE",
             type=Path,
+            nargs="?",
             help="MIDOSS-MOHID run parameters CSV file",
         )
         parser.add_argument(
@@ -76,6 +112,94 @@ class MonteCarlo(cliff.command.Command):
             more than once.
             """,
         )
+        parser.add_argument(
+            "--tune-resources",
+            dest="tune_resources",
+            action="store_true",
+            help="""
+            Set the memory per CPU, CPUs per task, and walltime requested for the glost job
+            from the resource usage recorded by sacct for past jobs with the same job id,
+            instead of the values calculated from DESC_FILE.
+            """,
+        )
+        parser.add_argument(
+            "--sacct-file",
+            dest="sacct_file",
+            type=Path,
+            default=None,
+            help="""
+            File of saved `sacct --parsable2` output to read the resource usage of past jobs
+            from instead of running sacct; implies --tune-resources.
+            """,
+        )
+        parser.add_argument(
+            "--executor",
+            choices=mohid_cmd.executors.EXECUTORS,
+            default="sbatch",
+            help="""
+            How to execute the runs:
+            sbatch submits the glost job to the Slurm scheduler (the default);
+            local runs the glost tasks on this machine and waits for them to finish.
+            """,
+        )
+        parser.add_argument(
+            "--cpus",
+            type=int,
+            default=None,
+            help="""
+            Maximum number of runs that the local executor runs concurrently;
+            defaults to the number of CPUs on this machine.
+            """,
+        )
+        parser.add_argument(
+            "--runs-per-shard",
+            dest="runs_per_shard",
+            type=int,
+            default=None,
+            help="""
+            Split the runs into glost jobs of at most RUNS_PER_SHARD runs each,
+            and submit those jobs to Slurm concurrently.
+            Use `mohid status` to follow the progress of the jobs.
+            Ignored by the local executor.
+            """,
+        )
+        parser.add_argument(
+            "--task-runner",
+            dest="task_runner",
+            choices=("glost", "queue"),
+            default="glost",
+            help="""
+            How the runs are distributed to the tasks of the Slurm job:
+            glost uses a GLOST manager task and a fixed task list (the default);
+            queue runs `mohid worker` in every task to pull runs from a file-based
+            task queue in the job directory.
+            """,
+        )
+        parser.add_argument(
+            "--retry-failed",
+            dest="retry_failed",
+            metavar="JOB_DIR",
+            type=Path,
+            default=None,
+            help="""
+            Prepare and execute a glost job to re-run the runs of the Monte Carlo job
+            in JOB_DIR that failed or did not finish,
+            using the inputs that were rendered in JOB_DIR for the original job.
+            DESC_FILE and CSV_FILE are not used.
+            """,
+        )
+        parser.add_argument(
+            "--dry-run",
+            dest="dry_run",
+            action="store_true",
+            help="""
+            Check DESC_FILE and the columns of CSV_FILE,
+            compile the templates,
+            and render a sample of the runs in memory to report the projected
+            number of files, bytes, and setup time of the job,
+            without creating the job directory or submitting the job.
+            """,
+        )
         return parser
 
     def take_action(self, parsed_args):
@@ -87,24 +211,68 @@ class MonteCarlo(cliff.command.Command):
         :param parsed_args: Arguments and options parsed from the command-line.
         :type parsed_args: :class:`argparse.Namespace` instance
         """
+        if parsed_args.retry_failed is not None:
+            submit_job_msg = retry_failed(
+                parsed_args.retry_failed,
+                no_submit=parsed_args.no_submit,
+                executor=parsed_args.executor,
+                cpus=parsed_args.cpus,
+            )
+            if submit_job_msg:
+                logger.info(submit_job_msg)
+            return
+        if parsed_args.desc_file is None or parsed_args.csv_file is None:
+            logger.error(
+                "DESC_FILE and CSV_FILE are required unless --retry-failed is used"
+            )
+            raise SystemExit(2)
+        if parsed_args.dry_run:
+            report = dry_run(parsed_args.desc_file, parsed_args.csv_file)
+            self.app.stdout.write(report)
+            return
         submit_job_msg = monte_carlo(
-            parsed_args.desc_file, parsed_args.csv_file, no_submit=parsed_args.no_submit
+            parsed_args.desc_file,
+            parsed_args.csv_file,
+            no_submit=parsed_args.no_submit,
+            tune_resources=parsed_args.tune_resources,
+            sacct_file=parsed_args.sacct_file,
+            executor=parsed_args.executor,
+            cpus=parsed_args.cpus,
+            runs_per_shard=parsed_args.runs_per_shard,
+            task_runner=parsed_args.task_runner,
         )
         if submit_job_msg:
             logger.info(submit_job_msg)
 
 
-def monte_carlo(desc_file, csv_file, no_submit=False):
+def monte_carlo(
+    desc_file,
+    csv_file,
+    no_submit=False,
+    tune_resources=False,
+    sacct_file=None,
+    executor="sbatch",
+    cpus=None,
+    runs_per_shard=None,
+    task_runner="glost",
+):
     """
 
     :param :py:class:`pathlib.Path` desc_file:
     :param :py:class:`pathlib.Path` csv_file:
     :param boolean no_submit:
+    :param boolean tune_resources:
+    :param :py:class:`pathlib.Path` sacct_file:
+    :param str executor:
+    :param int cpus:
+    :param int runs_per_shard:
+    :param str task_runner:
 
     :return:
     :rtype: str
     """
     job_desc = nemo_cmd.prepare.load_run_desc(desc_file)
+    mohid_cmd.validate.check_job_desc(job_desc, desc_file)
     job_id = nemo_cmd.prepare.get_run_desc_value(job_desc, ("job id",))
     forcing_dir = nemo_cmd.prepare.get_run_desc_value(
         job_desc,
@@ -120,15 +288,32 @@ def monte_carlo(desc_file, csv_file, no_submit=False):
     )
     job_dir = runs_dir / f"{job_id}_{arrow.now().format('YYYY-MM-DDTHHmmss')}"
     runs = _get_runs_info(csv_file)
-    ntasks_per_node = min(
-        32, len(runs) + 1
-    )  # One task is always allocated to the GLOST manager
-    run_walltime = nemo_cmd.prepare.get_run_desc_value(
-        job_desc, ("run walltime",), run_dir=job_dir
+    run_walltime = mohid_cmd.validate.walltime_seconds(
+        nemo_cmd.prepare.get_run_desc_value(job_desc, ("run walltime",))
+    )
+    cpus_per_task = 1
+    mem_per_cpu = nemo_cmd.prepare.get_run_desc_value(
+        job_desc, ("mem per cpu",), run_dir=job_dir
     )
-    run_walltime = datetime.timedelta(seconds=run_walltime * math.ceil(len(runs) / 31))
-    walltime = mohid_cmd.run.td_to_hms(run_walltime)
-    cookiecutter_context = {
+    if tune_resources or sacct_file is not None:
+        resources = mohid_cmd.resources.advise(job_id, sacct_file=sacct_file)
+        if resources is None:
+            logger.warning(
+                f"No usable sacct records found for past {job_id} jobs, "
+                f"so using resource requests from {desc_file}"
+            )
+        else:
+            cpus_per_task = resources["cpus_per_task"]
+            mem_per_cpu = f"{resources['mem_per_cpu']}M"
+            logger.info(
+                f"Resource requests set from {resources['n_jobs']} past {job_id} job(s)"
+            )
+    else:
+        resources = None
+    ntasks_per_node, walltime_seconds = _glost_job_size(
+        len(runs), run_walltime, resources, task_runner
+    )
+    scaffold_context = {
         "job_id": job_id,
         "job_dir": job_dir,
         "account": nemo_cmd.prepare.get_run_desc_value(
@@ -141,18 +326,20 @@ def monte_carlo(desc_file, csv_file, no_submit=False):
             job_desc, ("nodes",), run_dir=job_dir
         ),
         "ntasks_per_node": ntasks_per_node,
-        "mem_per_cpu": nemo_cmd.prepare.get_run_desc_value(
-            job_desc, ("mem per cpu",), run_dir=job_dir
-        ),
+        "cpus_per_task": cpus_per_task,
+        "mem_per_cpu": mem_per_cpu,
         "runs_per_job": len(runs),
-        "walltime": walltime,
+        "walltime": _hms(walltime_seconds),
+        "walltime_seconds": walltime_seconds,
+        "run_walltime_seconds": run_walltime,
+        "task_runner": task_runner,
+        "drain_seconds": DRAIN_SECONDS,
+        "drain_grace_seconds": DRAIN_SECONDS - DRAIN_CLEANUP_SECONDS,
+        "mohid_command": nemo_cmd.prepare.get_run_desc_value(
+            job_desc, ("mohid command",), run_dir=job_dir
+        ),
     }
-    cookiecutter.main.cookiecutter(
-        os.fspath(Path(__file__).parent.parent / "cookiecutter"),
-        no_input=True,
-        output_dir=job_dir,
-        extra_context=cookiecutter_context,
-    )
+    mohid_cmd.scaffold.make_job_dir(scaffold_context)
     shutil.copy2(desc_file, job_dir)
     shutil.copy2(csv_file, job_dir)
     nemo_cmd.prepare.record_vcs_revisions(job_desc, job_dir)
@@ -169,7 +356,15 @@ def monte_carlo(desc_file, csv_file, no_submit=False):
     )
     _render_make_hdf5_yamls(job_id, job_dir, forcing_dir, runs, tmpl_env)
     _render_mohid_run_yamls(
-        job_id, job_dir, forcing_dir, runs_dir, mohid_config, runs, tmpl_env
+        job_id,
+        job_dir,
+        forcing_dir,
+        runs_dir,
+        mohid_config,
+        runs,
+        tmpl_env,
+        job_desc.get("netcdf4"),
+        job_desc.get("gather"),
     )
     _render_model_dats(job_dir, runs, tmpl_env)
     _render_lagrangian_dats(job_dir, runs, tmpl_env)
@@ -182,19 +377,581 @@ def monte_carlo(desc_file, csv_file, no_submit=False):
     _render_glost_task_scripts(
         job_id, job_dir, forcing_dir, runs, make_hdf5_cmd, mohid_cli_cmd, tmpl_env
     )
+    mohid_cmd.job_index.create(
+        job_dir, mohid_cmd.job_index.run_rows(job_id, forcing_dir, runs)
+    )
+    glost_tasks = [
+        task
+        for task in (job_dir / "glost-tasks.txt").read_text().splitlines()
+        if task.strip()
+    ]
+    if task_runner == "queue":
+        mohid_cmd.task_queue.TaskQueue.create(job_dir / "queue", glost_tasks)
     logger.info(f"job directory created: {job_dir}")
     if no_submit:
         return
-    sbatch_cmd = f"sbatch {job_dir / 'glost-job.sh'}"
-    submit_job_msg = subprocess.run(
-        shlex.split(sbatch_cmd),
-        check=True,
-        universal_newlines=True,
-        stdout=subprocess.PIPE,
-    ).stdout
+    _record_submission(job_id, job_dir)
+    if runs_per_shard and executor == mohid_cmd.executors.SbatchExecutor.name:
+        return _submit_shards(
+            job_id,
+            job_dir,
+            glost_tasks,
+            runs_per_shard,
+            run_walltime,
+            resources,
+            task_runner,
+        )
+    submit_job_msg = mohid_cmd.executors.get_executor(executor, cpus).submit(
+        job_dir / "glost-job.sh",
+        tasks=glost_tasks,
+        env={"MONTE_CARLO": os.fspath(job_dir)},
+    )
+    if executor == mohid_cmd.executors.SbatchExecutor.name:
+        mohid_cmd.slurm.record_jobs(
+            job_dir,
+            [
+                {
+                    "name": job_id,
+                    "slurm_job_id": submit_job_msg.split()[-1],
+                    "tasks": "glost-tasks.txt",
+                    "n_runs": len(glost_tasks),
+                }
+            ],
+        )
     return submit_job_msg
 
 
+def retry_failed(job_dir, no_submit=False, executor="sbatch", cpus=None):
+    """Prepare for and execute a glost job to re-run the failed and incomplete runs
+    of a Monte Carlo job.
+
+    A run has failed or is incomplete if its results directory does not contain
+    a :kbd:`task` timing record with a zero exit code.
+    The results directories of those runs are moved into the :file:`failed-results/`
+    directory of the retry,
+    and the temporary run directories and forcing directories that they left behind
+    are moved into its :file:`failed-runs/` directory so that the retried runs can
+    re-create them,
+    and the glost tasks for them are written to a task list file in a new
+    :file:`retry-N/` directory in the job directory,
+    along with a copy of the job's :file:`glost-job.sh` script with its
+    tasks per node and walltime sized for the number of runs to retry.
+    The forcing YAML files, run description YAML files, :file:`.dat` files,
+    and glost task scripts of the original job are reused.
+
+    :param :py:class:`pathlib.Path` job_dir:
+    :param boolean no_submit:
+    :param str executor:
+    :param int cpus:
+
+    :return:
+    :rtype: str
+    """
+    job_dir = Path(job_dir).resolve()
+    job_id = job_dir.name.rpartition("_")[0]
+    desc_files = list(job_dir.glob("*.yaml"))
+    if len(desc_files) != 1:
+        logger.error(f"expected 1 glost job description YAML file in {job_dir}")
+        raise SystemExit(2)
+    job_desc = nemo_cmd.prepare.load_run_desc(desc_files[0])
+    run_walltime = mohid_cmd.validate.walltime_seconds(
+        nemo_cmd.prepare.get_run_desc_value(job_desc, ("run walltime",))
+    )
+    glost_tasks = [
+        task
+        for task in (job_dir / "glost-tasks.txt").read_text().splitlines()
+        if task.strip()
+    ]
+    failed_tasks = [
+        (task, run_id)
+        for task, run_id in (
+            (task, f"{job_id}-{_task_run_number(task)}") for task in glost_tasks
+        )
+        if mohid_cmd.profile.task_exit_code(job_dir / "results" / run_id) != 0
+    ]
+    if not failed_tasks:
+        logger.info(f"all {len(glost_tasks)} runs in {job_dir} finished successfully")
+        return
+    n_retry = len(list(job_dir.glob("retry-*"))) + 1
+    retry_dir = job_dir / f"retry-{n_retry}"
+    failed_results_dir = retry_dir / "failed-results"
+    failed_results_dir.mkdir(parents=True)
+    failed_runs_dir = retry_dir / "failed-runs"
+    forcing_dir = job_desc.get("paths", {}).get("forcing directory")
+    if forcing_dir is not None:
+        forcing_dir = Path(os.path.expandvars(forcing_dir)).expanduser().resolve()
+    for _, run_id in failed_tasks:
+        results_dir = job_dir / "results" / run_id
+        if results_dir.exists():
+            results_dir.rename(failed_results_dir / run_id)
+        _move_failed_run_dirs(job_dir / run_id, failed_runs_dir / run_id)
+        if forcing_dir is not None:
+            _move_failed_run_dirs(
+                forcing_dir / run_id, failed_runs_dir / f"forcing-{run_id}"
+            )
+            (forcing_dir / run_id).mkdir(parents=True, exist_ok=True)
+    tasks = [task for task, _ in failed_tasks]
+    tasks_file = retry_dir / "glost-tasks.txt"
+    tasks_file.write_text("".join(f"{task}\n" for task in tasks))
+    task_runner = "queue" if (job_dir / "queue").is_dir() else "glost"
+    if task_runner == "queue":
+        mohid_cmd.task_queue.TaskQueue.create(retry_dir / "queue", tasks)
+    ntasks_per_node, walltime_seconds = _glost_job_size(
+        len(tasks), run_walltime, task_runner=task_runner
+    )
+    _write_retry_job_script(
+        job_dir,
+        retry_dir,
+        {
+            "job-name": f"{job_id}-retry-{n_retry}",
+            "ntasks-per-node": ntasks_per_node,
+            "time": _hms(walltime_seconds),
+            "output": retry_dir / "glost-job.stdout",
+            "error": retry_dir / "glost-job.stderr",
+        },
+    )
+    logger.info(
+        f"retry job for {len(tasks)} of {len(glost_tasks)} runs created: {retry_dir}"
+    )
+    if no_submit:
+        return
+    _record_submission(job_id, job_dir)
+    submit_job_msg = mohid_cmd.executors.get_executor(executor, cpus).submit(
+        retry_dir / "glost-job.sh",
+        tasks=tasks,
+        env={"MONTE_CARLO": os.fspath(job_dir)},
+    )
+    if executor == mohid_cmd.executors.SbatchExecutor.name:
+        mohid_cmd.slurm.record_jobs(
+            job_dir,
+            [
+                {
+                    "name": f"{job_id}-retry-{n_retry}",
+                    "slurm_job_id": submit_job_msg.split()[-1],
+                    "tasks": os.fspath(tasks_file.relative_to(job_dir)),
+                    "n_runs": len(tasks),
+                }
+            ],
+        )
+    return submit_job_msg
+
+
+def dry_run(desc_file, csv_file, sample_size=DRY_RUN_SAMPLE_SIZE):
+    """Check a Monte Carlo job description and run parameters CSV file,
+    and project the size and setup time of the job without writing any files.
+
+    The CSV file columns in :py:data:`RUNS_COLUMNS` are checked for missing values
+    and values of the wrong kind,
+    and the :py:data:`RUN_TEMPLATES` and all of the Lagrangian templates named in
+    the CSV file are compiled.
+    All of the problems found are logged before the dry run fails so that they can
+    be fixed together.
+    A sample of the runs that includes the first run that uses each Lagrangian template
+    is rendered in memory with undefined template variables treated as errors,
+    and the file sizes and rendering time of the sample are extrapolated to all
+    of the runs.
+
+    :param :py:class:`pathlib.Path` desc_file:
+    :param :py:class:`pathlib.Path` csv_file:
+    :param int sample_size: Number of runs to render.
+
+    :returns: Dry run report.
+    :rtype: str
+    """
+    job_desc = nemo_cmd.prepare.load_run_desc(desc_file)
+    mohid_cmd.validate.check_job_desc(job_desc, desc_file)
+    job_id = nemo_cmd.prepare.get_run_desc_value(job_desc, ("job id",))
+    forcing_dir, runs_dir, mohid_config = (
+        nemo_cmd.prepare.get_run_desc_value(
+            job_desc, ("paths", key), expand_path=True, resolve_path=True
+        )
+        for key in ("forcing directory", "runs directory", "mohid config")
+    )
+    make_hdf5_cmd = nemo_cmd.prepare.get_run_desc_value(
+        job_desc, ("make-hdf5 command",)
+    )
+    mohid_cli_cmd = nemo_cmd.prepare.get_run_desc_value(job_desc, ("mohid command",))
+    job_dir = runs_dir / f"{job_id}_{arrow.now().format('YYYY-MM-DDTHHmmss')}"
+    runs = _get_runs_info(csv_file)
+    problems = _check_runs_columns(runs)
+    tmpl_env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(os.fspath(mohid_config / "templates")),
+        keep_trailing_newline=True,
+        undefined=jinja2.StrictUndefined,
+    )
+    templates = list(RUN_TEMPLATES)
+    if "Lagrangian_template" in runs.columns:
+        templates.extend(sorted(runs.Lagrangian_template.dropna().astype(str).unique()))
+    problems.extend(_compile_templates(tmpl_env, templates))
+    if not problems:
+        renderers = {
+            "make-hdf5 YAML": lambda runs: _make_hdf5_yamls(
+                job_id, forcing_dir, runs, tmpl_env
+            ),
+            "MOHID run YAML": lambda runs: _mohid_run_yamls(
+                job_id,
+                job_dir,
+                forcing_dir,
+                runs_dir,
+                mohid_config,
+                runs,
+                tmpl_env,
+                job_desc.get("netcdf4"),
+                job_desc.get("gather"),
+            ),
+            "Model.dat": lambda runs: _model_dats(runs, tmpl_env),
+            "Lagrangian.dat": lambda runs: _lagrangian_dats(runs, tmpl_env),
+            "glost task": lambda runs: _glost_task_scripts(
+                job_id,
+                job_dir,
+                forcing_dir,
+                runs,
+                make_hdf5_cmd,
+                mohid_cli_cmd,
+                tmpl_env,
+            ),
+        }
+        sample = _sample_runs(runs, sample_size)
+        file_sizes = {}
+        t_start = time.perf_counter()
+        for kind, render in renderers.items():
+            try:
+                file_sizes[kind] = [
+                    len(contents.encode()) for _, contents in render(sample)
+                ]
+            except jinja2.UndefinedError as exc:
+                problems.append(f"rendering {kind} files failed: {exc}")
+        render_seconds = time.perf_counter() - t_start
+    if problems:
+        for problem in problems:
+            logger.error(problem)
+        logger.error(
+            f"dry run found {len(problems)} problem(s) in {desc_file} and {csv_file}"
+        )
+        raise SystemExit(2)
+    n_runs = len(runs)
+    n_records = 3 + sum(
+        len(repos) for repos in job_desc.get("vcs revisions", {}).values()
+    )
+    n_scaffold = mohid_cmd.scaffold.count_files()
+    lines = [
+        f"Dry run of {job_id} Monte Carlo job from {desc_file} and {csv_file}",
+        "",
+        f"{n_runs} runs; {len(RUNS_COLUMNS)} CSV columns checked",
+        f"{len(templates)} templates compiled: {', '.join(templates)}",
+        f"{len(sample)} runs rendered in memory in {render_seconds:.3f}s",
+        "",
+        f"Projected job directory: {job_dir}",
+        f"  {'files':<16} {'count':>9} {'bytes':>14}",
+    ]
+    total_bytes = 0
+    for kind, sizes in file_sizes.items():
+        kind_bytes = round(n_runs * sum(sizes) / len(sizes))
+        total_bytes += kind_bytes
+        lines.append(f"  {kind:<16} {n_runs:>9} {kind_bytes:>14,}")
+    lines.extend(
+        [
+            f"  {'scaffold':<16} {n_scaffold:>9}",
+            f"  {'job records':<16} {n_records:>9}",
+            f"  {'total':<16} {n_runs * len(file_sizes) + n_scaffold + n_records:>9} "
+            f"{total_bytes:>14,}",
+            f"Projected forcing directories: {n_runs} in {forcing_dir}",
+            f"Estimated setup time: {render_seconds / len(sample) * n_runs:.1f}s "
+            f"to render run files, excluding file system writes",
+        ]
+    )
+    return "\n".join(lines) + "\n"
+
+
+def _check_runs_columns(runs):
+    """Check that the CSV file columns in :py:data:`RUNS_COLUMNS` exist,
+    and that they contain values of the expected kinds.
+
+    :param :py:class:`pandas.DataFrame` runs:
+
+    :returns: Problems found.
+    :rtype: list of str
+    """
+    if runs.empty:
+        return ["no runs found in CSV file"]
+    problems = []
+    for column, kind in RUNS_COLUMNS.items():
+        if column not in runs.columns:
+            problems.append(f"CSV file column missing: {column}")
+            continue
+        values = runs[column]
+        missing = values.index[values.isna()]
+        if len(missing):
+            problems.append(
+                f"CSV file column {column} has missing values in run(s): "
+                f"{_format_run_numbers(missing)}"
+            )
+        values = values.dropna()
+        if kind == "datetime":
+            if pandas.api.types.is_datetime64_any_dtype(values):
+                continue
+            bad = values.index[pandas.to_datetime(values, errors="coerce").isna()]
+            if not len(bad):
+                problems.append(
+                    f"CSV file column {column} must be the first column "
+                    f"to be read as date/times"
+                )
+                continue
+        elif kind == "integer":
+            numbers = pandas.to_numeric(values, errors="coerce")
+            bad = values.index[numbers.isna() | (numbers % 1 != 0)]
+        elif kind == "number":
+            bad = values.index[pandas.to_numeric(values, errors="coerce").isna()]
+        else:
+            bad = values.index[~values.map(lambda value: isinstance(value, str))]
+        if len(bad):
+            problems.append(
+                f"CSV file column {column} has non-{kind} values in run(s): "
+                f"{_format_run_numbers(bad)}"
+            )
+    return problems
+
+
+def _format_run_numbers(run_numbers, max_shown=5):
+    """
+    :param run_numbers: Run numbers.
+    :type run_numbers: :py:class:`pandas.Index`
+
+    :param int max_shown: Maximum number of run numbers to list.
+
+    :rtype: str
+    """
+    shown = ", ".join(f"{i}" for i in run_numbers[:max_shown])
+    if len(run_numbers) > max_shown:
+        shown = f"{shown}, ... ({len(run_numbers)} runs)"
+    return shown
+
+
+def _compile_templates(tmpl_env, templates):
+    """Load and compile templates.
+
+    :param :py:class:`jinja2.Environment` tmpl_env:
+    :param list templates: Template names.
+
+    :returns: Problems found.
+    :rtype: list of str
+    """
+    problems = []
+    for template in templates:
+        try:
+            tmpl_env.get_template(template)
+        except jinja2.TemplateNotFound:
+            problems.append(f"template not found: {template}")
+        except jinja2.TemplateSyntaxError as exc:
+            problems.append(
+                f"template syntax error in {template} line {exc.lineno}: {exc.message}"
+            )
+    return problems
+
+
+def _sample_runs(runs, sample_size):
+    """Choose the runs to render in a dry run:
+    the first run that uses each Lagrangian template,
+    and a reproducible random sample of the others to make up the sample size.
+
+    :param :py:class:`pandas.DataFrame` runs:
+    :param int sample_size:
+
+    :rtype: :py:class:`pandas.DataFrame`
+    """
+    first_runs = runs.drop_duplicates("Lagrangian_template").index
+    others = runs.drop(first_runs)
+    n_others = min(len(others), max(sample_size - len(first_runs), 0))
+    sampled = others.sample(n_others, random_state=0).index
+    return runs.loc[first_runs.union(sampled)]
+
+
+def _task_run_number(task):
+    """Get the run number from a glost task line like
+    :kbd:`bash $MONTE_CARLO/run-task.sh 42`.
+
+    :param str task:
+
+    :rtype: int
+    """
+    match = re.search(r"(\d+)(?:\.sh)?\s*$", task)
+    if match is None:
+        logger.error(f"can't find run number in glost task: {task}")
+        raise SystemExit(2)
+    return int(match.group(1))
+
+
+def _move_failed_run_dirs(run_dir, dest):
+    """Move the temporary run directory or forcing directory that a failed run left
+    behind out of the way of its retry.
+
+    :param :py:class:`pathlib.Path` run_dir:
+    :param :py:class:`pathlib.Path` dest:
+    """
+    if not run_dir.exists():
+        return
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    # The forcing directory may be on a different file system than the job directory
+    shutil.move(os.fspath(run_dir), os.fspath(dest))
+
+
+def _write_retry_job_script(job_dir, retry_dir, sbatch_options):
+    """Write a copy of a job's :file:`glost-job.sh` script into a retry directory
+    with some of its :kbd:`#SBATCH` directives replaced,
+    and with the retry directory's task list file or task queue as its default.
+
+    :param :py:class:`pathlib.Path` job_dir:
+    :param :py:class:`pathlib.Path` retry_dir:
+    :param dict sbatch_options: Values of :kbd:`#SBATCH` directives to replace,
+                                keyed by option name.
+    """
+    lines = []
+    for line in (job_dir / "glost-job.sh").read_text().splitlines():
+        option = re.match(r"#SBATCH --([\w-]+)=", line)
+        if option and option.group(1) in sbatch_options:
+            line = f"#SBATCH --{option.group(1)}={sbatch_options[option.group(1)]}"
+        elif line.startswith("GLOST_TASKS="):
+            line = f"GLOST_TASKS=${{1:-{retry_dir / 'glost-tasks.txt'}}}"
+        elif line.startswith("TASK_QUEUE="):
+            line = f"TASK_QUEUE=${{1:-{retry_dir / 'queue'}}}"
+        elif line.startswith("srun glost_launch") and "GLOST_TASKS" not in line:
+            # Script from before task list files could be passed as an argument
+            line = f"srun glost_launch {retry_dir / 'glost-tasks.txt'}"
+        lines.append(line)
+    (retry_dir / "glost-job.sh").write_text("\n".join(lines) + "\n")
+
+
+def _glost_job_size(n_runs, run_walltime, resources=None, task_runner="glost"):
+    """Calculate the number of tasks per node and the walltime for a glost job.
+
+    :param int n_runs: Number of MIDOSS-MOHID runs in the job.
+    :param int run_walltime: Walltime in seconds of a single run.
+    :param dict resources: Resource advice from :py:func:`mohid_cmd.resources.advise`.
+    :param str task_runner: :kbd:`glost` or :kbd:`queue`.
+
+    :returns: Number of tasks per node, and walltime in seconds.
+    :rtype: 2-tuple
+    """
+    if task_runner == "queue":
+        # Every task is a worker
+        workers = min(32, n_runs)
+        ntasks_per_node = workers
+    else:
+        # One task is always allocated to the GLOST manager
+        workers = min(31, n_runs)
+        ntasks_per_node = workers + 1
+    walltime_seconds = run_walltime * math.ceil(n_runs / max(workers, 1))
+    if resources is not None:
+        walltime_seconds = mohid_cmd.resources.scale_walltime(
+            walltime_seconds, resources
+        )
+    return ntasks_per_node, walltime_seconds
+
+
+def _hms(seconds):
+    """
+    :param int seconds:
+
+    :returns: Duration formatted as :kbd:`H:MM:SS`.
+    :rtype: str
+    """
+    return mohid_cmd.run.td_to_hms(datetime.timedelta(seconds=seconds))
+
+
+def _submit_shards(
+    job_id,
+    job_dir,
+    glost_tasks,
+    runs_per_shard,
+    run_walltime,
+    resources,
+    task_runner="glost",
+):
+    """Split the glost tasks into shards of at most :kbd:`runs_per_shard` runs,
+    and submit a glost job for each shard to Slurm.
+
+    Each shard job executes the :file:`glost-job.sh` script with a shard task list
+    file as its argument,
+    and with its name, size, walltime, and output files set on the
+    :command:`sbatch` command-line.
+    With the :kbd:`queue` task runner,
+    the shard jobs are sized the same way but all of their workers take tasks from
+    the job's shared task queue,
+    so shards that start early take on the work of shards that are still pending.
+
+    :param str job_id:
+    :param :py:class:`pathlib.Path` job_dir:
+    :param list glost_tasks:
+    :param int runs_per_shard:
+    :param int run_walltime:
+    :param dict resources:
+    :param str task_runner:
+
+    :return: Submission summary message.
+    :rtype: str
+    """
+    shards_dir = job_dir / "shards"
+    shards_dir.mkdir(exist_ok=True)
+    shards, sbatch_args = [], []
+    for i, start in enumerate(range(0, len(glost_tasks), runs_per_shard)):
+        tasks = glost_tasks[start : start + runs_per_shard]
+        name = f"{job_id}-{i:03d}"
+        if task_runner == "queue":
+            tasks_file = job_dir / "queue"
+        else:
+            tasks_file = shards_dir / f"glost-tasks-{i:03d}.txt"
+            tasks_file.write_text("".join(f"{task}\n" for task in tasks))
+        ntasks_per_node, walltime_seconds = _glost_job_size(
+            len(tasks), run_walltime, resources, task_runner
+        )
+        shards.append(
+            {
+                "name": name,
+                "tasks": os.fspath(tasks_file.relative_to(job_dir)),
+                "n_runs": len(tasks),
+            }
+        )
+        sbatch_args.append(
+            [
+                f"--job-name={name}",
+                f"--ntasks-per-node={ntasks_per_node}",
+                f"--time={_hms(walltime_seconds)}",
+                f"--output={shards_dir / f'glost-job-{i:03d}.stdout'}",
+                f"--error={shards_dir / f'glost-job-{i:03d}.stderr'}",
+                os.fspath(job_dir / "glost-job.sh"),
+                os.fspath(tasks_file),
+            ]
+        )
+    slurm_job_ids = mohid_cmd.slurm.submit_jobs(sbatch_args)
+    submitted = [
+        dict(shard, slurm_job_id=slurm_job_id)
+        for shard, slurm_job_id in zip(shards, slurm_job_ids)
+        if slurm_job_id is not None
+    ]
+    mohid_cmd.slurm.record_jobs(job_dir, submitted)
+    return (
+        f"Submitted {len(submitted)} of {len(shards)} glost shard job(s) for {job_id}; "
+        f"use `mohid status {job_dir}` to follow them"
+    )
+
+
+def _record_submission(job_id, job_dir):
+    """Append a record of the time that the glost job was submitted to the job's
+    timing file so that its queue wait can be calculated by :command:`mohid profile`.
+
+    :param str job_id:
+    :param :py:class:`pathlib.Path` job_dir:
+    """
+    record = {
+        "job_id": job_id,
+        "phase": "submit",
+        "host": socket.gethostname(),
+        "wall": time.time(),
+    }
+    with (job_dir / mohid_cmd.run.TIMING_FILE).open("at") as f:
+        f.write(f"{json.dumps(record)}\n")
+
+
 def _get_runs_info(csv_file):
     """
     :param :py:class:`pathlib.Path` csv_file:
@@ -212,18 +969,21 @@ def _render_make_hdf5_yamls(job_id, job_dir, forcing_dir_root, runs, tmpl_env):
     :param :py:class:`pandas.DataFrame` runs:
     :param :py:class:`jinja2.Environment` tmpl_env:
     """
-    tmpl = tmpl_env.get_template("make-hdf5.yaml")
-    for i, run in runs.iterrows():
-        forcing_dir = forcing_dir_root / f"{job_id}-{i}"
-        forcing_dir.mkdir(parents=True, exist_ok=True)
-        context = {"forcing_dir": forcing_dir}
-        (job_dir / "forcing-yaml" / f"{job_id}-make-hdf5-{i}.yaml").write_text(
-            tmpl.render(context)
-        )
+    for i in runs.index:
+        (forcing_dir_root / f"{job_id}-{i}").mkdir(parents=True, exist_ok=True)
+    _write_files(job_dir, _make_hdf5_yamls(job_id, forcing_dir_root, runs, tmpl_env))
 
 
 def _render_mohid_run_yamls(
-    job_id, job_dir, forcing_dir_root, runs_dir, mohid_config, runs, tmpl_env
+    job_id,
+    job_dir,
+    forcing_dir_root,
+    runs_dir,
+    mohid_config,
+    runs,
+    tmpl_env,
+    netcdf4=None,
+    gather=None,
 ):
     """
     :param str job_id:
@@ -233,13 +993,134 @@ def _render_mohid_run_yamls(
     :param :py:class:`pathlib.Path` mohid_config:
     :param :py:class:`pandas.DataFrame` runs:
     :param :py:class:`jinja2.Environment` tmpl_env:
+    :param dict netcdf4:
+    :param dict gather:
+    """
+    _write_files(
+        job_dir,
+        _mohid_run_yamls(
+            job_id,
+            job_dir,
+            forcing_dir_root,
+            runs_dir,
+            mohid_config,
+            runs,
+            tmpl_env,
+            netcdf4,
+            gather,
+        ),
+    )
+
+
+def _render_model_dats(job_dir, runs, tmpl_env):
+    """
+    :param :py:class:`pathlib.Path` job_dir:
+    :param :py:class:`pandas.DataFrame` runs:
+    :param :py:class:`jinja2.Environment` tmpl_env:
+    """
+    _write_files(job_dir, _model_dats(runs, tmpl_env))
+
+
+def _render_lagrangian_dats(job_dir, runs, tmpl_env):
+    """
+    :param :py:class:`pathlib.Path` job_dir:
+    :param :py:class:`pandas.DataFrame` runs:
+    :param :py:class:`jinja2.Environment` tmpl_env:
     """
+    _write_files(job_dir, _lagrangian_dats(runs, tmpl_env))
+
 
+def _render_glost_task_scripts(
+    job_id, job_dir, forcing_dir, runs, make_hdf5_cmd, mohid_cli_cmd, tmpl_env
+):
+    """
+    :param str job_id:
+    :param :py:class:`pathlib.Path` job_dir:
+    :param :py:class:`pathlib.Path` forcing_dir:
+    :param :py:class:`pandas.DataFrame` runs:
+    :param str make_hdf5_cmd:
+    :param str mohid_cli_cmd:
+    :param :py:class:`jinja2.Environment` tmpl_env:
+    """
+    _write_files(
+        job_dir,
+        _glost_task_scripts(
+            job_id, job_dir, forcing_dir, runs, make_hdf5_cmd, mohid_cli_cmd, tmpl_env
+        ),
+    )
+
+
+def _write_files(job_dir, files):
+    """
+    :param :py:class:`pathlib.Path` job_dir:
+
+    :param files: Paths relative to the job directory and contents of files to write.
+    :type files: iterable of 2-tuples
+    """
+    for path, contents in files:
+        (job_dir / path).write_text(contents)
+
+
+def _make_hdf5_yamls(job_id, forcing_dir_root, runs, tmpl_env):
+    """Render the make-hdf5 forcing YAML files of the runs.
+
+    :param str job_id:
+    :param :py:class:`pathlib.Path` forcing_dir_root:
+    :param :py:class:`pandas.DataFrame` runs:
+    :param :py:class:`jinja2.Environment` tmpl_env:
+
+    :returns: Path relative to the job directory and contents of each file.
+    :rtype: generator of 2-tuples
+    """
+    tmpl = tmpl_env.get_template("make-hdf5.yaml")
+    for i, run in runs.iterrows():
+        context = {"forcing_dir": forcing_dir_root / f"{job_id}-{i}"}
+        yield Path("forcing-yaml", f"{job_id}-make-hdf5-{i}.yaml"), tmpl.render(context)
+
+
+def _mohid_run_yamls(
+    job_id,
+    job_dir,
+    forcing_dir_root,
+    runs_dir,
+    mohid_config,
+    runs,
+    tmpl_env,
+    netcdf4=None,
+    gather=None,
+):
+    """Render the MIDOSS-MOHID run description YAML files of the runs.
+
+    The :kbd:`netcdf4` and :kbd:`gather` sections of the job description are
+    available to the template as the :kbd:`netcdf4` and :kbd:`gather` mappings,
+    so that the template can put them in the run descriptions with lines like
+    :kbd:`netcdf4: {{ netcdf4 | tojson }}`;
+    they are empty if the job description does not have those sections.
+    Sections that the template doesn't use are appended to the run descriptions.
+
+    :param str job_id:
+    :param :py:class:`pathlib.Path` job_dir:
+    :param :py:class:`pathlib.Path` forcing_dir_root:
+    :param :py:class:`pathlib.Path` runs_dir:
+    :param :py:class:`pathlib.Path` mohid_config:
+    :param :py:class:`pandas.DataFrame` runs:
+    :param :py:class:`jinja2.Environment` tmpl_env:
+    :param dict netcdf4: :kbd:`netcdf4` section of the job description.
+    :param dict gather: :kbd:`gather` section of the job description.
+
+    :returns: Path relative to the job directory and contents of each file.
+    :rtype: generator of 2-tuples
+    """
     tmpl = tmpl_env.get_template("mohid-run.yaml")
+    appended = _unused_job_sections(
+        tmpl_env, "mohid-run.yaml", {"netcdf4": netcdf4, "gather": gather}
+    )
     context = {
         "job_id": job_id,
         "job_dir": job_dir,
         "runs_dir": runs_dir,
+        "netcdf4": netcdf4 or {},
+        "gather": gather or {},
     }
     for i, run in runs.iterrows():
         start_date = arrow.get(run.spill_date_hour.date())
@@ -254,14 +1135,47 @@ def _render_mohid_run_yamls(
                 "mohid_config": mohid_config,
             }
         )
-        (job_dir / "mohid-yaml" / f"{job_id}-{i}.yaml").write_text(tmpl.render(context))
+        yield Path("mohid-yaml", f"{job_id}-{i}.yaml"), tmpl.render(context) + appended
 
 
-def _render_model_dats(job_dir, runs, tmpl_env):
+def _unused_job_sections(tmpl_env, tmpl_name, sections):
+    """Format the job description sections that a run description template doesn't
+    use as YAML to append to the rendered run descriptions.
+
+    The template is checked once,
+    rather than each rendered run description being parsed.
+
+    :param :py:class:`jinja2.Environment` tmpl_env:
+    :param str tmpl_name:
+    :param dict sections: Job description sections by key.
+
+    :returns: YAML lines for the non-empty sections that the template doesn't use.
+    :rtype: str
     """
-    :param :py:class:`pathlib.Path` job_dir:
+    source = tmpl_env.loader.get_source(tmpl_env, tmpl_name)[0]
+    used = jinja2.meta.find_undeclared_variables(tmpl_env.parse(source))
+    lines = []
+    for key, section in sections.items():
+        if not section or key in used:
+            continue
+        if re.search(rf"^{key}:", source, re.MULTILINE):
+            logger.warning(
+                f"{tmpl_name} template has its own {key} section, "
+                f"so the {key} section of the job description is ignored"
+            )
+            continue
+        lines.append(f"\n{key}: {json.dumps(section)}")
+    return "".join(lines)
+
+
+def _model_dats(runs, tmpl_env):
+    """Render the :file:`Model.dat` files of the runs.
+
     :param :py:class:`pandas.DataFrame` runs:
     :param :py:class:`jinja2.Environment` tmpl_env:
+
+    :returns: Path relative to the job directory and contents of each file.
+    :rtype: generator of 2-tuples
     """
     tmpl = tmpl_env.get_template("Model.dat")
     for i, run in runs.iterrows():
@@ -273,14 +1187,18 @@ def _render_model_dats(job_dir, runs, tmpl_env):
             "start_yyyy_mm_dd_hh": start_date.format("YYYY MM DD HH"),
             "end_yyyy_mm_dd_hh": end_date.format("YYYY MM DD HH"),
         }
-        (job_dir / "mohid-yaml" / f"Model-{i}.dat").write_text(tmpl.render(context))
+        yield Path("mohid-yaml", f"Model-{i}.dat"), tmpl.render(context)
 
 
-def _render_lagrangian_dats(job_dir, runs, tmpl_env):
-    """
-    :param :py:class:`pathlib.Path` job_dir:
+def _lagrangian_dats(runs, tmpl_env):
+    """Render the :file:`Lagrangian.dat` files of the runs from the templates named
+    in their :kbd:`Lagrangian_template` column.
+
     :param :py:class:`pandas.DataFrame` runs:
     :param :py:class:`jinja2.Environment` tmpl_env:
+
+    :returns: Path relative to the job directory and contents of each file.
+    :rtype: generator of 2-tuples
     """
     for i, run in runs.iterrows():
         lagrangian_template = Path(run.Lagrangian_template)
@@ -293,13 +1211,14 @@ def _render_lagrangian_dats(job_dir, runs, tmpl_env):
             "spill_volume": run.spill_volume / 1_000,
         }
         lagrangian_dat = f"{lagrangian_template.stem}-{i}.dat"
-        (job_dir / "mohid-yaml" / lagrangian_dat).write_text(tmpl.render(context))
+        yield Path("mohid-yaml", lagrangian_dat), tmpl.render(context)
 
 
-def _render_glost_task_scripts(
+def _glost_task_scripts(
     job_id, job_dir, forcing_dir, runs, make_hdf5_cmd, mohid_cli_cmd, tmpl_env
 ):
-    """
+    """Render the glost task scripts of the runs.
+
     :param str job_id:
     :param :py:class:`pathlib.Path` job_dir:
     :param :py:class:`pathlib.Path` forcing_dir:
@@ -307,6 +1226,9 @@ def _render_glost_task_scripts(
     :param str make_hdf5_cmd:
     :param str mohid_cli_cmd:
     :param :py:class:`jinja2.Environment` tmpl_env:
+
+    :returns: Path relative to the job directory and contents of each file.
+    :rtype: generator of 2-tuples
     """
     tmpl = tmpl_env.get_template("glost-task.sh")
     context = {
@@ -325,4 +1247,4 @@ def _render_glost_task_scripts(
                 "n_days": run.run_days + 1,
             }
         )
-        (job_dir / "glost-tasks" / f"{job_id}-{i}.sh").write_text(tmpl.render(context))
+        yield Path("glost-tasks", f"{job_id}-{i}.sh"), tmpl.render(context)
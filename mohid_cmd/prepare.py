@@ -18,14 +18,31 @@ Sets up the necessary symbolic links for a MIDOSS-MOHID run
 in a specified directory and changes the pwd to that directory.
 """
 import logging
+import os
 import shutil
 from pathlib import Path
 
+import arrow
 import cliff.command
 import nemo_cmd.prepare
 
+import mohid_cmd.run_desc
+import mohid_cmd.validate
+
 logger = logging.getLogger(__name__)
 
+#: Prefix of the names of the directories in which temporary run directories are
+#: built before they are renamed into place.
+#: The leading "." keeps them out of normal directory listings,
+#: and :command:`mohid prune` removes the ones that are orphaned by crashes.
+STAGING_PREFIX = ".staging-"
+#: Name of the symbolic link in the temporary run directory that the run script points
+#: at node-local storage before MOHID starts.
+#: MOHID writes the Lagrangian HDF5 results file through it so that the file is
+#: converted to netCDF4 where it is written instead of being copied off of the
+#: shared file system first.
+NODE_LOCAL_LINK = "node-local"
+
 
 class Prepare(cliff.command.Command):
     """Set up the MIDOSS-MOHID run described in DESC_FILE and print the path of the temporary run directory."""
@@ -75,7 +92,7 @@ class Prepare(cliff.command.Command):
         return tmp_run_dir
 
 
-def prepare(desc_file, tmp_run_dir=""):
+def prepare(desc_file, tmp_run_dir="", run_desc=None):
     """Create and prepare the temporary run directory.
 
     The temporary run directory is created with a unique name composed of the run id
@@ -86,29 +103,56 @@ def prepare(desc_file, tmp_run_dir=""):
     in the directory for the MIDOSS-MOHID code repo.
     The path to the temporary run directory is returned.
 
+    The run description is checked against :py:data:`mohid_cmd.validate.RUN_SCHEMA`
+    before anything is created.
+    The directory is populated under a staging name that starts with
+    :py:data:`STAGING_PREFIX` and renamed to its final name when it is complete,
+    so a temporary run directory only ever appears fully prepared.
+    The staging directory is removed if any step fails.
+
     :param desc_file: File path/name of the YAML run description file.
     :type desc_file: :py:class:`pathlib.Path`
 
     :param string tmp_run_dir: Name to use for temporary run directory.
 
+    :param run_desc: Run description loaded from :kbd:`desc_file` by the caller;
+                     it is loaded here if it is not provided.
+    :type run_desc: :py:class:`mohid_cmd.run_desc.RunDescription`
+
+    :raises: :py:exc:`SystemExit` with exit code 2 if the temporary run directory
+             already exists.
+
     :returns: Path of the temporary run directory
     :rtype: :py:class:`pathlib.Path`
     """
-    run_desc = nemo_cmd.prepare.load_run_desc(desc_file)
+    if run_desc is None:
+        run_desc = mohid_cmd.run_desc.RunDescription.load(desc_file)
+    mohid_cmd.validate.check_run_desc(run_desc, desc_file)
     mohid_exe = _check_mohid_exec(run_desc)
-    tmp_run_dir = _make_run_dir(run_desc, tmp_run_dir)
-    (tmp_run_dir / mohid_exe.name).symlink_to(mohid_exe)
-    shutil.copy2(desc_file, tmp_run_dir / desc_file.name)
-    _make_forcing_links(run_desc, tmp_run_dir)
-    _make_nomfich(run_desc, tmp_run_dir)
-    mohid_repo = nemo_cmd.prepare.get_run_desc_value(
-        run_desc, ("paths", "mohid repo"), resolve_path=True
-    )
-    nemo_cmd.prepare.write_repo_rev_file(
-        mohid_repo, tmp_run_dir, nemo_cmd.prepare.get_git_revision
-    )
-    nemo_cmd.prepare.record_vcs_revisions(run_desc, tmp_run_dir)
-    return tmp_run_dir
+    run_dir = _run_dir_path(run_desc, tmp_run_dir)
+    if run_dir.exists():
+        logger.error(f"{run_dir} already exists")
+        raise SystemExit(2)
+    staging_dir = run_dir.with_name(f"{STAGING_PREFIX}{run_dir.name}.{os.getpid()}")
+    staging_dir.mkdir()
+    try:
+        (staging_dir / mohid_exe.name).symlink_to(mohid_exe)
+        shutil.copy2(desc_file, staging_dir / desc_file.name)
+        _make_forcing_links(run_desc, staging_dir)
+        _make_nomfich(run_desc, staging_dir, run_dir)
+        mohid_repo = mohid_cmd.run_desc.get_value(
+            run_desc, ("paths", "mohid repo"), resolve_path=True
+        )
+        nemo_cmd.prepare.write_repo_rev_file(
+            mohid_repo, staging_dir, nemo_cmd.prepare.get_git_revision
+        )
+        nemo_cmd.prepare.record_vcs_revisions(run_desc, staging_dir)
+        staging_dir.rename(run_dir)
+    except BaseException:
+        # Includes SystemExit from run description errors and KeyboardInterrupt
+        nemo_cmd.prepare.remove_run_dir(staging_dir)
+        raise
+    return run_dir
 
 
 def _check_mohid_exec(run_desc):
@@ -124,7 +168,7 @@ def _check_mohid_exec(run_desc):
 
     :raises: :py:exc:`SystemExit` with exit code 2
     """
-    mohid_repo = nemo_cmd.prepare.get_run_desc_value(
+    mohid_repo = mohid_cmd.run_desc.get_value(
         run_desc, ("paths", "mohid repo"), resolve_path=True
     )
     mohid_exe = mohid_repo / Path("Solutions/linux/bin/MohidWater.exe")
@@ -134,23 +178,24 @@ def _check_mohid_exec(run_desc):
     return mohid_exe
 
 
-def _make_run_dir(run_desc, tmp_run_dir):
+def _run_dir_path(run_desc, tmp_run_dir):
     """
     :param dict run_desc: Run description dictionary.
 
-    :param string tmp_run_dir: Name to use for temporary run directory.
+    :param string tmp_run_dir: Name to use for temporary run directory;
+                               if it is empty, the name is the run id with
+                               an ISO-format date/time stamp appended.
 
     :returns: Path of the temporary run directory
     :rtype: :py:class:`pathlib.Path`
     """
-    if not tmp_run_dir:
-        return nemo_cmd.prepare.make_run_dir(run_desc)
-    runs_dir = nemo_cmd.prepare.get_run_desc_value(
+    runs_dir = mohid_cmd.run_desc.get_value(
         run_desc, ("paths", "runs directory"), resolve_path=True
     )
-    run_dir = runs_dir / tmp_run_dir
-    run_dir.mkdir()
-    return run_dir
+    if not tmp_run_dir:
+        run_id = mohid_cmd.run_desc.get_value(run_desc, ("run_id",))
+        tmp_run_dir = f"{run_id}_{arrow.now().format('YYYY-MM-DDTHHmmss.SSSSSSZ')}"
+    return runs_dir / tmp_run_dir
 
 
 def _make_forcing_links(run_desc, tmp_run_dir):
@@ -159,11 +204,11 @@ def _make_forcing_links(run_desc, tmp_run_dir):
 
     :param string tmp_run_dir: Name to use for temporary run directory.
     """
-    link_names = nemo_cmd.prepare.get_run_desc_value(
+    link_names = mohid_cmd.run_desc.get_value(
         run_desc, ("forcing",), run_dir=tmp_run_dir
     )
     for link_name in link_names:
-        source = nemo_cmd.prepare.get_run_desc_value(
+        source = mohid_cmd.run_desc.get_value(
             run_desc, ("forcing", link_name), expand_path=True, fatal=False
         )
         if not source.exists():
@@ -176,28 +221,36 @@ def _make_forcing_links(run_desc, tmp_run_dir):
         (tmp_run_dir / link_name).symlink_to(source.resolve())
 
 
-def _make_nomfich(run_desc, tmp_run_dir):
+def _make_nomfich(run_desc, tmp_run_dir, run_dir=None):
     """
     :param dict run_desc: Run description dictionary.
 
-    :param string tmp_run_dir: Name to use for temporary run directory.
+    :param tmp_run_dir: Directory to create the results directory and files in.
+    :type tmp_run_dir: :py:class:`pathlib.Path`
+
+    :param run_dir: Directory that :kbd:`tmp_run_dir` will be renamed to,
+                    which the paths in :file:`nomfich.dat` are in;
+                    defaults to :kbd:`tmp_run_dir`.
+    :type run_dir: :py:class:`pathlib.Path`
+
+    The :kbd:`PARTIC_HDF` Lagrangian results file is written through the
+    :py:data:`NODE_LOCAL_LINK` symbolic link that the run script creates;
+    the other HDF5 results files are written in :file:`res/`.
     """
-    bathymetry = nemo_cmd.prepare.get_run_desc_value(
+    bathymetry = mohid_cmd.run_desc.get_value(
         run_desc,
         ("bathymetry",),
         expand_path=True,
         resolve_path=True,
         run_dir=tmp_run_dir,
     )
-    results_dir = tmp_run_dir / "res"
-    results_dir.mkdir()
+    (tmp_run_dir / "res").mkdir()
+    results_dir = (run_dir or tmp_run_dir) / "res"
     nomfich = {"IN_BATIM": bathymetry, "ROOT": results_dir}
-    run_data_files = nemo_cmd.prepare.get_run_desc_value(
+    run_data_files = mohid_cmd.run_desc.get_value(
         run_desc, ("run data files",), run_dir=tmp_run_dir
     )
-    run_id = nemo_cmd.prepare.get_run_desc_value(
-        run_desc, ("run_id",), run_dir=tmp_run_dir
-    )
+    run_id = mohid_cmd.run_desc.get_value(run_desc, ("run_id",), run_dir=tmp_run_dir)
     hdf_files = {
         "PARTIC_DATA": "PARTIC_HDF",
         "SURF_DAT": "SURF_HDF",
@@ -211,7 +264,12 @@ def _make_nomfich(run_desc, tmp_run_dir):
         shutil.copy2(dat_path, tmp_run_dir / dat_path.name)
         nomfich.update({key: f"./{dat_path.name}"})
         if key in hdf_files:
-            hdf_file = results_dir / f"{dat_path.stem}_{run_id}.hdf"
+            hdf_dir = (
+                (run_dir or tmp_run_dir) / NODE_LOCAL_LINK
+                if key == "PARTIC_DATA"
+                else results_dir
+            )
+            hdf_file = hdf_dir / f"{dat_path.stem}_{run_id}.hdf"
             nomfich.update({hdf_files[key]: hdf_file})
     with (tmp_run_dir / "nomfich.dat").open("wt") as f:
         for key, value in nomfich.items():
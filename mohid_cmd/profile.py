@@ -0,0 +1,471 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd command plug-in for profile sub-command.
+
+Summarize the phase timing records of the runs in a Monte Carlo job directory
+to show where the job's core-hours were spent.
+"""
+import datetime
+import heapq
+import json
+import logging
+import math
+import os
+import re
+from pathlib import Path
+
+import cliff.command
+
+import mohid_cmd.run
+
+logger = logging.getLogger(__name__)
+
+#: Number of logarithmically spaced histogram bins per decade of duration
+#: used to estimate duration percentiles.
+BINS_PER_DECADE = 20
+#: Resolution, in seconds, of the :file:`/proc/uptime` monotonic clock times
+#: in timing records.
+UPTIME_RESOLUTION = 0.01
+
+
+class Profile(cliff.command.Command):
+    """Summarize where the core-hours of a Monte Carlo job were spent."""
+
+    def get_parser(self, prog_name):
+        parser = super().get_parser(prog_name)
+        parser.description = """
+            Summarize the phase timing records of the MIDOSS-MOHID runs in the results/
+            directory tree of the Monte Carlo job in JOB_DIR.
+            The distributions of the durations of the run phases,
+            the slowest runs,
+            the time that the job waited in the queue,
+            and the time that GLOST worker tasks were idle are reported,
+            along with estimates of the effect of changing the number of tasks per node
+            on the job's walltime and core-hours.
+        """
+        parser.add_argument(
+            "job_dir",
+            metavar="JOB_DIR",
+            type=Path,
+            help="Monte Carlo job directory",
+        )
+        parser.add_argument(
+            "--ntasks-per-node",
+            dest="ntasks_per_node",
+            type=int,
+            nargs="+",
+            default=[],
+            help="""
+            Numbers of tasks per node to estimate walltime and core-hours for.
+            The default is to estimate them for the job's ntasks-per-node value.
+            """,
+        )
+        parser.add_argument(
+            "--stragglers",
+            dest="n_stragglers",
+            type=int,
+            default=10,
+            help="Number of slowest runs to report; defaults to 10",
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute the `mohid profile` sub-command.
+
+        The profile report is written to stdout.
+
+        :param parsed_args: Arguments and options parsed from the command-line.
+        :type parsed_args: :class:`argparse.Namespace` instance
+        """
+        report = profile(
+            parsed_args.job_dir,
+            ntasks_per_node=parsed_args.ntasks_per_node,
+            n_stragglers=parsed_args.n_stragglers,
+        )
+        self.app.stdout.write(report)
+
+
+def profile(job_dir, ntasks_per_node=(), n_stragglers=10):
+    """Summarize the phase timing records of the runs in a Monte Carlo job directory.
+
+    The timing records of each run are read one results directory at a time and reduced
+    into fixed size accumulators,
+    so memory use does not grow with the number of runs in the job.
+
+    :param job_dir: Monte Carlo job directory.
+    :type job_dir: :py:class:`pathlib.Path`
+
+    :param ntasks_per_node: Numbers of tasks per node to estimate walltime and
+                            core-hours for.
+    :type ntasks_per_node: sequence of int
+
+    :param int n_stragglers: Number of slowest runs to report.
+
+    :returns: Profile report.
+    :rtype: str
+    """
+    job_dir = Path(job_dir)
+    phase_stats = {}
+    task_stats = DurationStats()
+    stragglers = []
+    n_results_dirs = 0
+    for results_dir in iter_results_dirs(job_dir / "results"):
+        n_results_dirs += 1
+        run = summarize_run(
+            read_timing_records(results_dir / mohid_cmd.run.TIMING_FILE)
+        )
+        if run is None:
+            continue
+        for phase, duration in run["phases"].items():
+            phase_stats.setdefault(phase, DurationStats()).add(duration)
+        task_stats.add(run["duration"])
+        straggler = (run["duration"], run["run_id"])
+        if len(stragglers) < n_stragglers:
+            heapq.heappush(stragglers, straggler)
+        elif stragglers and straggler > stragglers[0]:
+            heapq.heapreplace(stragglers, straggler)
+    job = _summarize_job(job_dir)
+    lines = [f"Profile of {job_dir}", ""]
+    lines.append(
+        f"{task_stats.count} of {n_results_dirs} results directories have timing records"
+    )
+    lines.extend(_format_phase_stats(phase_stats, task_stats))
+    lines.extend(_format_stragglers(stragglers, task_stats))
+    lines.extend(_format_job(job, task_stats))
+    lines.extend(_format_what_if(job, task_stats, ntasks_per_node))
+    return "\n".join(lines) + "\n"
+
+
+class DurationStats:
+    """Streaming summary of a collection of durations.
+
+    Count, total, minimum and maximum are exact.
+    Percentiles are estimated from a histogram with logarithmically spaced bins,
+    so the memory required is independent of the number of durations.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = 0.0
+        self.bins = {}
+
+    def add(self, duration):
+        """Add a duration to the summary.
+
+        :param float duration: Duration in seconds.
+        """
+        duration = max(duration, 0.0)
+        self.count += 1
+        self.total += duration
+        self.minimum = min(self.minimum, duration)
+        self.maximum = max(self.maximum, duration)
+        bin_ = (
+            math.floor(math.log10(duration) * BINS_PER_DECADE)
+            if duration > 0
+            else -math.inf
+        )
+        self.bins[bin_] = self.bins.get(bin_, 0) + 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Estimate a percentile of the durations.
+
+        :param float q: Percentile to estimate, between 0 and 100.
+
+        :returns: Geometric centre of the histogram bin that contains the percentile,
+                  limited to the range of the durations.
+        :rtype: float
+        """
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        cumulative = 0
+        for bin_ in sorted(self.bins):
+            cumulative += self.bins[bin_]
+            if cumulative >= rank:
+                if bin_ == -math.inf:
+                    return 0.0
+                centre = 10 ** ((bin_ + 0.5) / BINS_PER_DECADE)
+                return min(max(centre, self.minimum), self.maximum)
+        return self.maximum
+
+
+def read_timing_records(timing_file):
+    """Generate the records in a timing JSON lines file.
+
+    Missing files yield no records.
+    Lines that can't be parsed,
+    for example because the job was killed while the line was being written,
+    are skipped.
+
+    :param timing_file: Path of the JSON lines file.
+    :type timing_file: :py:class:`pathlib.Path`
+
+    :returns: Timing records.
+    :rtype: generator of dict
+    """
+    try:
+        f = timing_file.open("rt")
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.debug(f"skipped unparsable timing record in {timing_file}")
+
+
+def summarize_run(records):
+    """Reduce the timing records of a run to the durations of its phases and of the run.
+
+    The run's duration is the duration of its GLOST task if there is a :kbd:`task` record,
+    otherwise it is the wall clock span of its phases.
+
+    :param records: Timing records of the run.
+    :type records: iterable of dict
+
+    :returns: :kbd:`run_id`, :kbd:`phases` dict of phase durations in seconds,
+              :kbd:`start` wall clock time and :kbd:`duration` in seconds,
+              or :py:obj:`None` if there are no records.
+    :rtype: dict
+    """
+    run_id = None
+    phases = {}
+    start, end = math.inf, -math.inf
+    for record in records:
+        run_id = record.get("run_id", run_id)
+        duration = phase_duration(record)
+        phases[record["phase"]] = phases.get(record["phase"], 0.0) + duration
+        start = min(start, record["wall"])
+        end = max(end, record["wall"] + duration)
+    if run_id is None:
+        return None
+    duration = phases["task"] if "task" in phases else end - start
+    return {"run_id": run_id, "phases": phases, "start": start, "duration": duration}
+
+
+def phase_duration(record):
+    """Calculate the duration of the phase in a timing record.
+
+    The :kbd:`mono_start` and :kbd:`mono_end` times are from the monotonic
+    :file:`/proc/uptime` clock, which only has 10 ms resolution.
+    Records from the :command:`timed` function of run scripts also have
+    :kbd:`wall_end` times with microsecond resolution,
+    but the wall clock jumps if the system clock is stepped.
+    So, the wall clock duration is used if it agrees with the monotonic duration
+    to within the resolution of :file:`/proc/uptime`,
+    and the monotonic duration is used otherwise.
+
+    :param dict record:
+
+    :returns: Duration of the phase in seconds.
+    :rtype: float
+    """
+    duration = record["mono_end"] - record["mono_start"]
+    if "wall_end" in record:
+        wall_duration = record["wall_end"] - record["wall"]
+        # Both monotonic times are truncated, so their difference can be off by
+        # up to the resolution, plus the time between the wall and uptime reads
+        if abs(wall_duration - duration) <= 2 * UPTIME_RESOLUTION:
+            return wall_duration
+    return duration
+
+
+def task_exit_code(results_dir):
+    """Get the exit code of the most recent GLOST task of a run from the :kbd:`task`
+    records in its results directory.
+
+    :param results_dir: Run results directory.
+    :type results_dir: :py:class:`pathlib.Path`
+
+    :returns: Exit code of the run's most recent task,
+              or :py:obj:`None` if the task has not finished.
+    :rtype: int
+    """
+    exit_code = None
+    for record in read_timing_records(results_dir / mohid_cmd.run.TIMING_FILE):
+        if record.get("phase") == "task":
+            exit_code = record.get("exit_code")
+    return exit_code
+
+
+def iter_results_dirs(results_root):
+    """Generate the paths of the run results directories in the results/ directory
+    of a Monte Carlo job.
+
+    :param results_root: results/ directory of a Monte Carlo job.
+    :type results_root: :py:class:`pathlib.Path`
+
+    :rtype: generator of :py:class:`pathlib.Path`
+    """
+    try:
+        entries = os.scandir(results_root)
+    except FileNotFoundError:
+        logger.warning(f"{results_root} not found")
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir():
+                yield Path(entry.path)
+
+
+def _summarize_job(job_dir):
+    """
+    :param :py:class:`pathlib.Path` job_dir:
+
+    :rtype: dict
+    """
+    sbatch = _read_sbatch_directives(job_dir / "glost-job.sh")
+    job = {
+        "nodes": int(sbatch.get("nodes", 1)),
+        "ntasks_per_node": int(sbatch.get("ntasks-per-node", 0)),
+        "walltime": _hms_to_seconds(sbatch["time"]) if "time" in sbatch else None,
+        "queue_waits": [],
+        "glost_runs": [],
+    }
+    submitted = None
+    for record in read_timing_records(job_dir / mohid_cmd.run.TIMING_FILE):
+        if record["phase"] == "submit":
+            submitted = record["wall"]
+        elif record["phase"] == "glost":
+            if submitted is not None:
+                job["queue_waits"].append(record["wall"] - submitted)
+                submitted = None
+            ntasks = int(record["ntasks"])
+            # Records from before the workers field was added are from glost jobs
+            workers = max(int(record.get("workers", ntasks - 1)), 1)
+            job["glost_runs"].append((phase_duration(record), ntasks, workers))
+    return job
+
+
+def _read_sbatch_directives(job_script):
+    """
+    :param :py:class:`pathlib.Path` job_script:
+
+    :returns: sbatch option names and values
+    :rtype: dict
+    """
+    try:
+        script = job_script.read_text()
+    except FileNotFoundError:
+        return {}
+    return dict(re.findall(r"^#SBATCH --([\w-]+)=(\S+)", script, flags=re.MULTILINE))
+
+
+def _hms_to_seconds(hms):
+    """
+    :param str hms: Time interval formatted as [D-]H:M:S.
+
+    :rtype: int
+    """
+    days, _, hms = hms.rpartition("-")
+    hours, minutes, seconds = (int(value) for value in hms.split(":"))
+    return (int(days or 0) * 24 + hours) * 3600 + minutes * 60 + seconds
+
+
+def _hms(seconds):
+    """
+    :param float seconds:
+
+    :rtype: str
+    """
+    return mohid_cmd.run.td_to_hms(datetime.timedelta(seconds=round(seconds)))
+
+
+def _format_phase_stats(phase_stats, task_stats):
+    lines = [
+        "",
+        "Phase durations:",
+        f"  {'phase':<12} {'runs':>7} {'core-hours':>11} {'mean':>10} {'p50':>10} "
+        f"{'p90':>10} {'p99':>10} {'max':>10}",
+    ]
+    # The task phase of a run is the whole run, so it is reported as the run row
+    rows = sorted(
+        ((phase, stats) for phase, stats in phase_stats.items() if phase != "task"),
+        key=lambda item: -item[1].total,
+    )
+    for phase, stats in rows + [("run", task_stats)]:
+        lines.append(
+            f"  {phase:<12} {stats.count:>7} {stats.total / 3600:>11.2f} "
+            f"{_hms(stats.mean):>10} {_hms(stats.percentile(50)):>10} "
+            f"{_hms(stats.percentile(90)):>10} {_hms(stats.percentile(99)):>10} "
+            f"{_hms(stats.maximum):>10}"
+        )
+    return lines
+
+
+def _format_stragglers(stragglers, task_stats):
+    median = task_stats.percentile(50)
+    lines = ["", "Slowest runs:"]
+    for duration, run_id in sorted(stragglers, reverse=True):
+        ratio = f"{duration / median:.1f}x median" if median else ""
+        lines.append(f"  {run_id:<30} {_hms(duration):>10}  {ratio}")
+    return lines
+
+
+def _format_job(job, task_stats):
+    lines = [""]
+    for queue_wait in job["queue_waits"]:
+        lines.append(f"Queue wait: {_hms(queue_wait)}")
+    worker_seconds = sum(elapsed * workers for elapsed, _, workers in job["glost_runs"])
+    if not worker_seconds:
+        lines.append("No GLOST job timing records found")
+        return lines
+    for elapsed, ntasks, workers in job["glost_runs"]:
+        runner = (
+            f"{workers} queue workers"
+            if workers == ntasks
+            else f"1 GLOST manager, {workers} workers"
+        )
+        lines.append(f"GLOST job: {_hms(elapsed)} on {ntasks} tasks ({runner})")
+    idle_seconds = max(worker_seconds - task_stats.total, 0)
+    lines.append(
+        f"GLOST workers: {task_stats.total / 3600:.2f} core-hours busy, "
+        f"{idle_seconds / 3600:.2f} core-hours idle "
+        f"({idle_seconds / worker_seconds:.0%})"
+    )
+    return lines
+
+
+def _format_what_if(job, task_stats, ntasks_per_node):
+    ntasks_per_node = ntasks_per_node or [job["ntasks_per_node"]]
+    ntasks_per_node = [ntasks for ntasks in ntasks_per_node if ntasks > 1]
+    if not task_stats.count or not ntasks_per_node:
+        return []
+    lines = [
+        "",
+        f"Estimates for {job['nodes']} node(s):",
+        f"  {'ntasks-per-node':>15} {'workers':>8} {'makespan':>10} "
+        f"{'walltime':>10} {'saved':>10} {'core-hours':>11}",
+    ]
+    for ntasks in ntasks_per_node:
+        workers = job["nodes"] * ntasks - 1
+        # Lower bound on makespan for greedy scheduling of the runs on the workers
+        makespan = max(task_stats.total / workers, task_stats.maximum)
+        # 10% margin, rounded up to the next 10 minutes
+        walltime = math.ceil(makespan * 1.1 / 600) * 600
+        saved = _hms(max(job["walltime"] - walltime, 0)) if job["walltime"] else "n/a"
+        core_hours = job["nodes"] * ntasks * makespan / 3600
+        lines.append(
+            f"  {ntasks:>15} {workers:>8} {_hms(makespan):>10} {_hms(walltime):>10} "
+            f"{saved:>10} {core_hours:>11.2f}"
+        )
+    return lines
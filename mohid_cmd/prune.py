@@ -0,0 +1,159 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd command plug-in for prune sub-command.
+
+Remove the staging directories of temporary run directories that were orphaned
+when :command:`mohid prepare` was killed before it could clean up after itself.
+"""
+import concurrent.futures
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+
+import cliff.command
+
+import mohid_cmd.prepare
+
+logger = logging.getLogger(__name__)
+
+#: Minimum age, in seconds since their last modification,
+#: of staging directories that are removed.
+#: Preparing a temporary run directory takes seconds,
+#: so older staging directories are not in use.
+MIN_AGE = 60 * 60
+#: Maximum number of directory trees that are removed at the same time.
+MAX_CONCURRENT_REMOVALS = 16
+
+
+class Prune(cliff.command.Command):
+    """Remove orphaned temporary run directory staging directories."""
+
+    def get_parser(self, prog_name):
+        parser = super().get_parser(prog_name)
+        parser.description = """
+            Remove the staging directories in RUNS_DIR that were left behind by
+            `mohid prepare`, `mohid run`, or Monte Carlo run tasks that were killed
+            while they were preparing a temporary run directory.
+            Staging directories are hidden; their names start with .staging-
+        """
+        parser.add_argument(
+            "runs_dirs",
+            metavar="RUNS_DIR",
+            type=Path,
+            nargs="+",
+            help="Directory in which temporary run directories are created",
+        )
+        parser.add_argument(
+            "--min-age",
+            dest="min_age",
+            type=float,
+            default=MIN_AGE,
+            metavar="SECONDS",
+            help=f"""
+            Only remove staging directories that have not been modified for at least
+            SECONDS; defaults to {MIN_AGE}.
+            """,
+        )
+        parser.add_argument(
+            "--dry-run",
+            dest="dry_run",
+            action="store_true",
+            help="Show the staging directories that would be removed.",
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute the `mohid prune` sub-command.
+
+        :param parsed_args: Arguments and options parsed from the command-line.
+        :type parsed_args: :class:`argparse.Namespace` instance
+        """
+        orphans = find_orphans(parsed_args.runs_dirs, parsed_args.min_age)
+        if parsed_args.dry_run:
+            self.app.stdout.write("".join(f"{orphan}\n" for orphan in orphans))
+            return
+        n_removed = remove_dirs(orphans)
+        logger.info(f"removed {n_removed} orphaned staging directories")
+
+
+def find_orphans(runs_dirs, min_age=MIN_AGE):
+    """Find the orphaned staging directories in a collection of runs directories.
+
+    Each runs directory is listed with one :py:func:`os.scandir` pass,
+    and only the entries whose names start with
+    :py:data:`mohid_cmd.prepare.STAGING_PREFIX` are stat-ed.
+
+    :param runs_dirs: Directories in which temporary run directories are created.
+    :type runs_dirs: sequence of :py:class:`pathlib.Path`
+
+    :param float min_age: Minimum time, in seconds, since the staging directories
+                          were last modified.
+
+    :returns: Staging directories in name order.
+    :rtype: list of :py:class:`pathlib.Path`
+    """
+    cutoff = time.time() - min_age
+    orphans = []
+    for runs_dir in runs_dirs:
+        with os.scandir(runs_dir) as entries:
+            orphans.extend(
+                Path(entry.path)
+                for entry in entries
+                if entry.name.startswith(mohid_cmd.prepare.STAGING_PREFIX)
+                and entry.is_dir(follow_symlinks=False)
+                and entry.stat(follow_symlinks=False).st_mtime <= cutoff
+            )
+    return sorted(orphans)
+
+
+def remove_dirs(dirs):
+    """Remove a collection of directory trees concurrently.
+
+    Removing a tree is dominated by file system metadata operations that release
+    the GIL, so the trees are removed by a pool of threads.
+    Directories that have already been removed,
+    e.g. by another :command:`mohid prune`,
+    are skipped.
+
+    :param dirs: Directory trees to remove.
+    :type dirs: sequence of :py:class:`pathlib.Path`
+
+    :returns: Number of directory trees removed.
+    :rtype: int
+    """
+    if not dirs:
+        return 0
+    workers = min(MAX_CONCURRENT_REMOVALS, len(dirs))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(_remove_dir, dirs))
+
+
+def _remove_dir(path):
+    """
+    :param :py:class:`pathlib.Path` path:
+
+    :returns: 1 if the directory tree was removed, otherwise 0.
+    :rtype: int
+    """
+    try:
+        shutil.rmtree(path)
+    except FileNotFoundError:
+        return 0
+    except OSError as exc:
+        logger.warning(f"could not remove {path}: {exc}")
+        return 0
+    return 1
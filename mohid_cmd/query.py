@@ -0,0 +1,343 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd command plug-in for query sub-command.
+
+Find the results directories of the runs of Monte Carlo jobs whose spill parameters
+match location, date/time, and volume criteria.
+"""
+import logging
+import math
+import sqlite3
+from pathlib import Path
+
+import arrow
+import cliff.command
+
+import mohid_cmd.index
+import mohid_cmd.job_index
+
+logger = logging.getLogger(__name__)
+
+#: Mean radius of the Earth in km.
+EARTH_RADIUS = 6371.0088
+#: Format of spill date/time values in the run index.
+DATETIME_FORMAT = "YYYY-MM-DD HH:mm:ss"
+#: Spill volumes are stored in the run index in litres, as they are in job CSV files.
+LITRES_PER_M3 = 1000
+
+
+class Query(cliff.command.Command):
+    """Find the results directories of Monte Carlo runs by their spill parameters."""
+
+    def get_parser(self, prog_name):
+        parser = super().get_parser(prog_name)
+        parser.description = """
+            Print the paths of the results directories of the runs of the Monte Carlo
+            jobs in JOB_DIR(s) whose spill parameters match all of the given criteria.
+            The runs are found in the job-index.sqlite run index of each job.
+            The index is built for jobs that do not have one.
+        """
+        parser.add_argument(
+            "job_dirs",
+            metavar="JOB_DIR",
+            type=Path,
+            nargs="+",
+            help="Monte Carlo job directory",
+        )
+        parser.add_argument(
+            "--near",
+            type=float,
+            nargs=2,
+            default=None,
+            metavar=("LON", "LAT"),
+            help="Select runs with spills near LON, LAT; use with --within.",
+        )
+        parser.add_argument(
+            "--within",
+            type=float,
+            default=None,
+            metavar="KM",
+            help="Select runs with spills within KM kilometres of the --near location.",
+        )
+        parser.add_argument(
+            "--start",
+            type=arrow.get,
+            default=None,
+            metavar="DATETIME",
+            help="Select runs with spills at or after DATETIME; e.g. 2017-06-01",
+        )
+        parser.add_argument(
+            "--end",
+            type=arrow.get,
+            default=None,
+            metavar="DATETIME",
+            help="Select runs with spills before DATETIME; e.g. 2017-07-01",
+        )
+        parser.add_argument(
+            "--month",
+            dest="months",
+            type=int,
+            action="append",
+            choices=range(1, 13),
+            default=None,
+            metavar="MONTH",
+            help="""
+            Select runs with spills in MONTH of any year;
+            e.g. 6 for June.
+            Use more than once to select runs in several months.
+            """,
+        )
+        parser.add_argument(
+            "--min-volume",
+            dest="min_volume",
+            type=float,
+            default=None,
+            metavar="M3",
+            help="Select runs with spill volumes of at least M3 cubic metres.",
+        )
+        parser.add_argument(
+            "--max-volume",
+            dest="max_volume",
+            type=float,
+            default=None,
+            metavar="M3",
+            help="Select runs with spill volumes of at most M3 cubic metres.",
+        )
+        parser.add_argument(
+            "--status",
+            choices=(
+                mohid_cmd.job_index.PENDING,
+                mohid_cmd.job_index.STARTED,
+                mohid_cmd.job_index.GATHERED,
+                mohid_cmd.job_index.DONE,
+                mohid_cmd.job_index.FAILED,
+            ),
+            default=None,
+            metavar="STATUS",
+            help="""
+            Select runs with STATUS in the run index:
+            pending, started, gathered, done, or failed.
+            The status files of the runs are folded into the index first.
+            """,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute the `mohid query` sub-command.
+
+        The results directory paths of the matching runs are written to stdout.
+
+        :param parsed_args: Arguments and options parsed from the command-line.
+        :type parsed_args: :class:`argparse.Namespace` instance
+        """
+        if (parsed_args.near is None) != (parsed_args.within is None):
+            logger.error("--near and --within must be used together")
+            raise SystemExit(2)
+        try:
+            results_dirs = query(
+                parsed_args.job_dirs,
+                near=parsed_args.near,
+                within=parsed_args.within,
+                start=parsed_args.start,
+                end=parsed_args.end,
+                months=parsed_args.months,
+                min_volume=parsed_args.min_volume,
+                max_volume=parsed_args.max_volume,
+                status=parsed_args.status,
+            )
+        except sqlite3.Error as exc:
+            logger.error(f"could not query run index: {exc}")
+            raise SystemExit(2)
+        self.app.stdout.write("".join(f"{path}\n" for path in results_dirs))
+        logger.info(
+            f"{len(results_dirs)} run(s) matched in {len(parsed_args.job_dirs)} job(s)"
+        )
+
+
+def query(
+    job_dirs,
+    near=None,
+    within=None,
+    start=None,
+    end=None,
+    months=None,
+    min_volume=None,
+    max_volume=None,
+    status=None,
+):
+    """Find the results directories of the runs of a collection of Monte Carlo jobs
+    whose spill parameters match all of the given criteria.
+
+    The criteria are translated into a single SQL query on the run index of each job.
+    Spill location criteria are evaluated as a latitude/longitude bounding box search
+    of the index of the spill location columns,
+    followed by an exact great-circle distance test of the runs in the box.
+    Spill date/time ranges are searched in the index of the spill date/time column.
+    Run indexes are built for jobs that do not have one.
+
+    :param job_dirs: Monte Carlo job directories.
+    :type job_dirs: sequence of :py:class:`pathlib.Path`
+
+    :param near: Longitude and latitude of a location.
+    :type near: 2-tuple of float
+
+    :param float within: Maximum distance, in km, of spills from :kbd:`near`.
+
+    :param start: Earliest spill date/time.
+    :type start: :py:class:`arrow.Arrow`
+
+    :param end: Spill date/time before which spills are selected.
+    :type end: :py:class:`arrow.Arrow`
+
+    :param months: Months of the year of spills.
+    :type months: sequence of int
+
+    :param float min_volume: Minimum spill volume in m^3.
+    :param float max_volume: Maximum spill volume in m^3.
+    :param str status: Run status in the run index;
+                       the status files of the runs are folded into the index first.
+
+    :returns: Results directories of the matching runs,
+              in job directory and run number order.
+    :rtype: list of :py:class:`pathlib.Path`
+    """
+    where, params = _where_clause(
+        near, within, start, end, months, min_volume, max_volume, status
+    )
+    sql = f"SELECT results_dir FROM runs {where} ORDER BY run_number"
+    results_dirs = []
+    for job_dir in job_dirs:
+        job_dir = Path(job_dir).resolve()
+        if not (job_dir / mohid_cmd.job_index.INDEX_FILE).exists():
+            n_runs = mohid_cmd.index.build_index(job_dir)
+            logger.info(f"indexed {n_runs} runs in {job_dir}")
+        elif status is not None:
+            # Run statuses are only folded into the index when they are queried
+            # because that means reading the status file of every run
+            mohid_cmd.job_index.sync(job_dir)
+        connection = mohid_cmd.job_index.connect(job_dir)
+        try:
+            connection.create_function("distance", 4, distance, deterministic=True)
+            results_dirs.extend(
+                job_dir / row["results_dir"] for row in connection.execute(sql, params)
+            )
+        finally:
+            connection.close()
+    return results_dirs
+
+
+def _where_clause(near, within, start, end, months, min_volume, max_volume, status):
+    """
+    :param near:
+    :param float within:
+    :param start:
+    :param end:
+    :param months:
+    :param float min_volume:
+    :param float max_volume:
+    :param str status:
+
+    :returns: SQL WHERE clause with named parameters, and the parameter values.
+    :rtype: 2-tuple
+    """
+    conditions, params = [], {}
+    if near is not None:
+        lon, lat = near
+        lon_min, lat_min, lon_max, lat_max = bounding_box(lon, lat, within)
+        conditions.extend(
+            [
+                "spill_lat BETWEEN :lat_min AND :lat_max",
+                "spill_lon BETWEEN :lon_min AND :lon_max",
+                "distance(:lon, :lat, spill_lon, spill_lat) <= :within",
+            ]
+        )
+        params.update(
+            lon=lon,
+            lat=lat,
+            within=within,
+            lon_min=lon_min,
+            lat_min=lat_min,
+            lon_max=lon_max,
+            lat_max=lat_max,
+        )
+    if start is not None:
+        conditions.append("spill_date_hour >= :start")
+        params["start"] = start.format(DATETIME_FORMAT)
+    if end is not None:
+        conditions.append("spill_date_hour < :end")
+        params["end"] = end.format(DATETIME_FORMAT)
+    if months:
+        month_params = {f"month_{month}": f"{month:02d}" for month in set(months)}
+        conditions.append(
+            f"strftime('%m', spill_date_hour) IN "
+            f"({', '.join(f':{name}' for name in sorted(month_params))})"
+        )
+        params.update(month_params)
+    if min_volume is not None:
+        conditions.append("spill_volume >= :min_volume")
+        params["min_volume"] = min_volume * LITRES_PER_M3
+    if max_volume is not None:
+        conditions.append("spill_volume <= :max_volume")
+        params["max_volume"] = max_volume * LITRES_PER_M3
+    if status is not None:
+        conditions.append("status = :status")
+        params["status"] = status
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+
+def bounding_box(lon, lat, within):
+    """Calculate the longitude/latitude box that contains all of the points within
+    a distance of a location.
+
+    :param float lon: Longitude of the location.
+    :param float lat: Latitude of the location.
+    :param float within: Distance in km.
+
+    :returns: Minimum longitude, minimum latitude, maximum longitude,
+              and maximum latitude of the box.
+    :rtype: 4-tuple of float
+    """
+    dlat = math.degrees(within / EARTH_RADIUS)
+    lat_min, lat_max = lat - dlat, lat + dlat
+    if lat_min <= -90 or lat_max >= 90:
+        # The circle includes a pole, so it includes all longitudes
+        return -180.0, max(lat_min, -90.0), 180.0, min(lat_max, 90.0)
+    dlon = math.degrees(
+        math.asin(
+            min(1.0, math.sin(within / EARTH_RADIUS) / math.cos(math.radians(lat)))
+        )
+    )
+    return lon - dlon, lat_min, lon + dlon, lat_max
+
+
+def distance(lon1, lat1, lon2, lat2):
+    """Calculate the great-circle distance between two locations
+    with the haversine formula.
+
+    :param float lon1: Longitude of first location.
+    :param float lat1: Latitude of first location.
+    :param float lon2: Longitude of second location.
+    :param float lat2: Latitude of second location.
+
+    :returns: Distance in km.
+    :rtype: float
+    """
+    lon1, lat1, lon2, lat2 = map(math.radians, (lon1, lat1, lon2, lat2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
@@ -0,0 +1,315 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd command plug-in for resources sub-command.
+
+Suggest right-sized Slurm memory, CPUs, and walltime requests
+from the historical usage of past jobs recorded by :command:`sacct`.
+"""
+import csv
+import fnmatch
+import logging
+import math
+import shlex
+import subprocess
+from pathlib import Path
+
+import cliff.command
+
+logger = logging.getLogger(__name__)
+
+#: Job accounting fields requested from :command:`sacct`.
+SACCT_FIELDS = (
+    "JobID",
+    "JobName",
+    "State",
+    "Elapsed",
+    "Timelimit",
+    "AllocCPUS",
+    "NTasks",
+    "TotalCPU",
+    "MaxRSS",
+)
+#: Job states that provide usable resource usage records.
+USABLE_STATES = {"COMPLETED", "TIMEOUT", "OUT_OF_MEMORY"}
+#: Multipliers applied to the peak historical usage to allow for run to run variation.
+MEM_HEADROOM = 1.25
+OOM_MEM_HEADROOM = 1.5
+WALLTIME_HEADROOM = 1.2
+#: Granularity, in MiB, to which memory requests are rounded up.
+MEM_STEP = 250
+#: Granularity, in seconds, to which walltime requests are rounded up.
+WALLTIME_STEP = 600
+
+
+class Resources(cliff.command.Command):
+    """Suggest Slurm resource requests from the usage of past jobs."""
+
+    def get_parser(self, prog_name):
+        parser = super().get_parser(prog_name)
+        parser.description = """
+            Suggest right-sized memory per CPU, CPUs per task, and walltime requests
+            for jobs named JOB_NAME from the resource usage of past jobs recorded by sacct.
+            JOB_NAME is a run id or a Monte Carlo job id,
+            and may include shell-style wildcards to match a family of past jobs.
+        """
+        parser.add_argument(
+            "job_name",
+            metavar="JOB_NAME",
+            help="Name of past jobs to match; may include shell-style wildcards",
+        )
+        parser.add_argument(
+            "--sacct-file",
+            dest="sacct_file",
+            type=Path,
+            default=None,
+            help="""
+            File of saved `sacct --parsable2` output to read the resource usage of past jobs
+            from instead of running sacct.
+            """,
+        )
+        parser.add_argument(
+            "--starttime",
+            default="now-30days",
+            help="""
+            Earliest start time of past jobs to match, in any format accepted by sacct;
+            defaults to now-30days.
+            Ignored if --sacct-file is used.
+            """,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute the `mohid resources` sub-command.
+
+        The suggested resource requests are written to stdout.
+
+        :param parsed_args: Arguments and options parsed from the command-line.
+        :type parsed_args: :class:`argparse.Namespace` instance
+        """
+        advice = advise(
+            parsed_args.job_name,
+            sacct_file=parsed_args.sacct_file,
+            starttime=parsed_args.starttime,
+        )
+        if advice is None:
+            logger.warning(f"no usable sacct records found for {parsed_args.job_name}")
+            return
+        self.app.stdout.write(format_advice(advice))
+
+
+def advise(job_name, sacct_file=None, starttime="now-30days"):
+    """Calculate right-sized resource requests for jobs named :kbd:`job_name`
+    from the resource usage of matching past jobs.
+
+    :param str job_name: Name of past jobs to match;
+                         may include shell-style wildcards.
+
+    :param sacct_file: File of saved :command:`sacct --parsable2` output to read
+                       instead of running :command:`sacct`.
+    :type sacct_file: :py:class:`pathlib.Path`
+
+    :param str starttime: Earliest start time of past jobs to pass to :command:`sacct`.
+
+    :returns: Resource advice with :kbd:`n_jobs`,
+              :kbd:`mem_per_cpu` (MiB),
+              :kbd:`cpus_per_task`,
+              :kbd:`walltime` (seconds),
+              and :kbd:`walltime_fraction` (of the past jobs' time limits) items,
+              or :py:obj:`None` if there are no usable records for matching jobs,
+              so that the configured resource requests should be used.
+    :rtype: dict
+    """
+    if sacct_file is None:
+        lines = _run_sacct(starttime)
+    else:
+        lines = Path(sacct_file).read_text().splitlines()
+    jobs = [
+        job
+        for job in parse_sacct(lines)
+        if fnmatch.fnmatchcase(job["name"], job_name) and job["state"] in USABLE_STATES
+        # Jobs without step records (e.g. from sacct -X) have no MaxRSS,
+        # and jobs that ended as they started have no elapsed time to scale
+        and job["max_rss"] and job["elapsed"]
+    ]
+    if not jobs:
+        return None
+    mem_per_task = max(
+        job["max_rss"]
+        * (OOM_MEM_HEADROOM if job["state"] == "OUT_OF_MEMORY" else MEM_HEADROOM)
+        for job in jobs
+    )
+    cpus_per_task = max(max(math.ceil(job["cpus_used_per_task"]) for job in jobs), 1)
+    # The memory is requested per CPU, so it has to be spread over the advised CPUs,
+    # not the CPUs that the past jobs were allocated
+    mem_per_cpu = mem_per_task / cpus_per_task
+    elapsed = max(job["elapsed"] for job in jobs)
+    fractions = [job["elapsed"] / job["timelimit"] for job in jobs if job["timelimit"]]
+    return {
+        "n_jobs": len(jobs),
+        "mem_per_cpu": _round_up(mem_per_cpu / 2**20, MEM_STEP),
+        "cpus_per_task": cpus_per_task,
+        "walltime": _round_up(elapsed * WALLTIME_HEADROOM, WALLTIME_STEP),
+        "walltime_fraction": (
+            max(fractions) * WALLTIME_HEADROOM if fractions else WALLTIME_HEADROOM
+        ),
+    }
+
+
+def scale_walltime(walltime, advice):
+    """Scale a walltime calculated from a run description by the fraction of their
+    time limits that matching past jobs used.
+
+    This is used for GLOST jobs in which the walltime depends on the number of runs
+    in the job, so absolute elapsed times of past jobs are not comparable.
+
+    :param int walltime: Walltime in seconds.
+    :param dict advice: Resource advice from :py:func:`advise`.
+
+    :returns: Scaled walltime in seconds.
+    :rtype: int
+    """
+    return _round_up(walltime * advice["walltime_fraction"], WALLTIME_STEP)
+
+
+def format_advice(advice):
+    """
+    :param dict advice: Resource advice from :py:func:`advise`.
+
+    :rtype: str
+    """
+    hours, seconds = divmod(advice["walltime"], 3600)
+    minutes, seconds = divmod(seconds, 60)
+    return (
+        f"Based on {advice['n_jobs']} past job(s):\n"
+        f"  #SBATCH --cpus-per-task={advice['cpus_per_task']}\n"
+        f"  #SBATCH --mem-per-cpu={advice['mem_per_cpu']}M\n"
+        f"  #SBATCH --time={hours}:{minutes:02d}:{seconds:02d}\n"
+        f"  walltime fraction for GLOST jobs: {advice['walltime_fraction']:.2f}\n"
+    )
+
+
+def parse_sacct(lines):
+    """Generate job resource usage summaries from :command:`sacct --parsable2` output.
+
+    The job allocation line and the step lines of each job are combined
+    into a single summary.
+
+    :param lines: Lines of :command:`sacct --parsable2` output,
+                  including the header line.
+    :type lines: iterable of str
+
+    :returns: Job summaries with :kbd:`job_id`, :kbd:`name`, :kbd:`state`,
+              :kbd:`elapsed` (seconds), :kbd:`timelimit` (seconds or :py:obj:`None`),
+              :kbd:`cpus_per_task`, :kbd:`cpus_used_per_task`, and :kbd:`max_rss` (bytes)
+              items.
+    :rtype: generator of dict
+    """
+    job = None
+    for row in csv.DictReader(lines, delimiter="|"):
+        job_id, _, step = row["JobID"].partition(".")
+        if not step:
+            if job is not None:
+                yield _summarize_job(job)
+            job = {"job_id": job_id, "row": row, "steps": []}
+        elif job is not None and job_id == job["job_id"] and step != "extern":
+            job["steps"].append(row)
+    if job is not None:
+        yield _summarize_job(job)
+
+
+def _summarize_job(job):
+    """
+    :param dict job:
+
+    :rtype: dict
+    """
+    row = job["row"]
+    ntasks = max([int(step["NTasks"] or 1) for step in job["steps"]] or [1])
+    alloc_cpus = int(row["AllocCPUS"] or 1)
+    elapsed = _parse_duration(row["Elapsed"])
+    try:
+        timelimit = _parse_duration(row["Timelimit"])
+    except ValueError:
+        # UNLIMITED, Partition_Limit, etc.
+        timelimit = None
+    return {
+        "job_id": job["job_id"],
+        "name": row["JobName"],
+        "state": row["State"].split()[0] if row["State"] else "",
+        "elapsed": elapsed,
+        "timelimit": timelimit,
+        "cpus_per_task": max(alloc_cpus // ntasks, 1),
+        "cpus_used_per_task": (
+            _parse_duration(row["TotalCPU"]) / elapsed / ntasks if elapsed else 0
+        ),
+        "max_rss": max([_parse_size(step["MaxRSS"]) for step in job["steps"]] or [0]),
+    }
+
+
+def _run_sacct(starttime):
+    """
+    :param str starttime:
+
+    :rtype: list
+    """
+    sacct_cmd = (
+        f"sacct --parsable2 --starttime={starttime} "
+        f"--format={','.join(SACCT_FIELDS)}"
+    )
+    return subprocess.run(
+        shlex.split(sacct_cmd),
+        check=True,
+        universal_newlines=True,
+        stdout=subprocess.PIPE,
+    ).stdout.splitlines()
+
+
+def _parse_duration(duration):
+    """Parse a sacct duration formatted as [D-][HH:]MM:SS[.mmm] into seconds.
+
+    :param str duration:
+
+    :rtype: float
+    """
+    days, _, hms = duration.rpartition("-")
+    seconds = 0.0
+    for value in hms.split(":"):
+        seconds = seconds * 60 + float(value)
+    return int(days or 0) * 86400 + seconds
+
+
+def _parse_size(size):
+    """Parse a sacct memory size like 1234567K or 12.5G into bytes.
+
+    :param str size:
+
+    :rtype: float
+    """
+    if not size:
+        return 0.0
+    multipliers = {"K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40}
+    if size[-1] in multipliers:
+        return float(size[:-1]) * multipliers[size[-1]]
+    return float(size)
+
+
+def _round_up(value, step):
+    """
+    :param float value:
+    :param int step:
+
+    :rtype: int
+    """
+    return int(math.ceil(value / step) * step)
@@ -18,19 +18,37 @@ Prepare for, execute, and gather the results of a run of the MIDOSS-MOHID model.
 """
 import datetime
 import logging
+import math
 import os
 import shlex
-import subprocess
 import textwrap
 from pathlib import Path
 
 import cliff.command
 import nemo_cmd.prepare
 
+import mohid_cmd.executors
 import mohid_cmd.prepare
+import mohid_cmd.resources
+import mohid_cmd.run_desc
+import mohid_cmd.validate
 
 logger = logging.getLogger(__name__)
 
+#: Name of the JSON lines file in the results directory in which the run script records
+#: the timing of each phase of the run.
+TIMING_FILE = "timing.jsonl"
+#: Memory, in MiB, that a MOHID run requires,
+#: split across the CPUs allocated to the run's task.
+MEM_PER_TASK = 14500
+#: Run description :kbd:`openmp` section keys and the OpenMP environment variables
+#: that they set in the run script.
+OPENMP_ENV_VARS = {
+    "proc bind": "OMP_PROC_BIND",
+    "places": "OMP_PLACES",
+    "stacksize": "OMP_STACKSIZE",
+}
+
 
 class Run(cliff.command.Command):
     """Prepare, execute, and gather results from a MIDOSS-MOHID model run."""
@@ -86,6 +104,60 @@ class Run(cliff.command.Command):
             the run id and the date/time at which :kbd:`mohid run` is executed.
             """,
         )
+        parser.add_argument(
+            "--tune-resources",
+            dest="tune_resources",
+            action="store_true",
+            help="""
+            Set the memory, CPUs, and walltime requested for the run from the
+            resource usage recorded by sacct for past jobs with the same run id,
+            instead of the defaults and the walltime in DESC_FILE.
+            """,
+        )
+        parser.add_argument(
+            "--sacct-file",
+            dest="sacct_file",
+            type=Path,
+            default=None,
+            help="""
+            File of saved `sacct --parsable2` output to read the resource usage of past jobs
+            from instead of running sacct; implies --tune-resources.
+            """,
+        )
+        parser.add_argument(
+            "--scaling-test",
+            dest="scaling_test",
+            metavar="CPUS_PER_TASK",
+            type=int,
+            nargs="+",
+            default=[],
+            help="""
+            Prepare a temporary run directory and a run script for each of the
+            CPUS_PER_TASK OpenMP thread counts, with results directories named
+            RESULTS_DIR/cpus-N, but don't submit the runs to the queue.
+            Submitting the run scripts and comparing the model phase durations
+            in their timing files shows the fastest thread count for the domain.
+            """,
+        )
+        parser.add_argument(
+            "--executor",
+            choices=mohid_cmd.executors.EXECUTORS,
+            default="sbatch",
+            help="""
+            How to execute the run script:
+            sbatch submits it to the Slurm scheduler (the default);
+            local runs it on this machine and waits for it to finish.
+            """,
+        )
+        parser.add_argument(
+            "--cpus",
+            type=int,
+            default=None,
+            help="""
+            Maximum number of processes that the local executor runs concurrently;
+            defaults to the number of CPUs on this machine.
+            """,
+        )
         return parser
 
     def take_action(self, parsed_args):
@@ -97,25 +169,52 @@ class Run(cliff.command.Command):
         :param parsed_args: Arguments and options parsed from the command-line.
         :type parsed_args: :class:`argparse.Namespace` instance
         """
+        if parsed_args.scaling_test:
+            run_scripts = scaling_test(
+                parsed_args.desc_file,
+                parsed_args.results_dir,
+                parsed_args.scaling_test,
+                quiet=parsed_args.quiet,
+            )
+            if not parsed_args.quiet:
+                for run_script in run_scripts:
+                    logger.info(f"Wrote scaling test run script {run_script}")
+            return
         submit_job_msg = run(
             parsed_args.desc_file,
             parsed_args.results_dir,
             no_submit=parsed_args.no_submit,
             quiet=parsed_args.quiet,
             tmp_run_dir=parsed_args.tmp_run_dir,
+            tune_resources=parsed_args.tune_resources,
+            sacct_file=parsed_args.sacct_file,
+            executor=parsed_args.executor,
+            cpus=parsed_args.cpus,
         )
         if submit_job_msg and not parsed_args.quiet:
             logger.info(submit_job_msg)
 
 
-def run(desc_file, results_dir, no_submit=False, quiet=False, tmp_run_dir=""):
+def run(
+    desc_file,
+    results_dir,
+    no_submit=False,
+    quiet=False,
+    tmp_run_dir="",
+    tune_resources=False,
+    sacct_file=None,
+    executor="sbatch",
+    cpus=None,
+):
     """Create and populate a temporary run directory, and a run script,
     and submit the run to the queue manager.
 
     The temporary run directory is created and populated via the
     :func:`mohid_cmd.api.prepare` API function.
     The run script is stored in :file:`MOHID.sh` in the temporary run directory.
-    That script is submitted to the queue manager in a subprocess.
+    That script is submitted to the queue manager,
+    or run locally,
+    by the executor backend.
 
     :param desc_file: File path/name of the YAML run description file.
     :type desc_file: :py:class:`pathlib.Path`
@@ -134,40 +233,136 @@ def run(desc_file, results_dir, no_submit=False, quiet=False, tmp_run_dir=""):
 
     :param string tmp_run_dir: Name to use for temporary run directory.
 
+    :param boolean tune_resources: Set the memory, CPUs, and walltime requested
+                                   for the run from the resource usage of past jobs
+                                   with the same run id.
+
+    :param sacct_file: File of saved :command:`sacct --parsable2` output to read
+                       the resource usage of past jobs from instead of running
+                       :command:`sacct`; implies :kbd:`tune_resources`.
+    :type sacct_file: :py:class:`pathlib.Path`
+
+    :param str executor: Name of the executor backend to execute the run script with;
+                         :kbd:`sbatch` or :kbd:`local`.
+
+    :param int cpus: Maximum number of processes that the :kbd:`local` executor
+                     runs concurrently.
+
     :returns: Message generated by queue manager upon submission of the
-              run script.
+              run script,
+              or summary of the local execution of the run script.
     :rtype: str
     """
-    tmp_run_dir = mohid_cmd.prepare.prepare(desc_file, tmp_run_dir)
+    run_desc = mohid_cmd.run_desc.RunDescription.load(desc_file)
+    tmp_run_dir = mohid_cmd.prepare.prepare(desc_file, tmp_run_dir, run_desc=run_desc)
     if not quiet:
         logger.info(f"Created temporary run directory {tmp_run_dir}")
-    run_desc = nemo_cmd.prepare.load_run_desc(desc_file)
     results_dir = nemo_cmd.resolved_path(results_dir)
-    run_script = _build_run_script(run_desc, desc_file, results_dir, tmp_run_dir)
-    run_script_file = tmp_run_dir / "MOHID.sh"
-    with run_script_file.open("wt") as f:
-        f.write(run_script)
+    resources = None
+    if tune_resources or sacct_file is not None:
+        run_id = mohid_cmd.run_desc.get_value(run_desc, ("run_id",))
+        resources = mohid_cmd.resources.advise(run_id, sacct_file=sacct_file)
+        if resources is None:
+            logger.warning(
+                f"No usable sacct records found for past {run_id} jobs, "
+                f"so using default resource requests"
+            )
+        elif not quiet:
+            logger.info(
+                f"Resource requests set from {resources['n_jobs']} past {run_id} job(s)"
+            )
+    run_script_file = _write_run_script(
+        run_desc, desc_file, results_dir, tmp_run_dir, resources
+    )
     if not quiet:
         logger.info(f"Wrote job run script to {run_script_file}")
-    results_dir.mkdir(parents=True, exist_ok=True)
     if no_submit:
         return
-    sbatch_cmd = f"sbatch {run_script_file}"
-    submit_job_msg = subprocess.run(
-        shlex.split(sbatch_cmd),
-        check=True,
-        universal_newlines=True,
-        stdout=subprocess.PIPE,
-    ).stdout
+    submit_job_msg = mohid_cmd.executors.get_executor(executor, cpus).submit(
+        run_script_file
+    )
     return submit_job_msg
 
 
-def _build_run_script(run_desc, desc_file, results_dir, tmp_run_dir):
+def scaling_test(desc_file, results_dir, cpus_per_task_values, quiet=False):
+    """Create a temporary run directory and a run script for each of a collection
+    of OpenMP thread counts, but don't submit the runs to the queue manager.
+
+    The run id of each run has :kbd:`-cpusN` appended to it,
+    and the results of each run are gathered in a :file:`cpus-N/` sub-directory
+    of :kbd:`results_dir`,
+    so that the timing records of the runs can be compared.
+
+    :param desc_file: File path/name of the YAML run description file.
+    :type desc_file: :py:class:`pathlib.Path`
+
+    :param results_dir: Path of the directory in which to create the results
+                        directories of the runs.
+    :type results_dir: :py:class:`pathlib.Path`
+
+    :param cpus_per_task_values: Numbers of CPUs per task (OpenMP threads) to create
+                                 runs for.
+    :type cpus_per_task_values: sequence of int
+
+    :param boolean quiet: Don't show the run directory path messages.
+
+    :returns: Paths of the run scripts.
+    :rtype: list of :py:class:`pathlib.Path`
     """
+    results_dir = nemo_cmd.resolved_path(results_dir)
+    base_run_desc = mohid_cmd.run_desc.RunDescription.load(desc_file)
+    run_id = base_run_desc.value(("run_id",))
+    run_scripts = []
+    for cpus_per_task in cpus_per_task_values:
+        # The run id has to be changed before the run is prepared because the
+        # Lagrangian results file name in nomfich.dat is made from it
+        run_desc = base_run_desc.copy()
+        run_desc["run_id"] = f"{run_id}-cpus{cpus_per_task}"
+        run_desc["cpus per task"] = cpus_per_task
+        tmp_run_dir = mohid_cmd.prepare.prepare(desc_file, "", run_desc=run_desc)
+        if not quiet:
+            logger.info(f"Created temporary run directory {tmp_run_dir}")
+        run_scripts.append(
+            _write_run_script(
+                run_desc,
+                desc_file,
+                results_dir / f"cpus-{cpus_per_task}",
+                tmp_run_dir,
+            )
+        )
+    return run_scripts
+
+
+def _write_run_script(run_desc, desc_file, results_dir, tmp_run_dir, resources=None):
+    """Write the run script to :file:`MOHID.sh` in the temporary run directory,
+    and create the results directory.
+
     :param dict run_desc:
     :param :py:class:`pathlib.Path` desc_file:
     :param :py:class:`pathlib.Path` results_dir:
     :param :py:class:`pathlib.Path` tmp_run_dir:
+    :param dict resources: Resource advice from :py:func:`mohid_cmd.resources.advise`.
+
+    :returns: Path of the run script.
+    :rtype: :py:class:`pathlib.Path`
+    """
+    run_script = _build_run_script(
+        run_desc, desc_file, results_dir, tmp_run_dir, resources
+    )
+    run_script_file = tmp_run_dir / "MOHID.sh"
+    with run_script_file.open("wt") as f:
+        f.write(run_script)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    return run_script_file
+
+
+def _build_run_script(run_desc, desc_file, results_dir, tmp_run_dir, resources=None):
+    """
+    :param dict run_desc:
+    :param :py:class:`pathlib.Path` desc_file:
+    :param :py:class:`pathlib.Path` results_dir:
+    :param :py:class:`pathlib.Path` tmp_run_dir:
+    :param dict resources: Resource advice from :py:func:`mohid_cmd.resources.advise`.
 
     :rtype: str
     """
@@ -175,9 +370,10 @@ def _build_run_script(run_desc, desc_file, results_dir, tmp_run_dir):
     run_script = "\n".join(
         (
             run_script,
-            _sbatch_directives(run_desc, results_dir),
+            _sbatch_directives(run_desc, results_dir, resources),
             _definitions(run_desc, desc_file, results_dir, tmp_run_dir),
             _modules(),
+            _timing_functions(),
             _execute(run_desc),
             _fix_permissions(),
             _cleanup(),
@@ -186,22 +382,21 @@ def _build_run_script(run_desc, desc_file, results_dir, tmp_run_dir):
     return run_script
 
 
-def _sbatch_directives(run_desc, results_dir):
+def _sbatch_directives(run_desc, results_dir, resources=None):
     """
     :param dict run_desc:
     :param :py:class:`pathlib.Path` results_dir:
+    :param dict resources: Resource advice from :py:func:`mohid_cmd.resources.advise`.
 
     :rtype: str
     """
-    run_id = nemo_cmd.prepare.get_run_desc_value(run_desc, ("run_id",))
+    run_id = mohid_cmd.run_desc.get_value(run_desc, ("run_id",))
     try:
-        email = nemo_cmd.prepare.get_run_desc_value(run_desc, ("email",), fatal=False)
+        email = mohid_cmd.run_desc.get_value(run_desc, ("email",), fatal=False)
     except KeyError:
         email = "{user}@eoas.ubc.ca".format(user=os.getenv("USER"))
     try:
-        account = nemo_cmd.prepare.get_run_desc_value(
-            run_desc, ("account",), fatal=False
-        )
+        account = mohid_cmd.run_desc.get_value(run_desc, ("account",), fatal=False)
     except KeyError:
         account = "rrg-allen"
         logger.info(
@@ -209,15 +404,22 @@ def _sbatch_directives(run_desc, results_dir):
             f"so assuming {account}. If sbatch complains you can specify a "
             f"different account with a YAML line like account: def-allen"
         )
+    td = datetime.timedelta(
+        seconds=mohid_cmd.validate.walltime_seconds(
+            mohid_cmd.run_desc.get_value(run_desc, ("walltime",))
+        )
+    )
     try:
-        td = datetime.timedelta(
-            seconds=nemo_cmd.prepare.get_run_desc_value(run_desc, ("walltime",))
+        cpus_per_task = mohid_cmd.run_desc.get_value(
+            run_desc, ("cpus per task",), fatal=False
         )
-    except TypeError:
-        t = datetime.datetime.strptime(
-            nemo_cmd.prepare.get_run_desc_value(run_desc, ("walltime",)), "%H:%M:%S"
-        ).time()
-        td = datetime.timedelta(hours=t.hour, minutes=t.minute, seconds=t.second)
+    except KeyError:
+        cpus_per_task = 1
+    mem_per_cpu = f"{math.ceil(MEM_PER_TASK / cpus_per_task)}m"
+    if resources is not None:
+        cpus_per_task = resources["cpus_per_task"]
+        mem_per_cpu = f"{resources['mem_per_cpu']}m"
+        td = datetime.timedelta(seconds=resources["walltime"])
     walltime = td_to_hms(td)
     sbatch_directives = textwrap.dedent(
         f"""\
@@ -225,8 +427,8 @@ def _sbatch_directives(run_desc, results_dir):
         #SBATCH --account={account}
         #SBATCH --mail-user={email}
         #SBATCH --mail-type=ALL
-        #SBATCH --cpus-per-task=1
-        #SBATCH --mem-per-cpu=14500m
+        #SBATCH --cpus-per-task={cpus_per_task}
+        #SBATCH --mem-per-cpu={mem_per_cpu}
         #SBATCH --time={walltime}
         #SBATCH --output={results_dir/'stdout'}
         #SBATCH --error={results_dir/'stderr'}
@@ -237,9 +439,34 @@ def _sbatch_directives(run_desc, results_dir):
         fi
         """
     )
+    sbatch_directives += _openmp_env(run_desc)
     return sbatch_directives
 
 
+def _openmp_env(run_desc):
+    """
+    :param dict run_desc:
+
+    :rtype: str
+    """
+    try:
+        openmp = mohid_cmd.run_desc.get_value(run_desc, ("openmp",), fatal=False)
+    except KeyError:
+        return ""
+    unknown_keys = set(openmp) - set(OPENMP_ENV_VARS)
+    if unknown_keys:
+        logger.error(
+            f"unrecognized openmp key(s) in run description: "
+            f"{', '.join(sorted(unknown_keys))}; "
+            f"expected one or more of: {', '.join(OPENMP_ENV_VARS)}"
+        )
+        raise SystemExit(2)
+    return "".join(
+        f"export {OPENMP_ENV_VARS[key]}={shlex.quote(str(value))}\n"
+        for key, value in openmp.items()
+    )
+
+
 def td_to_hms(timedelta):
     """Return a string that is the timedelta value formatted as H:M:S
     with leading zeros on the minutes and seconds values.
@@ -276,8 +503,9 @@ def _definitions(run_desc, desc_file, results_dir, tmp_run_dir):
         RUN_DESC="{desc_file}"
         WORK_DIR="{tmp_run_dir}"
         RESULTS_DIR="{results_dir}"
-        HDF5_TO_NETCDF4="{user_local_bin}/hdf5-to-netcdf4"
+        CONVERT="{user_local_bin}/mohid convert"
         GATHER="{user_local_bin}/mohid gather"
+        TIMING="${{RESULTS_DIR}}/{TIMING_FILE}"
         """
     )
     return defns
@@ -298,17 +526,60 @@ def _modules():
     return modules
 
 
+def _timing_functions():
+    """Bash functions to record the timing of the phases of the run as JSON lines
+    in the ${TIMING} file.
+
+    :command:`timed PHASE BYTES COMMAND...` executes COMMAND and appends a record
+    containing the wall clock start and end times (seconds since the epoch),
+    the start and end times from the monotonic :file:`/proc/uptime` clock,
+    the number of bytes handled by the phase,
+    and the exit code of COMMAND.
+    :file:`/proc/uptime` only has 10 ms resolution,
+    so :py:func:`mohid_cmd.profile.phase_duration` uses the wall clock times,
+    which have microsecond resolution from :envvar:`EPOCHREALTIME` in bash>=5,
+    unless the system clock was stepped during the phase.
+    :command:`nbytes PATH...` calculates the total size of PATHs in bytes.
+
+    :rtype: str
+    """
+    script = textwrap.dedent(
+        """\
+        nbytes() {
+          local bytes
+          bytes=$(du -cbs "$@" 2>/dev/null | tail -n 1 | cut -f 1)
+          echo ${bytes:-0}
+        }
+
+        timed() {
+          local phase=$1 bytes=$2 wall wall_end mono_start mono_end exit_code
+          shift 2
+          wall=${EPOCHREALTIME:-$(date +%s.%N)}
+          read -r mono_start _ </proc/uptime
+          "$@"
+          exit_code=$?
+          read -r mono_end _ </proc/uptime
+          wall_end=${EPOCHREALTIME:-$(date +%s.%N)}
+          printf '{"run_id": "%s", "phase": "%s", "host": "%s", "wall": %s, "wall_end": %s, "mono_start": %s, "mono_end": %s, "bytes": %s, "exit_code": %s}\\n' \\
+            "${RUN_ID}" "${phase}" "${HOSTNAME}" "${wall/,/.}" "${wall_end/,/.}" "${mono_start}" "${mono_end}" "${bytes}" "${exit_code}" >>${TIMING}
+          return ${exit_code}
+        }
+        """
+    )
+    return script
+
+
 def _execute(run_desc):
     """
     :param dict run_desc:
 
     :rtype: str
     """
-    mohid_repo = nemo_cmd.prepare.get_run_desc_value(
+    mohid_repo = mohid_cmd.run_desc.get_value(
         run_desc, ("paths", "mohid repo"), resolve_path=True
     )
     mohid_exe = mohid_repo / Path("Solutions/linux/bin/MohidWater.exe")
-    partic_data = nemo_cmd.prepare.get_run_desc_value(
+    partic_data = mohid_cmd.run_desc.get_value(
         run_desc, ("run data files", "PARTIC_DATA"), resolve_path=True
     )
     script = textwrap.dedent(
@@ -317,45 +588,99 @@ def _execute(run_desc):
         cd ${{WORK_DIR}}
         echo "working dir: $(pwd)" >${{RESULTS_DIR}}/stdout
 
+        NODE_LOCAL="${{SLURM_TMPDIR:-/tmp}}"
+        ln -sfn ${{NODE_LOCAL}} ${{WORK_DIR}}/{mohid_cmd.prepare.NODE_LOCAL_LINK}
+
         echo "Starting run at $(date)" >>${{RESULTS_DIR}}/stdout
-        {str(mohid_exe)} >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr
+        timed model 0 {str(mohid_exe)} >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr
         MOHID_EXIT_CODE=$?
         echo "Ended run at $(date)" >>${{RESULTS_DIR}}/stdout
 
-        TMPDIR="${{SLURM_TMPDIR}}"
+        TMPDIR="${{NODE_LOCAL}}"
         LAGRANGIAN="{partic_data.stem}_${{RUN_ID}}"
-        if test -f ${{WORK_DIR}}/res/${{LAGRANGIAN}}.hdf5
+        if test -f ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5
         then
           echo "Results hdf5 to netCDF4 conversion started at $(date)" >>${{RESULTS_DIR}}/stdout
-          cp -v ${{WORK_DIR}}/res/${{LAGRANGIAN}}.hdf5 ${{SLURM_TMPDIR}}/ >>${{RESULTS_DIR}}/stdout && \\
-          ${{HDF5_TO_NETCDF4}} -v info \\
-            ${{SLURM_TMPDIR}}/${{LAGRANGIAN}}.hdf5 \\
-            ${{SLURM_TMPDIR}}/${{LAGRANGIAN}}.nc >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr && \\
-          mv -v ${{SLURM_TMPDIR}}/${{LAGRANGIAN}}.nc ${{WORK_DIR}}/ >>${{RESULTS_DIR}}/stdout && \\
-          rm -v ${{WORK_DIR}}/res/${{LAGRANGIAN}}.hdf5 >>${{RESULTS_DIR}}/stdout
+          if timed convert $(nbytes ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5) \\
+              ${{CONVERT}} ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5 \\
+              ${{NODE_LOCAL}}/${{LAGRANGIAN}}.nc{_convert_options(run_desc)} \\
+              >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr && \\
+            timed move $(nbytes ${{NODE_LOCAL}}/${{LAGRANGIAN}}.nc) \\
+              mv -v ${{NODE_LOCAL}}/${{LAGRANGIAN}}.nc ${{WORK_DIR}}/ >>${{RESULTS_DIR}}/stdout
+          then
+            timed delete $(nbytes ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5) \\
+              rm -v ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5 >>${{RESULTS_DIR}}/stdout
+          else
+            echo "Results hdf5 to netCDF4 conversion failed; keeping ${{LAGRANGIAN}}.hdf5" >>${{RESULTS_DIR}}/stdout
+            timed move $(nbytes ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5) \\
+              mv -v ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5 ${{WORK_DIR}}/res/ >>${{RESULTS_DIR}}/stdout
+          fi
           echo "Results hdf5 to netCDF4 conversion ended at $(date)" >>${{RESULTS_DIR}}/stdout
         fi
 
         echo "Rename mass balance file to MassBalance_${{RUN_ID}}.sro" >>${{RESULTS_DIR}}/stdout
-        mv -v ${{WORK_DIR}}/resOilOutput.sro ${{WORK_DIR}}/MassBalance_${{RUN_ID}}.sro >>${{RESULTS_DIR}}/stdout
+        timed rename $(nbytes ${{WORK_DIR}}/resOilOutput.sro) \\
+          mv -v ${{WORK_DIR}}/resOilOutput.sro ${{WORK_DIR}}/MassBalance_${{RUN_ID}}.sro >>${{RESULTS_DIR}}/stdout
 
         echo "Delete large unused output files"  >>${{RESULTS_DIR}}/stdout
-        rm -v ${{WORK_DIR}}/res/Turbulence*.hdf5 ${{WORK_DIR}}/res*.elf5 ${{WORK_DIR}}/res*.ptf
+        timed delete $(nbytes ${{WORK_DIR}}/res/Turbulence*.hdf5 ${{WORK_DIR}}/res*.elf5 ${{WORK_DIR}}/res*.ptf) \\
+          rm -v ${{WORK_DIR}}/res/Turbulence*.hdf5 ${{WORK_DIR}}/res*.elf5 ${{WORK_DIR}}/res*.ptf
 
         echo "Results gathering started at $(date)" >>${{RESULTS_DIR}}/stdout
-        ${{GATHER}} ${{RESULTS_DIR}} --debug >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr
+        timed gather $(nbytes ${{WORK_DIR}}) \\
+          ${{GATHER}} ${{RESULTS_DIR}}{_gather_options(run_desc)} --debug >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr
         echo "Results gathering ended at $(date)" >>${{RESULTS_DIR}}/stdout
         """
     )
     return script
 
 
+def _convert_options(run_desc):
+    """Command-line options for :command:`mohid convert` from the optional
+    :kbd:`netcdf4` section of the run description.
+
+    :param dict run_desc:
+
+    :rtype: str
+    """
+    try:
+        netcdf4 = mohid_cmd.run_desc.get_value(run_desc, ("netcdf4",), fatal=False)
+    except KeyError:
+        return ""
+    options = [f"--var {name}" for name in netcdf4.get("output variables", [])]
+    options.extend(
+        f"--chunk {dim}={size}" for dim, size in netcdf4.get("chunk sizes", {}).items()
+    )
+    if "output time stride" in netcdf4:
+        options.append(f"--time-stride {netcdf4['output time stride']}")
+    if "compression level" in netcdf4:
+        options.append(f"--complevel {netcdf4['compression level']}")
+    if "workers" in netcdf4:
+        options.append(f"--workers {netcdf4['workers']}")
+    return "".join(f" {option}" for option in options)
+
+
+def _gather_options(run_desc):
+    """Command-line options for :command:`mohid gather` from the optional
+    :kbd:`gather` section of the run description.
+
+    :param dict run_desc:
+
+    :rtype: str
+    """
+    try:
+        dedup = mohid_cmd.run_desc.get_value(run_desc, ("gather", "dedup"), fatal=False)
+    except KeyError:
+        return ""
+    return " --dedup" if dedup else ""
+
+
 def _fix_permissions():
     script = textwrap.dedent(
         """\
-        chmod -v go+rx ${RESULTS_DIR} >>${RESULTS_DIR}/stdout
-        chmod -v g+rw ${RESULTS_DIR}/* >>${RESULTS_DIR}/stdout
-        chmod -v o+r ${RESULTS_DIR}/* >>${RESULTS_DIR}/stdout
+        timed permissions 0 chmod -v go+rx ${RESULTS_DIR} >>${RESULTS_DIR}/stdout
+        timed permissions 0 chmod -v g+rw ${RESULTS_DIR}/* >>${RESULTS_DIR}/stdout
+        timed permissions 0 chmod -v o+r ${RESULTS_DIR}/* >>${RESULTS_DIR}/stdout
         """
     )
     return script
@@ -365,7 +690,7 @@ def _cleanup():
     script = textwrap.dedent(
         """\
         echo "Deleting run directory" >>${RESULTS_DIR}/stdout
-        rmdir -v $(pwd) >>${RESULTS_DIR}/stdout
+        timed cleanup 0 rmdir -v $(pwd) >>${RESULTS_DIR}/stdout
         echo "Finished at $(date)" >>${RESULTS_DIR}/stdout
         exit ${MOHID_EXIT_CODE}
         """
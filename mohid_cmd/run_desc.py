@@ -0,0 +1,165 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MIDOSS-MOHID run description that is loaded once and shared by the prepare,
+run script building, and submission stages of a run.
+"""
+import logging
+
+import nemo_cmd.prepare
+
+logger = logging.getLogger(__name__)
+
+
+class RunDescription(dict):
+    """Run description dictionary with memoized value lookups.
+
+    Values that are looked up with :py:meth:`value` are stored,
+    so path expansion and resolution,
+    which resolves symbolic links on the file system,
+    is only done once for each key.
+    The stored values are discarded if a top level key is set or deleted.
+
+    Because it is a :py:class:`dict`,
+    a :py:class:`RunDescription` can be passed to the :py:mod:`nemo_cmd.prepare`
+    functions that expect a run description dictionary.
+
+    :param run_desc: Run description.
+    :type run_desc: dict
+
+    :param desc_file: File that the run description was loaded from.
+    :type desc_file: :py:class:`pathlib.Path`
+    """
+
+    def __init__(self, run_desc=(), desc_file=None):
+        super().__init__(run_desc)
+        self.desc_file = desc_file
+        self._values = {}
+
+    @classmethod
+    def load(cls, desc_file):
+        """Load a run description from a YAML file.
+
+        :param desc_file: File path/name of the YAML run description file.
+        :type desc_file: :py:class:`pathlib.Path`
+
+        :raises: :py:exc:`SystemExit` with exit code 2 if the file does not contain
+                 a YAML mapping.
+
+        :rtype: :py:class:`RunDescription`
+        """
+        run_desc = nemo_cmd.prepare.load_run_desc(desc_file)
+        if not isinstance(run_desc, dict):
+            logger.error(f"{desc_file} does not contain a run description mapping")
+            raise SystemExit(2)
+        return cls(run_desc, desc_file)
+
+    def value(
+        self, keys, expand_path=False, resolve_path=False, run_dir=None, fatal=True
+    ):
+        """Get a value from the run description,
+        expanding and resolving it as a path if requested.
+
+        The arguments and exceptions are the same as those of
+        :py:func:`nemo_cmd.prepare.get_run_desc_value`.
+        Only values that are found are stored,
+        so a missing key is reported,
+        and the temporary run directory is removed,
+        every time that it is looked up.
+
+        :param tuple keys: Key sequence to look up.
+        :param boolean expand_path: Expand :kbd:`~` and environment variables in the value.
+        :param boolean resolve_path: Resolve the value to an absolute path.
+
+        :param run_dir: Temporary run directory to remove if the key is not found.
+        :type run_dir: :py:class:`pathlib.Path`
+
+        :param boolean fatal: Raise :py:exc:`SystemExit` instead of :py:exc:`KeyError`
+                              if the key is not found.
+        """
+        memo_key = (tuple(keys), expand_path, resolve_path)
+        try:
+            return self._values[memo_key]
+        except KeyError:
+            pass
+        value = nemo_cmd.prepare.get_run_desc_value(
+            self,
+            keys,
+            expand_path=expand_path,
+            resolve_path=resolve_path,
+            run_dir=run_dir,
+            fatal=fatal,
+        )
+        self._values[memo_key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self._values.clear()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._values.clear()
+        super().__delitem__(key)
+
+    def update(self, *args, **kwargs):
+        self._values.clear()
+        super().update(*args, **kwargs)
+
+    def setdefault(self, key, default=None):
+        self._values.clear()
+        return super().setdefault(key, default)
+
+    def pop(self, *args):
+        self._values.clear()
+        return super().pop(*args)
+
+    def popitem(self):
+        self._values.clear()
+        return super().popitem()
+
+    def clear(self):
+        self._values.clear()
+        super().clear()
+
+    def copy(self):
+        """
+        :returns: Shallow copy of the run description with the stored values.
+        :rtype: :py:class:`RunDescription`
+        """
+        run_desc = RunDescription(self, self.desc_file)
+        run_desc._values = dict(self._values)
+        return run_desc
+
+
+def get_value(
+    run_desc, keys, expand_path=False, resolve_path=False, run_dir=None, fatal=True
+):
+    """Get a value from a run description,
+    using the stored value if the run description is a :py:class:`RunDescription`.
+
+    Functions that are also called with plain run description dictionaries,
+    e.g. in unit tests,
+    use this instead of :py:func:`nemo_cmd.prepare.get_run_desc_value`.
+
+    :param run_desc: Run description.
+    :type run_desc: :py:class:`RunDescription` or dict
+
+    See :py:meth:`RunDescription.value` for the other parameters.
+    """
+    kwargs = dict(
+        expand_path=expand_path, resolve_path=resolve_path, run_dir=run_dir, fatal=fatal
+    )
+    if isinstance(run_desc, RunDescription):
+        return run_desc.value(keys, **kwargs)
+    return nemo_cmd.prepare.get_run_desc_value(run_desc, keys, **kwargs)
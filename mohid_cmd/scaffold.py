@@ -0,0 +1,95 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""Monte Carlo job directory scaffold generator.
+
+Render the job directory template in the :file:`cookiecutter/` directory in-process,
+with the same output as `cookiecutter`_ but without its template copying,
+hooks, and replay file machinery.
+
+.. _cookiecutter: https://cookiecutter.readthedocs.io/en/latest/index.html
+"""
+import itertools
+import json
+import os
+import shutil
+from pathlib import Path
+
+import jinja2
+
+#: Directory that contains the job directory template and its default context.
+TEMPLATE_DIR = Path(__file__).parent.parent / "cookiecutter"
+#: Job directory template.
+#: The template variables are in the :kbd:`cookiecutter` namespace,
+#: so the template can still be rendered by cookiecutter.
+JOB_DIR_TEMPLATE = TEMPLATE_DIR / "{{cookiecutter.job_dir}}"
+#: Number of rendered template chunks that are joined into each write.
+RENDER_BATCH = 4096
+
+
+def make_job_dir(context):
+    """Create a Monte Carlo job directory from the job directory template.
+
+    The job directory is created at the path given by the :kbd:`job_dir` context value.
+    The files are streamed to disk as they are rendered,
+    so the task list file of a job with a very large number of runs is not rendered
+    into memory in one piece.
+    File permissions are copied from the template files.
+
+    :param dict context: Template variable values that override the defaults in
+                         :file:`cookiecutter/cookiecutter.json`.
+
+    :raises: :py:exc:`FileExistsError` if the job directory already exists.
+
+    :returns: Job directory.
+    :rtype: :py:class:`pathlib.Path`
+    """
+    context = dict(default_context(), **context)
+    job_dir = Path(context["job_dir"])
+    job_dir.mkdir(parents=True)
+    tmpl_env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(os.fspath(JOB_DIR_TEMPLATE)),
+        keep_trailing_newline=True,
+        undefined=jinja2.StrictUndefined,
+    )
+    for tmpl_dir, dirs, files in os.walk(JOB_DIR_TEMPLATE):
+        rel_dir = Path(tmpl_dir).relative_to(JOB_DIR_TEMPLATE)
+        for name in sorted(dirs):
+            (job_dir / rel_dir / name).mkdir()
+        for name in sorted(files):
+            tmpl = tmpl_env.get_template((rel_dir / name).as_posix())
+            with (job_dir / rel_dir / name).open("wt") as f:
+                # Template loops yield a few short chunks per iteration,
+                # so they are joined in batches to avoid a write call for each chunk
+                chunks = tmpl.generate(cookiecutter=context)
+                while batch := "".join(itertools.islice(chunks, RENDER_BATCH)):
+                    f.write(batch)
+            shutil.copymode(Path(tmpl_dir, name), job_dir / rel_dir / name)
+    return job_dir
+
+
+def default_context():
+    """
+    :returns: Default template variable values from :file:`cookiecutter/cookiecutter.json`.
+    :rtype: dict
+    """
+    return json.loads((TEMPLATE_DIR / "cookiecutter.json").read_text())
+
+
+def count_files():
+    """
+    :returns: Number of files in the job directory template.
+    :rtype: int
+    """
+    return sum(len(files) for _, _, files in os.walk(JOB_DIR_TEMPLATE))
@@ -0,0 +1,297 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""Concurrent submission of collections of Slurm jobs,
+and batched polling of their states.
+
+Submissions are made by :command:`sbatch` subprocesses that run concurrently
+under an :py:mod:`asyncio` event loop,
+with limits on the number of simultaneous submissions and the rate at which they start
+so that the scheduler is not flooded.
+Job states are obtained from one :command:`squeue` call and one :command:`sacct` call
+per batch of job ids, rather than one call per job.
+
+The :command:`sbatch`, :command:`squeue`, and :command:`sacct` commands are found on
+:envvar:`PATH`,
+so stand-in scripts can be used for testing.
+"""
+import asyncio
+import json
+import logging
+import subprocess
+import time
+
+logger = logging.getLogger(__name__)
+
+#: Name of the file in a job directory in which submitted Slurm jobs are recorded.
+JOBS_FILE = "slurm-jobs.jsonl"
+#: Maximum number of :command:`sbatch` commands that run at the same time.
+MAX_CONCURRENT_SUBMISSIONS = 8
+#: Minimum interval, in seconds, between the starts of :command:`sbatch` commands.
+MIN_SUBMISSION_INTERVAL = 0.2
+#: Maximum number of job ids in a single :command:`squeue` or :command:`sacct` call.
+QUERY_BATCH_SIZE = 500
+#: Job states in which jobs are waiting in the queue or still executing.
+ACTIVE_STATES = {
+    "CONFIGURING",
+    "COMPLETING",
+    "PENDING",
+    "REQUEUED",
+    "RESIZING",
+    "RUNNING",
+    "SUSPENDED",
+}
+
+
+class RateLimiter:
+    """Space the starts of operations at least :kbd:`min_interval` seconds apart.
+
+    :param float min_interval: Minimum interval in seconds between starts.
+    """
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = None
+        self._next_start = 0.0
+
+    async def wait(self):
+        """Wait until the next operation may start."""
+        if self._lock is None:
+            # Create the lock in the running event loop
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            delay = self._next_start - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_start = loop.time() + self.min_interval
+
+
+def submit_jobs(
+    sbatch_args,
+    max_concurrent=MAX_CONCURRENT_SUBMISSIONS,
+    min_interval=MIN_SUBMISSION_INTERVAL,
+):
+    """Submit a collection of jobs to Slurm concurrently.
+
+    :param sbatch_args: :command:`sbatch` command-line arguments for each job,
+                        e.g. :kbd:`["--job-name=AKNS-000", "glost-job.sh", "tasks.txt"]`.
+    :type sbatch_args: sequence of lists of str
+
+    :param int max_concurrent: Maximum number of :command:`sbatch` commands that run
+                               at the same time.
+
+    :param float min_interval: Minimum interval in seconds between the starts of
+                               :command:`sbatch` commands.
+
+    :returns: Slurm job ids of the submitted jobs in the order of :kbd:`sbatch_args`;
+              :py:obj:`None` for jobs that :command:`sbatch` failed to submit.
+    :rtype: list
+    """
+    return asyncio.run(_submit_jobs(sbatch_args, max_concurrent, min_interval))
+
+
+async def _submit_jobs(sbatch_args, max_concurrent, min_interval):
+    """
+    :param sbatch_args:
+    :type sbatch_args: sequence of lists of str
+
+    :param int max_concurrent:
+    :param float min_interval:
+
+    :rtype: list
+    """
+    semaphore = asyncio.Semaphore(max_concurrent)
+    limiter = RateLimiter(min_interval)
+    return await asyncio.gather(
+        *(_sbatch(args, semaphore, limiter) for args in sbatch_args)
+    )
+
+
+async def _sbatch(args, semaphore, limiter):
+    """
+    :param list args:
+    :param :py:class:`asyncio.Semaphore` semaphore:
+    :param :py:class:`RateLimiter` limiter:
+
+    :returns: Slurm job id, or :py:obj:`None` if the submission failed.
+    :rtype: str
+    """
+    async with semaphore:
+        await limiter.wait()
+        try:
+            stdout = await _run("sbatch", "--parsable", *args)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"sbatch {' '.join(args)} failed: {e.stderr.strip()}")
+            return None
+    # --parsable output is jobid[;cluster]
+    return stdout.strip().split(";")[0]
+
+
+def query_states(job_ids):
+    """Get the states of a collection of Slurm jobs.
+
+    :command:`squeue` is used for jobs that are pending or running,
+    and :command:`sacct` for jobs that have finished.
+    Both are called once per batch of :py:data:`QUERY_BATCH_SIZE` job ids,
+    and all of the calls run concurrently.
+
+    :param job_ids: Slurm job ids.
+    :type job_ids: sequence of str
+
+    :returns: Job state (e.g. :kbd:`PENDING`, :kbd:`RUNNING`, :kbd:`COMPLETED`,
+              :kbd:`TIMEOUT`) keyed by job id;
+              :kbd:`UNKNOWN` for jobs that neither command reports.
+    :rtype: dict
+    """
+    return asyncio.run(_query_states(list(job_ids)))
+
+
+async def _query_states(job_ids):
+    """
+    :param list job_ids:
+
+    :rtype: dict
+    """
+    batches = [
+        job_ids[i : i + QUERY_BATCH_SIZE]
+        for i in range(0, len(job_ids), QUERY_BATCH_SIZE)
+    ]
+    results = await asyncio.gather(
+        *(_squeue(batch) for batch in batches), *(_sacct(batch) for batch in batches)
+    )
+    squeue_states, sacct_states = {}, {}
+    for states in results[: len(batches)]:
+        squeue_states.update(states)
+    for states in results[len(batches) :]:
+        sacct_states.update(states)
+    # squeue is authoritative for active jobs; sacct records can lag behind
+    return {
+        job_id: squeue_states.get(job_id, sacct_states.get(job_id, "UNKNOWN"))
+        for job_id in job_ids
+    }
+
+
+async def _squeue(job_ids):
+    """
+    :param list job_ids:
+
+    :rtype: dict
+    """
+    try:
+        stdout = await _run(
+            "squeue",
+            "--noheader",
+            "--states=all",
+            "--format=%i|%T",
+            f"--jobs={','.join(job_ids)}",
+        )
+    except subprocess.CalledProcessError:
+        # squeue fails if any of the jobs have been purged from the controller,
+        # so rely on sacct for that batch
+        return {}
+    return _parse_states(stdout)
+
+
+async def _sacct(job_ids):
+    """
+    :param list job_ids:
+
+    :rtype: dict
+    """
+    try:
+        stdout = await _run(
+            "sacct",
+            "--noheader",
+            "--parsable2",
+            "--allocations",
+            "--format=JobID,State",
+            f"--jobs={','.join(job_ids)}",
+        )
+    except subprocess.CalledProcessError as e:
+        logger.warning(f"sacct failed: {e.stderr.strip()}")
+        return {}
+    return _parse_states(stdout)
+
+
+def _parse_states(stdout):
+    """Parse :kbd:`job_id|state` lines.
+
+    :param str stdout:
+
+    :rtype: dict
+    """
+    states = {}
+    for line in stdout.splitlines():
+        job_id, sep, state = line.strip().partition("|")
+        if sep and state:
+            # sacct reports states like "CANCELLED by 1234"
+            states[job_id] = state.split()[0]
+    return states
+
+
+async def _run(*cmd):
+    """Run a command in a subprocess and return its stdout.
+
+    :param str cmd: Command and its arguments.
+
+    :raises: :py:exc:`subprocess.CalledProcessError` if the command fails.
+
+    :rtype: str
+    """
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+    except FileNotFoundError as e:
+        raise subprocess.CalledProcessError(127, cmd, "", str(e))
+    stdout, stderr = await proc.communicate()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(
+            proc.returncode, cmd, stdout.decode(), stderr.decode()
+        )
+    return stdout.decode()
+
+
+def record_jobs(job_dir, jobs):
+    """Append records of submitted Slurm jobs to the job directory's
+    :py:data:`JOBS_FILE` so that :command:`mohid status` can follow them.
+
+    :param job_dir: Job directory.
+    :type job_dir: :py:class:`pathlib.Path`
+
+    :param jobs: Job records with :kbd:`name`, :kbd:`slurm_job_id`, :kbd:`tasks`,
+                 and :kbd:`n_runs` items.
+    :type jobs: sequence of dict
+    """
+    submitted = time.time()
+    with (job_dir / JOBS_FILE).open("at") as f:
+        for job in jobs:
+            f.write(f"{json.dumps(dict(job, submitted=submitted))}\n")
+
+
+def read_jobs(job_dir):
+    """Read the records of the Slurm jobs submitted for a job directory.
+
+    :param job_dir: Job directory.
+    :type job_dir: :py:class:`pathlib.Path`
+
+    :returns: Job records, in submission order.
+    :rtype: list of dict
+    """
+    jobs_file = job_dir / JOBS_FILE
+    if not jobs_file.exists():
+        return []
+    with jobs_file.open("rt") as f:
+        return [json.loads(line) for line in f if line.strip()]
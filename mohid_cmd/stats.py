@@ -0,0 +1,374 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd command plug-in for stats sub-command.
+
+Calculate ensemble statistics of variables in the Lagrangian results files of
+the runs of a Monte Carlo job,
+and store them in a netCDF file.
+"""
+import concurrent.futures
+import logging
+import os
+import time
+from pathlib import Path
+
+import arrow
+import cliff.command
+import netCDF4
+import numpy
+
+import mohid_cmd.ensemble
+import mohid_cmd.profile
+
+logger = logging.getLogger(__name__)
+
+#: Name of the ensemble statistics file in a job directory.
+STATS_FILE = "ensemble-stats.nc"
+
+
+class Stats(cliff.command.Command):
+    """Calculate ensemble statistics of the runs of a Monte Carlo job."""
+
+    def get_parser(self, prog_name):
+        parser = super().get_parser(prog_name)
+        parser.description = f"""
+            Calculate the ensemble mean, variance, maximum, threshold exceedance
+            probabilities, and histograms of variables in the Lagrangian results files
+            of the runs in the results/ directory of the Monte Carlo job in JOB_DIR.
+            Each run's variables are reduced over time before the statistics are
+            calculated.
+            The runs are divided into shards that are reduced by a pool of processes.
+            The statistics are stored in JOB_DIR/{STATS_FILE} unless --output is used.
+        """
+        parser.add_argument(
+            "job_dir",
+            metavar="JOB_DIR",
+            type=Path,
+            help="Monte Carlo job directory",
+        )
+        parser.add_argument(
+            "--var",
+            dest="var_names",
+            action="append",
+            required=True,
+            metavar="NAME",
+            help="""
+            Name of a Lagrangian results variable to calculate statistics of.
+            Use more than once to calculate statistics of several variables.
+            """,
+        )
+        parser.add_argument(
+            "--time-reduction",
+            dest="how",
+            choices=mohid_cmd.ensemble.TIME_REDUCTIONS,
+            default="max",
+            help="How to reduce each run's variables over time; defaults to max.",
+        )
+        parser.add_argument(
+            "--threshold",
+            dest="thresholds",
+            type=float,
+            action="append",
+            default=[],
+            metavar="VALUE",
+            help="""
+            Calculate the probability that variables exceed VALUE.
+            Use more than once for several thresholds.
+            """,
+        )
+        parser.add_argument(
+            "--bins",
+            dest="bin_edges",
+            type=float,
+            nargs="+",
+            default=[],
+            metavar="EDGE",
+            help="Count the runs in the histogram bins between the EDGE values.",
+        )
+        parser.add_argument(
+            "--cpus",
+            type=int,
+            default=None,
+            help="""
+            Maximum number of processes to reduce runs in concurrently;
+            defaults to the number of CPUs on this machine.
+            """,
+        )
+        parser.add_argument(
+            "--output",
+            type=Path,
+            default=None,
+            metavar="FILE",
+            help=f"netCDF file to store the statistics in; defaults to JOB_DIR/{STATS_FILE}",
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute the `mohid stats` sub-command.
+
+        :param parsed_args: Arguments and options parsed from the command-line.
+        :type parsed_args: :class:`argparse.Namespace` instance
+        """
+        output = parsed_args.output or parsed_args.job_dir / STATS_FILE
+        t_start = time.perf_counter()
+        n_runs = stats(
+            parsed_args.job_dir,
+            parsed_args.var_names,
+            output,
+            how=parsed_args.how,
+            thresholds=parsed_args.thresholds,
+            bin_edges=parsed_args.bin_edges,
+            cpus=parsed_args.cpus,
+        )
+        logger.info(
+            f"statistics of {n_runs} runs stored in {output} in "
+            f"{time.perf_counter() - t_start:.1f}s"
+        )
+
+
+def stats(
+    job_dir, var_names, output, how="max", thresholds=(), bin_edges=(), cpus=None
+):
+    """Calculate ensemble statistics of variables in the Lagrangian results files of
+    the runs of a Monte Carlo job,
+    and store them in a netCDF file.
+
+    :param :py:class:`pathlib.Path` job_dir:
+    :param var_names: Names of Lagrangian results variables.
+    :type var_names: sequence of str
+
+    :param :py:class:`pathlib.Path` output: netCDF file to store the statistics in.
+    :param str how: Time reduction; one of :py:data:`mohid_cmd.ensemble.TIME_REDUCTIONS`.
+
+    :param thresholds: Values for which exceedance probabilities are calculated.
+    :type thresholds: sequence of float
+
+    :param bin_edges: Histogram bin edges.
+    :type bin_edges: sequence of float
+
+    :param int cpus: Maximum number of processes to reduce runs in concurrently.
+
+    :returns: Number of runs in the statistics.
+    :rtype: int
+    """
+    job_dir = Path(job_dir)
+    results_dirs = sorted(mohid_cmd.profile.iter_results_dirs(job_dir / "results"))
+    lagrangian_files = mohid_cmd.ensemble.find_lagrangian_files(results_dirs)
+    if not lagrangian_files:
+        logger.error(f"no Lagrangian results files found in {job_dir / 'results'}")
+        raise SystemExit(2)
+    with netCDF4.Dataset(lagrangian_files[0]) as dataset:
+        missing = [name for name in var_names if name not in dataset.variables]
+    if missing:
+        logger.error(
+            f"variable(s) not found in {lagrangian_files[0]}: {', '.join(missing)}"
+        )
+        raise SystemExit(2)
+    ensemble = reduce_files(
+        lagrangian_files, var_names, how, thresholds, bin_edges, cpus
+    )
+    write_stats(output, ensemble, lagrangian_files[0], job_dir, how)
+    return ensemble[var_names[0]].n_runs
+
+
+def reduce_files(
+    lagrangian_files, var_names, how="max", thresholds=(), bin_edges=(), cpus=None
+):
+    """Calculate ensemble statistics of variables in a collection of Lagrangian results
+    files in parallel.
+
+    The files are divided into a shard for each worker process.
+    Each worker reduces its shard to partial statistics,
+    opening each file once for all of the variables,
+    and the partial statistics are merged as they are returned.
+    Only the partial statistics are passed between processes,
+    so the processes work independently and throughput scales with the number of
+    processes until the file system's bandwidth is saturated.
+
+    :param lagrangian_files: Lagrangian results files of the runs.
+    :type lagrangian_files: sequence of :py:class:`pathlib.Path`
+
+    :param var_names: Names of Lagrangian results variables.
+    :type var_names: sequence of str
+
+    :param str how: Time reduction.
+    :param thresholds: Values for which exceedances are counted.
+    :param bin_edges: Histogram bin edges.
+    :param int cpus: Maximum number of processes to reduce files in concurrently;
+                     defaults to the number of CPUs on this machine.
+
+    :returns: Ensemble statistics of each variable.
+    :rtype: dict of :py:class:`mohid_cmd.ensemble.EnsembleStats`
+    """
+    workers = min(cpus or os.cpu_count() or 1, len(lagrangian_files))
+    shards = [lagrangian_files[i::workers] for i in range(workers)]
+    args = (var_names, how, thresholds, bin_edges)
+    if workers <= 1:
+        return reduce_shard(lagrangian_files, *args)
+    ensemble = {
+        var_name: mohid_cmd.ensemble.EnsembleStats(thresholds, bin_edges)
+        for var_name in var_names
+    }
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(reduce_shard, shard, *args) for shard in shards]
+        for future in concurrent.futures.as_completed(futures):
+            for var_name, partial in future.result().items():
+                ensemble[var_name].merge(partial)
+    return ensemble
+
+
+def reduce_shard(lagrangian_files, var_names, how, thresholds, bin_edges):
+    """Reduce a shard of Lagrangian results files to partial ensemble statistics.
+
+    :param lagrangian_files: Lagrangian results files of the runs in the shard.
+    :type lagrangian_files: sequence of :py:class:`pathlib.Path`
+
+    :param var_names: Names of Lagrangian results variables.
+    :type var_names: sequence of str
+
+    :param str how: Time reduction.
+    :param thresholds: Values for which exceedances are counted.
+    :param bin_edges: Histogram bin edges.
+
+    :returns: Partial ensemble statistics of each variable.
+    :rtype: dict of :py:class:`mohid_cmd.ensemble.EnsembleStats`
+    """
+    partials = {
+        var_name: mohid_cmd.ensemble.EnsembleStats(thresholds, bin_edges)
+        for var_name in var_names
+    }
+    for lagrangian_file in lagrangian_files:
+        with mohid_cmd.ensemble.LagrangianFile(lagrangian_file) as lagrangian:
+            for var_name in var_names:
+                partials[var_name].add(lagrangian.reduce_time(var_name, how))
+    return partials
+
+
+def write_stats(output, ensemble, template_file, job_dir, how):
+    """Store ensemble statistics in a netCDF file.
+
+    The grid dimensions of the variables,
+    and the variables that have no time dimension and are defined on those dimensions,
+    like coordinates,
+    are copied from one of the Lagrangian results files.
+    For each variable :kbd:`VAR`,
+    :kbd:`VAR_mean`,
+    :kbd:`VAR_variance`,
+    :kbd:`VAR_max`,
+    and :kbd:`VAR_count` variables are stored,
+    along with :kbd:`VAR_exceedance_probability` on a :kbd:`threshold` dimension,
+    and :kbd:`VAR_histogram` on a :kbd:`bin` dimension,
+    if thresholds and bin edges were used.
+    The file is written to a temporary file that is renamed into place.
+
+    :param :py:class:`pathlib.Path` output:
+    :param dict ensemble: Ensemble statistics of each variable.
+    :param :py:class:`pathlib.Path` template_file: Lagrangian results file to copy
+                                                   grid dimensions and variables from.
+    :param :py:class:`pathlib.Path` job_dir:
+    :param str how: Time reduction.
+    """
+    tmp_output = output.with_name(f".{output.name}.tmp")
+    with netCDF4.Dataset(template_file) as template, netCDF4.Dataset(
+        tmp_output, "w"
+    ) as dataset:
+        grid_dims = _copy_grid(template, dataset, ensemble)
+        first = next(iter(ensemble.values()))
+        if first.thresholds:
+            dataset.createDimension("threshold", len(first.thresholds))
+            threshold = dataset.createVariable("threshold", "f8", ("threshold",))
+            threshold[:] = first.thresholds
+        if first.bin_edges:
+            dataset.createDimension("bin", len(first.bin_edges) - 1)
+            for name, edges in (
+                ("bin_lower", first.bin_edges[:-1]),
+                ("bin_upper", first.bin_edges[1:]),
+            ):
+                var = dataset.createVariable(name, "f8", ("bin",))
+                var[:] = edges
+        for var_name, var_stats in ensemble.items():
+            dims = grid_dims[var_name]
+            units = getattr(template.variables[var_name], "units", None)
+            fields = {
+                "mean": (var_stats.mean, dims, units),
+                "variance": (var_stats.variance, dims, None),
+                "max": (var_stats.max, dims, units),
+                "count": (var_stats.n_valid, dims, "1"),
+            }
+            if var_stats.thresholds:
+                fields["exceedance_probability"] = (
+                    numpy.stack(
+                        [
+                            var_stats.exceedance_probability(threshold)
+                            for threshold in var_stats.thresholds
+                        ]
+                    ),
+                    ("threshold",) + dims,
+                    "1",
+                )
+            if var_stats.bin_edges:
+                fields["histogram"] = (var_stats.histogram, ("bin",) + dims, "1")
+            for stat, (values, stat_dims, stat_units) in fields.items():
+                dtype = "i8" if values.dtype.kind == "i" else "f8"
+                var = dataset.createVariable(
+                    f"{var_name}_{stat}", dtype, stat_dims, zlib=True
+                )
+                var[:] = values
+                if stat_units is not None:
+                    var.units = stat_units
+        dataset.title = f"Ensemble statistics of {job_dir.name} Monte Carlo runs"
+        dataset.n_runs = first.n_runs
+        dataset.time_reduction = how
+        dataset.history = (
+            f"[{arrow.now().format('ddd YYYY-MM-DD HH:mm:ss ZZ')}] "
+            f"created by mohid stats {job_dir}"
+        )
+    tmp_output.rename(output)
+
+
+def _copy_grid(template, dataset, ensemble):
+    """Copy the grid dimensions of variables, and the variables defined on them,
+    from a Lagrangian results file to a statistics file.
+
+    :param :py:class:`netCDF4.Dataset` template:
+    :param :py:class:`netCDF4.Dataset` dataset:
+    :param dict ensemble:
+
+    :returns: Grid dimension names of each variable.
+    :rtype: dict
+    """
+    grid_dims = {}
+    for var_name in ensemble:
+        dims = template.variables[var_name].dimensions
+        grid_dims[var_name] = (
+            dims[1:] if dims[:1] == (mohid_cmd.ensemble.TIME_DIM,) else dims
+        )
+    all_grid_dims = {dim for dims in grid_dims.values() for dim in dims}
+    for dim in sorted(all_grid_dims):
+        dataset.createDimension(dim, len(template.dimensions[dim]))
+    for name, var in template.variables.items():
+        if name in ensemble or not var.dimensions:
+            continue
+        if set(var.dimensions) <= all_grid_dims:
+            attrs = var.__dict__
+            copy = dataset.createVariable(
+                name,
+                var.dtype,
+                var.dimensions,
+                fill_value=attrs.pop("_FillValue", None),
+            )
+            copy.setncatts(attrs)
+            copy[:] = var[:]
+    return grid_dims
@@ -0,0 +1,155 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd command plug-in for status sub-command.
+
+Show the states of the Slurm jobs submitted for a Monte Carlo job directory,
+and the progress of its MIDOSS-MOHID runs.
+"""
+import collections
+import logging
+import time
+from pathlib import Path
+
+import cliff.command
+
+import mohid_cmd.profile
+import mohid_cmd.slurm
+
+logger = logging.getLogger(__name__)
+
+
+class Status(cliff.command.Command):
+    """Show the status of the Slurm jobs and runs of a Monte Carlo job."""
+
+    def get_parser(self, prog_name):
+        parser = super().get_parser(prog_name)
+        parser.description = """
+            Show the states of the Slurm jobs that were submitted for the Monte Carlo job
+            in JOB_DIR,
+            and the numbers of its MIDOSS-MOHID runs that have finished and failed.
+            The job states are obtained from batched squeue and sacct queries.
+        """
+        parser.add_argument(
+            "job_dir",
+            metavar="JOB_DIR",
+            type=Path,
+            help="Monte Carlo job directory",
+        )
+        parser.add_argument(
+            "--watch",
+            type=float,
+            default=None,
+            metavar="SECONDS",
+            help="""
+            Refresh the status every SECONDS until none of the jobs are pending or running.
+            """,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute the `mohid status` sub-command.
+
+        The status report is written to stdout.
+
+        :param parsed_args: Arguments and options parsed from the command-line.
+        :type parsed_args: :class:`argparse.Namespace` instance
+        """
+        while True:
+            ensemble = get_status(parsed_args.job_dir)
+            self.app.stdout.write(format_status(ensemble))
+            if parsed_args.watch is None or not ensemble["n_active"]:
+                return
+            time.sleep(parsed_args.watch)
+            self.app.stdout.write("\n")
+
+
+def get_status(job_dir):
+    """Get the states of the Slurm jobs submitted for a Monte Carlo job directory,
+    and the progress of its runs.
+
+    :param job_dir: Monte Carlo job directory.
+    :type job_dir: :py:class:`pathlib.Path`
+
+    :returns: Status with :kbd:`job_dir`,
+              :kbd:`jobs` (records from :py:func:`mohid_cmd.slurm.read_jobs` with
+              :kbd:`state` items added),
+              :kbd:`n_active` (number of jobs that are pending or running),
+              :kbd:`n_runs`, :kbd:`n_finished`, and :kbd:`n_failed` items.
+    :rtype: dict
+    """
+    job_dir = Path(job_dir)
+    jobs = mohid_cmd.slurm.read_jobs(job_dir)
+    if not jobs:
+        logger.warning(f"no Slurm jobs recorded in {job_dir}")
+    states = mohid_cmd.slurm.query_states([job["slurm_job_id"] for job in jobs])
+    for job in jobs:
+        job["state"] = states[job["slurm_job_id"]]
+    n_finished, n_failed = _count_runs(job_dir)
+    return {
+        "job_dir": job_dir,
+        "jobs": jobs,
+        "n_active": sum(job["state"] in mohid_cmd.slurm.ACTIVE_STATES for job in jobs),
+        "n_runs": sum(job["n_runs"] for job in jobs),
+        "n_finished": n_finished,
+        "n_failed": n_failed,
+    }
+
+
+def format_status(ensemble):
+    """
+    :param dict ensemble: Status from :py:func:`get_status`.
+
+    :rtype: str
+    """
+    jobs = ensemble["jobs"]
+    lines = [f"Status of {ensemble['job_dir']}", ""]
+    if jobs:
+        name_width = max(len(job["name"]) for job in jobs)
+        for job in jobs:
+            lines.append(
+                f"  {job['name']:<{name_width}}  {job['slurm_job_id']:>10}  "
+                f"{job['state']:<12}{job['n_runs']:>6} runs"
+            )
+        lines.append("")
+    state_counts = collections.Counter(job["state"] for job in jobs)
+    lines.append(
+        f"Slurm jobs: {len(jobs)}"
+        + "".join(f", {count} {state}" for state, count in sorted(state_counts.items()))
+    )
+    lines.append(
+        f"Runs: {ensemble['n_finished']} of {ensemble['n_runs']} finished; "
+        f"{ensemble['n_failed']} failed"
+    )
+    return "\n".join(lines) + "\n"
+
+
+def _count_runs(job_dir):
+    """Count the runs that have finished and failed from the task timing records
+    in their results directories.
+
+    :param :py:class:`pathlib.Path` job_dir:
+
+    :returns: Numbers of finished and failed runs.
+    :rtype: 2-tuple
+    """
+    n_finished = n_failed = 0
+    for results_dir in mohid_cmd.profile.iter_results_dirs(job_dir / "results"):
+        exit_code = mohid_cmd.profile.task_exit_code(results_dir)
+        if exit_code is None:
+            continue
+        n_finished += 1
+        if exit_code:
+            n_failed += 1
+    return n_finished, n_failed
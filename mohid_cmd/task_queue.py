@@ -0,0 +1,242 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""File-based queue of Monte Carlo job tasks.
+
+The queue is a directory tree on a file system that is shared by the nodes of a job::
+
+  queue/
+  ├── pending/
+  ├── running/
+  ├── done/
+  └── failed/
+
+Each task is a small JSON file whose name is the task's zero-padded sequence number.
+Workers claim a task by renaming its file from :file:`pending/` to :file:`running/`.
+Because :py:func:`os.rename` is atomic within a file system,
+exactly one worker succeeds when several try to claim the same task,
+so no queue manager process or network service is needed.
+
+Listing :file:`pending/` is expensive on a parallel file system when it holds
+many tasks,
+so each worker keeps the listing that it made and only lists the directory again
+when it has tried every name in it.
+Workers start claiming at different points in their listings,
+spread according to their ranks,
+so that they don't all race to rename the same files.
+
+Tasks are never moved out of :file:`running/` except by the worker that claimed them,
+so the task of a worker that is killed,
+or whose node fails,
+stays there.
+Its run does not have a successful :kbd:`task` timing record,
+so it is re-run by :command:`mohid monte-carlo --retry-failed`,
+along with the job's other failed and unfinished runs.
+"""
+import collections
+import json
+import logging
+import os
+import socket
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+#: Sub-directories of a queue for the states that tasks pass through.
+STATES = ("pending", "running", "done", "failed")
+#: Name of the file in which the commands of tasks left unfinished are recorded
+#: when workers stop.
+UNFINISHED_FILE = "unfinished-tasks.txt"
+
+
+class Task:
+    """A task claimed from a :py:class:`TaskQueue`.
+
+    :param str name: Sequence number of the task in its queue.
+    :param str command: bash command line of the task.
+    :param path: Path of the task's file in the queue's :file:`running/` directory.
+    :type path: :py:class:`pathlib.Path`
+    """
+
+    def __init__(self, name, command, path):
+        self.name = name
+        self.command = command
+        self.path = path
+
+
+class TaskQueue:
+    """File-based queue of tasks shared by workers on several nodes.
+
+    :param queue_dir: Queue directory.
+    :type queue_dir: :py:class:`pathlib.Path`
+
+    :param int rank: Rank of the worker that uses this instance among the workers
+                     of the job;
+                     it sets where in the pending tasks the worker starts claiming.
+
+    :param int n_ranks: Number of workers in the job.
+    """
+
+    def __init__(self, queue_dir, rank=0, n_ranks=1):
+        self.queue_dir = Path(queue_dir)
+        self.rank = rank
+        self.n_ranks = max(n_ranks, 1)
+        # Names from the last listing of pending/ that this worker hasn't tried yet
+        self._pending = collections.deque()
+
+    @classmethod
+    def create(cls, queue_dir, commands):
+        """Create a queue directory tree with a pending task for each command.
+
+        :param queue_dir: Queue directory.
+        :type queue_dir: :py:class:`pathlib.Path`
+
+        :param commands: bash command lines of the tasks.
+        :type commands: sequence of str
+
+        :rtype: :py:class:`TaskQueue`
+        """
+        queue = cls(queue_dir)
+        for state in STATES:
+            (queue.queue_dir / state).mkdir(parents=True, exist_ok=True)
+        width = max(len(str(len(commands))), 6)
+        for i, command in enumerate(commands):
+            queue._write(
+                queue.queue_dir / "pending" / f"{i:0{width}d}", {"task": command}
+            )
+        return queue
+
+    def claim(self, worker_id):
+        """Claim the next pending task.
+
+        :file:`pending/` is only listed when the names from the previous listing
+        have all been tried.
+
+        :param str worker_id: Identifier of the claiming worker;
+                              it is appended to the task's file name in :file:`running/`.
+
+        :returns: Claimed task, or :py:obj:`None` if there are no pending tasks.
+        :rtype: :py:class:`Task`
+        """
+        pending_dir = self.queue_dir / "pending"
+        while True:
+            if not self._pending:
+                names = self._names("pending")
+                if not names:
+                    return None
+                start = len(names) * (self.rank % self.n_ranks) // self.n_ranks
+                self._pending.extend(names[start:] + names[:start])
+            name = self._pending.popleft()
+            running = self.queue_dir / "running" / f"{name}@{worker_id}"
+            try:
+                os.rename(pending_dir / name, running)
+            except FileNotFoundError:
+                # Another worker claimed it first
+                continue
+            return Task(name, self._read(running)["task"], running)
+
+    def complete(self, task, exit_code, duration, worker_id):
+        """Record the outcome of a task,
+        moving it to :file:`done/` if it succeeded or :file:`failed/` if it didn't.
+
+        :param task: Task claimed from the queue.
+        :type task: :py:class:`Task`
+
+        :param int exit_code: Exit code of the task's command.
+        :param float duration: Duration of the task in seconds.
+        :param str worker_id: Identifier of the worker that executed the task.
+        """
+        state = "failed" if exit_code else "done"
+        record = {
+            "task": task.command,
+            "exit_code": exit_code,
+            "duration": duration,
+            "worker": worker_id,
+        }
+        self._write(self.queue_dir / state / task.name, record)
+        task.path.unlink()
+
+    def counts(self):
+        """
+        :returns: Numbers of tasks in each state.
+        :rtype: dict
+        """
+        return {state: len(self._names(state)) for state in STATES}
+
+    def unfinished_commands(self):
+        """
+        :returns: Commands of the tasks that are pending or running.
+        :rtype: list of str
+        """
+        commands = []
+        for state in ("pending", "running"):
+            state_dir = self.queue_dir / state
+            for name in self._names(state):
+                try:
+                    commands.append(self._read(state_dir / name)["task"])
+                except FileNotFoundError:
+                    # Claimed or finished since the directory was listed
+                    continue
+        return commands
+
+    def record_unfinished(self):
+        """Write the commands of the tasks that are pending or running to the queue's
+        :py:data:`UNFINISHED_FILE`,
+        replacing it atomically so that workers that stop at the same time don't
+        interleave their writes.
+
+        :returns: Number of unfinished tasks.
+        :rtype: int
+        """
+        commands = self.unfinished_commands()
+        tmp_file = (
+            self.queue_dir / f".{UNFINISHED_FILE}.{socket.gethostname()}.{os.getpid()}"
+        )
+        tmp_file.write_text("".join(f"{command}\n" for command in commands))
+        os.replace(tmp_file, self.queue_dir / UNFINISHED_FILE)
+        return len(commands)
+
+    def _names(self, state):
+        """
+        :param str state:
+
+        :returns: Sorted names of the task files in a state directory,
+                  excluding partially written temporary files.
+        :rtype: list
+        """
+        return sorted(
+            name
+            for name in os.listdir(self.queue_dir / state)
+            if not name.startswith(".")
+        )
+
+    @staticmethod
+    def _read(path):
+        """
+        :param :py:class:`pathlib.Path` path:
+
+        :rtype: dict
+        """
+        return json.loads(path.read_text())
+
+    @staticmethod
+    def _write(path, record):
+        """Write a task record so that it appears complete or not at all.
+
+        :param :py:class:`pathlib.Path` path:
+        :param dict record:
+        """
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}")
+        tmp_path.write_text(json.dumps(record))
+        os.replace(tmp_path, path)
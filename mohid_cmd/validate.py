@@ -0,0 +1,404 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd command plug-in for validate sub-command.
+
+Check MIDOSS-MOHID run description and Monte Carlo glost job description YAML files
+against their schemas.
+The schemas are compiled into check functions once,
+when the module is imported,
+and :command:`mohid prepare`,
+:command:`mohid run`,
+and :command:`mohid monte-carlo` use them to report all of the problems in
+a description file in one pass before they create any files or directories.
+"""
+import concurrent.futures
+import logging
+import math
+import os
+import re
+from pathlib import Path
+
+import cliff.command
+import yaml
+
+logger = logging.getLogger(__name__)
+
+#: Walltime string format; hours may exceed 23.
+WALLTIME_RE = re.compile(r"(\d+):([0-5]\d):([0-5]\d)")
+#: Slurm memory size format; e.g. :kbd:`14100M`.
+MEMORY_RE = re.compile(r"\d+[KMGT]?")
+
+# Schema values are the names of the value checks below,
+# nested mappings,
+# or a 1 item list that gives the check for the items of a list value.
+# Keys that end with "?" are optional.
+# A "*" key gives the check for keys that are not listed;
+# other keys that are not listed are errors.
+
+#: Lagrangian results netCDF4 conversion section schema;
+#: the same section is used in run descriptions and Monte Carlo job descriptions.
+NETCDF4_SCHEMA = {
+    "output variables?": ["string"],
+    "output time stride?": "count",
+    "chunk sizes?": {"*": "count"},
+    "compression level?": "complevel",
+    "workers?": "count",
+}
+#: Results gathering section schema;
+#: the same section is used in run descriptions and Monte Carlo job descriptions.
+GATHER_SCHEMA = {"dedup?": "boolean"}
+#: MIDOSS-MOHID run description schema.
+RUN_SCHEMA = {
+    "run_id": "string",
+    "email?": "string",
+    "account?": "string",
+    "walltime": "walltime",
+    "cpus per task?": "count",
+    "openmp?": {"*": "scalar"},
+    "paths": {"mohid repo": "path", "runs directory": "path", "*": "any"},
+    "forcing": {"*": "path"},
+    "bathymetry": "path",
+    "run data files": {"PARTIC_DATA": "path", "*": "path"},
+    "netcdf4?": NETCDF4_SCHEMA,
+    "gather?": GATHER_SCHEMA,
+    "vcs revisions?": {"*": ["path"]},
+    "*": "any",
+}
+#: Monte Carlo glost job description schema.
+JOB_SCHEMA = {
+    "job id": "string",
+    "account": "string",
+    "email": "string",
+    "nodes": "count",
+    "mem per cpu": "memory",
+    "run walltime": "walltime",
+    "paths": {
+        "forcing directory": "path",
+        "runs directory": "path",
+        "mohid config": "path",
+        "*": "any",
+    },
+    "make-hdf5 command": "path",
+    "mohid command": "path",
+    "netcdf4?": NETCDF4_SCHEMA,
+    "gather?": GATHER_SCHEMA,
+    "vcs revisions?": {"*": ["path"]},
+    "*": "any",
+}
+
+
+class Validate(cliff.command.Command):
+    """Check run description and glost job description YAML files."""
+
+    def get_parser(self, prog_name):
+        parser = super().get_parser(prog_name)
+        parser.description = """
+            Check MIDOSS-MOHID run description and Monte Carlo glost job description
+            YAML files for missing keys and values of the wrong kind.
+            All of the problems in all of the files are reported.
+            Directories are searched for *.yaml files,
+            so the run description files generated for a Monte Carlo job can be
+            checked with JOB_DIR/mohid-yaml/.
+        """
+        parser.add_argument(
+            "paths",
+            metavar="PATH",
+            type=Path,
+            nargs="+",
+            help="Description YAML file, or directory of description YAML files",
+        )
+        parser.add_argument(
+            "--cpus",
+            type=int,
+            default=None,
+            help="""
+            Maximum number of processes to check files in concurrently;
+            defaults to the number of CPUs on this machine.
+            """,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute the `mohid validate` sub-command.
+
+        The problems found are logged as errors.
+
+        :param parsed_args: Arguments and options parsed from the command-line.
+        :type parsed_args: :class:`argparse.Namespace` instance
+        """
+        desc_files = find_desc_files(parsed_args.paths)
+        results = validate_files(desc_files, parsed_args.cpus)
+        n_invalid = 0
+        for desc_file, errors in results:
+            if errors:
+                n_invalid += 1
+                for error in errors:
+                    logger.error(f"{desc_file}: {error}")
+        if n_invalid:
+            logger.error(
+                f"{n_invalid} of {len(results)} description file(s) are invalid"
+            )
+            raise SystemExit(2)
+        logger.info(f"{len(results)} description file(s) are valid")
+
+
+def find_desc_files(paths):
+    """
+    :param paths: Description YAML files, and directories of them.
+    :type paths: sequence of :py:class:`pathlib.Path`
+
+    :raises: :py:exc:`SystemExit` with exit code 2 if a path does not exist.
+
+    :returns: Description YAML files, with the files in directories in name order.
+    :rtype: list of :py:class:`pathlib.Path`
+    """
+    desc_files = []
+    for path in paths:
+        if path.is_dir():
+            desc_files.extend(sorted(path.glob("*.yaml")))
+        elif path.exists():
+            desc_files.append(path)
+        else:
+            logger.error(f"{path} not found")
+            raise SystemExit(2)
+    return desc_files
+
+
+def validate_files(desc_files, cpus=None):
+    """Check a collection of description YAML files in parallel.
+
+    Files that contain a :kbd:`job id` key are checked against :py:data:`JOB_SCHEMA`,
+    and other files against :py:data:`RUN_SCHEMA`.
+    The files are handed to the worker processes in chunks so that checking
+    thousands of small files is not dominated by inter-process communication.
+
+    :param desc_files: Description YAML files.
+    :type desc_files: sequence of :py:class:`pathlib.Path`
+
+    :param int cpus: Maximum number of processes to check files in concurrently;
+                     defaults to the number of CPUs on this machine.
+
+    :returns: File paths and the problems found in them.
+    :rtype: list of 2-tuples
+    """
+    workers = min(cpus or os.cpu_count() or 1, len(desc_files))
+    if workers <= 1:
+        return [validate_file(desc_file) for desc_file in desc_files]
+    chunksize = math.ceil(len(desc_files) / (workers * 4))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(validate_file, desc_files, chunksize=chunksize))
+
+
+def validate_file(desc_file):
+    """
+    :param :py:class:`pathlib.Path` desc_file: Description YAML file.
+
+    :returns: File path and the problems found in it.
+    :rtype: 2-tuple
+    """
+    try:
+        with desc_file.open("rt") as f:
+            desc = yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+    except (OSError, yaml.YAMLError) as exc:
+        return desc_file, [f"cannot be loaded: {exc}"]
+    if isinstance(desc, dict) and "job id" in desc:
+        return desc_file, validate_job_desc(desc)
+    return desc_file, validate_run_desc(desc)
+
+
+def check_run_desc(run_desc, desc_file):
+    """Check a run description against :py:data:`RUN_SCHEMA`.
+
+    :param dict run_desc: Run description.
+    :param :py:class:`pathlib.Path` desc_file: File the run description was loaded from.
+
+    :raises: :py:exc:`SystemExit` with exit code 2 if there are problems;
+             they are all logged first.
+    """
+    _fail_on_errors(validate_run_desc(run_desc), desc_file)
+
+
+def check_job_desc(job_desc, desc_file):
+    """Check a glost job description against :py:data:`JOB_SCHEMA`.
+
+    :param dict job_desc: Glost job description.
+    :param :py:class:`pathlib.Path` desc_file: File the job description was loaded from.
+
+    :raises: :py:exc:`SystemExit` with exit code 2 if there are problems;
+             they are all logged first.
+    """
+    _fail_on_errors(validate_job_desc(job_desc), desc_file)
+
+
+def _fail_on_errors(errors, desc_file):
+    if not errors:
+        return
+    for error in errors:
+        logger.error(error)
+    logger.error(
+        f"{len(errors)} problem(s) found in {desc_file} - "
+        f"please check your run description YAML file"
+    )
+    raise SystemExit(2)
+
+
+def walltime_seconds(walltime):
+    """Convert a run description walltime value to seconds.
+
+    YAML loads an unquoted :kbd:`H:MM:SS` value as an integer number of seconds,
+    and a quoted one as a string.
+
+    :param walltime: Walltime in seconds, or as a :kbd:`H:MM:SS` string.
+    :type walltime: int or str
+
+    :raises: :py:exc:`ValueError` if the value is not a positive walltime.
+
+    :rtype: int
+    """
+    if isinstance(walltime, int) and not isinstance(walltime, bool):
+        seconds = walltime
+    else:
+        match = WALLTIME_RE.fullmatch(walltime) if isinstance(walltime, str) else None
+        if match is None:
+            raise ValueError(walltime)
+        hours, minutes, seconds = (int(group) for group in match.groups())
+        seconds += hours * 60 * 60 + minutes * 60
+    if seconds <= 0:
+        raise ValueError(walltime)
+    return seconds
+
+
+def _is_walltime(value):
+    try:
+        walltime_seconds(value)
+    except ValueError:
+        return False
+    return True
+
+
+#: Value checks that schemas refer to by name, and their descriptions for messages.
+VALUE_CHECKS = {
+    "any": (lambda value: True, "anything"),
+    "string": (lambda value: isinstance(value, str), "a string"),
+    "path": (lambda value: isinstance(value, str) and value != "", "a path"),
+    "scalar": (lambda value: not isinstance(value, (dict, list)), "a single value"),
+    "boolean": (lambda value: isinstance(value, bool), "true or false"),
+    "count": (
+        lambda value: isinstance(value, int)
+        and not isinstance(value, bool)
+        and value > 0,
+        "a positive integer",
+    ),
+    "walltime": (_is_walltime, "a walltime in seconds or H:MM:SS"),
+    "complevel": (
+        lambda value: isinstance(value, int)
+        and not isinstance(value, bool)
+        and 0 <= value <= 9,
+        "a zlib compression level from 0 to 9",
+    ),
+    "memory": (
+        lambda value: (isinstance(value, int) and not isinstance(value, bool))
+        or (isinstance(value, str) and MEMORY_RE.fullmatch(value) is not None),
+        "a Slurm memory size like 14100M",
+    ),
+}
+
+
+def compile_schema(schema):
+    """Compile a schema into a function that checks a description against it.
+
+    The schema is walked once here,
+    so checking a description only calls the nested check closures.
+
+    :param dict schema: Schema like :py:data:`RUN_SCHEMA`.
+
+    :returns: Function that takes a description and returns a list of the
+              problems found in it.
+    :rtype: callable
+    """
+    check = _compile(schema)
+
+    def validate(desc):
+        errors = []
+        check(desc, (), errors)
+        return errors
+
+    return validate
+
+
+def _compile(spec):
+    """
+    :returns: Function that checks a value at a key path against :kbd:`spec`,
+              and appends the problems found to a list of errors.
+    :rtype: callable
+    """
+    if isinstance(spec, str):
+        is_valid, description = VALUE_CHECKS[spec]
+
+        def check_value(value, keys, errors):
+            if not is_valid(value):
+                errors.append(f"{_label(keys)} value {value!r} is not {description}")
+
+        return check_value
+    if isinstance(spec, list):
+        (item_spec,) = spec
+        check_item = _compile(item_spec)
+
+        def check_list(value, keys, errors):
+            if not isinstance(value, list):
+                errors.append(f"{_label(keys)} value {value!r} is not a list")
+                return
+            for i, item in enumerate(value):
+                check_item(item, keys + (str(i),), errors)
+
+        return check_list
+    fields = {
+        key.rstrip("?"): _compile(field_spec)
+        for key, field_spec in spec.items()
+        if key != "*"
+    }
+    required = [key for key in spec if key != "*" and not key.endswith("?")]
+    check_other = _compile(spec["*"]) if "*" in spec else None
+    expected = ", ".join(fields)
+
+    def check_mapping(value, keys, errors):
+        if not isinstance(value, dict):
+            what = f"{_label(keys)} value {value!r}" if keys else "description"
+            errors.append(f"{what} is not a mapping")
+            return
+        for key in required:
+            if key not in value:
+                errors.append(f"{_label(keys + (key,))} key not found")
+        for key, item in value.items():
+            check = fields.get(key, check_other)
+            if check is None:
+                errors.append(
+                    f"{_label(keys + (str(key),))} key is not recognized; "
+                    f"expected one of: {expected}"
+                )
+            else:
+                check(item, keys + (str(key),), errors)
+
+    return check_mapping
+
+
+def _label(keys):
+    return f'"{": ".join(keys)}"'
+
+
+#: Check function compiled from :py:data:`RUN_SCHEMA`.
+validate_run_desc = compile_schema(RUN_SCHEMA)
+#: Check function compiled from :py:data:`JOB_SCHEMA`.
+validate_job_desc = compile_schema(JOB_SCHEMA)
@@ -0,0 +1,197 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd command plug-in for worker sub-command.
+
+Execute tasks from the file-based task queue of a Monte Carlo job
+until the queue is empty or the job's walltime is nearly used up.
+"""
+import logging
+import os
+import signal
+import socket
+import subprocess
+import time
+from pathlib import Path
+
+import cliff.command
+
+import mohid_cmd.task_queue
+
+logger = logging.getLogger(__name__)
+
+#: Default time, in seconds, to keep in reserve before the deadline
+#: when deciding whether to start another task.
+STOP_MARGIN = 300
+
+
+class Worker(cliff.command.Command):
+    """Execute tasks from the task queue of a Monte Carlo job."""
+
+    def get_parser(self, prog_name):
+        parser = super().get_parser(prog_name)
+        parser.description = """
+            Claim and execute tasks from the task queue in QUEUE_DIR
+            until there are no pending tasks,
+            or until there is not enough time left before the deadline to finish another task.
+            Every Slurm task of a Monte Carlo job that uses the queue task runner runs
+            a worker.
+        """
+        parser.add_argument(
+            "queue_dir",
+            metavar="QUEUE_DIR",
+            type=Path,
+            help="Task queue directory",
+        )
+        parser.add_argument(
+            "--deadline",
+            type=float,
+            default=None,
+            help="""
+            Time, in seconds since the epoch, by which the worker must finish;
+            typically the start time of the job plus its walltime.
+            """,
+        )
+        parser.add_argument(
+            "--task-time",
+            dest="task_time",
+            type=float,
+            default=0,
+            help="""
+            Expected duration of a task in seconds,
+            used until the worker has timed a task of its own.
+            """,
+        )
+        parser.add_argument(
+            "--drain-file",
+            dest="drain_file",
+            type=Path,
+            default=None,
+            help="""
+            Stop claiming tasks when this file exists;
+            the job script creates it when Slurm signals the job to drain before its
+            time limit.
+            """,
+        )
+        parser.add_argument(
+            "--margin",
+            type=float,
+            default=STOP_MARGIN,
+            help=f"""
+            Seconds to keep in reserve before the deadline
+            when deciding whether to start another task; defaults to {STOP_MARGIN}.
+            """,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute the `mohid worker` sub-command.
+
+        :param parsed_args: Arguments and options parsed from the command-line.
+        :type parsed_args: :class:`argparse.Namespace` instance
+        """
+        summary = work(
+            parsed_args.queue_dir,
+            deadline=parsed_args.deadline,
+            task_time=parsed_args.task_time,
+            drain_file=parsed_args.drain_file,
+            margin=parsed_args.margin,
+        )
+        logger.info(summary)
+
+
+def work(
+    queue_dir,
+    deadline=None,
+    task_time=0,
+    drain_file=None,
+    margin=STOP_MARGIN,
+    worker_id=None,
+):
+    """Claim and execute tasks from a task queue until it is empty,
+    or until there is not enough time left before :kbd:`deadline` to finish another task.
+
+    Before each task is claimed,
+    the time that it will take is estimated as the longest task that this worker
+    has executed so far,
+    or :kbd:`task_time` if it hasn't finished a task yet.
+    The worker also stops claiming tasks when :kbd:`drain_file` exists,
+    or when it receives :py:data:`signal.SIGTERM`;
+    a task that is interrupted by :py:data:`signal.SIGTERM` is recorded as failed.
+    If the worker stops before the queue is empty,
+    the commands of the unfinished tasks are recorded in the queue's
+    :py:data:`mohid_cmd.task_queue.UNFINISHED_FILE`.
+
+    :param queue_dir: Task queue directory.
+    :type queue_dir: :py:class:`pathlib.Path`
+
+    :param float deadline: Time, in seconds since the epoch, by which the worker must
+                           finish; :py:obj:`None` means no deadline.
+
+    :param float task_time: Expected duration of a task in seconds.
+
+    :param drain_file: File whose existence tells the worker to stop claiming tasks.
+    :type drain_file: :py:class:`pathlib.Path`
+
+    :param float margin: Seconds to keep in reserve before the deadline.
+
+    :param str worker_id: Identifier of the worker;
+                          defaults to the host name and process id.
+
+    :returns: Summary of the tasks that the worker executed.
+    :rtype: str
+    """
+    # srun sets the rank of each worker in the job step
+    queue = mohid_cmd.task_queue.TaskQueue(
+        queue_dir,
+        rank=int(os.environ.get("SLURM_PROCID", 0)),
+        n_ranks=int(os.environ.get("SLURM_NTASKS", 1)),
+    )
+    worker_id = worker_id or f"{socket.gethostname()}.{os.getpid()}"
+    terminated = []
+    # Slurm signals every process of the job step,
+    # so the task's command is interrupted too and the worker only has to record it
+    prev_handler = signal.signal(
+        signal.SIGTERM, lambda signum, frame: terminated.append(signum)
+    )
+    n_tasks = n_failed = 0
+    longest = None
+    try:
+        while True:
+            estimate = task_time if longest is None else longest
+            if deadline is not None and time.time() + estimate + margin > deadline:
+                reason = "before deadline"
+                break
+            if terminated or (drain_file is not None and drain_file.exists()):
+                reason = "to drain"
+                break
+            task = queue.claim(worker_id)
+            if task is None:
+                return f"worker {worker_id} ran {n_tasks} task(s), {n_failed} failed"
+            start = time.monotonic()
+            exit_code = subprocess.run(["bash", "-c", task.command]).returncode
+            duration = time.monotonic() - start
+            queue.complete(task, exit_code, duration, worker_id)
+            n_tasks += 1
+            if exit_code:
+                n_failed += 1
+                logger.warning(f"task {task.name} failed with exit code {exit_code}")
+            longest = duration if longest is None else max(longest, duration)
+    finally:
+        signal.signal(signal.SIGTERM, prev_handler)
+    n_unfinished = queue.record_unfinished()
+    return (
+        f"worker {worker_id} ran {n_tasks} task(s), {n_failed} failed; "
+        f"stopped {reason} with {n_unfinished} task(s) unfinished"
+    )
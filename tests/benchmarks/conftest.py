@@ -0,0 +1,193 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""Fixtures for MOHID-Cmd benchmark suite.
+
+The benchmarks are only run when pytest is invoked with the --benchmarks option.
+Measurements are compared to the values stored in baseline.json;
+use the --benchmark-save-baseline option to store a new baseline.
+Ratios of measurements that are made on the same machine,
+like the time for 1000 runs to the time for 10 runs,
+are checked against fixed limits,
+so those checks fail on regressions whether or not a baseline is stored.
+"""
+import importlib.metadata
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import git
+import pytest
+
+BASELINE_FILE = Path(__file__).parent / "baseline.json"
+
+
+@pytest.fixture(scope="session")
+def benchmark_baseline(request):
+    """Baseline measurements dict keyed by benchmark name.
+
+    When the --benchmark-save-baseline option is used the measurements collected
+    during the session are written to baseline.json at the end of the session.
+    """
+    try:
+        baseline = json.loads(BASELINE_FILE.read_text())
+    except FileNotFoundError:
+        baseline = {}
+    yield baseline
+    if request.config.getoption("--benchmark-save-baseline"):
+        BASELINE_FILE.write_text(f"{json.dumps(baseline, indent=2, sort_keys=True)}\n")
+
+
+@pytest.fixture
+def check_baseline(benchmark_baseline, request):
+    """Compare a benchmark's measurements to its stored baseline values,
+    or record them if --benchmark-save-baseline was used.
+    """
+    save_baseline = request.config.getoption("--benchmark-save-baseline")
+    tolerance = request.config.getoption("--benchmark-tolerance")
+
+    def check_baseline(name, measurements):
+        if save_baseline:
+            benchmark_baseline[name] = measurements
+            return
+        expected = benchmark_baseline.get(name)
+        if expected is None:
+            pytest.skip(f"no baseline stored for {name}: {measurements}")
+        regressions = [
+            f"{key}: {value:.3f} > {expected[key]:.3f} + {tolerance:.0%}"
+            for key, value in measurements.items()
+            if key in expected and value > expected[key] * (1 + tolerance)
+        ]
+        assert not regressions, f"{name} regressed: {'; '.join(regressions)}"
+
+    return check_baseline
+
+
+@pytest.fixture
+def check_ratio(request):
+    """Check that the ratio of two measurements made on the same machine
+    is no more than a limit.
+
+    Unlike the baseline values, the limits don't depend on the speed of the machine,
+    so these checks are made even when there is no stored baseline.
+    """
+    tolerance = request.config.getoption("--benchmark-tolerance")
+
+    def check_ratio(name, numerator, denominator, limit):
+        ratio = numerator / denominator
+        assert ratio <= limit * (
+            1 + tolerance
+        ), f"{name} regressed: {ratio:.2f} > {limit:.2f} + {tolerance:.0%}"
+
+    return check_ratio
+
+
+@pytest.fixture
+def measure_cli(tmp_path):
+    """Run a `mohid` command in a subprocess and measure its import time,
+    wall time, and peak resident set size.
+
+    Commands that return a value from take_action() exit with a non-zero status
+    even when they succeed, so they have to be checked by their effects instead.
+    """
+
+    if not _has_entry_points("mohid.app"):
+        pytest.fail(
+            "mohid sub-command entry points not found; "
+            "install the package with: python3 -m pip install --editable ."
+        )
+
+    def measure_cli(argv, cwd, check_returncode=True):
+        cmd = [sys.executable, "-X", "importtime", "-m", "mohid_cmd.main", *argv]
+        stdout_file = tmp_path / "bench.stdout"
+        stderr_file = tmp_path / "bench.stderr"
+        with stdout_file.open("wt") as stdout, stderr_file.open("wt") as stderr:
+            t_start = time.perf_counter()
+            proc = subprocess.Popen(cmd, cwd=cwd, stdout=stdout, stderr=stderr)
+            _, status, rusage = os.wait4(proc.pid, 0)
+            wall_time = time.perf_counter() - t_start
+        # os.wait4() reaped the child, so tell Popen not to try again
+        proc.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+        importtime_lines, stderr_lines = [], []
+        for line in stderr_file.read_text().splitlines():
+            if line.startswith("import time:"):
+                importtime_lines.append(line)
+            else:
+                stderr_lines.append(line)
+        if check_returncode:
+            assert proc.returncode == 0, "\n".join(stderr_lines)
+        return {
+            "import_time": _total_import_time(importtime_lines),
+            "wall_time": wall_time,
+            # ru_maxrss is in KiB on Linux
+            "peak_rss": rusage.ru_maxrss / 1024,
+        }
+
+    return measure_cli
+
+
+def _has_entry_points(group):
+    """
+    :param str group: Entry points group name.
+
+    :rtype: boolean
+    """
+    entry_points = importlib.metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        return bool(entry_points.select(group=group))
+    # Python < 3.10
+    return bool(entry_points.get(group))
+
+
+def _total_import_time(importtime_lines):
+    """Sum the cumulative times of the top level imports reported by
+    `python -X importtime`.
+
+    :param list importtime_lines: `import time: self | cumulative | name` lines
+
+    :returns: Total import time in seconds.
+    :rtype: float
+    """
+    total_us = 0
+    for line in importtime_lines:
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not cumulative.strip().isdigit():
+            # header line
+            continue
+        if not name.startswith("  "):
+            # nested imports are indented below their importer
+            total_us += int(cumulative)
+    return total_us / 1e6
+
+
+@pytest.fixture
+def git_repos(tmp_path, monkeypatch):
+    """Initialize git repos with an initial commit so that the VCS revision recording
+    in `mohid prepare` and `mohid monte-carlo` can run in a subprocess.
+    """
+    monkeypatch.setenv("GIT_AUTHOR_NAME", "MOHID-Cmd benchmarks")
+    monkeypatch.setenv("GIT_AUTHOR_EMAIL", "benchmarks@example.com")
+    monkeypatch.setenv("GIT_COMMITTER_NAME", "MOHID-Cmd benchmarks")
+    monkeypatch.setenv("GIT_COMMITTER_EMAIL", "benchmarks@example.com")
+
+    def git_repos(*repo_paths):
+        for repo_path in repo_paths:
+            Path(repo_path).mkdir(parents=True, exist_ok=True)
+            repo = git.Repo.init(repo_path)
+            repo.index.commit("Initial commit")
+
+    return git_repos
@@ -0,0 +1,133 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""Benchmarks of `mohid gather` on temporary run directories like those of
+Monte Carlo runs,
+comparing the globs, per-path checks, and per-path deletions that it used to do
+to the directory scan plan and dir_fd-relative deletions.
+
+Run the benchmarks with the tmp directory on the file system that the runs use,
+e.g. with --basetemp=$SCRATCH/pytest,
+to measure the effect of the metadata server latency.
+"""
+import os
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+
+import mohid_cmd.gather
+
+pytestmark = pytest.mark.benchmark
+
+#: Numbers of symbolic links, run definition files, and files in res/
+#: of the temporary run directories.
+RUN_DIR_SIZES = ((20, 10, 5), (100, 30, 20))
+#: Number of temporary run directories that are gathered in each measurement.
+N_RUN_DIRS = 10
+#: Number of measurements of each gather implementation;
+#: the fastest is reported so that a load spike doesn't fail the ratio check.
+N_ROUNDS = 3
+
+
+def _make_run_dirs(root, n_symlinks, n_run_files, n_res_files):
+    run_dirs = []
+    for i in range(N_RUN_DIRS):
+        run_dir = root / f"AKNS-spatial-{i}_2020-06-15T142000"
+        (run_dir / "res").mkdir(parents=True)
+        for j in range(n_symlinks):
+            (run_dir / f"forcing-{j}.hdf5").symlink_to(root)
+        for j in range(n_run_files):
+            (run_dir / f"Run_{j}.dat").write_text("START : 2017 6 15 0 0 0\n")
+        for j in range(n_res_files):
+            (run_dir / "res" / f"Lagrangian_{j}.hdf5").write_bytes(b"\x89HDF")
+        run_dirs.append(run_dir)
+    return run_dirs
+
+
+def _path_gather(results_dir):
+    """What `mohid gather` did before it planned the gathering from one scan of
+    each directory.
+    """
+    results_dir.mkdir(parents=True, exist_ok=True)
+    cwd = Path.cwd()
+    symlinks = {p for p in cwd.glob("*") if p.is_symlink()}
+    res_files = set((cwd / "res").glob("*"))
+    if not cwd.samefile(results_dir):
+        for p in cwd.glob("*"):
+            if p not in symlinks and p.name != "res":
+                shutil.move(p, results_dir / p.name)
+        for p in res_files:
+            shutil.move(p, results_dir / p.name)
+    for ln in symlinks:
+        ln.unlink()
+    for p in (cwd / "res").glob("*"):
+        p.unlink()
+    (cwd / "res").rmdir()
+
+
+def _measure(gather, run_dirs, results_root, monkeypatch):
+    wall_time = 0
+    for run_dir in run_dirs:
+        monkeypatch.chdir(run_dir)
+        t_start = time.perf_counter()
+        gather(results_root / run_dir.name)
+        wall_time += time.perf_counter() - t_start
+        assert not os.listdir(run_dir)
+    return wall_time
+
+
+@pytest.mark.parametrize("n_symlinks, n_run_files, n_res_files", RUN_DIR_SIZES)
+def test_gather(
+    n_symlinks,
+    n_run_files,
+    n_res_files,
+    check_baseline,
+    check_ratio,
+    tmp_path,
+    monkeypatch,
+):
+    path_time = plan_time = float("inf")
+    for i in range(N_ROUNDS):
+        round_dir = tmp_path / f"round-{i}"
+        path_run_dirs = _make_run_dirs(
+            round_dir / "path", n_symlinks, n_run_files, n_res_files
+        )
+        plan_run_dirs = _make_run_dirs(
+            round_dir / "plan", n_symlinks, n_run_files, n_res_files
+        )
+        path_time = min(
+            path_time,
+            _measure(
+                _path_gather, path_run_dirs, round_dir / "path-results", monkeypatch
+            ),
+        )
+        plan_time = min(
+            plan_time,
+            _measure(
+                mohid_cmd.gather.gather,
+                plan_run_dirs,
+                round_dir / "plan-results",
+                monkeypatch,
+            ),
+        )
+    check_ratio(
+        f"gather [{n_symlinks} symlinks] plan / path wall time", plan_time, path_time, 1
+    )
+    check_baseline(
+        f"gather [{N_RUN_DIRS} run dirs, {n_symlinks} symlinks, "
+        f"{n_run_files} run files, {n_res_files} res files]",
+        {"path_wall_time": path_time, "plan_wall_time": plan_time},
+    )
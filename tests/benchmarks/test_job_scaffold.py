@@ -0,0 +1,121 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""Monte Carlo job directory scaffold benchmarks comparing cookiecutter to the
+in-process scaffold generator.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pytest
+
+import mohid_cmd.scaffold
+
+pytestmark = pytest.mark.benchmark
+
+#: Numbers of runs in the benchmark job directories,
+#: and the limits of the scaffold / cookiecutter wall time ratio for them.
+#: Both render the same compiled glost-tasks.txt loop,
+#: so the scaffold's advantage shrinks as the number of runs grows.
+SCAFFOLD_RUNS = ((1_000, 0.5), (100_000, 1))
+
+
+def _import_time(module):
+    t_start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+    return time.perf_counter() - t_start
+
+
+def _measure(make_job_dir, context):
+    t_start = time.perf_counter()
+    make_job_dir(context)
+    wall_time = time.perf_counter() - t_start
+    # Memory is traced in a separate run because tracing slows the generator down
+    shutil.rmtree(context["job_dir"])
+    tracemalloc.start()
+    make_job_dir(context)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return wall_time, peak / 2**20
+
+
+def _read_tree(job_dir):
+    return {
+        os.fspath(path.relative_to(job_dir)): path.read_bytes()
+        for path in sorted(job_dir.rglob("*"))
+        if path.is_file()
+    }
+
+
+@pytest.mark.parametrize("n_runs, ratio_limit", SCAFFOLD_RUNS)
+def test_scaffold(n_runs, ratio_limit, check_baseline, check_ratio, request, tmp_path):
+    if n_runs > request.config.getoption("--benchmark-max-runs"):
+        pytest.skip(f"{n_runs} runs is more than --benchmark-max-runs")
+    cookiecutter_main = pytest.importorskip("cookiecutter.main")
+    context = {"job_id": "AKNS-spatial", "runs_per_job": n_runs}
+
+    def cookiecutter(context):
+        cookiecutter_main.cookiecutter(
+            os.fspath(mohid_cmd.scaffold.TEMPLATE_DIR),
+            no_input=True,
+            output_dir=context["job_dir"],
+            extra_context=context,
+        )
+
+    # Both generators write to the same path so that the trees can be compared
+    context["job_dir"] = tmp_path / "AKNS-spatial_2020-06-15T142000"
+    cookiecutter_time, cookiecutter_peak = _measure(cookiecutter, context)
+    cookiecutter_tree = _read_tree(context["job_dir"])
+    shutil.rmtree(context["job_dir"])
+    scaffold_time, scaffold_peak = _measure(mohid_cmd.scaffold.make_job_dir, context)
+
+    assert _read_tree(context["job_dir"]) == cookiecutter_tree
+    check_ratio(
+        f"job directory scaffold [{n_runs} runs] scaffold / cookiecutter wall time",
+        scaffold_time,
+        cookiecutter_time,
+        ratio_limit,
+    )
+    check_baseline(
+        f"job directory scaffold [{n_runs} runs]",
+        {
+            "cookiecutter_wall_time": cookiecutter_time,
+            "cookiecutter_peak_memory": cookiecutter_peak,
+            "scaffold_wall_time": scaffold_time,
+            "scaffold_peak_memory": scaffold_peak,
+        },
+    )
+
+
+def test_scaffold_import_time(check_baseline, check_ratio):
+    pytest.importorskip("cookiecutter.main")
+    cookiecutter_import_time = _import_time("cookiecutter.main")
+    scaffold_import_time = _import_time("mohid_cmd.scaffold")
+    check_ratio(
+        "job directory scaffold import time / cookiecutter import time",
+        scaffold_import_time,
+        cookiecutter_import_time,
+        1,
+    )
+    check_baseline(
+        "job directory scaffold import",
+        {
+            "cookiecutter_import_time": cookiecutter_import_time,
+            "scaffold_import_time": scaffold_import_time,
+        },
+    )
@@ -0,0 +1,193 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd command and sub-command start-up benchmarks.
+"""
+import textwrap
+from pathlib import Path
+
+import pytest
+
+pytestmark = pytest.mark.benchmark
+
+MONTE_CARLO_RUNS = (10, 100, 1_000, 10_000, 100_000)
+
+
+@pytest.fixture
+def monte_carlo_templates(glost_run_desc):
+    tmpl_dir = Path(glost_run_desc["paths"]["mohid config"], "templates")
+    tmpl_dir.mkdir()
+    (tmpl_dir / "make-hdf5.yaml").write_text(
+        textwrap.dedent(
+            """\
+            paths:
+              output: {{ forcing_dir }}
+            """
+        )
+    )
+    (tmpl_dir / "mohid-run.yaml").write_text(
+        textwrap.dedent(
+            """\
+            run_id: {{ job_id }}-{{ run_number }}
+
+            paths:
+              runs directory: {{ runs_dir }}
+
+            forcing:
+              winds.hdf5: {{ forcing_dir }}/{{ start_ddmmmyy }}-{{ end_ddmmmyy }}/winds.hdf5
+
+            run data files:
+              IN_MODEL: {{ job_dir }}/mohid-yaml/Model-{{ run_number }}.dat
+              PARTIC_DATA: {{ job_dir }}/mohid-yaml/{{ Lagrangian_template }}-{{ run_number }}.dat
+            """
+        )
+    )
+    (tmpl_dir / "Model.dat").write_text(
+        textwrap.dedent(
+            """\
+            START                     : {{ start_yyyy_mm_dd_hh }} 30 0
+            END                       : {{ end_yyyy_mm_dd_hh }} 30 0
+            DT                        : 3600
+            """
+        )
+    )
+    (tmpl_dir / "Lagrangian.dat").write_text(
+        textwrap.dedent(
+            """\
+            POSITION_COORDINATES      : {{ spill_lon }} {{ spill_lat }}
+            POINT_VOLUME              : {{ spill_volume }}
+            """
+        )
+    )
+    (tmpl_dir / "glost-task.sh").write_text(
+        textwrap.dedent(
+            """\
+            {{ make_hdf5_cmd }} $MONTE_CARLO/forcing-yaml/{{ job_id }}-make-hdf5-{{ run_number }}.yaml {{ start_yyyy_mm_dd }} {{ n_days }} \\
+            && {{ mohid_cmd }} run --no-submit --tmp-run-dir $MONTE_CARLO/{{ job_id }}-{{ run_number }}/ \\
+              $MONTE_CARLO/mohid-yaml/{{ job_id }}-{{ run_number }}.yaml $MONTE_CARLO/results/{{ job_id }}-{{ run_number }}/ \\
+            && bash $MONTE_CARLO/{{ job_id }}-{{ run_number }}/MOHID.sh
+            rm -rf {{ forcing_dir }}/{{ job_id }}-{{ run_number }}/
+            """
+        )
+    )
+    return tmpl_dir
+
+
+def _write_runs_csv(csv_file, n_runs):
+    with csv_file.open("wt") as f:
+        f.write(
+            "spill_date_hour, run_days, spill_lon, spill_lat, spill_volume, "
+            "Lagrangian_template\n"
+        )
+        for i in range(n_runs):
+            f.write(
+                f"2017-06-{1 + i % 28:02d} 02:00, 7, {-123.5 + i % 100 / 100:.2f}, "
+                f"48.38, 21300.43, Lagrangian.dat\n"
+            )
+
+
+def test_mohid_help(measure_cli, check_baseline, tmp_path):
+    measurements = measure_cli(["--help"], cwd=tmp_path)
+    check_baseline("mohid --help", measurements)
+
+
+def test_prepare(measure_cli, check_baseline, run_desc, git_repos, tmp_path):
+    git_repos(tmp_path / "MIDOSS-MOHID-CODE", tmp_path / "MIDOSS-MOHID-config")
+    # `mohid prepare` returns the temporary run directory path from take_action(),
+    # which cliff turns into exit status 1
+    measurements = measure_cli(
+        ["prepare", "mohid.yaml", "--quiet"], cwd=tmp_path, check_returncode=False
+    )
+    assert len(list((tmp_path / "runs_dir").iterdir())) == 1
+    check_baseline("mohid prepare", measurements)
+
+
+def test_run_no_submit(measure_cli, check_baseline, run_desc, git_repos, tmp_path):
+    git_repos(tmp_path / "MIDOSS-MOHID-CODE", tmp_path / "MIDOSS-MOHID-config")
+    measurements = measure_cli(
+        ["run", "mohid.yaml", "results_dir", "--no-submit", "--quiet"], cwd=tmp_path
+    )
+    check_baseline("mohid run --no-submit", measurements)
+
+
+def test_gather(measure_cli, check_baseline, tmp_path):
+    tmp_run_dir = tmp_path / "tmp_run_dir"
+    (tmp_run_dir / "res").mkdir(parents=True)
+    forcing = tmp_path / "forcing"
+    forcing.mkdir()
+    for name in ("winds", "currents", "t", "waves", "e3t"):
+        (forcing / f"{name}.hdf5").write_bytes(b"")
+        (tmp_run_dir / f"{name}.hdf5").symlink_to(forcing / f"{name}.hdf5")
+    for name in ("mohid.yaml", "nomfich.dat", "Model.dat", "MOHID.sh"):
+        (tmp_run_dir / name).write_text("")
+    for name in ("Lagrangian_AKNS.hdf5", "Turbulence_AKNS.hdf5"):
+        (tmp_run_dir / "res" / name).write_bytes(b"")
+    measurements = measure_cli(
+        ["gather", f"{tmp_path / 'results_dir'}"], cwd=tmp_run_dir
+    )
+    check_baseline("mohid gather", measurements)
+
+
+@pytest.mark.parametrize("n_runs", MONTE_CARLO_RUNS)
+def test_monte_carlo_no_submit(
+    n_runs,
+    measure_cli,
+    check_baseline,
+    glost_run_desc,
+    monte_carlo_templates,
+    git_repos,
+    request,
+    tmp_path,
+):
+    if n_runs > request.config.getoption("--benchmark-max-runs"):
+        pytest.skip(f"{n_runs} runs is more than --benchmark-max-runs")
+    git_repos(*glost_run_desc["vcs revisions"]["git"])
+    csv_file = tmp_path / "AKNS_spatial.csv"
+    _write_runs_csv(csv_file, n_runs)
+    measurements = measure_cli(
+        ["monte-carlo", "monte-carlo.yaml", csv_file.name, "--no-submit"],
+        cwd=tmp_path,
+    )
+    check_baseline(f"mohid monte-carlo --no-submit [{n_runs} runs]", measurements)
+
+
+def test_monte_carlo_scaling(
+    measure_cli,
+    check_ratio,
+    glost_run_desc,
+    monte_carlo_templates,
+    git_repos,
+    request,
+    tmp_path,
+):
+    # Start-up dominates small jobs, so a 100-fold increase in the number of runs
+    # should take much less than 100 times as long
+    if request.config.getoption("--benchmark-max-runs") < 1_000:
+        pytest.skip("1000 runs is more than --benchmark-max-runs")
+    git_repos(*glost_run_desc["vcs revisions"]["git"])
+    wall_times = {}
+    for n_runs in (10, 1_000):
+        csv_file = tmp_path / f"AKNS_spatial_{n_runs}.csv"
+        _write_runs_csv(csv_file, n_runs)
+        measurements = measure_cli(
+            ["monte-carlo", "monte-carlo.yaml", csv_file.name, "--no-submit"],
+            cwd=tmp_path,
+        )
+        wall_times[n_runs] = measurements["wall_time"]
+    check_ratio(
+        "mohid monte-carlo --no-submit [1000 runs / 10 runs]",
+        wall_times[1_000],
+        wall_times[10],
+        4,
+    )
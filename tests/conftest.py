@@ -14,12 +14,90 @@
 #  limitations under the License.
 """Fixture for MOHID-Cmd test suite.
 """
+import json
+import os
 import textwrap
+from pathlib import Path
 
 import pytest
 import yaml
 
 
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks", "MOHID-Cmd benchmark suite")
+    group.addoption(
+        "--benchmarks",
+        action="store_true",
+        help="run the benchmark suite in tests/benchmarks/",
+    )
+    group.addoption(
+        "--benchmark-save-baseline",
+        action="store_true",
+        help="store the benchmark measurements as the new baseline",
+    )
+    group.addoption(
+        "--benchmark-tolerance",
+        type=float,
+        default=0.25,
+        help="fractional increase over baseline that is reported as a regression",
+    )
+    group.addoption(
+        "--benchmark-max-runs",
+        type=int,
+        default=100_000,
+        help="largest Monte Carlo run count to benchmark",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: performance benchmark; only run with --benchmarks"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmarks"):
+        return
+    skip_benchmark = pytest.mark.skip(reason="need --benchmarks option to run")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip_benchmark)
+
+
+class FakeSlurm:
+    """Control and inspect the fake Slurm commands in tests/fake_slurm/."""
+
+    def __init__(self, state_dir):
+        self.state_dir = state_dir
+
+    def jobs(self):
+        jobs_file = self.state_dir / "jobs.json"
+        return json.loads(jobs_file.read_text()) if jobs_file.exists() else {}
+
+    def set_state(self, job_id, state):
+        jobs = self.jobs()
+        jobs[job_id]["state"] = state
+        (self.state_dir / "jobs.json").write_text(json.dumps(jobs))
+
+    def calls(self, prog):
+        calls_file = self.state_dir / "calls.jsonl"
+        if not calls_file.exists():
+            return []
+        calls = [json.loads(line) for line in calls_file.read_text().splitlines()]
+        return [call for call in calls if call["prog"] == prog]
+
+
+@pytest.fixture
+def fake_slurm(tmp_path, monkeypatch):
+    """Put stand-ins for sbatch, squeue, and sacct at the front of PATH."""
+    fake_slurm_bin = Path(__file__).parent / "fake_slurm"
+    monkeypatch.setenv("PATH", f"{fake_slurm_bin}{os.pathsep}{os.environ['PATH']}")
+    state_dir = tmp_path / "fake_slurm"
+    monkeypatch.setenv("FAKE_SLURM_DIR", os.fspath(state_dir))
+    monkeypatch.delenv("FAKE_SLURM_SBATCH_FAIL", raising=False)
+    return FakeSlurm(state_dir)
+
+
 @pytest.fixture()
 def run_desc(tmp_path):
     mohid_repo = tmp_path / "MIDOSS-MOHID-CODE"
@@ -102,3 +180,62 @@ def run_desc(tmp_path):
     with p_run_desc.open("rt") as f:
         run_desc = yaml.safe_load(f)
     return run_desc
+
+
+@pytest.fixture
+def glost_run_desc(tmp_path):
+    forcing_dir = tmp_path / "forcing"
+    forcing_dir.mkdir()
+
+    runs_dir = tmp_path / "monte-carlo"
+    runs_dir.mkdir()
+
+    code_repo = tmp_path / "MIDOSS-MOHID-CODE"
+    code_repo.mkdir()
+    config_repo = tmp_path / "MIDOSS-MOHID-config"
+    config_repo.mkdir()
+    grid_repo = tmp_path / "MIDOSS-MOHID-grid"
+    grid_repo.mkdir()
+    mohid_cmd_repo = tmp_path / "MOHID-Cmd"
+    mohid_cmd_repo.mkdir()
+    nemo_cmd_repo = tmp_path / "NEMO-Cmd"
+    nemo_cmd_repo.mkdir()
+    moad_tools_repo = tmp_path / "moad_tools"
+    moad_tools_repo.mkdir()
+
+    mohid_config_dir = config_repo / "monte-carlo"
+    mohid_config_dir.mkdir()
+
+    run_desc_file = tmp_path / "monte-carlo.yaml"
+    run_desc_file.write_text(
+        textwrap.dedent(
+            f"""\
+            job id: AKNS-spatial
+            account: rrg-allen
+            email: dlatorne@example.com
+            nodes: 1
+            mem per cpu: 14100M
+            run walltime: 3:00:00
+
+            paths:
+              forcing directory: {forcing_dir}
+              runs directory: {runs_dir}
+              mohid config: {mohid_config_dir}
+
+            make-hdf5 command: $HOME/.local/bin/make-hdf5
+            mohid command: $HOME/.local/bin/mohid
+
+            vcs revisions:
+              git:
+                - {code_repo}
+                - {config_repo}
+                - {grid_repo}
+                - {mohid_cmd_repo}
+                - {nemo_cmd_repo}
+                - {moad_tools_repo}
+            """
+        )
+    )
+    with run_desc_file.open("rt") as fp:
+        run_desc = yaml.safe_load(fp)
+    return run_desc
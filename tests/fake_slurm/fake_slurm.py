@@ -0,0 +1,96 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""Stand-in for the Slurm sbatch, squeue, and sacct commands for tests.
+
+The scripts in this directory are put at the front of PATH by the fake_slurm fixture.
+Job states are stored in $FAKE_SLURM_DIR/jobs.json,
+and each call is appended to $FAKE_SLURM_DIR/calls.jsonl so that tests can check
+how many calls were made, and when.
+
+Jobs submitted with a --job-name that contains $FAKE_SLURM_SBATCH_FAIL are rejected.
+squeue only reports jobs in active states,
+like the real squeue does once finished jobs have been purged from the controller.
+"""
+import contextlib
+import fcntl
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ACTIVE_STATES = {"PENDING", "RUNNING", "COMPLETING"}
+FIRST_JOB_ID = 1000
+
+
+@contextlib.contextmanager
+def _locked_jobs(state_dir):
+    with (state_dir / "lock").open("w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        jobs_file = state_dir / "jobs.json"
+        jobs = json.loads(jobs_file.read_text()) if jobs_file.exists() else {}
+        yield jobs
+        jobs_file.write_text(json.dumps(jobs))
+
+
+def _option(args, name):
+    for arg in args:
+        if arg.startswith(f"{name}="):
+            return arg.split("=", 1)[1]
+    return ""
+
+
+def sbatch(state_dir, args):
+    name = _option(args, "--job-name")
+    fail = os.environ.get("FAKE_SLURM_SBATCH_FAIL")
+    if fail and fail in name:
+        sys.stderr.write("sbatch: error: Batch job submission failed\n")
+        return 1
+    with _locked_jobs(state_dir) as jobs:
+        job_id = str(FIRST_JOB_ID + len(jobs))
+        jobs[job_id] = {"name": name, "state": "PENDING", "args": args}
+    if "--parsable" in args:
+        print(job_id)
+    else:
+        print(f"Submitted batch job {job_id}")
+    return 0
+
+
+def squeue(state_dir, args):
+    job_ids = _option(args, "--jobs").split(",")
+    with _locked_jobs(state_dir) as jobs:
+        for job_id in job_ids:
+            if job_id in jobs and jobs[job_id]["state"] in ACTIVE_STATES:
+                print(f"{job_id}|{jobs[job_id]['state']}")
+    return 0
+
+
+def sacct(state_dir, args):
+    job_ids = _option(args, "--jobs").split(",")
+    with _locked_jobs(state_dir) as jobs:
+        for job_id in job_ids:
+            if job_id in jobs:
+                print(f"{job_id}|{jobs[job_id]['state']}")
+    return 0
+
+
+def main(prog):
+    state_dir = Path(os.environ["FAKE_SLURM_DIR"])
+    state_dir.mkdir(parents=True, exist_ok=True)
+    args = sys.argv[1:]
+    with (state_dir / "calls.jsonl").open("a") as f:
+        f.write(f"{json.dumps({'prog': prog, 'args': args, 'time': time.time()})}\n")
+    commands = {"sbatch": sbatch, "squeue": squeue, "sacct": sacct}
+    sys.exit(commands[prog](state_dir, args))
@@ -0,0 +1,172 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd results content store unit tests.
+"""
+import hashlib
+import logging
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+import mohid_cmd.content_store
+
+
+class TestJobStore:
+    """Unit tests for job_store() function."""
+
+    def test_monte_carlo_run(self):
+        results_dir = Path(
+            "AKNS-spatial_2020-06-15T142000", "results", "AKNS-spatial-0"
+        )
+        assert mohid_cmd.content_store.job_store(results_dir) == Path(
+            "AKNS-spatial_2020-06-15T142000", mohid_cmd.content_store.STORE_DIR
+        )
+
+    def test_not_monte_carlo_run(self):
+        results_dir = Path("MIDOSS", "results-MarathassaConstTS")
+        assert mohid_cmd.content_store.job_store(results_dir) is None
+
+
+class TestDigest:
+    """Unit test for digest() function."""
+
+    def test_digest(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(mohid_cmd.content_store, "READ_SIZE", 3)
+        path = tmp_path / "Model.dat"
+        path.write_bytes(b"START : 2017 6 15 0 0 0\n")
+        assert (
+            mohid_cmd.content_store.digest(path)
+            == hashlib.sha256(b"START : 2017 6 15 0 0 0\n").hexdigest()
+        )
+
+
+class TestAdd:
+    """Unit tests for add() function."""
+
+    def test_add(self, tmp_path):
+        store = tmp_path / "content-store"
+        path = tmp_path / "nomfich.dat"
+        path.write_text("IN_MODEL : Model.dat\n")
+        hexdigest = hashlib.sha256(b"IN_MODEL : Model.dat\n").hexdigest()
+        stored = mohid_cmd.content_store.add(store, path)
+        assert stored == store / hexdigest[:2] / hexdigest
+        assert stored.samefile(path)
+
+    def test_already_stored(self, tmp_path):
+        store = tmp_path / "content-store"
+        for i in range(2):
+            (tmp_path / f"nomfich-{i}.dat").write_text("IN_MODEL : Model.dat\n")
+        stored = mohid_cmd.content_store.add(store, tmp_path / "nomfich-0.dat")
+        assert mohid_cmd.content_store.add(store, tmp_path / "nomfich-1.dat") == stored
+        assert stored.samefile(tmp_path / "nomfich-0.dat")
+        assert stored.stat().st_nlink == 2
+
+    def test_other_file_system(self, tmp_path):
+        store = tmp_path / "content-store"
+        path = tmp_path / "nomfich.dat"
+        path.write_text("IN_MODEL : Model.dat\n")
+        with patch(
+            "mohid_cmd.content_store.os.link",
+            side_effect=[OSError(18, "Invalid cross-device link"), None],
+            autospec=True,
+        ) as m_link:
+            stored = mohid_cmd.content_store.add(store, path)
+        tmp = stored.with_name(
+            f".{stored.name}.{mohid_cmd.content_store.os.getpid()}.tmp"
+        )
+        assert m_link.call_args_list[1][0] == (tmp, stored)
+        assert not tmp.exists()
+
+
+class TestLink:
+    """Unit test for link() function."""
+
+    def test_replaces_dest(self, tmp_path):
+        stored = tmp_path / "stored"
+        stored.write_text("new")
+        dest = tmp_path / "results" / "Model.dat"
+        dest.parent.mkdir()
+        dest.write_text("old")
+        mohid_cmd.content_store.link(stored, dest)
+        assert dest.samefile(stored)
+        assert not list(dest.parent.glob(".*"))
+
+
+class TestDedup:
+    """Unit tests for dedup() function."""
+
+    @pytest.fixture
+    def dirs(self, tmp_path):
+        store = tmp_path / "job" / "content-store"
+        results_dir = tmp_path / "job" / "results" / "AKNS-spatial-0"
+        results_dir.mkdir(parents=True)
+        tmp_run_dir = tmp_path / "AKNS-spatial-0_2020-06-15T142000"
+        tmp_run_dir.mkdir()
+        return store, results_dir, tmp_run_dir
+
+    def test_small_file(self, dirs):
+        store, results_dir, tmp_run_dir = dirs
+        path = tmp_run_dir / "Model.dat"
+        path.write_text("START : 2017 6 15 0 0 0\n")
+        assert mohid_cmd.content_store.dedup(path, results_dir / "Model.dat", store)
+        assert not path.exists()
+        assert (results_dir / "Model.dat").read_text() == "START : 2017 6 15 0 0 0\n"
+        assert (results_dir / "Model.dat").stat().st_nlink == 2
+
+    def test_large_file(self, dirs, monkeypatch):
+        store, results_dir, tmp_run_dir = dirs
+        monkeypatch.setattr(mohid_cmd.content_store, "MAX_BYTES", 4)
+        path = tmp_run_dir / "Lagrangian.nc"
+        path.write_bytes(b"CDF\x01\x00")
+        assert not mohid_cmd.content_store.dedup(
+            path, results_dir / "Lagrangian.nc", store
+        )
+        assert path.exists()
+        assert not store.exists()
+
+    def test_directory(self, dirs):
+        store, results_dir, tmp_run_dir = dirs
+        path = tmp_run_dir / "res"
+        path.mkdir()
+        assert not mohid_cmd.content_store.dedup(path, results_dir / "res", store)
+
+    def test_symlink(self, dirs):
+        store, results_dir, tmp_run_dir = dirs
+        (tmp_run_dir / "Model.dat").write_text("START : 2017 6 15 0 0 0\n")
+        path = tmp_run_dir / "Model-link.dat"
+        path.symlink_to(tmp_run_dir / "Model.dat")
+        assert not mohid_cmd.content_store.dedup(
+            path, results_dir / "Model-link.dat", store
+        )
+
+    def test_link_fails(self, dirs, caplog):
+        store, results_dir, tmp_run_dir = dirs
+        path = tmp_run_dir / "Model.dat"
+        path.write_text("START : 2017 6 15 0 0 0\n")
+        caplog.set_level(logging.WARNING)
+        with patch(
+            "mohid_cmd.content_store.link",
+            side_effect=OSError(31, "Too many links"),
+            autospec=True,
+        ):
+            deduped = mohid_cmd.content_store.dedup(
+                path, results_dir / "Model.dat", store
+            )
+        assert not deduped
+        assert path.exists()
+        assert (
+            caplog.messages[0] == f"{path} not deduplicated: [Errno 31] Too many links"
+        )
@@ -0,0 +1,443 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd convert sub-command plug-in unit tests.
+"""
+import argparse
+import logging
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import arrow
+import h5py
+import netCDF4
+import numpy
+import pytest
+
+import mohid_cmd.convert
+import mohid_cmd.main
+
+
+@pytest.fixture
+def convert_cmd():
+    return mohid_cmd.convert.Convert(mohid_cmd.main.MohidApp, [])
+
+
+#: Number of output time steps in the hdf5_file fixture.
+N_STEPS = 5
+#: Shape of the grid in the hdf5_file fixture, in MOHID (i, j) order.
+GRID_SHAPE = (4, 3)
+
+
+def _values(step, shape=GRID_SHAPE):
+    """Values of time step `step` of a variable in the hdf5_file fixture."""
+    return numpy.arange(numpy.prod(shape), dtype="f4").reshape(shape) + 100 * step
+
+
+@pytest.fixture
+def hdf5_file(tmp_path):
+    """MOHID Lagrangian HDF5 results file with 5 hourly output times on a 3x4 grid
+    with 2 layers;
+    OilConcentration_2D and Thickness_2D time series variables,
+    an OilConcentration_3D time series variable with the same name as the 2D one
+    in another group,
+    and a Beaching_Time variable that has no time steps.
+    """
+    hdf5_file = tmp_path / "Lagrangian_AKNS_crude_AKNS-spatial-0.hdf5"
+    with h5py.File(hdf5_file, "w") as h5file:
+        for step in range(1, N_STEPS + 1):
+            h5file[f"Time/Time_{step:05d}"] = numpy.array(
+                [2017, 6, 15, step - 1, 30, 0], dtype="f8"
+            )
+        latitude = h5file.create_dataset(
+            "Grid/Latitude", data=numpy.ones((GRID_SHAPE[0] + 1, GRID_SHAPE[1] + 1))
+        )
+        latitude.attrs["Units"] = b"degrees_north"
+        h5file["Grid/Bathymetry"] = numpy.full(GRID_SHAPE, 42.0)
+        h5file["Grid/WaterPoints2D"] = numpy.ones(GRID_SHAPE, dtype="i4")
+        data_2d = h5file.create_group("Results/OilSpill/Data_2D")
+        for name, units in (("OilConcentration", b"kg/m3"), ("Thickness_2D", b"m")):
+            for step in range(1, N_STEPS + 1):
+                dataset = data_2d.create_dataset(
+                    f"{name}/{name}_{step:05d}", data=_values(step)
+                )
+                dataset.attrs["Units"] = units
+        data_2d["Beaching_Time"] = numpy.full(GRID_SHAPE, 7.0)
+        data_3d = h5file.create_group("Results/OilSpill/Data_3D")
+        for step in range(1, N_STEPS + 1):
+            data_3d[f"OilConcentration/OilConcentration_{step:05d}"] = _values(
+                step, (2,) + GRID_SHAPE
+            )
+    return hdf5_file
+
+
+class TestParser:
+    """Unit tests for `mohid convert` sub-command command-line parser."""
+
+    def test_get_parser(self, convert_cmd):
+        parser = convert_cmd.get_parser("mohid convert")
+        assert parser.prog == "mohid convert"
+
+    def test_hdf5_file_argument(self, convert_cmd):
+        parser = convert_cmd.get_parser("mohid convert")
+        assert parser._actions[1].dest == "hdf5_file"
+        assert parser._actions[1].metavar == "HDF5_FILE"
+        assert parser._actions[1].type == Path
+        assert parser._actions[1].help
+
+    def test_netcdf4_file_argument(self, convert_cmd):
+        parser = convert_cmd.get_parser("mohid convert")
+        assert parser._actions[2].dest == "netcdf4_file"
+        assert parser._actions[2].metavar == "NETCDF4_FILE"
+        assert parser._actions[2].type == Path
+        assert parser._actions[2].help
+
+    def test_var_option(self, convert_cmd):
+        parser = convert_cmd.get_parser("mohid convert")
+        assert parser._actions[3].dest == "var_names"
+        assert parser._actions[3].option_strings == ["--var"]
+        assert parser._actions[3].default is None
+        assert parser._actions[3].help
+
+    def test_chunk_option(self, convert_cmd):
+        parser = convert_cmd.get_parser("mohid convert")
+        assert parser._actions[4].dest == "chunk_sizes"
+        assert parser._actions[4].option_strings == ["--chunk"]
+        assert parser._actions[4].type == mohid_cmd.convert.chunk_size
+        assert parser._actions[4].default == []
+        assert parser._actions[4].help
+
+    def test_time_stride_option(self, convert_cmd):
+        parser = convert_cmd.get_parser("mohid convert")
+        assert parser._actions[5].dest == "time_stride"
+        assert parser._actions[5].option_strings == ["--time-stride"]
+        assert parser._actions[5].type == int
+        assert parser._actions[5].default == 1
+        assert parser._actions[5].help
+
+    def test_complevel_option(self, convert_cmd):
+        parser = convert_cmd.get_parser("mohid convert")
+        assert parser._actions[6].dest == "complevel"
+        assert parser._actions[6].type == int
+        assert parser._actions[6].choices == range(10)
+        assert parser._actions[6].default == mohid_cmd.convert.DEFAULT_COMPLEVEL
+        assert parser._actions[6].help
+
+    def test_workers_option(self, convert_cmd):
+        parser = convert_cmd.get_parser("mohid convert")
+        assert parser._actions[7].dest == "workers"
+        assert parser._actions[7].type == int
+        assert parser._actions[7].default is None
+        assert parser._actions[7].help
+
+    def test_parsed_args(self, convert_cmd):
+        parser = convert_cmd.get_parser("mohid convert")
+        parsed_args = parser.parse_args(
+            [
+                "Lagrangian.hdf5",
+                "Lagrangian.nc",
+                "--var",
+                "OilConcentration_2D",
+                "--chunk",
+                "time=12",
+                "--time-stride",
+                "3",
+                "--complevel",
+                "1",
+            ]
+        )
+        assert parsed_args.hdf5_file == Path("Lagrangian.hdf5")
+        assert parsed_args.netcdf4_file == Path("Lagrangian.nc")
+        assert parsed_args.var_names == ["OilConcentration_2D"]
+        assert parsed_args.chunk_sizes == [("time", 12)]
+        assert parsed_args.time_stride == 3
+        assert parsed_args.complevel == 1
+        assert parsed_args.workers is None
+
+
+class TestTakeAction:
+    """Unit test for `mohid convert` sub-command take_action() method."""
+
+    def test_take_action(self, convert_cmd, hdf5_file, tmp_path, caplog):
+        netcdf4_file = tmp_path / "Lagrangian.nc"
+        parsed_args = SimpleNamespace(
+            hdf5_file=hdf5_file,
+            netcdf4_file=netcdf4_file,
+            var_names=["Thickness_2D"],
+            chunk_sizes=[("time", 2)],
+            time_stride=1,
+            complevel=4,
+            workers=1,
+        )
+        caplog.set_level(logging.INFO)
+        convert_cmd.take_action(parsed_args)
+        assert netcdf4_file.exists()
+        assert caplog.messages[0].startswith(
+            f"converted 1 variable(s) from {hdf5_file} to {netcdf4_file} in "
+        )
+
+
+class TestChunkSize:
+    """Unit tests for chunk_size() function."""
+
+    def test_chunk_size(self):
+        assert mohid_cmd.convert.chunk_size("time=24") == ("time", 24)
+
+    @pytest.mark.parametrize("value", ["time", "time=", "=24", "time=0", "time=x"])
+    def test_invalid(self, value):
+        with pytest.raises(argparse.ArgumentTypeError):
+            mohid_cmd.convert.chunk_size(value)
+
+
+class TestFindVariables:
+    """Unit test for find_variables() function."""
+
+    def test_find_variables(self, hdf5_file):
+        with h5py.File(hdf5_file, "r") as h5file:
+            variables = mohid_cmd.convert.find_variables(h5file)
+        assert list(variables) == [
+            "Beaching_Time",
+            "OilConcentration",
+            "Thickness_2D",
+            "OilSpill_Data_3D_OilConcentration",
+        ]
+        assert not variables["Beaching_Time"].time_series
+        assert variables["Beaching_Time"].datasets == [
+            "/Results/OilSpill/Data_2D/Beaching_Time"
+        ]
+        assert variables["Thickness_2D"].time_series
+        assert variables["Thickness_2D"].datasets == [
+            f"/Results/OilSpill/Data_2D/Thickness_2D/Thickness_2D_{step:05d}"
+            for step in range(1, N_STEPS + 1)
+        ]
+
+
+class TestReadTimes:
+    """Unit test for read_times() function."""
+
+    def test_read_times(self, hdf5_file):
+        with h5py.File(hdf5_file, "r") as h5file:
+            times = mohid_cmd.convert.read_times(h5file)
+        assert times == [
+            arrow.get("2017-06-15 00:30:00").shift(hours=+step)
+            for step in range(N_STEPS)
+        ]
+
+
+class TestMohidVariable:
+    """Unit tests for MohidVariable class."""
+
+    def test_block_starts(self):
+        variable = mohid_cmd.convert.MohidVariable("Thickness_2D", list("abcde"))
+        assert variable.block_starts(2) == [0, 2, 4]
+
+    def test_block_starts_no_time_steps(self):
+        variable = mohid_cmd.convert.MohidVariable(
+            "Beaching_Time", ["a"], time_series=False
+        )
+        assert variable.block_starts(None) == [None]
+
+    def test_read_block(self, hdf5_file):
+        with h5py.File(hdf5_file, "r") as h5file:
+            variable = mohid_cmd.convert.find_variables(h5file)["Thickness_2D"]
+            block = variable.read_block(h5file, 4, 2)
+        assert block.shape == (1, GRID_SHAPE[1], GRID_SHAPE[0])
+        numpy.testing.assert_array_equal(block[0], _values(5).T)
+
+
+class TestToStorageOrder:
+    """Unit test for to_storage_order() function."""
+
+    def test_to_storage_order(self):
+        values = numpy.arange(24).reshape(2, 3, 4)
+        storage_order = mohid_cmd.convert.to_storage_order(values)
+        assert storage_order.shape == (2, 4, 3)
+        assert storage_order.flags["C_CONTIGUOUS"]
+        numpy.testing.assert_array_equal(storage_order[1], values[1].T)
+
+
+class TestConvert:
+    """Unit tests for convert() function."""
+
+    @pytest.mark.parametrize("workers", [1, 3])
+    def test_convert(self, workers, hdf5_file, tmp_path):
+        netcdf4_file = tmp_path / "Lagrangian.nc"
+        var_names = mohid_cmd.convert.convert(
+            hdf5_file, netcdf4_file, chunk_sizes={"time": 2}, workers=workers
+        )
+        assert var_names == [
+            "Beaching_Time",
+            "OilConcentration",
+            "Thickness_2D",
+            "OilSpill_Data_3D_OilConcentration",
+        ]
+        with netCDF4.Dataset(netcdf4_file) as dataset:
+            assert dataset["time"].units == "seconds since 2017-06-15 00:30:00"
+            numpy.testing.assert_array_equal(
+                dataset["time"][:], [0, 3600, 7200, 10800, 14400]
+            )
+            thickness = dataset["Thickness_2D"]
+            assert thickness.dimensions == ("time", "grid_y", "grid_x")
+            assert thickness.units == "m"
+            assert thickness.chunking() == [2, GRID_SHAPE[1], GRID_SHAPE[0]]
+            assert thickness.filters()["zlib"]
+            assert thickness.filters()["shuffle"]
+            for step in range(N_STEPS):
+                numpy.testing.assert_array_equal(thickness[step], _values(step + 1).T)
+            concentration_3d = dataset["OilSpill_Data_3D_OilConcentration"]
+            assert concentration_3d.dimensions == (
+                "time",
+                "grid_z",
+                "grid_y",
+                "grid_x",
+            )
+            numpy.testing.assert_array_equal(
+                concentration_3d[2], numpy.swapaxes(_values(3, (2,) + GRID_SHAPE), 1, 2)
+            )
+            assert dataset["Beaching_Time"].dimensions == ("grid_y", "grid_x")
+            numpy.testing.assert_array_equal(dataset["Beaching_Time"][:], 7)
+            assert dataset["Latitude"].dimensions == ("grid_y_4", "grid_x_5")
+            assert dataset["Latitude"].units == "degrees_north"
+            numpy.testing.assert_array_equal(dataset["Bathymetry"][:], 42)
+            assert dataset.history.endswith(f"created by mohid convert {hdf5_file}")
+        assert not (tmp_path / ".Lagrangian.nc.tmp").exists()
+
+    def test_default_time_chunk(self, hdf5_file, tmp_path):
+        netcdf4_file = tmp_path / "Lagrangian.nc"
+        mohid_cmd.convert.convert(hdf5_file, netcdf4_file, var_names=["Thickness_2D"])
+        with netCDF4.Dataset(netcdf4_file) as dataset:
+            assert list(dataset.variables) == [
+                "time",
+                "Bathymetry",
+                "Latitude",
+                "WaterPoints2D",
+                "Thickness_2D",
+            ]
+            # Chunk sizes are limited to the dimension sizes
+            assert dataset["Thickness_2D"].chunking() == [
+                N_STEPS,
+                GRID_SHAPE[1],
+                GRID_SHAPE[0],
+            ]
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_partial_edge_chunks(self, workers, hdf5_file, tmp_path):
+        netcdf4_file = tmp_path / "Lagrangian.nc"
+        mohid_cmd.convert.convert(
+            hdf5_file,
+            netcdf4_file,
+            var_names=["OilConcentration", "Beaching_Time"],
+            chunk_sizes={"time": 2, "grid_x": 3},
+            workers=workers,
+        )
+        with netCDF4.Dataset(netcdf4_file) as dataset:
+            concentration = dataset["OilConcentration"]
+            assert concentration.chunking() == [2, GRID_SHAPE[1], 3]
+            numpy.testing.assert_array_equal(
+                concentration[:],
+                numpy.stack([_values(step).T for step in range(1, N_STEPS + 1)]),
+            )
+            numpy.testing.assert_array_equal(dataset["Beaching_Time"][:], 7)
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_time_stride(self, workers, hdf5_file, tmp_path):
+        netcdf4_file = tmp_path / "Lagrangian.nc"
+        mohid_cmd.convert.convert(
+            hdf5_file,
+            netcdf4_file,
+            var_names=["Thickness_2D", "Beaching_Time"],
+            chunk_sizes={"time": 2},
+            time_stride=2,
+            workers=workers,
+        )
+        with netCDF4.Dataset(netcdf4_file) as dataset:
+            numpy.testing.assert_array_equal(dataset["time"][:], [0, 7200, 14400])
+            numpy.testing.assert_array_equal(
+                dataset["Thickness_2D"][:],
+                numpy.stack([_values(step).T for step in (1, 3, 5)]),
+            )
+            numpy.testing.assert_array_equal(dataset["Beaching_Time"][:], 7)
+
+    def test_invalid_time_stride(self, hdf5_file, tmp_path, caplog):
+        caplog.set_level(logging.ERROR)
+        with pytest.raises(SystemExit):
+            mohid_cmd.convert.convert(
+                hdf5_file, tmp_path / "Lagrangian.nc", time_stride=0
+            )
+        assert caplog.messages[0] == "time stride must be a positive integer: 0"
+
+    def test_no_compression(self, hdf5_file, tmp_path):
+        netcdf4_file = tmp_path / "Lagrangian.nc"
+        mohid_cmd.convert.convert(
+            hdf5_file, netcdf4_file, var_names=["Thickness_2D"], complevel=0
+        )
+        with netCDF4.Dataset(netcdf4_file) as dataset:
+            thickness = dataset["Thickness_2D"]
+            assert not thickness.filters()["zlib"]
+            assert not thickness.filters()["shuffle"]
+            numpy.testing.assert_array_equal(thickness[-1], _values(N_STEPS).T)
+
+    def test_unknown_variable(self, hdf5_file, tmp_path, caplog):
+        caplog.set_level(logging.ERROR)
+        with pytest.raises(SystemExit):
+            mohid_cmd.convert.convert(
+                hdf5_file, tmp_path / "Lagrangian.nc", var_names=["OilThickness"]
+            )
+        assert caplog.messages[0] == (
+            f"variable(s) not found in {hdf5_file}: OilThickness; "
+            f"expected one or more of: Beaching_Time, OilConcentration, Thickness_2D, "
+            f"OilSpill_Data_3D_OilConcentration"
+        )
+        assert not list(tmp_path.glob("*.nc*"))
+
+    def test_mismatched_time_steps(self, hdf5_file, tmp_path, caplog):
+        with h5py.File(hdf5_file, "r+") as h5file:
+            del h5file["Results/OilSpill/Data_2D/Thickness_2D/Thickness_2D_00005"]
+        caplog.set_level(logging.ERROR)
+        with pytest.raises(SystemExit):
+            mohid_cmd.convert.convert(hdf5_file, tmp_path / "Lagrangian.nc")
+        assert caplog.messages[0] == (
+            f"number of time steps of variable(s) in {hdf5_file} differ from "
+            f"the 5 output times: Thickness_2D"
+        )
+
+    def test_tmp_file_removed_on_error(self, hdf5_file, tmp_path):
+        netcdf4_file = tmp_path / "Lagrangian.nc"
+        with patch(
+            "mohid_cmd.convert._write_variables",
+            side_effect=KeyboardInterrupt,
+            autospec=True,
+        ):
+            with pytest.raises(KeyboardInterrupt):
+                mohid_cmd.convert.convert(hdf5_file, netcdf4_file, workers=1)
+        assert not netcdf4_file.exists()
+        assert not (tmp_path / ".Lagrangian.nc.tmp").exists()
+
+
+class TestChunkEncoding:
+    """Unit tests for _ChunkEncoding class."""
+
+    def test_edge_chunks_padded(self, tmp_path):
+        with h5py.File(tmp_path / "chunks.h5", "w") as h5file:
+            dataset = h5file.create_dataset(
+                "var", shape=(3, 5), dtype="f4", chunks=(2, 4), compression="gzip"
+            )
+            encoding = mohid_cmd.convert._ChunkEncoding(dataset)
+        assert encoding.chunks == (2, 4)
+        assert encoding.complevel == 4
+        assert not encoding.shuffle
+        encoded = encoding.encode(numpy.ones((1, 5)), 2)
+        assert [offset for offset, data in encoded] == [(2, 0), (2, 4)]
+        assert all(isinstance(data, bytes) for offset, data in encoded)
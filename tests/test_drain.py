@@ -0,0 +1,211 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd drain sub-command plug-in unit tests.
+"""
+import json
+import logging
+import os
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+import mohid_cmd.content_store
+import mohid_cmd.drain
+import mohid_cmd.main
+import mohid_cmd.prepare
+import mohid_cmd.profile
+
+
+@pytest.fixture
+def drain_cmd():
+    return mohid_cmd.drain.Drain(mohid_cmd.main.MohidApp, [])
+
+
+def _make_run(job_dir, run_number, slurm_job_id, records, work_dir=None):
+    results_dir = job_dir / "results" / f"AKNS-spatial-{run_number}"
+    results_dir.mkdir(parents=True)
+    (results_dir / "slurm-job-id").write_text(f"{slurm_job_id}\n")
+    (results_dir / "timing.jsonl").write_text(
+        "".join(f"{json.dumps(record)}\n" for record in records)
+    )
+    if work_dir is not None:
+        (results_dir / "stdout").write_text(f"working dir: {work_dir}\n")
+    return results_dir
+
+
+def _record(run_number, phase, exit_code):
+    return {
+        "run_id": f"AKNS-spatial-{run_number}",
+        "phase": phase,
+        "host": "gra123",
+        "wall": 1000.0,
+        "mono_start": 10.0,
+        "mono_end": 7210.0,
+        "bytes": 0,
+        "exit_code": exit_code,
+    }
+
+
+@pytest.fixture
+def job_dir(tmp_path):
+    job_dir = tmp_path / "AKNS-spatial_2020-06-15T142000"
+    runs_dir = tmp_path / "runs"
+    # Run 0 finished
+    _make_run(job_dir, 0, "41", [_record(0, "model", 0), _record(0, "task", 0)])
+    # Run 1's model finished, but its results weren't gathered before the drain
+    work_dir = runs_dir / "AKNS-spatial-1_2020-06-15T150000"
+    (work_dir / "res").mkdir(parents=True)
+    (work_dir / "res" / "Lagrangian_AKNS-spatial-1.hdf5").write_text("")
+    (work_dir / "AKNS-spatial-1.yaml").write_text("")
+    _make_run(job_dir, 1, "41", [_record(1, "model", 0)], work_dir)
+    # Run 2 was interrupted during its model execution
+    work_dir = runs_dir / "AKNS-spatial-2_2020-06-15T150000"
+    (work_dir / "res").mkdir(parents=True)
+    _make_run(job_dir, 2, "41", [_record(2, "model", 143)], work_dir)
+    # Run 3 is being executed by another shard job
+    _make_run(job_dir, 3, "42", [])
+    return job_dir
+
+
+class TestParser:
+    """Unit tests for `mohid drain` sub-command command-line parser."""
+
+    def test_get_parser(self, drain_cmd):
+        parser = drain_cmd.get_parser("mohid drain")
+        assert parser.prog == "mohid drain"
+
+    def test_cmd_description(self, drain_cmd):
+        parser = drain_cmd.get_parser("mohid drain")
+        assert parser.description.strip().startswith(
+            "Find the runs of the Monte Carlo job in JOB_DIR that did not finish."
+        )
+
+    def test_job_dir_argument(self, drain_cmd):
+        parser = drain_cmd.get_parser("mohid drain")
+        assert parser._actions[1].dest == "job_dir"
+        assert parser._actions[1].metavar == "JOB_DIR"
+        assert parser._actions[1].type == Path
+        assert parser._actions[1].help
+
+    def test_slurm_job_id_option(self, drain_cmd):
+        parser = drain_cmd.get_parser("mohid drain")
+        assert parser._actions[2].dest == "slurm_job_id"
+        assert parser._actions[2].option_strings == ["--slurm-job-id"]
+        assert parser._actions[2].default is None
+        assert parser._actions[2].help
+
+    def test_parsed_args(self, drain_cmd):
+        parser = drain_cmd.get_parser("mohid drain")
+        parsed_args = parser.parse_args(["job_dir", "--slurm-job-id", "41"])
+        assert parsed_args.job_dir == Path("job_dir")
+        assert parsed_args.slurm_job_id == "41"
+
+
+class TestTakeAction:
+    """Unit test for `mohid drain` sub-command take_action() method."""
+
+    @patch("mohid_cmd.drain.drain", return_value="drained 0 unfinished run(s)")
+    def test_take_action(self, m_drain, drain_cmd, caplog):
+        parsed_args = SimpleNamespace(job_dir=Path("job_dir"), slurm_job_id="41")
+        caplog.set_level(logging.INFO)
+        drain_cmd.take_action(parsed_args)
+        m_drain.assert_called_once_with(Path("job_dir"), slurm_job_id="41")
+        assert caplog.messages[0] == "drained 0 unfinished run(s)"
+
+
+class TestDrain:
+    """Unit tests for drain() function."""
+
+    def test_summary(self, job_dir):
+        summary = mohid_cmd.drain.drain(job_dir, slurm_job_id="41")
+        assert summary == (
+            f"drained 2 unfinished run(s) in {job_dir}: 1 gathered, 1 interrupted"
+        )
+
+    def test_complete_results_gathered(self, job_dir):
+        cwd = Path.cwd()
+        mohid_cmd.drain.drain(job_dir, slurm_job_id="41")
+        results_dir = job_dir / "results" / "AKNS-spatial-1"
+        assert (results_dir / "Lagrangian_AKNS-spatial-1.hdf5").exists()
+        assert (results_dir / "AKNS-spatial-1.yaml").exists()
+        assert not (
+            job_dir.parent / "runs" / "AKNS-spatial-1_2020-06-15T150000"
+        ).exists()
+        assert Path.cwd() == cwd
+
+    def test_dedup_with_content_store(self, job_dir):
+        store = job_dir / mohid_cmd.content_store.STORE_DIR
+        store.mkdir()
+        mohid_cmd.drain.drain(job_dir, slurm_job_id="41")
+        results_dir = job_dir / "results" / "AKNS-spatial-1"
+        assert (results_dir / "AKNS-spatial-1.yaml").stat().st_nlink == 3
+        assert list(store.glob("*/*"))
+
+    def test_node_local_hdf5_gathered(self, job_dir, tmp_path):
+        node_local = tmp_path / "slurm_tmpdir"
+        node_local.mkdir()
+        (node_local / "Lagrangian_AKNS-spatial-1.hdf5").write_text("")
+        (node_local / "Lagrangian_AKNS-spatial-9.hdf5").write_text("")
+        work_dir = tmp_path / "runs" / "AKNS-spatial-1_2020-06-15T150000"
+        (work_dir / "res" / "Lagrangian_AKNS-spatial-1.hdf5").unlink()
+        (work_dir / mohid_cmd.prepare.NODE_LOCAL_LINK).symlink_to(node_local)
+        mohid_cmd.drain.drain(job_dir, slurm_job_id="41")
+        results_dir = job_dir / "results" / "AKNS-spatial-1"
+        assert (results_dir / "Lagrangian_AKNS-spatial-1.hdf5").exists()
+        assert not (results_dir / mohid_cmd.prepare.NODE_LOCAL_LINK).exists()
+        assert not work_dir.exists()
+        assert [path.name for path in node_local.iterdir()] == [
+            "Lagrangian_AKNS-spatial-9.hdf5"
+        ]
+
+    def test_node_local_link_dangling(self, job_dir, tmp_path):
+        work_dir = tmp_path / "runs" / "AKNS-spatial-1_2020-06-15T150000"
+        (work_dir / mohid_cmd.prepare.NODE_LOCAL_LINK).symlink_to(
+            tmp_path / "other_node_tmpdir"
+        )
+        mohid_cmd.drain.drain(job_dir, slurm_job_id="41")
+        assert not work_dir.exists()
+
+    def test_gathered_run_finished(self, job_dir):
+        mohid_cmd.drain.drain(job_dir, slurm_job_id="41")
+        results_dir = job_dir / "results" / "AKNS-spatial-1"
+        assert mohid_cmd.profile.task_exit_code(results_dir) == 0
+
+    def test_interrupted_run_left(self, job_dir):
+        mohid_cmd.drain.drain(job_dir, slurm_job_id="41")
+        results_dir = job_dir / "results" / "AKNS-spatial-2"
+        assert mohid_cmd.profile.task_exit_code(results_dir) is None
+        assert (job_dir.parent / "runs" / "AKNS-spatial-2_2020-06-15T150000").exists()
+
+    def test_drained_runs_recorded(self, job_dir):
+        mohid_cmd.drain.drain(job_dir, slurm_job_id="41")
+        drained_runs = job_dir / mohid_cmd.drain.DRAINED_RUNS_FILE
+        records = [json.loads(line) for line in drained_runs.read_text().splitlines()]
+        assert [(record["run_id"], record["state"]) for record in records] == [
+            ("AKNS-spatial-1", "gathered"),
+            ("AKNS-spatial-2", "interrupted"),
+        ]
+        assert records[1]["slurm_job_id"] == "41"
+        assert records[1]["work_dir"] == os.fspath(
+            job_dir.parent / "runs" / "AKNS-spatial-2_2020-06-15T150000"
+        )
+
+    def test_all_slurm_jobs(self, job_dir):
+        summary = mohid_cmd.drain.drain(job_dir)
+        assert summary == (
+            f"drained 3 unfinished run(s) in {job_dir}: 1 gathered, 2 interrupted"
+        )
@@ -0,0 +1,272 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd Monte Carlo ensemble statistics unit tests.
+"""
+import logging
+
+import netCDF4
+import numpy
+import pytest
+
+import mohid_cmd.ensemble
+
+
+def _write_lagrangian(path, thickness, beaching_time=None, chunksizes=None):
+    """Write a Lagrangian results file with an OilThickness_2D variable
+    and an optional Beaching_Time variable.
+    """
+    with netCDF4.Dataset(path, "w") as dataset:
+        dataset.createDimension("time", thickness.shape[0])
+        dataset.createDimension("grid_y", thickness.shape[1])
+        dataset.createDimension("grid_x", thickness.shape[2])
+        var = dataset.createVariable(
+            "OilThickness_2D",
+            "f4",
+            ("time", "grid_y", "grid_x"),
+            zlib=True,
+            chunksizes=chunksizes,
+            fill_value=-9999.0,
+        )
+        var[:] = thickness
+        if beaching_time is not None:
+            var = dataset.createVariable("Beaching_Time", "f8", ("grid_y", "grid_x"))
+            var[:] = beaching_time
+
+
+@pytest.fixture
+def lagrangian_files(tmp_path):
+    """Lagrangian results files of 3 runs with 5 time steps on a 2x3 grid;
+    grid point (1, 2) is land.
+    """
+    lagrangian_files = []
+    for n in range(3):
+        thickness = numpy.zeros((5, 2, 3))
+        thickness[n, 0, 0] = n + 1
+        thickness[:, 0, 1] = n
+        thickness = numpy.ma.masked_array(thickness, mask=False)
+        thickness[:, 1, 2] = numpy.ma.masked
+        results_dir = tmp_path / "results" / f"AKNS-spatial-{n}"
+        results_dir.mkdir(parents=True)
+        lagrangian_file = results_dir / f"Lagrangian_AKNS_crude_AKNS-spatial-{n}.nc"
+        _write_lagrangian(lagrangian_file, thickness, chunksizes=(2, 2, 3))
+        lagrangian_files.append(lagrangian_file)
+    return lagrangian_files
+
+
+class TestLagrangianFile:
+    """Unit tests for LagrangianFile class."""
+
+    def test_grid_shape(self, lagrangian_files):
+        with mohid_cmd.ensemble.LagrangianFile(lagrangian_files[0]) as lagrangian:
+            assert lagrangian.grid_shape("OilThickness_2D") == (2, 3)
+
+    def test_grid_shape_no_time(self, tmp_path):
+        lagrangian_file = tmp_path / "Lagrangian.nc"
+        _write_lagrangian(lagrangian_file, numpy.zeros((1, 2, 3)), numpy.ones((2, 3)))
+        with mohid_cmd.ensemble.LagrangianFile(lagrangian_file) as lagrangian:
+            assert lagrangian.grid_shape("Beaching_Time") == (2, 3)
+
+    def test_close(self, lagrangian_files):
+        lagrangian = mohid_cmd.ensemble.LagrangianFile(lagrangian_files[0])
+        lagrangian.close()
+        assert not lagrangian.dataset.isopen()
+
+
+class TestIterTimeChunks:
+    """Unit tests for LagrangianFile.iter_time_chunks() method."""
+
+    def test_storage_chunks(self, lagrangian_files):
+        with mohid_cmd.ensemble.LagrangianFile(lagrangian_files[0]) as lagrangian:
+            chunks = list(lagrangian.iter_time_chunks("OilThickness_2D"))
+        assert [chunk.shape for chunk in chunks] == [(2, 2, 3), (2, 2, 3), (1, 2, 3)]
+
+    def test_time_chunk(self, lagrangian_files):
+        with mohid_cmd.ensemble.LagrangianFile(lagrangian_files[0]) as lagrangian:
+            chunks = list(lagrangian.iter_time_chunks("OilThickness_2D", time_chunk=3))
+        assert [chunk.shape[0] for chunk in chunks] == [3, 2]
+
+    def test_contiguous(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(mohid_cmd.ensemble, "TIME_CHUNK", 4)
+        lagrangian_file = tmp_path / "Lagrangian.nc"
+        with netCDF4.Dataset(lagrangian_file, "w") as dataset:
+            dataset.createDimension("time", 5)
+            dataset.createDimension("grid_x", 2)
+            var = dataset.createVariable(
+                "OilThickness_2D", "f4", ("time", "grid_x"), contiguous=True
+            )
+            var[:] = numpy.zeros((5, 2))
+        with mohid_cmd.ensemble.LagrangianFile(lagrangian_file) as lagrangian:
+            chunks = list(lagrangian.iter_time_chunks("OilThickness_2D"))
+        assert [chunk.shape[0] for chunk in chunks] == [4, 1]
+
+    def test_masked_values_are_nan(self, lagrangian_files):
+        with mohid_cmd.ensemble.LagrangianFile(lagrangian_files[0]) as lagrangian:
+            chunk = next(lagrangian.iter_time_chunks("OilThickness_2D"))
+        assert type(chunk) is numpy.ndarray
+        assert numpy.isnan(chunk[:, 1, 2]).all()
+        assert not numpy.isnan(chunk[:, :, :2]).any()
+
+    def test_no_time_dimension(self, tmp_path):
+        lagrangian_file = tmp_path / "Lagrangian.nc"
+        _write_lagrangian(lagrangian_file, numpy.zeros((1, 2, 3)), numpy.ones((2, 3)))
+        with mohid_cmd.ensemble.LagrangianFile(lagrangian_file) as lagrangian:
+            chunks = list(lagrangian.iter_time_chunks("Beaching_Time"))
+        assert [chunk.shape for chunk in chunks] == [(1, 2, 3)]
+
+
+class TestReduceTime:
+    """Unit tests for LagrangianFile.reduce_time() method."""
+
+    def test_max(self, lagrangian_files):
+        with mohid_cmd.ensemble.LagrangianFile(lagrangian_files[2]) as lagrangian:
+            field = lagrangian.reduce_time("OilThickness_2D", "max")
+        numpy.testing.assert_array_equal(field, [[3, 2, 0], [0, 0, numpy.nan]])
+
+    def test_mean(self, lagrangian_files):
+        with mohid_cmd.ensemble.LagrangianFile(lagrangian_files[2]) as lagrangian:
+            field = lagrangian.reduce_time("OilThickness_2D", "mean", time_chunk=2)
+        numpy.testing.assert_allclose(field, [[0.6, 2, 0], [0, 0, numpy.nan]])
+
+    def test_unknown_reduction(self, lagrangian_files):
+        with mohid_cmd.ensemble.LagrangianFile(lagrangian_files[0]) as lagrangian:
+            with pytest.raises(ValueError):
+                lagrangian.reduce_time("OilThickness_2D", "median")
+
+
+class TestEnsembleStats:
+    """Unit tests for EnsembleStats class."""
+
+    def test_add(self):
+        stats = mohid_cmd.ensemble.EnsembleStats(thresholds=[1])
+        stats.add([[0, 2], [numpy.nan, numpy.nan]])
+        stats.add([[1, 4], [3, numpy.nan]])
+        assert stats.n_runs == 2
+        numpy.testing.assert_array_equal(stats.mean, [[0.5, 3], [3, numpy.nan]])
+        numpy.testing.assert_array_equal(stats.max, [[1, 4], [3, numpy.nan]])
+        numpy.testing.assert_array_equal(
+            stats.exceedance_probability(1), [[0, 1], [0.5, 0]]
+        )
+
+    def test_variance(self):
+        fields = [[[1, numpy.nan, 5]], [[3, 2, numpy.nan]], [[8, numpy.nan, numpy.nan]]]
+        stats = mohid_cmd.ensemble.EnsembleStats()
+        for field in fields:
+            stats.add(field)
+        numpy.testing.assert_allclose(
+            stats.variance, [[numpy.var([1, 3, 8], ddof=1), numpy.nan, numpy.nan]]
+        )
+        numpy.testing.assert_allclose(stats.mean, [[4, 2, 5]])
+
+    def test_variance_large_offset(self):
+        # Welford's algorithm is not degraded by cancellation
+        values = 1e9 + numpy.array([4, 7, 13, 16])
+        stats = mohid_cmd.ensemble.EnsembleStats()
+        for value in values:
+            stats.add([value])
+        numpy.testing.assert_allclose(stats.variance, [30])
+
+    def test_histogram(self):
+        stats = mohid_cmd.ensemble.EnsembleStats(bin_edges=[0, 1, 2])
+        for field in ([0, 1, -1], [0.5, 2, numpy.nan], [1.5, 3, 1]):
+            stats.add(field)
+        numpy.testing.assert_array_equal(stats.histogram, [[2, 0, 0], [1, 2, 1]])
+
+    def test_one_bin_edge(self):
+        with pytest.raises(ValueError):
+            mohid_cmd.ensemble.EnsembleStats(bin_edges=[0])
+
+    def test_shape_mismatch(self):
+        stats = mohid_cmd.ensemble.EnsembleStats()
+        stats.add(numpy.zeros((2, 3)))
+        with pytest.raises(ValueError):
+            stats.add(numpy.zeros((3, 2)))
+
+    def test_merge(self):
+        fields = [numpy.array([[n, numpy.nan], [2 * n, 1]]) for n in range(5)]
+        fields[3][1, 1] = numpy.nan
+        expected = mohid_cmd.ensemble.EnsembleStats([1.5], [0, 2, 10])
+        for field in fields:
+            expected.add(field)
+        stats = mohid_cmd.ensemble.EnsembleStats([1.5], [0, 2, 10])
+        other = mohid_cmd.ensemble.EnsembleStats([1.5], [0, 2, 10])
+        for field in fields[:2]:
+            stats.add(field)
+        for field in fields[2:]:
+            other.add(field)
+        stats.merge(other)
+        assert stats.n_runs == 5
+        numpy.testing.assert_array_equal(stats.mean, expected.mean)
+        numpy.testing.assert_array_equal(stats.max, expected.max)
+        numpy.testing.assert_array_equal(stats.exceedances, expected.exceedances)
+        numpy.testing.assert_allclose(stats.variance, expected.variance)
+        numpy.testing.assert_array_equal(stats.histogram, expected.histogram)
+        numpy.testing.assert_array_equal(stats.n_valid, expected.n_valid)
+
+    def test_merge_into_empty(self):
+        stats = mohid_cmd.ensemble.EnsembleStats()
+        other = mohid_cmd.ensemble.EnsembleStats()
+        other.add(numpy.ones((2, 2)))
+        stats.merge(other)
+        stats.merge(mohid_cmd.ensemble.EnsembleStats())
+        assert stats.n_runs == 1
+        numpy.testing.assert_array_equal(stats.mean, numpy.ones((2, 2)))
+
+    def test_merge_threshold_mismatch(self):
+        stats = mohid_cmd.ensemble.EnsembleStats(thresholds=[1])
+        with pytest.raises(ValueError):
+            stats.merge(mohid_cmd.ensemble.EnsembleStats(thresholds=[2]))
+
+    def test_merge_bin_edges_mismatch(self):
+        stats = mohid_cmd.ensemble.EnsembleStats(bin_edges=[0, 1])
+        with pytest.raises(ValueError):
+            stats.merge(mohid_cmd.ensemble.EnsembleStats(bin_edges=[0, 2]))
+
+
+class TestFindLagrangianFiles:
+    """Unit tests for find_lagrangian_files() function."""
+
+    def test_find_lagrangian_files(self, lagrangian_files, caplog):
+        results_dirs = [path.parent for path in lagrangian_files]
+        failed_dir = results_dirs[0].parent / "AKNS-spatial-3"
+        failed_dir.mkdir()
+        caplog.set_level(logging.WARNING)
+        found = mohid_cmd.ensemble.find_lagrangian_files(results_dirs + [failed_dir])
+        assert found == lagrangian_files
+        assert caplog.messages == [f"no Lagrangian_*.nc file found in {failed_dir}"]
+
+
+class TestReduceEnsemble:
+    """Unit tests for reduce_ensemble() function."""
+
+    def test_reduce_ensemble(self, lagrangian_files):
+        stats = mohid_cmd.ensemble.reduce_ensemble(
+            lagrangian_files, "OilThickness_2D", thresholds=[0.5, 2.5]
+        )
+        assert stats.n_runs == 3
+        # Maximum thicknesses over time of runs 0, 1, 2 at (0, 0) are 1, 2, 3,
+        # and at (0, 1) are 0, 1, 2
+        numpy.testing.assert_array_equal(stats.mean, [[2, 1, 0], [0, 0, numpy.nan]])
+        numpy.testing.assert_array_equal(stats.max, [[3, 2, 0], [0, 0, numpy.nan]])
+        numpy.testing.assert_allclose(
+            stats.exceedance_probability(0.5), [[1, 2 / 3, 0], [0, 0, 0]]
+        )
+        numpy.testing.assert_allclose(
+            stats.exceedance_probability(2.5), [[1 / 3, 0, 0], [0, 0, 0]]
+        )
+
+    def test_no_files(self):
+        stats = mohid_cmd.ensemble.reduce_ensemble([], "OilThickness_2D")
+        assert stats.n_runs == 0
+        assert stats.total is None
@@ -0,0 +1,105 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd executors module unit tests.
+"""
+import logging
+import subprocess
+import textwrap
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+import mohid_cmd.executors
+
+
+class TestGetExecutor:
+    """Unit tests for get_executor() function."""
+
+    def test_sbatch_executor(self):
+        executor = mohid_cmd.executors.get_executor("sbatch")
+        assert isinstance(executor, mohid_cmd.executors.SbatchExecutor)
+
+    def test_local_executor(self):
+        executor = mohid_cmd.executors.get_executor("local", cpus=3)
+        assert isinstance(executor, mohid_cmd.executors.LocalExecutor)
+        assert executor.cpus == 3
+
+    @patch("mohid_cmd.executors.os.cpu_count", return_value=8, autospec=True)
+    def test_local_executor_default_cpus(self, m_cpu_count):
+        executor = mohid_cmd.executors.get_executor("local")
+        assert executor.cpus == 8
+
+    def test_unknown_executor(self):
+        with pytest.raises(KeyError):
+            mohid_cmd.executors.get_executor("pbs")
+
+
+class TestSbatchExecutor:
+    """Unit test for SbatchExecutor class."""
+
+    @patch("mohid_cmd.executors.subprocess.run", autospec=True)
+    def test_submit(self, m_run):
+        m_run().stdout = "Submitted batch job 12345678"
+        executor = mohid_cmd.executors.SbatchExecutor()
+        submit_job_msg = executor.submit(
+            Path("job_dir/glost-job.sh"), tasks=["bash task.sh 0"]
+        )
+        m_run.assert_called_with(
+            ["sbatch", "job_dir/glost-job.sh"],
+            check=True,
+            universal_newlines=True,
+            stdout=subprocess.PIPE,
+        )
+        assert submit_job_msg == "Submitted batch job 12345678"
+
+
+class TestLocalExecutor:
+    """Unit tests for LocalExecutor class."""
+
+    def test_run_job_script(self, tmp_path):
+        job_script = tmp_path / "MOHID.sh"
+        job_script.write_text(
+            textwrap.dedent(
+                f"""\
+                #!/bin/bash
+                #SBATCH --job-name=ignored-by-bash
+                echo "ran" >{tmp_path}/ran.txt
+                """
+            )
+        )
+        executor = mohid_cmd.executors.LocalExecutor(cpus=2)
+        msg = executor.submit(job_script)
+        assert (tmp_path / "ran.txt").read_text() == "ran\n"
+        assert msg == "Ran 1 task(s) locally on 1 CPU(s); 0 failed"
+
+    def test_run_tasks(self, tmp_path):
+        tasks = [f'echo "$MONTE_CARLO" >$MONTE_CARLO/task-{n}.txt' for n in range(5)]
+        executor = mohid_cmd.executors.LocalExecutor(cpus=2)
+        msg = executor.submit(
+            tmp_path / "glost-job.sh", tasks=tasks, env={"MONTE_CARLO": str(tmp_path)}
+        )
+        for n in range(5):
+            assert (tmp_path / f"task-{n}.txt").read_text() == f"{tmp_path}\n"
+        assert msg == "Ran 5 task(s) locally on 2 CPU(s); 0 failed"
+
+    def test_failed_tasks(self, tmp_path, caplog):
+        executor = mohid_cmd.executors.LocalExecutor(cpus=4)
+        caplog.set_level(logging.WARNING)
+        msg = executor.submit(
+            tmp_path / "glost-job.sh", tasks=["true", "exit 1", "exit 42"]
+        )
+        assert caplog.messages[0] == "2 of 3 local task(s) failed"
+        assert msg == "Ran 3 task(s) locally on 3 CPU(s); 2 failed"
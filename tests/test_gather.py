@@ -14,6 +14,9 @@
 #  limitations under the License.
 """MOHID-Cmd gather sub-command plug-in unit tests.
 """
+import io
+import logging
+import os
 from pathlib import Path
 from types import SimpleNamespace
 from unittest.mock import patch
@@ -49,46 +52,197 @@ class TestParser:
         assert parser._actions[1].type == Path
         assert parser._actions[1].help
 
+    def test_dedup_option(self, gather_cmd):
+        parser = gather_cmd.get_parser("mohid gather")
+        assert parser._actions[2].dest == "dedup"
+        assert parser._actions[2].option_strings == ["--dedup"]
+        assert parser._actions[2].const is True
+        assert parser._actions[2].default is False
+        assert parser._actions[2].help
+
+    def test_plan_option(self, gather_cmd):
+        parser = gather_cmd.get_parser("mohid gather")
+        assert parser._actions[3].dest == "plan"
+        assert parser._actions[3].option_strings == ["--plan"]
+        assert parser._actions[3].const is True
+        assert parser._actions[3].default is False
+        assert parser._actions[3].help
+
 
 class TestTakeAction:
     """Unit tests for `mohid gather` sub-command take_action() method."""
 
     @patch("mohid_cmd.gather.gather", autospec=True)
     def test_take_action(self, m_gather, gather_cmd):
-        parsed_args = SimpleNamespace(results_dir=Path("results dir"))
+        parsed_args = SimpleNamespace(
+            results_dir=Path("results dir"), dedup=True, plan=False
+        )
+        gather_cmd.take_action(parsed_args)
+        m_gather.assert_called_once_with(Path("results dir"), dedup=True)
+
+    @patch("mohid_cmd.gather.gather", autospec=True)
+    def test_plan(self, m_gather, gather_cmd, tmp_path, monkeypatch):
+        tmp_run_dir = tmp_path / "MarathassaConstTS_2020-06-15T142000"
+        (tmp_run_dir / "res").mkdir(parents=True)
+        (tmp_run_dir / "Model.dat").write_text("")
+        (tmp_run_dir / "winds.hdf5").symlink_to(tmp_path)
+        monkeypatch.chdir(tmp_run_dir)
+        results_dir = tmp_path / "results"
+        gather_cmd.app = SimpleNamespace(stdout=io.StringIO())
+        parsed_args = SimpleNamespace(results_dir=results_dir, dedup=False, plan=True)
         gather_cmd.take_action(parsed_args)
-        m_gather.assert_called_once_with(Path("results dir"))
-
-
-@pytest.mark.parametrize(
-    "res_files, expected",
-    (
-        (
-            {
-                Path("Lagrangian_MarathassaCostTS.hdf5"),
-                Path("Hydrodynamics_MarathassaCostTS.hdf5"),
-            },
-            {
-                Path("Lagrangian_MarathassaCostTS.hdf5"),
-                Path("Hydrodynamics_MarathassaCostTS.hdf5"),
-            },
-        ),
-    ),
-)
-@patch("mohid_cmd.gather.nemo_cmd.resolved_path", spec=True)
-@patch("mohid_cmd.gather.Path.glob", autospec=True)
-@patch("mohid_cmd.gather.Path.is_symlink", return_value=True, autospec=True)
-@patch("mohid_cmd.gather._move_results", autospec=True)
+        assert gather_cmd.app.stdout.getvalue() == (
+            f"move Model.dat {results_dir / 'Model.dat'}\nunlink winds.hdf5\nrmdir res\n"
+        )
+        assert not m_gather.called
+        assert not results_dir.exists()
+
+
+class TestMakePlan:
+    """Unit tests for make_plan() function."""
+
+    def test_make_plan(self, tmp_path):
+        tmp_run_dir = tmp_path / "MarathassaConstTS_2020-06-15T142000"
+        (tmp_run_dir / "res").mkdir(parents=True)
+        (tmp_run_dir / "nomfich.dat").write_text("")
+        (tmp_run_dir / "Model.dat").write_text("")
+        (tmp_run_dir / "MIDOSS-MOHID").mkdir()
+        (tmp_run_dir / "winds.hdf5").symlink_to(tmp_path)
+        (tmp_run_dir / "res" / "Lagrangian_MarathassaConstTS.hdf5").write_text("")
+        plan = mohid_cmd.gather.make_plan(tmp_run_dir, tmp_path / "results")
+        assert plan.moves == [
+            ("MIDOSS-MOHID", False),
+            ("Model.dat", True),
+            ("nomfich.dat", True),
+            ("res/Lagrangian_MarathassaConstTS.hdf5", True),
+        ]
+        assert plan.symlinks == ["winds.hdf5"]
+        assert plan.res_dir
+
+    def test_no_res_dir(self, tmp_path):
+        tmp_run_dir = tmp_path / "MarathassaConstTS_2020-06-15T142000"
+        tmp_run_dir.mkdir()
+        (tmp_run_dir / "Model.dat").write_text("")
+        plan = mohid_cmd.gather.make_plan(tmp_run_dir, tmp_path / "results")
+        assert plan.moves == [("Model.dat", True)]
+        assert not plan.res_dir
+        assert plan.lines() == [f"move Model.dat {tmp_path / 'results' / 'Model.dat'}"]
+
+    def test_results_dir_is_tmp_run_dir(self, tmp_path):
+        (tmp_path / "Model.dat").write_text("")
+        plan = mohid_cmd.gather.make_plan(tmp_path, tmp_path)
+        assert plan.lines() == []
+
+
 class TestGather:
-    """Unit test for `mohid gather` gather() function."""
-
-    def test_gather(
-        self, m_mv_results, m_is_link, m_glob, m_rslv_path, res_files, expected, tmpdir
-    ):
-        p_results_dir = tmpdir.ensure_dir("results_dir")
-        symlinks = {Path("winds.hdf5"), Path("currents.hdf5")}
-        m_glob.side_effect = (symlinks, res_files)
-        mohid_cmd.gather.gather(Path(str(p_results_dir)))
-        m_rslv_path.assert_called_once_with(Path(str(p_results_dir)))
-        m_rslv_path().mkdir.assert_called_once_with(parents=True, exist_ok=True)
-        m_mv_results.assert_called_once_with(m_rslv_path(), symlinks, expected)
+    """Unit tests for `mohid gather` gather() function."""
+
+    def test_gather(self, tmp_path, monkeypatch):
+        tmp_run_dir = tmp_path / "MarathassaConstTS_2020-06-15T142000"
+        (tmp_run_dir / "res").mkdir(parents=True)
+        (tmp_run_dir / "Model.dat").write_text("START : 2017 6 15 0 0 0\n")
+        (tmp_run_dir / "res" / "Lagrangian_MarathassaConstTS.hdf5").write_text("")
+        for name in ("winds.hdf5", "currents.hdf5"):
+            (tmp_run_dir / name).symlink_to(tmp_path)
+        monkeypatch.chdir(tmp_run_dir)
+        results_dir = tmp_path / "results" / "MarathassaConstTS"
+        plan = mohid_cmd.gather.gather(results_dir)
+        assert plan.results_dir == results_dir
+        assert not list(tmp_run_dir.iterdir())
+        assert sorted(p.name for p in results_dir.iterdir()) == [
+            "Lagrangian_MarathassaConstTS.hdf5",
+            "Model.dat",
+        ]
+
+    def test_results_dir_is_tmp_run_dir(self, tmp_path, monkeypatch):
+        (tmp_path / "Model.dat").write_text("")
+        monkeypatch.chdir(tmp_path)
+        mohid_cmd.gather.gather(tmp_path)
+        assert (tmp_path / "Model.dat").exists()
+
+
+class TestGatherDedup:
+    """Unit tests for `mohid gather` gather() function with deduplication."""
+
+    @staticmethod
+    def make_tmp_run_dir(tmp_path, run_id):
+        tmp_run_dir = tmp_path / f"{run_id}_2020-06-15T142000"
+        (tmp_run_dir / "res").mkdir(parents=True)
+        (tmp_run_dir / "Model.dat").write_text("START : 2017 6 15 0 0 0\n")
+        (tmp_run_dir / "nomfich.dat").write_text(f"PARTIC_HDF : {run_id}.hdf\n")
+        (tmp_run_dir / "res" / f"Lagrangian_{run_id}.nc").write_bytes(os.urandom(64))
+        (tmp_run_dir / "winds.hdf5").symlink_to(tmp_path)
+        return tmp_run_dir
+
+    def test_identical_files_linked(self, tmp_path, monkeypatch):
+        job_dir = tmp_path / "AKNS-spatial_2020-06-15T142000"
+        monkeypatch.setattr(mohid_cmd.gather.mohid_cmd.content_store, "MAX_BYTES", 32)
+        for i in range(2):
+            monkeypatch.chdir(self.make_tmp_run_dir(tmp_path, f"AKNS-spatial-{i}"))
+            mohid_cmd.gather.gather(
+                job_dir / "results" / f"AKNS-spatial-{i}", dedup=True
+            )
+            assert not list(Path.cwd().iterdir())
+        results = [job_dir / "results" / f"AKNS-spatial-{i}" for i in range(2)]
+        assert (results[0] / "Model.dat").samefile(results[1] / "Model.dat")
+        assert (results[0] / "Model.dat").stat().st_nlink == 3
+        assert not (results[0] / "nomfich.dat").samefile(results[1] / "nomfich.dat")
+        assert (results[0] / "Lagrangian_AKNS-spatial-0.nc").stat().st_nlink == 1
+        assert len(list((job_dir / "content-store").glob("*/*"))) == 3
+
+    def test_not_monte_carlo_run(self, tmp_path, monkeypatch, caplog):
+        results_dir = tmp_path / "results-AKNS-spatial-0"
+        monkeypatch.chdir(self.make_tmp_run_dir(tmp_path, "AKNS-spatial-0"))
+        caplog.set_level(logging.WARNING)
+        mohid_cmd.gather.gather(results_dir, dedup=True)
+        assert (results_dir / "Model.dat").stat().st_nlink == 1
+        assert caplog.messages == [
+            f"{results_dir} is not the results directory of a Monte Carlo run, "
+            f"so files will not be deduplicated"
+        ]
+
+
+class TestDeleteSymlinksAndResDir:
+    """Unit test for _delete_symlinks_and_res_dir() function."""
+
+    def test_delete_symlinks_and_res_dir(self, tmp_path, monkeypatch):
+        tmp_run_dir = tmp_path / "AKNS-spatial-0_2020-06-15T142000"
+        (tmp_run_dir / "res").mkdir(parents=True)
+        for name in ("winds.hdf5", "currents.hdf5", "node-local"):
+            (tmp_run_dir / name).symlink_to(tmp_path / name)
+        monkeypatch.chdir(tmp_run_dir)
+        symlinks = [p.name for p in tmp_run_dir.iterdir() if p.is_symlink()]
+        mohid_cmd.gather._delete_symlinks_and_res_dir(symlinks)
+        assert not list(tmp_run_dir.iterdir())
+
+    def test_no_res_dir(self, tmp_path, monkeypatch):
+        (tmp_path / "winds.hdf5").symlink_to(tmp_path / "forcing")
+        monkeypatch.chdir(tmp_path)
+        mohid_cmd.gather._delete_symlinks_and_res_dir(["winds.hdf5"], res_dir=False)
+        assert not list(tmp_path.iterdir())
+
+
+class TestUnlinkAll:
+    """Unit tests for unlink_all() function."""
+
+    @pytest.mark.parametrize("n_files, workers", ((3, 4), (100, 1), (100, 4)))
+    def test_unlink_all(self, n_files, workers, tmp_path):
+        names = [f"Lagrangian_{i}.hdf5" for i in range(n_files)]
+        for name in names:
+            (tmp_path / name).write_text("")
+        (tmp_path / "keep").write_text("")
+        dir_fd = os.open(tmp_path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            n_deleted = mohid_cmd.gather.unlink_all(dir_fd, names, workers)
+        finally:
+            os.close(dir_fd)
+        assert n_deleted == n_files
+        assert [path.name for path in tmp_path.iterdir()] == ["keep"]
+
+    def test_missing_file(self, tmp_path):
+        dir_fd = os.open(tmp_path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            with pytest.raises(FileNotFoundError):
+                mohid_cmd.gather.unlink_all(dir_fd, ["winds.hdf5"])
+        finally:
+            os.close(dir_fd)
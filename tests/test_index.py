@@ -0,0 +1,210 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd index sub-command plug-in unit tests.
+"""
+import json
+import logging
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import mohid_cmd.index
+import mohid_cmd.job_index
+import mohid_cmd.main
+
+
+@pytest.fixture
+def index_cmd():
+    return mohid_cmd.index.Index(mohid_cmd.main.MohidApp, [])
+
+
+@pytest.fixture
+def job_dir(tmp_path):
+    """Job directory in which run 0 succeeded, run 1 failed, run 2 didn't finish,
+    and run 3 didn't start.
+    """
+    job_dir = tmp_path / "AKNS-spatial_2019-11-24T170743"
+    job_dir.mkdir()
+    (job_dir / "AKNS-spatial.yaml").write_text(
+        textwrap.dedent(
+            f"""\
+            job id: AKNS-spatial
+            paths:
+              forcing directory: {tmp_path / 'forcing'}
+            """
+        )
+    )
+    (job_dir / "AKNS_spatial.csv").write_text(
+        textwrap.dedent(
+            """\
+            spill_date_hour, run_days, spill_lon, spill_lat, spill_volume, Lagrangian_template
+            2017-06-15 02:00, 7, -123.16, 49.2, 1000, Lagrangian_akns.dat
+            2017-06-20 14:00, 7, -122.86, 48.7, 250.5, Lagrangian_bunker.dat
+            2017-07-01 00:00, 7, -124.5, 48.5, 12, Lagrangian_akns.dat
+            2017-12-01 08:00, 14, -123.0, 49.0, 42, Lagrangian_akns.dat
+            """
+        )
+    )
+    for n, exit_code in enumerate([0, 1]):
+        results_dir = job_dir / "results" / f"AKNS-spatial-{n}"
+        results_dir.mkdir(parents=True)
+        record = {"run_id": f"AKNS-spatial-{n}", "phase": "task"}
+        record["exit_code"] = exit_code
+        (results_dir / "timing.jsonl").write_text(f"{json.dumps(record)}\n")
+    (job_dir / "results" / "AKNS-spatial-2").mkdir()
+    return job_dir
+
+
+class TestParser:
+    """Unit tests for `mohid index` sub-command command-line parser."""
+
+    def test_get_parser(self, index_cmd):
+        parser = index_cmd.get_parser("mohid index")
+        assert parser.prog == "mohid index"
+
+    def test_job_dir_argument(self, index_cmd):
+        parser = index_cmd.get_parser("mohid index")
+        assert parser._actions[1].dest == "job_dir"
+        assert parser._actions[1].metavar == "JOB_DIR"
+        assert parser._actions[1].type == Path
+        assert parser._actions[1].help
+
+    def test_task_exit_option(self, index_cmd):
+        parser = index_cmd.get_parser("mohid index")
+        assert parser._actions[2].dest == "task_exit"
+        assert parser._actions[2].option_strings == ["--task-exit"]
+        assert parser._actions[2].type == int
+        assert parser._actions[2].nargs == 2
+        assert parser._actions[2].default is None
+        assert parser._actions[2].help
+
+    def test_sync_option(self, index_cmd):
+        parser = index_cmd.get_parser("mohid index")
+        assert parser._actions[3].dest == "sync"
+        assert parser._actions[3].option_strings == ["--sync"]
+        assert parser._actions[3].const is True
+        assert parser._actions[3].default is False
+        assert parser._actions[3].help
+
+    def test_parsed_args(self, index_cmd):
+        parser = index_cmd.get_parser("mohid index")
+        parsed_args = parser.parse_args(["job_dir/", "--task-exit", "42", "1"])
+        assert parsed_args.job_dir == Path("job_dir/")
+        assert parsed_args.task_exit == [42, 1]
+        assert not parsed_args.sync
+
+
+class TestTakeAction:
+    """Unit tests for `mohid index` sub-command take_action() method."""
+
+    def test_build(self, index_cmd, job_dir, caplog):
+        caplog.set_level(logging.INFO)
+        parsed_args = SimpleNamespace(job_dir=job_dir, task_exit=None, sync=False)
+        index_cmd.take_action(parsed_args)
+        assert caplog.messages == [
+            f"indexed 4 runs in {job_dir / mohid_cmd.job_index.INDEX_FILE}"
+        ]
+
+    def test_task_exit(self, index_cmd, job_dir):
+        parsed_args = SimpleNamespace(job_dir=job_dir, task_exit=[3, 0], sync=False)
+        index_cmd.take_action(parsed_args)
+        record = mohid_cmd.job_index.read_status(job_dir / "results" / "AKNS-spatial-3")
+        assert record["status"] == mohid_cmd.job_index.DONE
+        assert record["exit_code"] == 0
+
+    def test_sync(self, index_cmd, job_dir, caplog):
+        mohid_cmd.index.build_index(job_dir)
+        mohid_cmd.job_index.record_task_exit(job_dir, 3, 0)
+        caplog.set_level(logging.INFO)
+        parsed_args = SimpleNamespace(job_dir=job_dir, task_exit=None, sync=True)
+        index_cmd.take_action(parsed_args)
+        with mohid_cmd.job_index.connect(job_dir) as connection:
+            run = connection.execute(
+                "SELECT status, exit_code FROM runs WHERE run_number = 3"
+            ).fetchone()
+        assert tuple(run) == (mohid_cmd.job_index.DONE, 0)
+        assert caplog.messages == [
+            f"updated the status of 1 runs in "
+            f"{job_dir / mohid_cmd.job_index.INDEX_FILE}"
+        ]
+
+    def test_sync_database_error(self, index_cmd, job_dir, caplog):
+        (job_dir / mohid_cmd.job_index.INDEX_FILE).write_text("not a database")
+        mohid_cmd.job_index.record_task_exit(job_dir, 3, 0)
+        caplog.set_level(logging.ERROR)
+        parsed_args = SimpleNamespace(job_dir=job_dir, task_exit=None, sync=True)
+        with pytest.raises(SystemExit):
+            index_cmd.take_action(parsed_args)
+        assert caplog.messages[0].startswith(
+            f"could not update {job_dir / mohid_cmd.job_index.INDEX_FILE}: "
+        )
+
+    def test_task_exit_imports(self):
+        # run-task.sh runs `mohid index --task-exit` at the end of every task,
+        # so it must not import the modules that only building the index needs
+        proc = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, mohid_cmd.index; "
+                "print(sorted({'pandas', 'nemo_cmd.prepare', 'mohid_cmd.monte_carlo'} "
+                "& set(sys.modules)))",
+            ],
+            check=True,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        assert proc.stdout == "[]\n"
+
+
+class TestBuildIndex:
+    """Unit tests for build_index() function."""
+
+    def test_build_index(self, job_dir):
+        assert mohid_cmd.index.build_index(job_dir) == 4
+        with mohid_cmd.job_index.connect(job_dir) as connection:
+            runs = connection.execute(
+                "SELECT run_id, status, exit_code, forcing_dir FROM runs"
+            ).fetchall()
+        assert [tuple(run)[:3] for run in runs] == [
+            ("AKNS-spatial-0", mohid_cmd.job_index.DONE, 0),
+            ("AKNS-spatial-1", mohid_cmd.job_index.FAILED, 1),
+            ("AKNS-spatial-2", mohid_cmd.job_index.STARTED, None),
+            ("AKNS-spatial-3", mohid_cmd.job_index.PENDING, None),
+        ]
+        forcing_dir = job_dir.parent / "forcing" / "AKNS-spatial-0"
+        assert runs[0]["forcing_dir"] == str(forcing_dir)
+
+    def test_status_file(self, job_dir):
+        mohid_cmd.job_index.write_status(
+            job_dir / "results" / "AKNS-spatial-2", mohid_cmd.job_index.GATHERED
+        )
+        mohid_cmd.index.build_index(job_dir)
+        with mohid_cmd.job_index.connect(job_dir) as connection:
+            run = connection.execute(
+                "SELECT status, exit_code FROM runs WHERE run_number = 2"
+            ).fetchone()
+        assert tuple(run) == (mohid_cmd.job_index.GATHERED, None)
+
+    def test_no_csv_file(self, job_dir, caplog):
+        (job_dir / "AKNS_spatial.csv").unlink()
+        caplog.set_level(logging.ERROR)
+        with pytest.raises(SystemExit):
+            mohid_cmd.index.build_index(job_dir)
+        assert caplog.messages == [f"expected 1 runs CSV file in {job_dir}"]
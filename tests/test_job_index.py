@@ -0,0 +1,253 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd Monte Carlo job run index unit tests.
+"""
+import json
+import logging
+import sqlite3
+from pathlib import Path
+
+import pandas
+import pytest
+
+import mohid_cmd.job_index
+
+
+@pytest.fixture
+def runs():
+    return pandas.DataFrame(
+        {
+            "spill_date_hour": pandas.to_datetime(
+                ["2017-06-15 02:00", "2017-06-20 14:00", "2017-12-01 08:00"]
+            ),
+            "run_days": [7, 7, 14],
+            "spill_lon": [-123.16, -122.86, -124.5],
+            "spill_lat": [49.2, 48.7, 48.5],
+            "spill_volume": [1000.0, 250.5, 12.0],
+            "Lagrangian_template": [
+                "Lagrangian_akns.dat",
+                "Lagrangian_bunker.dat",
+                "Lagrangian_akns.dat",
+            ],
+        }
+    )
+
+
+@pytest.fixture
+def job_dir(runs, tmp_path):
+    job_dir = tmp_path / "AKNS-spatial_2019-11-24T170743"
+    job_dir.mkdir()
+    rows = mohid_cmd.job_index.run_rows("AKNS-spatial", Path("/scratch/forcing"), runs)
+    mohid_cmd.job_index.create(job_dir, rows)
+    return job_dir
+
+
+def _run(job_dir, run_number):
+    with mohid_cmd.job_index.connect(job_dir) as connection:
+        return dict(
+            connection.execute(
+                "SELECT * FROM runs WHERE run_number = ?", (run_number,)
+            ).fetchone()
+        )
+
+
+class TestRunRows:
+    """Unit tests for run_rows() function."""
+
+    def test_run_rows(self, runs):
+        rows = list(
+            mohid_cmd.job_index.run_rows("AKNS-spatial", Path("/scratch/forcing"), runs)
+        )
+        assert len(rows) == 3
+        row = rows[1]
+        assert row.pop("updated") > 0
+        assert row == {
+            "run_number": 1,
+            "run_id": "AKNS-spatial-1",
+            "spill_date_hour": "2017-06-20 14:00:00",
+            "run_days": 7,
+            "spill_lon": -122.86,
+            "spill_lat": 48.7,
+            "spill_volume": 250.5,
+            "lagrangian_template": "Lagrangian_bunker.dat",
+            "forcing_dir": "/scratch/forcing/AKNS-spatial-1",
+            "tmp_run_dir": "AKNS-spatial-1",
+            "results_dir": "results/AKNS-spatial-1",
+            "status": mohid_cmd.job_index.PENDING,
+            "exit_code": None,
+        }
+
+    def test_python_types(self, runs):
+        row = next(
+            mohid_cmd.job_index.run_rows("AKNS-spatial", Path("/scratch/forcing"), runs)
+        )
+        assert type(row["run_number"]) is int
+        assert type(row["run_days"]) is int
+        assert type(row["spill_lon"]) is float
+
+
+class TestCreate:
+    """Unit tests for create() function."""
+
+    def test_create(self, job_dir):
+        assert (job_dir / mohid_cmd.job_index.INDEX_FILE).is_file()
+        assert _run(job_dir, 2)["spill_date_hour"] == "2017-12-01 08:00:00"
+
+    def test_n_runs(self, runs, tmp_path):
+        rows = mohid_cmd.job_index.run_rows("AKNS-spatial", tmp_path, runs)
+        assert mohid_cmd.job_index.create(tmp_path, rows) == 3
+
+    def test_replace(self, job_dir):
+        mohid_cmd.job_index.create(job_dir, [])
+        with mohid_cmd.job_index.connect(job_dir) as connection:
+            assert connection.execute("SELECT count(*) FROM runs").fetchone()[0] == 0
+        assert not (job_dir / f"{mohid_cmd.job_index.INDEX_FILE}.tmp").exists()
+
+    def test_schema_version(self, job_dir):
+        with mohid_cmd.job_index.connect(job_dir) as connection:
+            (version,) = connection.execute("PRAGMA user_version").fetchone()
+        assert version == mohid_cmd.job_index.SCHEMA_VERSION
+
+    def test_date_and_location_queries_use_indexes(self, job_dir):
+        with mohid_cmd.job_index.connect(job_dir) as connection:
+            plan = connection.execute(
+                """
+                EXPLAIN QUERY PLAN SELECT run_number FROM runs
+                WHERE spill_date_hour BETWEEN '2017-06-01' AND '2017-07-01'
+                """
+            ).fetchall()
+            assert "INDEX runs_spill_date_hour" in plan[0]["detail"]
+            plan = connection.execute(
+                """
+                EXPLAIN QUERY PLAN SELECT run_number FROM runs
+                WHERE spill_lat BETWEEN 48.6 AND 48.8
+                """
+            ).fetchall()
+            assert "INDEX runs_spill_lat_lon" in plan[0]["detail"]
+
+
+class TestWriteStatus:
+    """Unit tests for write_status() function."""
+
+    def test_write_status(self, tmp_path):
+        results_dir = tmp_path / "results" / "AKNS-spatial-0"
+        mohid_cmd.job_index.write_status(results_dir, mohid_cmd.job_index.FAILED, 1)
+        record = json.loads((results_dir / mohid_cmd.job_index.STATUS_FILE).read_text())
+        assert record.pop("updated") > 0
+        assert record == {"status": mohid_cmd.job_index.FAILED, "exit_code": 1}
+        assert [path.name for path in results_dir.iterdir()] == [
+            mohid_cmd.job_index.STATUS_FILE
+        ]
+
+    def test_replace(self, tmp_path):
+        mohid_cmd.job_index.write_status(tmp_path, mohid_cmd.job_index.GATHERED)
+        mohid_cmd.job_index.write_status(tmp_path, mohid_cmd.job_index.DONE, 0)
+        record = mohid_cmd.job_index.read_status(tmp_path)
+        assert record["status"] == mohid_cmd.job_index.DONE
+
+
+class TestReadStatus:
+    """Unit tests for read_status() function."""
+
+    def test_read_status(self, tmp_path):
+        mohid_cmd.job_index.write_status(tmp_path, mohid_cmd.job_index.DONE, 0)
+        record = mohid_cmd.job_index.read_status(tmp_path)
+        assert record["status"] == mohid_cmd.job_index.DONE
+        assert record["exit_code"] == 0
+
+    def test_no_status_file(self, tmp_path):
+        assert mohid_cmd.job_index.read_status(tmp_path) is None
+
+    def test_invalid_status_file(self, tmp_path, caplog):
+        (tmp_path / mohid_cmd.job_index.STATUS_FILE).write_text('{"status": ')
+        caplog.set_level(logging.WARNING)
+        assert mohid_cmd.job_index.read_status(tmp_path) is None
+        assert caplog.messages[0].startswith(
+            f"ignored invalid run status file {tmp_path}/"
+        )
+
+
+class TestSync:
+    """Unit tests for sync() function."""
+
+    def test_sync(self, job_dir):
+        results_dir = job_dir / "results"
+        mohid_cmd.job_index.write_status(
+            results_dir / "AKNS-spatial-0", mohid_cmd.job_index.DONE, 0
+        )
+        mohid_cmd.job_index.write_status(
+            results_dir / "AKNS-spatial-2", mohid_cmd.job_index.GATHERED
+        )
+        assert mohid_cmd.job_index.sync(job_dir) == 2
+        assert _run(job_dir, 0)["status"] == mohid_cmd.job_index.DONE
+        assert _run(job_dir, 0)["exit_code"] == 0
+        assert _run(job_dir, 1)["status"] == mohid_cmd.job_index.PENDING
+        assert _run(job_dir, 2)["status"] == mohid_cmd.job_index.GATHERED
+
+    def test_unchanged_runs_not_updated(self, job_dir):
+        mohid_cmd.job_index.write_status(
+            job_dir / "results" / "AKNS-spatial-1", mohid_cmd.job_index.FAILED, 1
+        )
+        assert mohid_cmd.job_index.sync(job_dir) == 1
+        assert mohid_cmd.job_index.sync(job_dir) == 0
+
+    def test_no_results_dir(self, job_dir):
+        assert mohid_cmd.job_index.sync(job_dir) == 0
+
+    def test_database_error(self, tmp_path):
+        (tmp_path / mohid_cmd.job_index.INDEX_FILE).write_text("not a database")
+        mohid_cmd.job_index.write_status(
+            tmp_path / "results" / "AKNS-spatial-0", mohid_cmd.job_index.DONE, 0
+        )
+        with pytest.raises(sqlite3.DatabaseError):
+            mohid_cmd.job_index.sync(tmp_path)
+
+
+class TestRecordTaskExit:
+    """Unit tests for record_task_exit() function."""
+
+    @pytest.mark.parametrize(
+        "exit_code, expected",
+        [(0, mohid_cmd.job_index.DONE), (1, mohid_cmd.job_index.FAILED)],
+    )
+    def test_record_task_exit(self, exit_code, expected, job_dir):
+        mohid_cmd.job_index.record_task_exit(job_dir, 1, exit_code)
+        record = mohid_cmd.job_index.read_status(job_dir / "results" / "AKNS-spatial-1")
+        assert record["status"] == expected
+        assert record["exit_code"] == exit_code
+
+    def test_index_not_updated(self, job_dir):
+        mohid_cmd.job_index.record_task_exit(job_dir, 1, 0)
+        assert _run(job_dir, 1)["status"] == mohid_cmd.job_index.PENDING
+
+
+class TestRecordGathered:
+    """Unit tests for record_gathered() function."""
+
+    def test_monte_carlo_run(self, job_dir):
+        results_dir = job_dir / "results" / "AKNS-spatial-2"
+        assert mohid_cmd.job_index.record_gathered(results_dir)
+        record = mohid_cmd.job_index.read_status(results_dir)
+        assert record["status"] == mohid_cmd.job_index.GATHERED
+        assert record["exit_code"] is None
+
+    def test_not_monte_carlo_run(self, job_dir):
+        assert not mohid_cmd.job_index.record_gathered(job_dir / "AKNS-spatial-2")
+        assert not (job_dir / "AKNS-spatial-2").exists()
+
+    def test_no_index(self, tmp_path):
+        results_dir = tmp_path / "results" / "AKNS-spatial-2"
+        assert not mohid_cmd.job_index.record_gathered(results_dir)
+        assert not results_dir.exists()
@@ -12,12 +12,16 @@
 #  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
+import json
 import logging
 import os
+import subprocess
 import textwrap
 from datetime import datetime
+from io import StringIO
 from pathlib import Path
 from types import SimpleNamespace
+from unittest.mock import patch
 
 import arrow
 import attr
@@ -29,8 +33,10 @@ import pytest
 import yaml
 from dateutil import tz
 
+import mohid_cmd.job_index
 import mohid_cmd.main
 import mohid_cmd.monte_carlo
+import mohid_cmd.scaffold
 
 
 @pytest.fixture
@@ -38,65 +44,6 @@ def monte_carlo_cmd():
     return mohid_cmd.monte_carlo.MonteCarlo(mohid_cmd.main.MohidApp, [])
 
 
-@pytest.fixture
-def glost_run_desc(tmp_path):
-    forcing_dir = tmp_path / "forcing"
-    forcing_dir.mkdir()
-
-    runs_dir = tmp_path / "monte-carlo"
-    runs_dir.mkdir()
-
-    code_repo = tmp_path / "MIDOSS-MOHID-CODE"
-    code_repo.mkdir()
-    config_repo = tmp_path / "MIDOSS-MOHID-config"
-    config_repo.mkdir()
-    grid_repo = tmp_path / "MIDOSS-MOHID-grid"
-    grid_repo.mkdir()
-    mohid_cmd_repo = tmp_path / "MOHID-Cmd"
-    mohid_cmd_repo.mkdir()
-    nemo_cmd_repo = tmp_path / "NEMO-Cmd"
-    nemo_cmd_repo.mkdir()
-    moad_tools_repo = tmp_path / "moad_tools"
-    moad_tools_repo.mkdir()
-
-    mohid_config_dir = config_repo / "monte-carlo"
-    mohid_config_dir.mkdir()
-
-    run_desc_file = tmp_path / "monte-carlo.yaml"
-    run_desc_file.write_text(
-        textwrap.dedent(
-            f"""\
-            job id: AKNS-spatial
-            account: rrg-allen
-            email: dlatorne@example.com
-            nodes: 1
-            mem per cpu: 14100M
-            run walltime: 3:00:00
-
-            paths:
-              forcing directory: {forcing_dir}
-              runs directory: {runs_dir}
-              mohid config: {mohid_config_dir}
-
-            make-hdf5 command: $HOME/.local/bin/make-hdf5
-            mohid command: $HOME/.local/bin/mohid
-
-            vcs revisions:
-              git:
-                - {code_repo}
-                - {config_repo}
-                - {grid_repo}
-                - {mohid_cmd_repo}
-                - {nemo_cmd_repo}
-                - {moad_tools_repo}
-            """
-        )
-    )
-    with run_desc_file.open("rt") as fp:
-        run_desc = yaml.safe_load(fp)
-    return run_desc
-
-
 @pytest.fixture
 def mock_get_runs_info(monkeypatch):
     def mock_get_runs_info(*args):
@@ -104,6 +51,10 @@ def mock_get_runs_info(monkeypatch):
             {
                 "spill_date_hour": pandas.Timestamp("2017-06-15 02:00"),
                 "run_days": numpy.array([7], dtype=numpy.int64),
+                "spill_lon": -123.16,
+                "spill_lat": 49.2,
+                "spill_volume": 1000.0,
+                "Lagrangian_template": "Lagrangian_akns.dat",
             }
         )
         return runs
@@ -184,7 +135,9 @@ def mock_subprocess_run(monkeypatch):
 
         return CompletedProcess()
 
-    monkeypatch.setattr(mohid_cmd.monte_carlo.subprocess, "run", mock_subprocess_run)
+    monkeypatch.setattr(
+        mohid_cmd.monte_carlo.mohid_cmd.executors.subprocess, "run", mock_subprocess_run
+    )
 
 
 class TestParser:
@@ -205,6 +158,7 @@ class TestParser:
         assert parser._actions[1].dest == "desc_file"
         assert parser._actions[1].metavar == "DESC_FILE"
         assert parser._actions[1].type == Path
+        assert parser._actions[1].nargs == "?"
         assert parser._actions[1].help
 
     def test_csv_file_argument(self, monte_carlo_cmd):
@@ -212,6 +166,7 @@ class TestParser:
         assert parser._actions[2].dest == "csv_file"
         assert parser._actions[2].metavar == "CSV_FILE"
         assert parser._actions[2].type == Path
+        assert parser._actions[2].nargs == "?"
         assert parser._actions[2].help
 
     def test_no_submit_option(self, monte_carlo_cmd):
@@ -222,6 +177,71 @@ class TestParser:
         assert parser._actions[3].default is False
         assert parser._actions[3].help
 
+    def test_tune_resources_option(self, monte_carlo_cmd):
+        parser = monte_carlo_cmd.get_parser("mohid monte-carlo")
+        assert parser._actions[4].dest == "tune_resources"
+        assert parser._actions[4].option_strings == ["--tune-resources"]
+        assert parser._actions[4].const is True
+        assert parser._actions[4].default is False
+        assert parser._actions[4].help
+
+    def test_sacct_file_option(self, monte_carlo_cmd):
+        parser = monte_carlo_cmd.get_parser("mohid monte-carlo")
+        assert parser._actions[5].dest == "sacct_file"
+        assert parser._actions[5].option_strings == ["--sacct-file"]
+        assert parser._actions[5].type == Path
+        assert parser._actions[5].default is None
+        assert parser._actions[5].help
+
+    def test_executor_option(self, monte_carlo_cmd):
+        parser = monte_carlo_cmd.get_parser("mohid monte-carlo")
+        assert parser._actions[6].dest == "executor"
+        assert parser._actions[6].option_strings == ["--executor"]
+        assert list(parser._actions[6].choices) == ["sbatch", "local"]
+        assert parser._actions[6].default == "sbatch"
+        assert parser._actions[6].help
+
+    def test_cpus_option(self, monte_carlo_cmd):
+        parser = monte_carlo_cmd.get_parser("mohid monte-carlo")
+        assert parser._actions[7].dest == "cpus"
+        assert parser._actions[7].option_strings == ["--cpus"]
+        assert parser._actions[7].type == int
+        assert parser._actions[7].default is None
+        assert parser._actions[7].help
+
+    def test_runs_per_shard_option(self, monte_carlo_cmd):
+        parser = monte_carlo_cmd.get_parser("mohid monte-carlo")
+        assert parser._actions[8].dest == "runs_per_shard"
+        assert parser._actions[8].option_strings == ["--runs-per-shard"]
+        assert parser._actions[8].type == int
+        assert parser._actions[8].default is None
+        assert parser._actions[8].help
+
+    def test_task_runner_option(self, monte_carlo_cmd):
+        parser = monte_carlo_cmd.get_parser("mohid monte-carlo")
+        assert parser._actions[9].dest == "task_runner"
+        assert parser._actions[9].option_strings == ["--task-runner"]
+        assert list(parser._actions[9].choices) == ["glost", "queue"]
+        assert parser._actions[9].default == "glost"
+        assert parser._actions[9].help
+
+    def test_retry_failed_option(self, monte_carlo_cmd):
+        parser = monte_carlo_cmd.get_parser("mohid monte-carlo")
+        assert parser._actions[10].dest == "retry_failed"
+        assert parser._actions[10].option_strings == ["--retry-failed"]
+        assert parser._actions[10].metavar == "JOB_DIR"
+        assert parser._actions[10].type == Path
+        assert parser._actions[10].default is None
+        assert parser._actions[10].help
+
+    def test_dry_run_option(self, monte_carlo_cmd):
+        parser = monte_carlo_cmd.get_parser("mohid monte-carlo")
+        assert parser._actions[11].dest == "dry_run"
+        assert parser._actions[11].option_strings == ["--dry-run"]
+        assert parser._actions[11].const is True
+        assert parser._actions[11].default is False
+        assert parser._actions[11].help
+
     def test_parsed_args(self, monte_carlo_cmd):
         parser = monte_carlo_cmd.get_parser("mohid monte-carlo")
         parsed_args = parser.parse_args(
@@ -242,6 +262,21 @@ class TestParser:
             ]
         )
         assert parsed_args.no_submit is False
+        assert parsed_args.tune_resources is False
+        assert parsed_args.sacct_file is None
+        assert parsed_args.executor == "sbatch"
+        assert parsed_args.cpus is None
+        assert parsed_args.runs_per_shard is None
+        assert parsed_args.task_runner == "glost"
+        assert parsed_args.retry_failed is None
+        assert parsed_args.dry_run is False
+
+    def test_parsed_args_retry_failed(self, monte_carlo_cmd):
+        parser = monte_carlo_cmd.get_parser("mohid monte-carlo")
+        parsed_args = parser.parse_args(["--retry-failed", "AKNS-spatial_job_dir"])
+        assert parsed_args.retry_failed == Path("AKNS-spatial_job_dir")
+        assert parsed_args.desc_file is None
+        assert parsed_args.csv_file is None
 
 
 class TestTakeAction:
@@ -275,7 +310,17 @@ class TestTakeAction:
         csv_file = tmp_path / "AKNS_spatial.csv"
         csv_file.write_text("")
         parsed_args = SimpleNamespace(
-            desc_file=desc_file, csv_file=csv_file, no_submit=False
+            desc_file=desc_file,
+            csv_file=csv_file,
+            no_submit=False,
+            tune_resources=False,
+            sacct_file=None,
+            executor="sbatch",
+            cpus=None,
+            runs_per_shard=None,
+            task_runner="glost",
+            retry_failed=None,
+            dry_run=False,
         )
         caplog.set_level(logging.INFO)
 
@@ -310,7 +355,17 @@ class TestTakeAction:
         csv_file = tmp_path / "AKNS_spatial.csv"
         csv_file.write_text("")
         parsed_args = SimpleNamespace(
-            desc_file=desc_file, csv_file=csv_file, no_submit=True
+            desc_file=desc_file,
+            csv_file=csv_file,
+            no_submit=True,
+            tune_resources=False,
+            sacct_file=None,
+            executor="sbatch",
+            cpus=None,
+            runs_per_shard=None,
+            task_runner="glost",
+            retry_failed=None,
+            dry_run=False,
         )
         caplog.set_level(logging.INFO)
 
@@ -323,6 +378,78 @@ class TestTakeAction:
         assert caplog.messages[0] == f"job directory created: {job_dir}"
         assert len(caplog.records) == 1
 
+    @patch("mohid_cmd.monte_carlo.retry_failed", autospec=True)
+    def test_take_action_retry_failed(self, m_retry_failed, monte_carlo_cmd, caplog):
+        m_retry_failed.return_value = "Submitted batch job 12345679"
+        parsed_args = SimpleNamespace(
+            desc_file=None,
+            csv_file=None,
+            no_submit=False,
+            tune_resources=False,
+            sacct_file=None,
+            executor="sbatch",
+            cpus=None,
+            runs_per_shard=None,
+            task_runner="glost",
+            retry_failed=Path("job_dir"),
+            dry_run=False,
+        )
+        caplog.set_level(logging.INFO)
+
+        monte_carlo_cmd.take_action(parsed_args)
+
+        m_retry_failed.assert_called_once_with(
+            Path("job_dir"), no_submit=False, executor="sbatch", cpus=None
+        )
+        assert caplog.messages[0] == "Submitted batch job 12345679"
+
+    def test_take_action_missing_files(self, monte_carlo_cmd, caplog):
+        parsed_args = SimpleNamespace(
+            desc_file=Path("monte-carlo.yaml"),
+            csv_file=None,
+            no_submit=False,
+            tune_resources=False,
+            sacct_file=None,
+            executor="sbatch",
+            cpus=None,
+            runs_per_shard=None,
+            task_runner="glost",
+            retry_failed=None,
+            dry_run=False,
+        )
+        caplog.set_level(logging.ERROR)
+
+        with pytest.raises(SystemExit):
+            monte_carlo_cmd.take_action(parsed_args)
+
+        assert caplog.messages[0] == (
+            "DESC_FILE and CSV_FILE are required unless --retry-failed is used"
+        )
+
+    @patch("mohid_cmd.monte_carlo.dry_run", return_value="report\n", autospec=True)
+    def test_take_action_dry_run(self, m_dry_run, monte_carlo_cmd):
+        monte_carlo_cmd.app.stdout = StringIO()
+        parsed_args = SimpleNamespace(
+            desc_file=Path("monte-carlo.yaml"),
+            csv_file=Path("AKNS_spatial.csv"),
+            no_submit=False,
+            tune_resources=False,
+            sacct_file=None,
+            executor="sbatch",
+            cpus=None,
+            runs_per_shard=None,
+            task_runner="glost",
+            retry_failed=None,
+            dry_run=True,
+        )
+
+        monte_carlo_cmd.take_action(parsed_args)
+
+        m_dry_run.assert_called_once_with(
+            Path("monte-carlo.yaml"), Path("AKNS_spatial.csv")
+        )
+        assert monte_carlo_cmd.app.stdout.getvalue() == "report\n"
+
 
 class TestMonteCarlo:
     """Unit tests for monte_carlo() function."""
@@ -369,6 +496,587 @@ class TestMonteCarlo:
         )
         assert submit_job_msg == "Submitted batch job 12345678"
 
+    def test_submit_records_slurm_job(
+        self,
+        mock_get_runs_info,
+        mock_record_vcs_revisions,
+        mock_render_make_hdf5_yamls,
+        mock_render_mohid_run_yamls,
+        mock_render_model_dats,
+        mock_render_lagrangian_dats,
+        mock_render_glost_task_scripts,
+        mock_subprocess_run,
+        glost_run_desc,
+        tmp_path,
+        monkeypatch,
+    ):
+        monkeypatch.setattr(
+            mohid_cmd.monte_carlo.arrow, "now", lambda: arrow.get("2019-11-24T170743")
+        )
+        csv_file = tmp_path / "AKNS_spatial.csv"
+        csv_file.write_text("")
+        mohid_cmd.monte_carlo.monte_carlo(tmp_path / "monte-carlo.yaml", csv_file)
+
+        runs_dir = glost_run_desc["paths"]["runs directory"]
+        job_id = glost_run_desc["job id"]
+        job_dir = Path(runs_dir) / f"{job_id}_2019-11-24T170743"
+        jobs = mohid_cmd.monte_carlo.mohid_cmd.slurm.read_jobs(job_dir)
+        assert len(jobs) == 1
+        assert jobs[0]["name"] == job_id
+        assert jobs[0]["slurm_job_id"] == "12345678"
+        assert jobs[0]["tasks"] == "glost-tasks.txt"
+        assert jobs[0]["n_runs"] == 1
+
+    def test_local_executor(
+        self,
+        mock_get_runs_info,
+        mock_record_vcs_revisions,
+        mock_render_make_hdf5_yamls,
+        mock_render_mohid_run_yamls,
+        mock_render_model_dats,
+        mock_render_lagrangian_dats,
+        mock_render_glost_task_scripts,
+        glost_run_desc,
+        tmp_path,
+        monkeypatch,
+    ):
+        monkeypatch.setattr(
+            mohid_cmd.monte_carlo.arrow, "now", lambda: arrow.get("2019-11-24T170743")
+        )
+        submissions = []
+
+        class MockLocalExecutor:
+            def submit(self, job_script, tasks=(), env=None):
+                submissions.append((job_script, tasks, env))
+                return "Ran 1 task(s) locally on 4 CPU(s); 0 failed"
+
+        monkeypatch.setattr(
+            mohid_cmd.monte_carlo.mohid_cmd.executors,
+            "get_executor",
+            lambda name, cpus: MockLocalExecutor(),
+        )
+        csv_file = tmp_path / "AKNS_spatial.csv"
+        csv_file.write_text("")
+        submit_job_msg = mohid_cmd.monte_carlo.monte_carlo(
+            tmp_path / "monte-carlo.yaml", csv_file, executor="local", cpus=4
+        )
+
+        runs_dir = glost_run_desc["paths"]["runs directory"]
+        job_id = glost_run_desc["job id"]
+        job_dir = Path(runs_dir) / f"{job_id}_2019-11-24T170743"
+        assert submissions == [
+            (
+                job_dir / "glost-job.sh",
+                ["bash $MONTE_CARLO/run-task.sh 0"],
+                {"MONTE_CARLO": os.fspath(job_dir)},
+            )
+        ]
+        assert submit_job_msg == "Ran 1 task(s) locally on 4 CPU(s); 0 failed"
+
+    def test_submit_recorded(
+        self,
+        mock_get_runs_info,
+        mock_record_vcs_revisions,
+        mock_render_make_hdf5_yamls,
+        mock_render_mohid_run_yamls,
+        mock_render_model_dats,
+        mock_render_lagrangian_dats,
+        mock_render_glost_task_scripts,
+        mock_subprocess_run,
+        glost_run_desc,
+        tmp_path,
+        monkeypatch,
+    ):
+        monkeypatch.setattr(
+            mohid_cmd.monte_carlo.arrow, "now", lambda: arrow.get("2019-11-24T170743")
+        )
+        csv_file = tmp_path / "AKNS_spatial.csv"
+        csv_file.write_text("")
+        mohid_cmd.monte_carlo.monte_carlo(
+            tmp_path / "monte-carlo.yaml", csv_file, no_submit=False
+        )
+
+        runs_dir = glost_run_desc["paths"]["runs directory"]
+        job_id = glost_run_desc["job id"]
+        job_dir = Path(runs_dir) / f"{job_id}_2019-11-24T170743"
+        records = (job_dir / "timing.jsonl").read_text().splitlines()
+        assert len(records) == 1
+        record = json.loads(records[0])
+        assert record["job_id"] == job_id
+        assert record["phase"] == "submit"
+        assert isinstance(record["wall"], float)
+
+
+class TestRetryFailed:
+    """Unit tests for retry_failed() function."""
+
+    @staticmethod
+    @pytest.fixture
+    def job_dir(tmp_path):
+        job_dir = tmp_path / "AKNS-spatial_2019-11-24T170743"
+        job_dir.mkdir()
+        (job_dir / "AKNS-spatial.yaml").write_text(
+            textwrap.dedent(
+                """\
+                job id: AKNS-spatial
+                run walltime: 3:00:00
+                """
+            )
+        )
+        (job_dir / "glost-tasks.txt").write_text(
+            "".join(f"bash $MONTE_CARLO/run-task.sh {n}\n" for n in range(40))
+        )
+        (job_dir / "glost-job.sh").write_text(
+            textwrap.dedent(
+                f"""\
+                #!/bin/bash
+
+                #SBATCH --job-name=AKNS-spatial
+                #SBATCH --nodes=1
+                #SBATCH --ntasks-per-node=32
+                #SBATCH --mem-per-cpu=3750M
+                #SBATCH --time=6:00:00
+                #SBATCH --output={job_dir}/glost-job.stdout
+                #SBATCH --error={job_dir}/glost-job.stderr
+
+                export MONTE_CARLO={job_dir}
+                # The task list file may be given as an argument to run a shard of the job's tasks
+                GLOST_TASKS=${{1:-${{MONTE_CARLO}}/glost-tasks.txt}}
+                srun glost_launch ${{GLOST_TASKS}}
+                """
+            )
+        )
+        # Runs 0 to 36 succeeded, run 37 failed, run 38 didn't finish,
+        # and run 39 didn't start
+        for n, exit_code in enumerate([0] * 37 + [1]):
+            results_dir = job_dir / "results" / f"AKNS-spatial-{n}"
+            results_dir.mkdir(parents=True)
+            record = {"run_id": f"AKNS-spatial-{n}", "phase": "task"}
+            record["exit_code"] = exit_code
+            (results_dir / "timing.jsonl").write_text(f"{json.dumps(record)}\n")
+        (job_dir / "results" / "AKNS-spatial-38").mkdir()
+        return job_dir
+
+    def test_retry_tasks(self, job_dir):
+        mohid_cmd.monte_carlo.retry_failed(job_dir, no_submit=True)
+        retry_tasks = (job_dir / "retry-1" / "glost-tasks.txt").read_text()
+        assert retry_tasks.splitlines() == [
+            "bash $MONTE_CARLO/run-task.sh 37",
+            "bash $MONTE_CARLO/run-task.sh 38",
+            "bash $MONTE_CARLO/run-task.sh 39",
+        ]
+
+    def test_failed_results_moved(self, job_dir):
+        mohid_cmd.monte_carlo.retry_failed(job_dir, no_submit=True)
+        failed_results_dir = job_dir / "retry-1" / "failed-results"
+        assert sorted(p.name for p in failed_results_dir.iterdir()) == [
+            "AKNS-spatial-37",
+            "AKNS-spatial-38",
+        ]
+        assert not (job_dir / "results" / "AKNS-spatial-37").exists()
+        assert (job_dir / "results" / "AKNS-spatial-36").exists()
+
+    def test_tmp_run_dirs_moved(self, job_dir, tmp_path):
+        forcing_dir = tmp_path / "forcing"
+        desc_file = job_dir / "AKNS-spatial.yaml"
+        desc_file.write_text(
+            f"{desc_file.read_text()}paths:\n  forcing directory: {forcing_dir}\n"
+        )
+        (job_dir / "AKNS-spatial-37" / "res").mkdir(parents=True)
+        (job_dir / "AKNS-spatial-37" / "MOHID.sh").write_text("")
+        (job_dir / "AKNS-spatial-36").mkdir()
+        (forcing_dir / "AKNS-spatial-37").mkdir(parents=True)
+        (forcing_dir / "AKNS-spatial-37" / "winds.hdf5").write_bytes(b"")
+        mohid_cmd.monte_carlo.retry_failed(job_dir, no_submit=True)
+        failed_runs_dir = job_dir / "retry-1" / "failed-runs"
+        assert sorted(p.name for p in failed_runs_dir.iterdir()) == [
+            "AKNS-spatial-37",
+            "forcing-AKNS-spatial-37",
+        ]
+        assert (failed_runs_dir / "AKNS-spatial-37" / "MOHID.sh").exists()
+        assert (failed_runs_dir / "forcing-AKNS-spatial-37" / "winds.hdf5").exists()
+        assert not (job_dir / "AKNS-spatial-37").exists()
+        assert (job_dir / "AKNS-spatial-36").exists()
+        assert not list((forcing_dir / "AKNS-spatial-37").iterdir())
+
+    def test_retry_job_script(self, job_dir):
+        mohid_cmd.monte_carlo.retry_failed(job_dir, no_submit=True)
+        retry_dir = job_dir / "retry-1"
+        retry_script = (retry_dir / "glost-job.sh").read_text().splitlines()
+        assert "#SBATCH --job-name=AKNS-spatial-retry-1" in retry_script
+        assert "#SBATCH --ntasks-per-node=4" in retry_script
+        assert "#SBATCH --time=3:00:00" in retry_script
+        assert "#SBATCH --mem-per-cpu=3750M" in retry_script
+        assert f"#SBATCH --output={retry_dir}/glost-job.stdout" in retry_script
+        assert f"#SBATCH --error={retry_dir}/glost-job.stderr" in retry_script
+        assert f"GLOST_TASKS=${{1:-{retry_dir}/glost-tasks.txt}}" in retry_script
+        assert f"export MONTE_CARLO={job_dir}" in retry_script
+
+    def test_retry_queue(self, job_dir):
+        mohid_cmd.monte_carlo.mohid_cmd.task_queue.TaskQueue.create(
+            job_dir / "queue", []
+        )
+        glost_job = job_dir / "glost-job.sh"
+        glost_job.write_text(
+            "#!/bin/bash\n"
+            "#SBATCH --ntasks-per-node=32\n"
+            "TASK_QUEUE=${1:-${MONTE_CARLO}/queue}\n"
+            "srun mohid worker ${TASK_QUEUE}\n"
+        )
+        mohid_cmd.monte_carlo.retry_failed(job_dir, no_submit=True)
+        retry_dir = job_dir / "retry-1"
+        queue = mohid_cmd.monte_carlo.mohid_cmd.task_queue.TaskQueue(
+            retry_dir / "queue"
+        )
+        assert queue.unfinished_commands() == [
+            f"bash $MONTE_CARLO/run-task.sh {n}" for n in (37, 38, 39)
+        ]
+        retry_script = (retry_dir / "glost-job.sh").read_text().splitlines()
+        # No task is allocated to a GLOST manager
+        assert "#SBATCH --ntasks-per-node=3" in retry_script
+        assert f"TASK_QUEUE=${{1:-{retry_dir}/queue}}" in retry_script
+
+    def test_pre_shard_job_script(self, job_dir):
+        glost_job = job_dir / "glost-job.sh"
+        glost_job.write_text(
+            f"#!/bin/bash\nsrun glost_launch {job_dir}/glost-tasks.txt\n"
+        )
+        mohid_cmd.monte_carlo.retry_failed(job_dir, no_submit=True)
+        retry_dir = job_dir / "retry-1"
+        retry_script = (retry_dir / "glost-job.sh").read_text().splitlines()
+        assert retry_script[1] == f"srun glost_launch {retry_dir}/glost-tasks.txt"
+
+    def test_second_retry(self, job_dir):
+        mohid_cmd.monte_carlo.retry_failed(job_dir, no_submit=True)
+        mohid_cmd.monte_carlo.retry_failed(job_dir, no_submit=True)
+        assert (job_dir / "retry-2" / "glost-tasks.txt").exists()
+
+    def test_no_failed_runs(self, job_dir, caplog):
+        (job_dir / "glost-tasks.txt").write_text("bash $MONTE_CARLO/run-task.sh 0\n")
+        caplog.set_level(logging.INFO)
+        submit_job_msg = mohid_cmd.monte_carlo.retry_failed(job_dir)
+        assert submit_job_msg is None
+        assert caplog.messages[0] == f"all 1 runs in {job_dir} finished successfully"
+        assert not (job_dir / "retry-1").exists()
+
+    def test_no_desc_file(self, job_dir, caplog):
+        (job_dir / "AKNS-spatial.yaml").unlink()
+        caplog.set_level(logging.ERROR)
+        with pytest.raises(SystemExit):
+            mohid_cmd.monte_carlo.retry_failed(job_dir)
+        assert caplog.messages[0] == (
+            f"expected 1 glost job description YAML file in {job_dir}"
+        )
+
+    def test_submit(self, job_dir, mock_subprocess_run):
+        submit_job_msg = mohid_cmd.monte_carlo.retry_failed(job_dir)
+        assert submit_job_msg == "Submitted batch job 12345678"
+        jobs = mohid_cmd.monte_carlo.mohid_cmd.slurm.read_jobs(job_dir)
+        assert jobs[0]["name"] == "AKNS-spatial-retry-1"
+        assert jobs[0]["slurm_job_id"] == "12345678"
+        assert jobs[0]["tasks"] == "retry-1/glost-tasks.txt"
+        assert jobs[0]["n_runs"] == 3
+
+    def test_local_executor(self, job_dir, monkeypatch):
+        submissions = []
+
+        class MockLocalExecutor:
+            def submit(self, job_script, tasks=(), env=None):
+                submissions.append((job_script, tasks, env))
+                return "Ran 3 task(s) locally on 2 CPU(s); 0 failed"
+
+        monkeypatch.setattr(
+            mohid_cmd.monte_carlo.mohid_cmd.executors,
+            "get_executor",
+            lambda name, cpus: MockLocalExecutor(),
+        )
+        mohid_cmd.monte_carlo.retry_failed(job_dir, executor="local", cpus=2)
+        assert submissions == [
+            (
+                job_dir / "retry-1" / "glost-job.sh",
+                [f"bash $MONTE_CARLO/run-task.sh {n}" for n in (37, 38, 39)],
+                {"MONTE_CARLO": os.fspath(job_dir)},
+            )
+        ]
+
+
+class TestTaskRunNumber:
+    """Unit tests for _task_run_number() function."""
+
+    @pytest.mark.parametrize(
+        "task, expected",
+        (
+            ("bash $MONTE_CARLO/run-task.sh 42", 42),
+            ("bash $MONTE_CARLO/glost-tasks/AKNS-spatial-7.sh", 7),
+        ),
+    )
+    def test_task_run_number(self, task, expected):
+        assert mohid_cmd.monte_carlo._task_run_number(task) == expected
+
+
+class TestSubmitShards:
+    """Unit tests for sharded submission of glost jobs by monte_carlo() function."""
+
+    @pytest.fixture
+    def sharded_job_dir(
+        self,
+        mock_record_vcs_revisions,
+        mock_render_make_hdf5_yamls,
+        mock_render_mohid_run_yamls,
+        mock_render_model_dats,
+        mock_render_lagrangian_dats,
+        mock_render_glost_task_scripts,
+        fake_slurm,
+        glost_run_desc,
+        tmp_path,
+        monkeypatch,
+    ):
+        def mock_get_runs_info(*args):
+            runs = pandas.DataFrame(
+                {
+                    "spill_date_hour": pandas.Timestamp("2017-06-15 02:00"),
+                    "run_days": numpy.array([7] * 5, dtype=numpy.int64),
+                    "spill_lon": -123.16,
+                    "spill_lat": 49.2,
+                    "spill_volume": 1000.0,
+                    "Lagrangian_template": "Lagrangian_akns.dat",
+                }
+            )
+            return runs
+
+        monkeypatch.setattr(mohid_cmd.monte_carlo, "_get_runs_info", mock_get_runs_info)
+        monkeypatch.setattr(
+            mohid_cmd.monte_carlo.arrow, "now", lambda: arrow.get("2019-11-24T170743")
+        )
+        csv_file = tmp_path / "AKNS_spatial.csv"
+        csv_file.write_text("")
+        submit_job_msg = mohid_cmd.monte_carlo.monte_carlo(
+            tmp_path / "monte-carlo.yaml", csv_file, runs_per_shard=2
+        )
+        runs_dir = glost_run_desc["paths"]["runs directory"]
+        job_id = glost_run_desc["job id"]
+        job_dir = Path(runs_dir) / f"{job_id}_2019-11-24T170743"
+        return job_dir, submit_job_msg
+
+    def test_shard_task_files(self, sharded_job_dir):
+        job_dir, _ = sharded_job_dir
+        shards_dir = job_dir / "shards"
+        assert (shards_dir / "glost-tasks-000.txt").read_text().splitlines() == [
+            "bash $MONTE_CARLO/run-task.sh 0",
+            "bash $MONTE_CARLO/run-task.sh 1",
+        ]
+        assert (shards_dir / "glost-tasks-002.txt").read_text().splitlines() == [
+            "bash $MONTE_CARLO/run-task.sh 4",
+        ]
+
+    def test_sbatch_args(self, sharded_job_dir, fake_slurm):
+        job_dir, _ = sharded_job_dir
+        jobs = fake_slurm.jobs()
+        args = next(
+            job["args"] for job in jobs.values() if job["name"] == "AKNS-spatial-002"
+        )
+        shards_dir = job_dir / "shards"
+        assert args == [
+            "--parsable",
+            "--job-name=AKNS-spatial-002",
+            "--ntasks-per-node=2",
+            "--time=3:00:00",
+            f"--output={shards_dir / 'glost-job-002.stdout'}",
+            f"--error={shards_dir / 'glost-job-002.stderr'}",
+            f"{job_dir / 'glost-job.sh'}",
+            f"{shards_dir / 'glost-tasks-002.txt'}",
+        ]
+
+    def test_jobs_recorded(self, sharded_job_dir):
+        job_dir, _ = sharded_job_dir
+        jobs = mohid_cmd.monte_carlo.mohid_cmd.slurm.read_jobs(job_dir)
+        assert sorted(job["name"] for job in jobs) == [
+            "AKNS-spatial-000",
+            "AKNS-spatial-001",
+            "AKNS-spatial-002",
+        ]
+        assert sum(job["n_runs"] for job in jobs) == 5
+
+    def test_submit_job_msg(self, sharded_job_dir):
+        job_dir, submit_job_msg = sharded_job_dir
+        assert submit_job_msg == (
+            f"Submitted 3 of 3 glost shard job(s) for AKNS-spatial; "
+            f"use `mohid status {job_dir}` to follow them"
+        )
+
+    def test_queue_shards(self, fake_slurm, tmp_path):
+        job_dir = tmp_path / "AKNS-spatial_2019-11-24T170743"
+        job_dir.mkdir()
+        glost_tasks = [f"bash $MONTE_CARLO/run-task.sh {n}" for n in range(5)]
+        mohid_cmd.monte_carlo._submit_shards(
+            "AKNS-spatial", job_dir, glost_tasks, 2, 10800, None, task_runner="queue"
+        )
+        shards_dir = job_dir / "shards"
+        assert not list(shards_dir.glob("glost-tasks-*.txt"))
+        for job in fake_slurm.jobs().values():
+            assert job["args"][-1] == f"{job_dir / 'queue'}"
+        args = next(
+            job["args"]
+            for job in fake_slurm.jobs().values()
+            if job["name"] == "AKNS-spatial-000"
+        )
+        assert "--ntasks-per-node=2" in args
+
+
+class TestDryRun:
+    """Unit tests for dry_run() function."""
+
+    @staticmethod
+    @pytest.fixture
+    def dry_run_files(glost_run_desc, tmp_path):
+        tmpl_dir = Path(glost_run_desc["paths"]["mohid config"], "templates")
+        tmpl_dir.mkdir()
+        (tmpl_dir / "make-hdf5.yaml").write_text("output: {{ forcing_dir }}\n")
+        (tmpl_dir / "mohid-run.yaml").write_text(
+            "run_id: {{ job_id }}-{{ run_number }}\n"
+            "IN_MODEL: {{ job_dir }}/mohid-yaml/Model-{{ run_number }}.dat\n"
+        )
+        (tmpl_dir / "Model.dat").write_text("START : {{ start_yyyy_mm_dd_hh }} 30 0\n")
+        (tmpl_dir / "Lagrangian_AKNS_crude.dat").write_text(
+            "POINT_VOLUME : {{ spill_volume }}\n"
+        )
+        (tmpl_dir / "glost-task.sh").write_text(
+            "{{ mohid_cmd }} run {{ job_id }}-{{ run_number }}.yaml\n"
+        )
+        csv_file = tmp_path / "AKNS_spatial.csv"
+        csv_file.write_text(
+            "spill_date_hour, run_days, spill_lon, spill_lat, spill_volume, "
+            "Lagrangian_template\n"
+            + "".join(
+                f"2017-06-15 02:00, 7, -122.86, 48.38, 21300.43, "
+                f"Lagrangian_AKNS_crude.dat\n"
+                for _ in range(10)
+            )
+        )
+        return tmp_path / "monte-carlo.yaml", csv_file, tmpl_dir
+
+    def test_report(self, dry_run_files, glost_run_desc):
+        desc_file, csv_file, _ = dry_run_files
+        report = mohid_cmd.monte_carlo.dry_run(desc_file, csv_file, sample_size=4)
+        lines = report.splitlines()
+        assert lines[0] == (
+            f"Dry run of AKNS-spatial Monte Carlo job from {desc_file} and {csv_file}"
+        )
+        assert lines[2] == "10 runs; 6 CSV columns checked"
+        assert lines[3].startswith("5 templates compiled: make-hdf5.yaml, ")
+        assert lines[4].startswith("4 runs rendered in memory in ")
+        # 5 files for each run, the job directory scaffold, 2 copied input files,
+        # the run index, and 6 VCS revision records
+        n_scaffold = mohid_cmd.scaffold.count_files()
+        assert lines[-3].split()[:2] == ["total", f"{5 * 10 + n_scaffold + 9}"]
+        forcing_dir = glost_run_desc["paths"]["forcing directory"]
+        assert lines[-2] == f"Projected forcing directories: 10 in {forcing_dir}"
+        assert lines[-1].startswith("Estimated setup time: ")
+
+    def test_projected_bytes(self, dry_run_files):
+        desc_file, csv_file, _ = dry_run_files
+        report = mohid_cmd.monte_carlo.dry_run(desc_file, csv_file, sample_size=4)
+        model_dat_line = next(
+            line for line in report.splitlines() if line.startswith("  Model.dat")
+        )
+        # "START : 2017 06 15 02 30 0\n" for each of 10 runs
+        assert model_dat_line.split()[1:] == ["10", "270"]
+
+    def test_no_files_written(self, dry_run_files, glost_run_desc):
+        desc_file, csv_file, _ = dry_run_files
+        mohid_cmd.monte_carlo.dry_run(desc_file, csv_file)
+        assert not list(Path(glost_run_desc["paths"]["runs directory"]).iterdir())
+        assert not list(Path(glost_run_desc["paths"]["forcing directory"]).iterdir())
+
+    def test_template_problems(self, dry_run_files, caplog):
+        desc_file, csv_file, tmpl_dir = dry_run_files
+        (tmpl_dir / "Model.dat").write_text("START : {{ start_yyyy_mm_dd_hh }\n")
+        (tmpl_dir / "glost-task.sh").unlink()
+        caplog.set_level(logging.ERROR)
+        with pytest.raises(SystemExit):
+            mohid_cmd.monte_carlo.dry_run(desc_file, csv_file)
+        assert caplog.messages[0].startswith(
+            "template syntax error in Model.dat line 1: "
+        )
+        assert caplog.messages[1] == "template not found: glost-task.sh"
+        assert caplog.messages[2] == (
+            f"dry run found 2 problem(s) in {desc_file} and {csv_file}"
+        )
+
+    def test_undefined_template_variable(self, dry_run_files, caplog):
+        desc_file, csv_file, tmpl_dir = dry_run_files
+        (tmpl_dir / "Lagrangian_AKNS_crude.dat").write_text(
+            "POINT_VOLUME : {{ spill_volume_m3 }}\n"
+        )
+        caplog.set_level(logging.ERROR)
+        with pytest.raises(SystemExit):
+            mohid_cmd.monte_carlo.dry_run(desc_file, csv_file)
+        assert caplog.messages[0] == (
+            "rendering Lagrangian.dat files failed: 'spill_volume_m3' is undefined"
+        )
+
+
+class TestCheckRunsColumns:
+    """Unit tests for _check_runs_columns() function."""
+
+    def test_valid_columns(self):
+        runs = pandas.DataFrame(
+            {
+                "spill_date_hour": [pandas.Timestamp("2017-06-15 02:00")],
+                "run_days": [7],
+                "spill_lon": [-122.86],
+                "spill_lat": [48.38],
+                "spill_volume": [21300],
+                "Lagrangian_template": ["Lagrangian_AKNS_crude.dat"],
+            }
+        )
+        assert mohid_cmd.monte_carlo._check_runs_columns(runs) == []
+
+    def test_problems(self):
+        runs = pandas.DataFrame(
+            {
+                "spill_date_hour": ["2017-06-15 02:00", "June 31"],
+                "run_days": [7.5, 7],
+                "spill_lon": [-122.86, None],
+                "spill_lat": [48.38, 48.39],
+                "Lagrangian_template": ["Lagrangian_AKNS_crude.dat", 42],
+            }
+        )
+        assert mohid_cmd.monte_carlo._check_runs_columns(runs) == [
+            "CSV file column spill_date_hour has non-datetime values in run(s): 1",
+            "CSV file column run_days has non-integer values in run(s): 0",
+            "CSV file column spill_lon has missing values in run(s): 1",
+            "CSV file column missing: spill_volume",
+            "CSV file column Lagrangian_template has non-string values in run(s): 1",
+        ]
+
+    def test_dates_not_first_column(self):
+        runs = pandas.DataFrame({"spill_date_hour": ["2017-06-15 02:00"]})
+        problems = mohid_cmd.monte_carlo._check_runs_columns(runs)
+        assert problems[0] == (
+            "CSV file column spill_date_hour must be the first column "
+            "to be read as date/times"
+        )
+
+    def test_no_runs(self):
+        runs = pandas.DataFrame({"spill_date_hour": []})
+        assert mohid_cmd.monte_carlo._check_runs_columns(runs) == [
+            "no runs found in CSV file"
+        ]
+
+
+class TestSampleRuns:
+    """Unit test for _sample_runs() function."""
+
+    def test_sample_runs(self):
+        runs = pandas.DataFrame(
+            {"Lagrangian_template": ["crude.dat"] * 8 + ["diesel.dat"] * 2}
+        )
+        sample = mohid_cmd.monte_carlo._sample_runs(runs, 4)
+        assert len(sample) == 4
+        assert {0, 8} <= set(sample.index)
+        assert list(sample.index) == sorted(sample.index)
+
 
 class TestRenderMakeHDF5Yamls:
     """Unit test for _render_make_hdf5_yamls() function."""
@@ -499,6 +1207,124 @@ class TestRenderMohidRunYamls:
         }
         assert run_desc["run data files"] == expected_run_data_files
 
+    @pytest.mark.parametrize(
+        "netcdf4, gather",
+        [
+            (None, None),
+            (
+                {"output variables": ["Thickness_2D"], "output time stride": 2},
+                {"dedup": True},
+            ),
+        ],
+    )
+    def test_job_desc_sections(self, netcdf4, gather, glost_run_desc):
+        job_id = glost_run_desc["job id"]
+        forcing_dir = Path(glost_run_desc["paths"]["forcing directory"])
+        runs_dir = glost_run_desc["paths"]["runs directory"]
+        job_dir = Path(runs_dir) / f"{job_id}_2019-12-04T180843"
+        mohid_config = glost_run_desc["paths"]["mohid config"]
+        mohid_yaml_dir = job_dir / "mohid-yaml"
+        mohid_yaml_dir.mkdir(parents=True)
+        tmpl_dir = Path(glost_run_desc["paths"]["mohid config"]) / "templates"
+        tmpl_dir.mkdir(parents=True)
+        (tmpl_dir / "mohid-run.yaml").write_text(
+            textwrap.dedent(
+                """\
+                run_id: {{ job_id }}-{{ run_number }}
+                netcdf4: {{ netcdf4 | tojson }}
+                gather: {{ gather | tojson }}
+                """
+            )
+        )
+        tmpl_env = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(os.fspath(tmpl_dir))
+        )
+        runs = pandas.DataFrame(
+            {
+                "spill_date_hour": pandas.Timestamp("2017-06-15 02:00"),
+                "run_days": numpy.array([7], dtype=numpy.int64),
+                "Lagrangian_template": "Lagrangian_AKNS_crude.dat",
+            }
+        )
+
+        mohid_cmd.monte_carlo._render_mohid_run_yamls(
+            job_id,
+            job_dir,
+            forcing_dir,
+            runs_dir,
+            mohid_config,
+            runs,
+            tmpl_env,
+            netcdf4,
+            gather,
+        )
+
+        with (mohid_yaml_dir / f"{job_id}-0.yaml").open("rt") as fp:
+            run_desc = yaml.safe_load(fp)
+        assert run_desc["netcdf4"] == (netcdf4 or {})
+        assert run_desc["gather"] == (gather or {})
+
+    @pytest.mark.parametrize(
+        "tmpl, expected_gather",
+        [
+            ("run_id: {{ job_id }}-{{ run_number }}\n", {"dedup": True}),
+            (
+                "run_id: {{ job_id }}-{{ run_number }}\ngather:\n  dedup: false\n",
+                {"dedup": False},
+            ),
+        ],
+    )
+    def test_job_desc_sections_not_in_template(
+        self, tmpl, expected_gather, glost_run_desc, caplog
+    ):
+        job_id = glost_run_desc["job id"]
+        forcing_dir = Path(glost_run_desc["paths"]["forcing directory"])
+        runs_dir = glost_run_desc["paths"]["runs directory"]
+        job_dir = Path(runs_dir) / f"{job_id}_2019-12-04T180843"
+        mohid_config = glost_run_desc["paths"]["mohid config"]
+        mohid_yaml_dir = job_dir / "mohid-yaml"
+        mohid_yaml_dir.mkdir(parents=True)
+        tmpl_dir = Path(glost_run_desc["paths"]["mohid config"]) / "templates"
+        tmpl_dir.mkdir(parents=True)
+        (tmpl_dir / "mohid-run.yaml").write_text(tmpl)
+        tmpl_env = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(os.fspath(tmpl_dir))
+        )
+        runs = pandas.DataFrame(
+            {
+                "spill_date_hour": pandas.Timestamp("2017-06-15 02:00"),
+                "run_days": numpy.array([7], dtype=numpy.int64),
+                "Lagrangian_template": "Lagrangian_AKNS_crude.dat",
+            }
+        )
+        netcdf4 = {"output variables": ["Thickness_2D"], "output time stride": 2}
+        caplog.set_level(logging.WARNING)
+
+        mohid_cmd.monte_carlo._render_mohid_run_yamls(
+            job_id,
+            job_dir,
+            forcing_dir,
+            runs_dir,
+            mohid_config,
+            runs,
+            tmpl_env,
+            netcdf4,
+            {"dedup": True},
+        )
+
+        with (mohid_yaml_dir / f"{job_id}-0.yaml").open("rt") as fp:
+            run_desc = yaml.safe_load(fp)
+        assert run_desc["run_id"] == f"{job_id}-0"
+        assert run_desc["netcdf4"] == netcdf4
+        assert run_desc["gather"] == expected_gather
+        if expected_gather["dedup"]:
+            assert not caplog.messages
+        else:
+            assert caplog.messages == [
+                "mohid-run.yaml template has its own gather section, "
+                "so the gather section of the job description is ignored"
+            ]
+
 
 class TestRenderModelDats:
     """Unit test for _render_model_dats() function."""
@@ -540,6 +1366,10 @@ class TestRenderModelDats:
             {
                 "spill_date_hour": pandas.Timestamp("2017-06-15 02:00"),
                 "run_days": numpy.array([7], dtype=numpy.int64),
+                "spill_lon": -123.16,
+                "spill_lat": 49.2,
+                "spill_volume": 1000.0,
+                "Lagrangian_template": "Lagrangian_akns.dat",
             }
         )
 
@@ -645,6 +1475,10 @@ class TestRenderGlostTaskScripts:
             {
                 "spill_date_hour": pandas.Timestamp("2017-06-15 02:00"),
                 "run_days": numpy.array([7], dtype=numpy.int64),
+                "spill_lon": -123.16,
+                "spill_lat": 49.2,
+                "spill_volume": 1000.0,
+                "Lagrangian_template": "Lagrangian_akns.dat",
             }
         )
 
@@ -863,6 +1697,10 @@ class TestGlostJobDir:
                 {
                     "spill_date_hour": pandas.Timestamp("2017-06-15 02:00"),
                     "run_days": numpy.array([7] * n_runs, dtype=numpy.int64),
+                    "spill_lon": -123.16,
+                    "spill_lat": 49.2,
+                    "spill_volume": 1000.0,
+                    "Lagrangian_template": "Lagrangian_akns.dat",
                 }
             )
             return runs
@@ -907,6 +1745,10 @@ class TestGlostJobDir:
                 {
                     "spill_date_hour": pandas.Timestamp("2017-06-15 02:00"),
                     "run_days": numpy.array([7] * n_runs, dtype=numpy.int64),
+                    "spill_lon": -123.16,
+                    "spill_lat": 49.2,
+                    "spill_volume": 1000.0,
+                    "Lagrangian_template": "Lagrangian_akns.dat",
                     "Lagrangian_template": "Lagrangian_AKNS_crude.dat",
                 }
             )
@@ -950,6 +1792,10 @@ class TestGlostJobDir:
                 {
                     "spill_date_hour": pandas.Timestamp("2017-06-15 02:00"),
                     "run_days": numpy.array([7] * n_runs, dtype=numpy.int64),
+                    "spill_lon": -123.16,
+                    "spill_lat": 49.2,
+                    "spill_volume": 1000.0,
+                    "Lagrangian_template": "Lagrangian_akns.dat",
                 }
             )
             return runs
@@ -990,6 +1836,8 @@ class TestGlostJobDir:
         def mock_get_runs_info(*args):
             runs = pandas.DataFrame(
                 {
+                    "spill_date_hour": pandas.Timestamp("2017-06-15 02:00"),
+                    "run_days": numpy.array([7] * n_runs, dtype=numpy.int64),
                     "spill_lon": numpy.array([-122.86] * n_runs, dtype=numpy.float32),
                     "spill_lat": numpy.array([48.38] * n_runs, dtype=numpy.float32),
                     "spill_volume": numpy.array(
@@ -1018,6 +1866,36 @@ class TestGlostJobDir:
         for i in range(n_runs):
             assert (mohid_yaml_dir / f"Lagrangian_AKNS_crude-{i}.dat").exists()
 
+    def test_run_index_created(
+        self,
+        mock_arrow_now,
+        mock_hg_repo,
+        mock_git_repo,
+        mock_get_runs_info,
+        mock_render_make_hdf5_yamls,
+        mock_render_mohid_run_yamls,
+        mock_render_model_dats,
+        mock_render_lagrangian_dats,
+        mock_render_glost_task_scripts,
+        glost_run_desc,
+        tmp_path,
+    ):
+        csv_file = tmp_path / "AKNS_spatial.csv"
+        csv_file.write_text("")
+        mohid_cmd.monte_carlo.monte_carlo(
+            tmp_path / "monte-carlo.yaml", csv_file, no_submit=True
+        )
+
+        runs_dir = glost_run_desc["paths"]["runs directory"]
+        job_id = glost_run_desc["job id"]
+        job_dir = Path(runs_dir) / f"{job_id}_2019-11-24T170743"
+        with mohid_cmd.job_index.connect(job_dir) as connection:
+            runs = connection.execute("SELECT * FROM runs").fetchall()
+        assert [tuple(run)[:3] for run in runs] == [
+            (0, f"{job_id}-0", "2017-06-15 02:00:00")
+        ]
+        assert runs[0]["status"] == mohid_cmd.job_index.PENDING
+
     def test_glost_task_files_created(
         self,
         mock_arrow_now,
@@ -1038,6 +1916,10 @@ class TestGlostJobDir:
                 {
                     "spill_date_hour": pandas.Timestamp("2017-06-15 02:00"),
                     "run_days": numpy.array([7] * n_runs, dtype=numpy.int64),
+                    "spill_lon": -123.16,
+                    "spill_lat": 49.2,
+                    "spill_volume": 1000.0,
+                    "Lagrangian_template": "Lagrangian_akns.dat",
                 }
             )
             return runs
@@ -1130,6 +2012,10 @@ class TestGlostJobDir:
                 {
                     "spill_date_hour": pandas.Timestamp("2017-06-15 02:00"),
                     "run_days": numpy.array([7] * n_runs, dtype=numpy.int64),
+                    "spill_lon": -123.16,
+                    "spill_lat": 49.2,
+                    "spill_volume": 1000.0,
+                    "Lagrangian_template": "Lagrangian_akns.dat",
                 }
             )
             return runs
@@ -1149,11 +2035,77 @@ class TestGlostJobDir:
         glost_tasks = (job_dir / "glost-tasks.txt").read_text().splitlines()[:-1]
         expected = [
             # 2 GLOST tasks
-            f"bash $MONTE_CARLO/glost-tasks/{job_id}-0.sh",
-            f"bash $MONTE_CARLO/glost-tasks/{job_id}-1.sh",
+            "bash $MONTE_CARLO/run-task.sh 0",
+            "bash $MONTE_CARLO/run-task.sh 1",
         ]
         assert glost_tasks == expected
 
+    def test_run_task_script_created(
+        self,
+        mock_arrow_now,
+        mock_get_runs_info,
+        mock_hg_repo,
+        mock_git_repo,
+        mock_render_make_hdf5_yamls,
+        mock_render_mohid_run_yamls,
+        mock_render_model_dats,
+        mock_render_lagrangian_dats,
+        mock_render_glost_task_scripts,
+        glost_run_desc,
+        tmp_path,
+    ):
+        csv_file = tmp_path / "AKNS_spatial.csv"
+        csv_file.write_text("")
+        mohid_cmd.monte_carlo.monte_carlo(
+            tmp_path / "monte-carlo.yaml", csv_file, no_submit=True
+        )
+
+        runs_dir = glost_run_desc["paths"]["runs directory"]
+        job_id = glost_run_desc["job id"]
+        job_dir = Path(runs_dir) / f"{job_id}_2019-11-24T170743"
+        run_task_sh = (job_dir / "run-task.sh").read_text()
+        assert f'RUN_ID="{job_id}-$1"' in run_task_sh
+        assert "bash ${MONTE_CARLO}/glost-tasks/${RUN_ID}.sh" in run_task_sh
+
+    def test_run_task_script_drain(
+        self,
+        mock_arrow_now,
+        mock_get_runs_info,
+        mock_hg_repo,
+        mock_git_repo,
+        mock_render_make_hdf5_yamls,
+        mock_render_mohid_run_yamls,
+        mock_render_model_dats,
+        mock_render_lagrangian_dats,
+        mock_render_glost_task_scripts,
+        glost_run_desc,
+        tmp_path,
+    ):
+        csv_file = tmp_path / "AKNS_spatial.csv"
+        csv_file.write_text("")
+        mohid_cmd.monte_carlo.monte_carlo(
+            tmp_path / "monte-carlo.yaml", csv_file, no_submit=True
+        )
+
+        runs_dir = glost_run_desc["paths"]["runs directory"]
+        job_id = glost_run_desc["job id"]
+        job_dir = Path(runs_dir) / f"{job_id}_2019-11-24T170743"
+        (job_dir / "drain").mkdir()
+        (job_dir / "drain" / "12345678").touch()
+        proc = subprocess.run(
+            ["bash", os.fspath(job_dir / "run-task.sh"), "0"],
+            env=dict(
+                os.environ, MONTE_CARLO=os.fspath(job_dir), SLURM_JOB_ID="12345678"
+            ),
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        assert proc.returncode == 75
+        assert (
+            proc.stdout == f"Not starting {job_id}-0 because job 12345678 is draining\n"
+        )
+        assert not (job_dir / "results" / f"{job_id}-0" / "slurm-job-id").exists()
+
     def test_glost_job_script_created(
         self,
         mock_arrow_now,
@@ -1213,11 +2165,13 @@ class TestGlostJobDir:
             #SBATCH --mail-type=ALL
             #SBATCH --nodes={glost_run_desc["nodes"]}
             #SBATCH --ntasks-per-node=2
+            #SBATCH --cpus-per-task=1
             #SBATCH --mem-per-cpu={glost_run_desc["mem per cpu"]}
             #SBATCH --exclude=gra[801-803]
             #SBATCH --time=3:00:00
             #SBATCH --output={job_dir}/glost-job.stdout
             #SBATCH --error={job_dir}/glost-job.stderr
+            #SBATCH --signal=B:USR1@600
 
             module load StdEnv/2016.4
             module load glost/0.3.1
@@ -1226,10 +2180,55 @@ class TestGlostJobDir:
             module load nco/4.6.6
 
             export MONTE_CARLO={job_dir}
+            # The task list file may be given as an argument to run a shard of the job's tasks
+            GLOST_TASKS=${{1:-${{MONTE_CARLO}}/glost-tasks.txt}}
+            TIMING="${{MONTE_CARLO}}/timing.jsonl"
+
+            # Slurm signals the job to drain 600 seconds before its time limit.
+            # Tasks stop starting new runs when they find the drain file,
+            # and runs that are still going at the drain deadline are interrupted
+            # so that there is time to gather the results of runs that are complete.
+            DRAIN_FILE="${{MONTE_CARLO}}/drain/${{SLURM_JOB_ID}}"
+            DRAIN_DEADLINE=
+            drain() {{
+              echo "Draining at $(date)"
+              mkdir -p $(dirname ${{DRAIN_FILE}})
+              touch ${{DRAIN_FILE}}
+              DRAIN_DEADLINE=$(($(date +%s) + 480))
+            }}
+            trap drain USR1
 
             echo "Starting glost at $(date)"
-            srun glost_launch {job_dir}/glost-tasks.txt
+            GLOST_WALL=$(date +%s.%N)
+            read -r GLOST_MONO_START _ </proc/uptime
+            srun glost_launch ${{GLOST_TASKS}} &
+            GLOST_WORKERS=$((${{SLURM_NTASKS:-1}} - 1))
+            SRUN_PID=$!
+            # The drain signal interrupts wait, so keep waiting until srun finishes
+            while kill -0 ${{SRUN_PID}} 2>/dev/null
+            do
+              if test -n "${{DRAIN_DEADLINE}}"
+              then
+                while kill -0 ${{SRUN_PID}} 2>/dev/null && test $(date +%s) -lt ${{DRAIN_DEADLINE}}
+                do
+                  sleep 10
+                done
+                kill -TERM ${{SRUN_PID}} 2>/dev/null
+                DRAIN_DEADLINE=
+              fi
+              wait ${{SRUN_PID}}
+            done
+            wait ${{SRUN_PID}}
+            GLOST_EXIT_CODE=$?
+            read -r GLOST_MONO_END _ </proc/uptime
             echo "Ended glost at $(date)"
+            if test -f ${{DRAIN_FILE}}
+            then
+              {glost_run_desc["mohid command"]} drain ${{MONTE_CARLO}} --slurm-job-id ${{SLURM_JOB_ID}}
+            fi
+            printf '{{"job_id": "%s", "phase": "glost", "host": "%s", "wall": %s, "mono_start": %s, "mono_end": %s, "ntasks": %s, "workers": %s, "exit_code": %s}}\\n' \\
+              "{job_id}" "${{HOSTNAME}}" "${{GLOST_WALL}}" "${{GLOST_MONO_START}}" "${{GLOST_MONO_END}}" "${{SLURM_NTASKS:-0}}" "${{GLOST_WORKERS}}" "${{GLOST_EXIT_CODE}}" >>${{TIMING}}
+            exit ${{GLOST_EXIT_CODE}}
             """
         ).splitlines()
         assert glost_script == expected
@@ -1272,6 +2271,10 @@ class TestGlostJobDir:
                 {
                     "spill_date_hour": pandas.Timestamp("2017-06-15 02:00"),
                     "run_days": numpy.array([7] * n_runs, dtype=numpy.int64),
+                    "spill_lon": -123.16,
+                    "spill_lat": 49.2,
+                    "spill_volume": 1000.0,
+                    "Lagrangian_template": "Lagrangian_akns.dat",
                 }
             )
             return runs
@@ -1291,6 +2294,117 @@ class TestGlostJobDir:
         glost_script = (job_dir / "glost-job.sh").read_text()
         assert f"#SBATCH --time={walltime}" in glost_script
 
+    def test_queue_job_script(
+        self,
+        mock_arrow_now,
+        mock_get_runs_info,
+        mock_hg_repo,
+        mock_git_repo,
+        mock_render_make_hdf5_yamls,
+        mock_render_mohid_run_yamls,
+        mock_render_model_dats,
+        mock_render_lagrangian_dats,
+        mock_render_glost_task_scripts,
+        glost_run_desc,
+        tmp_path,
+    ):
+        csv_file = tmp_path / "AKNS_spatial.csv"
+        csv_file.write_text("")
+        mohid_cmd.monte_carlo.monte_carlo(
+            tmp_path / "monte-carlo.yaml", csv_file, no_submit=True, task_runner="queue"
+        )
+
+        runs_dir = glost_run_desc["paths"]["runs directory"]
+        job_id = glost_run_desc["job id"]
+        job_dir = Path(runs_dir) / f"{job_id}_2019-11-24T170743"
+        glost_script = (job_dir / "glost-job.sh").read_text().splitlines()
+        # Every task is a worker, so there is no GLOST manager task
+        assert "#SBATCH --ntasks-per-node=1" in glost_script
+        assert "TASK_QUEUE=${1:-${MONTE_CARLO}/queue}" in glost_script
+        assert (
+            f"srun {glost_run_desc['mohid command']} worker ${{TASK_QUEUE}} \\"
+            in glost_script
+        )
+        assert (
+            "  --deadline ${SLURM_JOB_END_TIME:-$((JOB_START + 10800))} "
+            "--task-time 10800 \\"
+        ) in glost_script
+        assert "  --drain-file ${DRAIN_FILE} &" in glost_script
+        assert "GLOST_WORKERS=${SLURM_NTASKS:-0}" in glost_script
+        assert "glost_launch" not in "\n".join(glost_script)
+
+    def test_task_queue_created(
+        self,
+        mock_arrow_now,
+        mock_get_runs_info,
+        mock_hg_repo,
+        mock_git_repo,
+        mock_render_make_hdf5_yamls,
+        mock_render_mohid_run_yamls,
+        mock_render_model_dats,
+        mock_render_lagrangian_dats,
+        mock_render_glost_task_scripts,
+        glost_run_desc,
+        tmp_path,
+    ):
+        csv_file = tmp_path / "AKNS_spatial.csv"
+        csv_file.write_text("")
+        mohid_cmd.monte_carlo.monte_carlo(
+            tmp_path / "monte-carlo.yaml", csv_file, no_submit=True, task_runner="queue"
+        )
+
+        runs_dir = glost_run_desc["paths"]["runs directory"]
+        job_id = glost_run_desc["job id"]
+        job_dir = Path(runs_dir) / f"{job_id}_2019-11-24T170743"
+        queue = mohid_cmd.monte_carlo.mohid_cmd.task_queue.TaskQueue(job_dir / "queue")
+        assert queue.unfinished_commands() == ["bash $MONTE_CARLO/run-task.sh 0"]
+        assert queue.counts()["pending"] == 1
+
+    def test_glost_job_script_tuned_resources(
+        self,
+        mock_arrow_now,
+        mock_get_runs_info,
+        mock_hg_repo,
+        mock_git_repo,
+        mock_render_make_hdf5_yamls,
+        mock_render_mohid_run_yamls,
+        mock_render_model_dats,
+        mock_render_lagrangian_dats,
+        mock_render_glost_task_scripts,
+        glost_run_desc,
+        tmp_path,
+    ):
+        csv_file = tmp_path / "AKNS_spatial.csv"
+        csv_file.write_text("")
+        sacct_file = tmp_path / "sacct.txt"
+        sacct_file.write_text(
+            textwrap.dedent(
+                """\
+                JobID|JobName|State|Elapsed|Timelimit|AllocCPUS|NTasks|TotalCPU|MaxRSS
+                1234|AKNS-spatial|COMPLETED|01:30:00|03:00:00|32||1-20:00:00|
+                1234.batch|batch|COMPLETED|01:30:00||32|1|00:01.234|12000K
+                1234.0|glost_launch|COMPLETED|01:29:58||32|32|1-19:58:00|3500000K
+                """
+            )
+        )
+
+        mohid_cmd.monte_carlo.monte_carlo(
+            tmp_path / "monte-carlo.yaml",
+            csv_file,
+            no_submit=True,
+            sacct_file=sacct_file,
+        )
+
+        runs_dir = glost_run_desc["paths"]["runs directory"]
+        job_id = glost_run_desc["job id"]
+        job_dir = Path(runs_dir) / f"{job_id}_2019-11-24T170743"
+        glost_script = (job_dir / "glost-job.sh").read_text()
+        assert "#SBATCH --cpus-per-task=1\n" in glost_script
+        assert "#SBATCH --mem-per-cpu=4500M\n" in glost_script
+        # 3:00:00 walltime scaled by 1.2 times the 50% of it used by the past job,
+        # and rounded up to 10 minutes
+        assert "#SBATCH --time=1:50:00\n" in glost_script
+
     def test_glost_job_desc_file_copied(
         self,
         mock_arrow_now,
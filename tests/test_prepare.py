@@ -133,34 +133,34 @@ class TestPrepare:
         tmp_path,
         monkeypatch,
     ):
-        def mock_make_run_dir(*args):
-            tmp_run_dir = (
-                tmp_path
-                / "runs_dir"
-                / "MarathassaConstTS_2019-11-23T203918.370737-0800"
-            )
-            tmp_run_dir.mkdir()
-            return tmp_run_dir
+        def mock_arrow_now():
+            return arrow.get("2019-11-23T203918.370737-0800")
 
-        monkeypatch.setattr(mohid_cmd.prepare, "_make_run_dir", mock_make_run_dir)
+        monkeypatch.setattr(mohid_cmd.prepare.arrow, "now", mock_arrow_now)
 
         tmp_run_dir = mohid_cmd.prepare.prepare(tmp_path / "mohid.yaml")
+        staging_dir = (
+            tmp_path
+            / "runs_dir"
+            / f".staging-MarathassaConstTS_2019-11-23T203918.370737-0800.{os.getpid()}"
+        )
         assert (tmp_run_dir / "MohidWater.exe").is_symlink()
         m_copy2.assert_called_once_with(
-            tmp_path / "mohid.yaml", tmp_run_dir / "mohid.yaml"
+            tmp_path / "mohid.yaml", staging_dir / "mohid.yaml"
         )
-        m_mk_frc_lnks.assert_called_once_with(run_desc, tmp_run_dir)
-        m_mk_nomfich.assert_called_once_with(run_desc, tmp_run_dir)
+        m_mk_frc_lnks.assert_called_once_with(run_desc, staging_dir)
+        m_mk_nomfich.assert_called_once_with(run_desc, staging_dir, tmp_run_dir)
         m_write_vcs_revs.assert_called_once_with(
             tmp_path / "MIDOSS-MOHID-CODE",
-            tmp_run_dir,
+            staging_dir,
             nemo_cmd.prepare.get_git_revision,
         )
-        m_rec_vcs_revs.assert_called_once_with(run_desc, tmp_run_dir)
+        m_rec_vcs_revs.assert_called_once_with(run_desc, staging_dir)
         assert (
             tmp_run_dir
             == tmp_path / "runs_dir" / "MarathassaConstTS_2019-11-23T203918.370737-0800"
         )
+        assert not staging_dir.exists()
 
     def test_prepare_w_tmp_run_dir(
         self,
@@ -173,20 +173,80 @@ class TestPrepare:
         tmp_path,
     ):
         tmp_run_dir = mohid_cmd.prepare.prepare(tmp_path / "mohid.yaml", "tmp_run_dir")
+        staging_dir = tmp_path / "runs_dir" / f".staging-tmp_run_dir.{os.getpid()}"
         assert (tmp_run_dir / "MohidWater.exe").is_symlink()
         m_copy2.assert_called_once_with(
-            tmp_path / "mohid.yaml", tmp_run_dir / "mohid.yaml"
+            tmp_path / "mohid.yaml", staging_dir / "mohid.yaml"
         )
-        m_mk_frc_lnks.assert_called_once_with(run_desc, tmp_run_dir)
-        m_mk_nomfich.assert_called_once_with(run_desc, tmp_run_dir)
+        m_mk_frc_lnks.assert_called_once_with(run_desc, staging_dir)
+        m_mk_nomfich.assert_called_once_with(run_desc, staging_dir, tmp_run_dir)
         m_write_vcs_revs.assert_called_once_with(
             tmp_path / "MIDOSS-MOHID-CODE",
-            tmp_run_dir,
+            staging_dir,
             nemo_cmd.prepare.get_git_revision,
         )
-        m_rec_vcs_revs.assert_called_once_with(run_desc, tmp_run_dir)
+        m_rec_vcs_revs.assert_called_once_with(run_desc, staging_dir)
         assert tmp_run_dir == (tmp_path / "runs_dir") / "tmp_run_dir"
 
+    @pytest.mark.parametrize(
+        "exception",
+        [SystemExit(2), OSError("disk quota exceeded"), KeyboardInterrupt()],
+    )
+    def test_rollback(
+        self,
+        m_rec_vcs_revs,
+        m_write_vcs_revs,
+        m_mk_nomfich,
+        m_mk_frc_lnks,
+        m_copy2,
+        exception,
+        run_desc,
+        tmp_path,
+    ):
+        m_rec_vcs_revs.side_effect = exception
+        with pytest.raises(type(exception)):
+            mohid_cmd.prepare.prepare(tmp_path / "mohid.yaml", "tmp_run_dir")
+        assert list((tmp_path / "runs_dir").iterdir()) == []
+
+    def test_run_dir_exists(
+        self,
+        m_rec_vcs_revs,
+        m_write_vcs_revs,
+        m_mk_nomfich,
+        m_mk_frc_lnks,
+        m_copy2,
+        run_desc,
+        tmp_path,
+        caplog,
+    ):
+        (tmp_path / "runs_dir" / "tmp_run_dir").mkdir()
+        caplog.set_level(logging.ERROR)
+        with pytest.raises(SystemExit):
+            mohid_cmd.prepare.prepare(tmp_path / "mohid.yaml", "tmp_run_dir")
+        assert caplog.messages == [
+            f"{tmp_path / 'runs_dir' / 'tmp_run_dir'} already exists"
+        ]
+        assert list((tmp_path / "runs_dir").iterdir()) == [
+            tmp_path / "runs_dir" / "tmp_run_dir"
+        ]
+
+    def test_invalid_run_desc(
+        self,
+        m_rec_vcs_revs,
+        m_write_vcs_revs,
+        m_mk_nomfich,
+        m_mk_frc_lnks,
+        m_copy2,
+        run_desc,
+        tmp_path,
+    ):
+        desc_file = tmp_path / "mohid.yaml"
+        desc_file.write_text(desc_file.read_text().replace("bathymetry:", "bathy:"))
+        with pytest.raises(SystemExit):
+            mohid_cmd.prepare.prepare(desc_file, "tmp_run_dir")
+        assert not (tmp_path / "runs_dir" / "tmp_run_dir").exists()
+        assert not m_copy2.called
+
 
 @patch("mohid_cmd.prepare.logger", autospec=True)
 class TestCheckMohidExec:
@@ -206,16 +266,16 @@ class TestCheckMohidExec:
             mohid_cmd.prepare._check_mohid_exec(run_desc)
 
 
-class TestMakeRunDir:
-    """Unit tests for `mohid prepare` _make_run_dir() function."""
+class TestRunDirPath:
+    """Unit tests for `mohid prepare` _run_dir_path() function."""
 
     def test_timestamp_run_dir(self, run_desc, monkeypatch):
         def mock_arrow_now():
             return arrow.get("2019-11-24T094803.201666-0800")
 
-        monkeypatch.setattr(nemo_cmd.prepare.arrow, "now", mock_arrow_now)
+        monkeypatch.setattr(mohid_cmd.prepare.arrow, "now", mock_arrow_now)
 
-        tmp_run_dir = mohid_cmd.prepare._make_run_dir(run_desc, tmp_run_dir="")
+        tmp_run_dir = mohid_cmd.prepare._run_dir_path(run_desc, tmp_run_dir="")
         expected = (
             Path(run_desc["paths"]["runs directory"])
             / "MarathassaConstTS_2019-11-24T094803.201666-0800"
@@ -223,8 +283,9 @@ class TestMakeRunDir:
         assert tmp_run_dir == expected
 
     def test_named_run_dir(self, run_desc):
-        tmp_run_dir = mohid_cmd.prepare._make_run_dir(run_desc, tmp_run_dir="foobar")
+        tmp_run_dir = mohid_cmd.prepare._run_dir_path(run_desc, tmp_run_dir="foobar")
         assert tmp_run_dir == Path(run_desc["paths"]["runs directory"]) / "foobar"
+        assert not tmp_run_dir.exists()
 
 
 class TestMakeForcingLinks:
@@ -318,7 +379,7 @@ class TestMakeNomfich:
             ROOT        : {tmp_run_dir/"res"}
             IN_MODEL    : ./{Path(run_desc["run data files"]["IN_MODEL"]).name}
             PARTIC_DATA : ./{Path(run_desc["run data files"]["PARTIC_DATA"]).name}
-            PARTIC_HDF  : {tmp_run_dir.joinpath("res", "Lagrangian_DieselFuel_refined_MarathassaConstTS.hdf")}
+            PARTIC_HDF  : {tmp_run_dir.joinpath("node-local", "Lagrangian_DieselFuel_refined_MarathassaConstTS.hdf")}
             DOMAIN      : ./{Path(run_desc["run data files"]["DOMAIN"]).name}
             SURF_DAT    : ./{Path(run_desc["run data files"]["SURF_DAT"]).name}
             SURF_HDF    : {tmp_run_dir.joinpath("res", "Atmosphere_MarathassaConstTS.hdf")}
@@ -351,3 +412,17 @@ class TestMakeNomfich:
         mohid_cmd.prepare._make_nomfich(run_desc, tmp_run_dir)
         for path in run_desc["run data files"].values():
             assert (tmp_run_dir / Path(path).name).is_file()
+
+    def test_nomfich_paths_in_run_dir(self, run_desc, tmp_path, monkeypatch):
+        staging_dir = tmp_path / ".staging-tmp_run_dir.42"
+        staging_dir.mkdir()
+        run_dir = tmp_path / "tmp_run_dir"
+        bathy_file = tmp_path / run_desc["bathymetry"]
+        bathy_file.write_text("")
+        monkeypatch.setitem(run_desc, "bathymetry", os.fspath(bathy_file))
+        mohid_cmd.prepare._make_nomfich(run_desc, staging_dir, run_dir)
+        assert (staging_dir / "res").is_dir()
+        assert not run_dir.exists()
+        nomfich = (staging_dir / "nomfich.dat").read_text()
+        assert f"ROOT        : {run_dir / 'res'}\n" in nomfich
+        assert os.fspath(staging_dir) not in nomfich
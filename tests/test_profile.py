@@ -0,0 +1,358 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd profile sub-command plug-in unit tests.
+"""
+import json
+import textwrap
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+import mohid_cmd.main
+import mohid_cmd.profile
+
+
+@pytest.fixture
+def profile_cmd():
+    return mohid_cmd.profile.Profile(mohid_cmd.main.MohidApp, [])
+
+
+def _timing_record(run_id, phase, wall, duration, mono_start=100.0):
+    return {
+        "run_id": run_id,
+        "phase": phase,
+        "host": "gra123",
+        "wall": wall,
+        "mono_start": mono_start,
+        "mono_end": mono_start + duration,
+        "bytes": 0,
+        "exit_code": 0,
+    }
+
+
+@pytest.fixture
+def job_dir(tmp_path):
+    job_dir = tmp_path / "AKNS-spatial_2020-06-15T142000"
+    for i, duration in enumerate((3600, 3600, 3600, 7200)):
+        run_id = f"AKNS-spatial-{i}"
+        results_dir = job_dir / "results" / run_id
+        results_dir.mkdir(parents=True)
+        records = [
+            _timing_record(run_id, "model", 1000.0, duration - 600),
+            _timing_record(run_id, "convert", 1000.0 + duration - 600, 300),
+            _timing_record(run_id, "task", 990.0, duration),
+        ]
+        (results_dir / "timing.jsonl").write_text(
+            "".join(f"{json.dumps(record)}\n" for record in records)
+        )
+    (job_dir / "glost-job.sh").write_text(
+        textwrap.dedent(
+            """\
+            #!/bin/bash
+
+            #SBATCH --job-name=AKNS-spatial
+            #SBATCH --nodes=1
+            #SBATCH --ntasks-per-node=3
+            #SBATCH --time=6:00:00
+            """
+        )
+    )
+    job_records = [
+        {
+            "job_id": "AKNS-spatial",
+            "phase": "submit",
+            "host": "gra-login1",
+            "wall": 100.0,
+        },
+        {
+            "job_id": "AKNS-spatial",
+            "phase": "glost",
+            "host": "gra123",
+            "wall": 700.0,
+            "mono_start": 0.0,
+            "mono_end": 10800.0,
+            "ntasks": 3,
+            "exit_code": 0,
+        },
+    ]
+    (job_dir / "timing.jsonl").write_text(
+        "".join(f"{json.dumps(record)}\n" for record in job_records)
+    )
+    return job_dir
+
+
+class TestParser:
+    """Unit tests for `mohid profile` sub-command command-line parser."""
+
+    def test_get_parser(self, profile_cmd):
+        parser = profile_cmd.get_parser("mohid profile")
+        assert parser.prog == "mohid profile"
+
+    def test_cmd_description(self, profile_cmd):
+        parser = profile_cmd.get_parser("mohid profile")
+        assert parser.description.strip().startswith(
+            "Summarize the phase timing records of the MIDOSS-MOHID runs"
+        )
+
+    def test_job_dir_argument(self, profile_cmd):
+        parser = profile_cmd.get_parser("mohid profile")
+        assert parser._actions[1].dest == "job_dir"
+        assert parser._actions[1].metavar == "JOB_DIR"
+        assert parser._actions[1].type == Path
+        assert parser._actions[1].help
+
+    def test_ntasks_per_node_option(self, profile_cmd):
+        parser = profile_cmd.get_parser("mohid profile")
+        assert parser._actions[2].dest == "ntasks_per_node"
+        assert parser._actions[2].option_strings == ["--ntasks-per-node"]
+        assert parser._actions[2].type == int
+        assert parser._actions[2].nargs == "+"
+        assert parser._actions[2].default == []
+        assert parser._actions[2].help
+
+    def test_stragglers_option(self, profile_cmd):
+        parser = profile_cmd.get_parser("mohid profile")
+        assert parser._actions[3].dest == "n_stragglers"
+        assert parser._actions[3].option_strings == ["--stragglers"]
+        assert parser._actions[3].type == int
+        assert parser._actions[3].default == 10
+        assert parser._actions[3].help
+
+    def test_parsed_args(self, profile_cmd):
+        parser = profile_cmd.get_parser("mohid profile")
+        parsed_args = parser.parse_args(
+            ["job_dir", "--ntasks-per-node", "16", "32", "--stragglers", "5"]
+        )
+        assert parsed_args.job_dir == Path("job_dir")
+        assert parsed_args.ntasks_per_node == [16, 32]
+        assert parsed_args.n_stragglers == 5
+
+
+class TestTakeAction:
+    """Unit test for `mohid profile` sub-command take_action() method."""
+
+    @patch("mohid_cmd.profile.profile", return_value="report\n", autospec=True)
+    def test_take_action(self, m_profile, profile_cmd):
+        profile_cmd.app.stdout = StringIO()
+        parsed_args = SimpleNamespace(
+            job_dir=Path("job_dir"), ntasks_per_node=[32], n_stragglers=10
+        )
+        profile_cmd.take_action(parsed_args)
+        m_profile.assert_called_once_with(
+            Path("job_dir"), ntasks_per_node=[32], n_stragglers=10
+        )
+        assert profile_cmd.app.stdout.getvalue() == "report\n"
+
+
+class TestProfile:
+    """Unit tests for profile() function."""
+
+    def test_run_count(self, job_dir):
+        report = mohid_cmd.profile.profile(job_dir)
+        assert "4 of 4 results directories have timing records" in report
+
+    def test_phase_durations(self, job_dir):
+        report = mohid_cmd.profile.profile(job_dir)
+        model_line = next(
+            line for line in report.splitlines() if line.strip().startswith("model ")
+        )
+        assert model_line.split()[1:3] == ["4", "4.33"]
+
+    def test_stragglers(self, job_dir):
+        report = mohid_cmd.profile.profile(job_dir, n_stragglers=1)
+        lines = report.splitlines()
+        i = lines.index("Slowest runs:")
+        assert lines[i + 1].split()[:2] == ["AKNS-spatial-3", "2:00:00"]
+        assert lines[i + 2] == ""
+
+    def test_queue_wait(self, job_dir):
+        report = mohid_cmd.profile.profile(job_dir)
+        assert "Queue wait: 0:10:00" in report
+
+    def test_glost_idle(self, job_dir):
+        report = mohid_cmd.profile.profile(job_dir)
+        assert (
+            "GLOST workers: 5.00 core-hours busy, 1.00 core-hours idle (17%)" in report
+        )
+
+    def test_queue_workers(self, job_dir):
+        record = {
+            "job_id": "AKNS-spatial",
+            "phase": "glost",
+            "host": "gra123",
+            "wall": 700.0,
+            "mono_start": 0.0,
+            "mono_end": 7200.0,
+            "ntasks": 3,
+            "workers": 3,
+            "exit_code": 0,
+        }
+        (job_dir / "timing.jsonl").write_text(f"{json.dumps(record)}\n")
+        report = mohid_cmd.profile.profile(job_dir)
+        assert "GLOST job: 2:00:00 on 3 tasks (3 queue workers)" in report
+        assert (
+            "GLOST workers: 5.00 core-hours busy, 1.00 core-hours idle (17%)" in report
+        )
+
+    def test_what_if_default_ntasks_per_node(self, job_dir):
+        report = mohid_cmd.profile.profile(job_dir)
+        lines = report.splitlines()
+        i = lines.index("Estimates for 1 node(s):")
+        assert lines[i + 2].split() == [
+            "3",
+            "2",
+            "2:30:00",
+            "2:50:00",
+            "3:10:00",
+            "7.50",
+        ]
+
+    def test_what_if_ntasks_per_node(self, job_dir):
+        report = mohid_cmd.profile.profile(job_dir, ntasks_per_node=[5, 9])
+        lines = report.splitlines()
+        i = lines.index("Estimates for 1 node(s):")
+        # Makespan can't be less than the longest run
+        assert lines[i + 2].split()[:3] == ["5", "4", "2:00:00"]
+        assert lines[i + 3].split()[:3] == ["9", "8", "2:00:00"]
+
+    def test_no_results(self, tmp_path):
+        report = mohid_cmd.profile.profile(tmp_path)
+        assert "0 of 0 results directories have timing records" in report
+        assert "No GLOST job timing records found" in report
+
+
+class TestDurationStats:
+    """Unit tests for DurationStats class."""
+
+    def test_empty(self):
+        stats = mohid_cmd.profile.DurationStats()
+        assert stats.count == 0
+        assert stats.mean == 0
+        assert stats.percentile(50) == 0
+
+    def test_exact_summary(self):
+        stats = mohid_cmd.profile.DurationStats()
+        for duration in (10, 20, 30, 0):
+            stats.add(duration)
+        assert stats.count == 4
+        assert stats.total == 60
+        assert stats.minimum == 0
+        assert stats.maximum == 30
+        assert stats.mean == 15
+
+    @pytest.mark.parametrize("q", (50, 90, 99))
+    def test_percentile_estimate(self, q):
+        stats = mohid_cmd.profile.DurationStats()
+        for duration in range(1, 10_001):
+            stats.add(duration)
+        # Histogram bins are about 12% wide
+        assert stats.percentile(q) == pytest.approx(q * 100, rel=0.13)
+
+    def test_percentile_limited_to_max(self):
+        stats = mohid_cmd.profile.DurationStats()
+        stats.add(3600)
+        assert stats.percentile(99) == 3600
+
+
+class TestReadTimingRecords:
+    """Unit tests for read_timing_records() function."""
+
+    def test_missing_file(self, tmp_path):
+        records = mohid_cmd.profile.read_timing_records(tmp_path / "timing.jsonl")
+        assert list(records) == []
+
+    def test_skip_unparsable_line(self, tmp_path):
+        timing_file = tmp_path / "timing.jsonl"
+        timing_file.write_text('{"phase": "model"}\n{"phase": "conv\n')
+        records = mohid_cmd.profile.read_timing_records(timing_file)
+        assert list(records) == [{"phase": "model"}]
+
+
+class TestSummarizeRun:
+    """Unit tests for summarize_run() function."""
+
+    def test_no_records(self):
+        assert mohid_cmd.profile.summarize_run([]) is None
+
+    def test_task_duration(self):
+        records = [
+            _timing_record("run-0", "model", 1000.0, 100),
+            _timing_record("run-0", "task", 990.0, 150),
+        ]
+        run = mohid_cmd.profile.summarize_run(records)
+        assert run["run_id"] == "run-0"
+        assert run["phases"] == {"model": 100, "task": 150}
+        assert run["duration"] == 150
+
+    def test_span_duration_without_task_record(self):
+        records = [
+            _timing_record("run-0", "model", 1000.0, 100),
+            _timing_record("run-0", "delete", 1100.0, 2),
+            _timing_record("run-0", "delete", 1102.0, 3),
+        ]
+        run = mohid_cmd.profile.summarize_run(records)
+        assert run["phases"] == {"model": 100, "delete": 5}
+        assert run["duration"] == 105
+
+
+class TestPhaseDuration:
+    """Unit tests for phase_duration() function."""
+
+    def test_no_wall_end(self):
+        record = _timing_record("AKNS-spatial-0", "rename", 1000.0, 0.01)
+        assert mohid_cmd.profile.phase_duration(record) == pytest.approx(0.01)
+
+    def test_wall_clock_duration(self):
+        record = _timing_record("AKNS-spatial-0", "rename", 1000.0, 0.0)
+        record["wall_end"] = 1000.004321
+        assert mohid_cmd.profile.phase_duration(record) == pytest.approx(0.004321)
+
+    def test_system_clock_stepped(self):
+        record = _timing_record("AKNS-spatial-0", "model", 1000.0, 60.0)
+        record["wall_end"] = 1000.0 + 60.0 - 3600.0
+        assert mohid_cmd.profile.phase_duration(record) == pytest.approx(60.0)
+
+
+class TestTaskExitCode:
+    """Unit tests for task_exit_code() function."""
+
+    def test_no_task_record(self, tmp_path):
+        timing_file = tmp_path / "timing.jsonl"
+        timing_file.write_text(f"{json.dumps({'phase': 'model', 'exit_code': 0})}\n")
+        assert mohid_cmd.profile.task_exit_code(tmp_path) is None
+
+    def test_most_recent_task(self, tmp_path):
+        records = [
+            {"phase": "task", "exit_code": 1},
+            {"phase": "model", "exit_code": 0},
+            {"phase": "task", "exit_code": 0},
+        ]
+        (tmp_path / "timing.jsonl").write_text(
+            "".join(f"{json.dumps(record)}\n" for record in records)
+        )
+        assert mohid_cmd.profile.task_exit_code(tmp_path) == 0
+
+
+class TestHmsToSeconds:
+    """Unit tests for _hms_to_seconds() function."""
+
+    @pytest.mark.parametrize(
+        "hms, expected", (("3:00:00", 10800), ("0:10:30", 630), ("1-2:00:00", 93600))
+    )
+    def test_hms_to_seconds(self, hms, expected):
+        assert mohid_cmd.profile._hms_to_seconds(hms) == expected
@@ -0,0 +1,164 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd prune sub-command plug-in unit tests.
+"""
+import logging
+import os
+import time
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+import mohid_cmd.main
+import mohid_cmd.prune
+
+
+@pytest.fixture
+def prune_cmd():
+    return mohid_cmd.prune.Prune(mohid_cmd.main.MohidApp, [])
+
+
+@pytest.fixture
+def runs_dir(tmp_path):
+    """Runs directory with 2 old staging directories, a new one,
+    and a temporary run directory.
+    """
+    runs_dir = tmp_path / "runs"
+    old = time.time() - 2 * mohid_cmd.prune.MIN_AGE
+    for name in (".staging-AKNS-0.123", ".staging-AKNS-1.456"):
+        staging_dir = runs_dir / name
+        (staging_dir / "res").mkdir(parents=True)
+        (staging_dir / "nomfich.dat").write_text("")
+        os.utime(staging_dir, (old, old))
+    (runs_dir / ".staging-AKNS-2.789").mkdir()
+    (runs_dir / "AKNS-3").mkdir()
+    return runs_dir
+
+
+class TestParser:
+    """Unit tests for `mohid prune` sub-command command-line parser."""
+
+    def test_get_parser(self, prune_cmd):
+        parser = prune_cmd.get_parser("mohid prune")
+        assert parser.prog == "mohid prune"
+
+    def test_runs_dirs_argument(self, prune_cmd):
+        parser = prune_cmd.get_parser("mohid prune")
+        assert parser._actions[1].dest == "runs_dirs"
+        assert parser._actions[1].metavar == "RUNS_DIR"
+        assert parser._actions[1].type == Path
+        assert parser._actions[1].nargs == "+"
+        assert parser._actions[1].help
+
+    def test_min_age_option(self, prune_cmd):
+        parser = prune_cmd.get_parser("mohid prune")
+        assert parser._actions[2].dest == "min_age"
+        assert parser._actions[2].option_strings == ["--min-age"]
+        assert parser._actions[2].type == float
+        assert parser._actions[2].default == mohid_cmd.prune.MIN_AGE
+        assert parser._actions[2].help
+
+    def test_dry_run_option(self, prune_cmd):
+        parser = prune_cmd.get_parser("mohid prune")
+        assert parser._actions[3].dest == "dry_run"
+        assert parser._actions[3].option_strings == ["--dry-run"]
+        assert parser._actions[3].default is False
+        assert parser._actions[3].help
+
+    def test_parsed_args(self, prune_cmd):
+        parser = prune_cmd.get_parser("mohid prune")
+        parsed_args = parser.parse_args(["runs/", "--min-age", "600", "--dry-run"])
+        assert parsed_args.runs_dirs == [Path("runs/")]
+        assert parsed_args.min_age == 600
+        assert parsed_args.dry_run is True
+
+
+class TestTakeAction:
+    """Unit tests for `mohid prune` sub-command take_action() method."""
+
+    def test_prune(self, prune_cmd, runs_dir, caplog):
+        caplog.set_level(logging.INFO)
+        parsed_args = SimpleNamespace(
+            runs_dirs=[runs_dir], min_age=mohid_cmd.prune.MIN_AGE, dry_run=False
+        )
+        prune_cmd.take_action(parsed_args)
+        assert sorted(path.name for path in runs_dir.iterdir()) == [
+            ".staging-AKNS-2.789",
+            "AKNS-3",
+        ]
+        assert caplog.messages == ["removed 2 orphaned staging directories"]
+
+    def test_dry_run(self, prune_cmd, runs_dir):
+        prune_cmd.app.stdout = StringIO()
+        parsed_args = SimpleNamespace(
+            runs_dirs=[runs_dir], min_age=mohid_cmd.prune.MIN_AGE, dry_run=True
+        )
+        prune_cmd.take_action(parsed_args)
+        assert prune_cmd.app.stdout.getvalue() == (
+            f"{runs_dir / '.staging-AKNS-0.123'}\n"
+            f"{runs_dir / '.staging-AKNS-1.456'}\n"
+        )
+        assert len(list(runs_dir.iterdir())) == 4
+
+
+class TestFindOrphans:
+    """Unit tests for find_orphans() function."""
+
+    def test_old_staging_dirs(self, runs_dir):
+        orphans = mohid_cmd.prune.find_orphans([runs_dir])
+        assert orphans == [
+            runs_dir / ".staging-AKNS-0.123",
+            runs_dir / ".staging-AKNS-1.456",
+        ]
+
+    def test_min_age(self, runs_dir):
+        orphans = mohid_cmd.prune.find_orphans([runs_dir], min_age=0)
+        assert [orphan.name for orphan in orphans] == [
+            ".staging-AKNS-0.123",
+            ".staging-AKNS-1.456",
+            ".staging-AKNS-2.789",
+        ]
+
+    def test_staging_file_ignored(self, tmp_path):
+        (tmp_path / ".staging-notes.txt").write_text("")
+        assert mohid_cmd.prune.find_orphans([tmp_path], min_age=0) == []
+
+
+class TestRemoveDirs:
+    """Unit tests for remove_dirs() function."""
+
+    def test_remove_dirs(self, runs_dir):
+        dirs = mohid_cmd.prune.find_orphans([runs_dir])
+        assert mohid_cmd.prune.remove_dirs(dirs) == 2
+        assert not any(path.exists() for path in dirs)
+
+    def test_no_dirs(self):
+        assert mohid_cmd.prune.remove_dirs([]) == 0
+
+    def test_already_removed(self, tmp_path):
+        assert mohid_cmd.prune.remove_dirs([tmp_path / ".staging-gone.1"]) == 0
+
+    def test_remove_error(self, runs_dir, caplog):
+        dirs = mohid_cmd.prune.find_orphans([runs_dir])
+        caplog.set_level(logging.WARNING)
+        with patch(
+            "mohid_cmd.prune.shutil.rmtree",
+            side_effect=[None, PermissionError("Permission denied")],
+        ):
+            assert mohid_cmd.prune.remove_dirs(dirs) == 1
+        assert caplog.messages[0].startswith("could not remove ")
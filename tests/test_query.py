@@ -0,0 +1,306 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd query sub-command plug-in unit tests.
+"""
+import logging
+import textwrap
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+
+import arrow
+import pytest
+
+import mohid_cmd.index
+import mohid_cmd.job_index
+import mohid_cmd.main
+import mohid_cmd.query
+
+
+@pytest.fixture
+def query_cmd():
+    return mohid_cmd.query.Query(mohid_cmd.main.MohidApp, [])
+
+
+@pytest.fixture
+def job_dir(tmp_path):
+    """Job directory with runs at Turn Point (0, 2), Victoria (1, 4),
+    and Vancouver (3).
+    """
+    job_dir = tmp_path / "AKNS-spatial_2019-11-24T170743"
+    job_dir.mkdir()
+    (job_dir / "AKNS-spatial.yaml").write_text(
+        textwrap.dedent(
+            f"""\
+            job id: AKNS-spatial
+            paths:
+              forcing directory: {tmp_path / 'forcing'}
+            """
+        )
+    )
+    (job_dir / "AKNS_spatial.csv").write_text(
+        textwrap.dedent(
+            """\
+            spill_date_hour, run_days, spill_lon, spill_lat, spill_volume, Lagrangian_template
+            2017-06-15 02:00, 7, -123.24, 48.69, 1000, Lagrangian_akns.dat
+            2017-06-20 14:00, 7, -123.37, 48.42, 250.5, Lagrangian_bunker.dat
+            2018-06-01 00:00, 7, -123.20, 48.65, 12, Lagrangian_akns.dat
+            2017-12-01 08:00, 14, -123.12, 49.29, 42, Lagrangian_akns.dat
+            2017-07-01 00:00, 7, -123.40, 48.40, 5000, Lagrangian_akns.dat
+            """
+        )
+    )
+    mohid_cmd.index.build_index(job_dir)
+    return job_dir
+
+
+def _run_numbers(results_dirs):
+    return [int(path.name.rpartition("-")[2]) for path in results_dirs]
+
+
+class TestParser:
+    """Unit tests for `mohid query` sub-command command-line parser."""
+
+    def test_get_parser(self, query_cmd):
+        parser = query_cmd.get_parser("mohid query")
+        assert parser.prog == "mohid query"
+
+    def test_job_dirs_argument(self, query_cmd):
+        parser = query_cmd.get_parser("mohid query")
+        assert parser._actions[1].dest == "job_dirs"
+        assert parser._actions[1].metavar == "JOB_DIR"
+        assert parser._actions[1].type == Path
+        assert parser._actions[1].nargs == "+"
+        assert parser._actions[1].help
+
+    def test_near_option(self, query_cmd):
+        parser = query_cmd.get_parser("mohid query")
+        assert parser._actions[2].dest == "near"
+        assert parser._actions[2].option_strings == ["--near"]
+        assert parser._actions[2].type == float
+        assert parser._actions[2].nargs == 2
+        assert parser._actions[2].help
+
+    def test_within_option(self, query_cmd):
+        parser = query_cmd.get_parser("mohid query")
+        assert parser._actions[3].dest == "within"
+        assert parser._actions[3].option_strings == ["--within"]
+        assert parser._actions[3].type == float
+        assert parser._actions[3].help
+
+    @pytest.mark.parametrize("i, dest", [(4, "start"), (5, "end")])
+    def test_date_options(self, i, dest, query_cmd):
+        parser = query_cmd.get_parser("mohid query")
+        assert parser._actions[i].dest == dest
+        assert parser._actions[i].option_strings == [f"--{dest}"]
+        assert parser._actions[i].type == arrow.get
+        assert parser._actions[i].default is None
+        assert parser._actions[i].help
+
+    def test_month_option(self, query_cmd):
+        parser = query_cmd.get_parser("mohid query")
+        assert parser._actions[6].dest == "months"
+        assert parser._actions[6].option_strings == ["--month"]
+        assert parser._actions[6].type == int
+        assert list(parser._actions[6].choices) == list(range(1, 13))
+        assert parser._actions[6].help
+
+    @pytest.mark.parametrize("i, dest", [(7, "min_volume"), (8, "max_volume")])
+    def test_volume_options(self, i, dest, query_cmd):
+        parser = query_cmd.get_parser("mohid query")
+        assert parser._actions[i].dest == dest
+        assert parser._actions[i].type == float
+        assert parser._actions[i].default is None
+        assert parser._actions[i].help
+
+    def test_status_option(self, query_cmd):
+        parser = query_cmd.get_parser("mohid query")
+        assert parser._actions[9].dest == "status"
+        assert parser._actions[9].option_strings == ["--status"]
+        assert mohid_cmd.job_index.DONE in parser._actions[9].choices
+        assert parser._actions[9].help
+
+    def test_parsed_args(self, query_cmd):
+        parser = query_cmd.get_parser("mohid query")
+        parsed_args = parser.parse_args(
+            [
+                "job_dir/",
+                "--near",
+                "-123.2",
+                "48.4",
+                "--within",
+                "10",
+                "--month",
+                "6",
+                "--month",
+                "7",
+                "--start",
+                "2017-01-01",
+            ]
+        )
+        assert parsed_args.job_dirs == [Path("job_dir/")]
+        assert parsed_args.near == [-123.2, 48.4]
+        assert parsed_args.within == 10
+        assert parsed_args.months == [6, 7]
+        assert parsed_args.start == arrow.get("2017-01-01")
+        assert parsed_args.end is None
+
+
+class TestTakeAction:
+    """Unit tests for `mohid query` sub-command take_action() method."""
+
+    @staticmethod
+    def _parsed_args(job_dir, **kwargs):
+        args = dict(
+            job_dirs=[job_dir],
+            near=None,
+            within=None,
+            start=None,
+            end=None,
+            months=None,
+            min_volume=None,
+            max_volume=None,
+            status=None,
+        )
+        args.update(kwargs)
+        return SimpleNamespace(**args)
+
+    def test_query(self, query_cmd, job_dir, caplog):
+        query_cmd.app.stdout = StringIO()
+        caplog.set_level(logging.INFO)
+        query_cmd.take_action(self._parsed_args(job_dir, min_volume=1))
+        assert query_cmd.app.stdout.getvalue() == (
+            f"{job_dir / 'results' / 'AKNS-spatial-0'}\n"
+            f"{job_dir / 'results' / 'AKNS-spatial-4'}\n"
+        )
+        assert caplog.messages == ["2 run(s) matched in 1 job(s)"]
+
+    def test_near_without_within(self, query_cmd, job_dir, caplog):
+        caplog.set_level(logging.ERROR)
+        with pytest.raises(SystemExit):
+            query_cmd.take_action(self._parsed_args(job_dir, near=[-123.2, 48.4]))
+        assert caplog.messages == ["--near and --within must be used together"]
+
+    def test_database_error(self, query_cmd, job_dir, caplog):
+        (job_dir / mohid_cmd.job_index.INDEX_FILE).write_text("not a database")
+        caplog.set_level(logging.ERROR)
+        with pytest.raises(SystemExit):
+            query_cmd.take_action(self._parsed_args(job_dir))
+        assert caplog.messages[0].startswith("could not query run index: ")
+
+
+class TestQuery:
+    """Unit tests for query() function."""
+
+    def test_no_criteria(self, job_dir):
+        results_dirs = mohid_cmd.query.query([job_dir])
+        assert results_dirs[0] == job_dir / "results" / "AKNS-spatial-0"
+        assert _run_numbers(results_dirs) == [0, 1, 2, 3, 4]
+
+    def test_near_within(self, job_dir):
+        results_dirs = mohid_cmd.query.query([job_dir], near=(-123.24, 48.69), within=6)
+        assert _run_numbers(results_dirs) == [0, 2]
+
+    def test_near_within_month(self, job_dir):
+        results_dirs = mohid_cmd.query.query(
+            [job_dir], near=(-123.38, 48.41), within=10, months=[6]
+        )
+        assert _run_numbers(results_dirs) == [1]
+
+    def test_start_end(self, job_dir):
+        results_dirs = mohid_cmd.query.query(
+            [job_dir], start=arrow.get("2017-06-20"), end=arrow.get("2017-07-01")
+        )
+        assert _run_numbers(results_dirs) == [1]
+
+    def test_months(self, job_dir):
+        results_dirs = mohid_cmd.query.query([job_dir], months=[7, 12])
+        assert _run_numbers(results_dirs) == [3, 4]
+
+    def test_volume(self, job_dir):
+        # Spill volumes are in litres in the CSV file, and in m^3 in queries
+        results_dirs = mohid_cmd.query.query([job_dir], min_volume=0.04, max_volume=1)
+        assert _run_numbers(results_dirs) == [0, 1, 3]
+
+    def test_status(self, job_dir):
+        mohid_cmd.job_index.record_task_exit(job_dir, 3, 0)
+        results_dirs = mohid_cmd.query.query([job_dir], status=mohid_cmd.job_index.DONE)
+        assert _run_numbers(results_dirs) == [3]
+
+    def test_status_not_synced_without_status_criterion(self, job_dir):
+        mohid_cmd.job_index.record_task_exit(job_dir, 3, 0)
+        mohid_cmd.query.query([job_dir])
+        with mohid_cmd.job_index.connect(job_dir) as connection:
+            (status,) = connection.execute(
+                "SELECT status FROM runs WHERE run_number = 3"
+            ).fetchone()
+        assert status == mohid_cmd.job_index.PENDING
+
+    def test_index_built(self, job_dir, caplog):
+        (job_dir / mohid_cmd.job_index.INDEX_FILE).unlink()
+        caplog.set_level(logging.INFO)
+        results_dirs = mohid_cmd.query.query([job_dir], months=[12])
+        assert _run_numbers(results_dirs) == [3]
+        assert (job_dir / mohid_cmd.job_index.INDEX_FILE).exists()
+        assert caplog.messages == [f"indexed 5 runs in {job_dir}"]
+
+    def test_several_jobs(self, job_dir, tmp_path):
+        results_dirs = mohid_cmd.query.query([job_dir, job_dir], months=[12])
+        assert results_dirs == [job_dir / "results" / "AKNS-spatial-3"] * 2
+
+
+class TestBoundingBox:
+    """Unit tests for bounding_box() function."""
+
+    def test_bounding_box(self):
+        lon_min, lat_min, lon_max, lat_max = mohid_cmd.query.bounding_box(
+            -123.2, 48.4, 10
+        )
+        assert lat_max - 48.4 == pytest.approx(0.0899, abs=1e-4)
+        assert 48.4 - lat_min == pytest.approx(0.0899, abs=1e-4)
+        # Degrees of longitude are shorter than degrees of latitude at 48.4N
+        assert lon_max - -123.2 == pytest.approx(0.1355, abs=1e-4)
+        assert -123.2 - lon_min == pytest.approx(0.1355, abs=1e-4)
+
+    def test_contains_circle(self):
+        lon_min, lat_min, lon_max, lat_max = mohid_cmd.query.bounding_box(
+            -123.2, 48.4, 10
+        )
+        assert mohid_cmd.query.distance(-123.2, 48.4, lon_max, 48.4) >= 10
+        assert mohid_cmd.query.distance(-123.2, 48.4, -123.2, lat_max) == (
+            pytest.approx(10)
+        )
+
+    def test_pole(self):
+        assert mohid_cmd.query.bounding_box(0, 89.99, 10) == pytest.approx(
+            (-180, 89.9001, 180, 90), abs=1e-4
+        )
+
+
+class TestDistance:
+    """Unit tests for distance() function."""
+
+    def test_same_location(self):
+        assert mohid_cmd.query.distance(-123.2, 48.4, -123.2, 48.4) == 0
+
+    def test_one_degree_of_latitude(self):
+        assert mohid_cmd.query.distance(-123.2, 48, -123.2, 49) == pytest.approx(
+            111.195, abs=1e-3
+        )
+
+    def test_victoria_to_vancouver(self):
+        assert mohid_cmd.query.distance(
+            -123.37, 48.42, -123.12, 49.29
+        ) == pytest.approx(98.4, abs=0.5)
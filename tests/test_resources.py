@@ -0,0 +1,320 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd resources sub-command plug-in unit tests.
+"""
+import logging
+import subprocess
+import textwrap
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+import mohid_cmd.main
+import mohid_cmd.resources
+
+
+@pytest.fixture
+def resources_cmd():
+    return mohid_cmd.resources.Resources(mohid_cmd.main.MohidApp, [])
+
+
+@pytest.fixture
+def sacct_file(tmp_path):
+    sacct_file = tmp_path / "sacct.txt"
+    sacct_file.write_text(
+        textwrap.dedent(
+            """\
+            JobID|JobName|State|Elapsed|Timelimit|AllocCPUS|NTasks|TotalCPU|MaxRSS
+            1001|AKNS-2017-06-15|COMPLETED|01:00:00|02:00:00|1||00:58:00|
+            1001.batch|batch|COMPLETED|01:00:00||1|1|00:58:00|2000000K
+            1001.extern|extern|COMPLETED|01:00:00||1|1|00:00:00|900000K
+            1002|AKNS-2017-06-16|COMPLETED|01:30:00|02:00:00|1||01:29:00|
+            1002.batch|batch|COMPLETED|01:30:00||1|1|01:29:00|3000000K
+            1003|AKNS-2017-06-17|CANCELLED by 1234|00:05:00|02:00:00|1||00:04:00|
+            1003.batch|batch|CANCELLED|00:05:00||1|1|00:04:00|9000000K
+            1004|SoG-2017-06-15|COMPLETED|05:00:00|06:00:00|1||04:59:00|
+            1004.batch|batch|COMPLETED|05:00:00||1|1|04:59:00|9000000K
+            """
+        )
+    )
+    return sacct_file
+
+
+class TestParser:
+    """Unit tests for `mohid resources` sub-command command-line parser."""
+
+    def test_get_parser(self, resources_cmd):
+        parser = resources_cmd.get_parser("mohid resources")
+        assert parser.prog == "mohid resources"
+
+    def test_cmd_description(self, resources_cmd):
+        parser = resources_cmd.get_parser("mohid resources")
+        assert parser.description.strip().startswith(
+            "Suggest right-sized memory per CPU, CPUs per task, and walltime requests"
+        )
+
+    def test_job_name_argument(self, resources_cmd):
+        parser = resources_cmd.get_parser("mohid resources")
+        assert parser._actions[1].dest == "job_name"
+        assert parser._actions[1].metavar == "JOB_NAME"
+        assert parser._actions[1].help
+
+    def test_sacct_file_option(self, resources_cmd):
+        parser = resources_cmd.get_parser("mohid resources")
+        assert parser._actions[2].dest == "sacct_file"
+        assert parser._actions[2].option_strings == ["--sacct-file"]
+        assert parser._actions[2].type == Path
+        assert parser._actions[2].default is None
+        assert parser._actions[2].help
+
+    def test_starttime_option(self, resources_cmd):
+        parser = resources_cmd.get_parser("mohid resources")
+        assert parser._actions[3].dest == "starttime"
+        assert parser._actions[3].option_strings == ["--starttime"]
+        assert parser._actions[3].default == "now-30days"
+        assert parser._actions[3].help
+
+    def test_parsed_args(self, resources_cmd):
+        parser = resources_cmd.get_parser("mohid resources")
+        parsed_args = parser.parse_args(["AKNS-*", "--sacct-file", "sacct.txt"])
+        assert parsed_args.job_name == "AKNS-*"
+        assert parsed_args.sacct_file == Path("sacct.txt")
+
+
+class TestTakeAction:
+    """Unit tests for `mohid resources` sub-command take_action() method."""
+
+    def test_take_action(self, resources_cmd, sacct_file):
+        resources_cmd.app.stdout = StringIO()
+        parsed_args = SimpleNamespace(
+            job_name="AKNS-*", sacct_file=sacct_file, starttime="now-30days"
+        )
+        resources_cmd.take_action(parsed_args)
+        assert resources_cmd.app.stdout.getvalue() == textwrap.dedent(
+            """\
+            Based on 2 past job(s):
+              #SBATCH --cpus-per-task=1
+              #SBATCH --mem-per-cpu=3750M
+              #SBATCH --time=1:50:00
+              walltime fraction for GLOST jobs: 0.90
+            """
+        )
+
+    def test_take_action_no_matches(self, resources_cmd, sacct_file, caplog):
+        resources_cmd.app.stdout = StringIO()
+        parsed_args = SimpleNamespace(
+            job_name="SalishSea-*", sacct_file=sacct_file, starttime="now-30days"
+        )
+        caplog.set_level(logging.WARNING)
+        resources_cmd.take_action(parsed_args)
+        assert caplog.messages[0] == "no usable sacct records found for SalishSea-*"
+        assert resources_cmd.app.stdout.getvalue() == ""
+
+
+class TestAdvise:
+    """Unit tests for advise() function."""
+
+    def test_exact_job_name(self, sacct_file):
+        advice = mohid_cmd.resources.advise("AKNS-2017-06-15", sacct_file=sacct_file)
+        assert advice == {
+            "n_jobs": 1,
+            # 1953 MiB * 1.25 rounded up to 250 MiB
+            "mem_per_cpu": 2500,
+            "cpus_per_task": 1,
+            # 1 hour * 1.2 rounded up to 10 minutes
+            "walltime": 4800,
+            "walltime_fraction": pytest.approx(0.6),
+        }
+
+    def test_wildcard_job_name_excludes_cancelled(self, sacct_file):
+        advice = mohid_cmd.resources.advise("AKNS-*", sacct_file=sacct_file)
+        assert advice["n_jobs"] == 2
+        assert advice["mem_per_cpu"] == 3750
+
+    def test_no_matching_jobs(self, sacct_file):
+        advice = mohid_cmd.resources.advise("SalishSea-*", sacct_file=sacct_file)
+        assert advice is None
+
+    def test_out_of_memory_headroom(self, tmp_path):
+        sacct_file = tmp_path / "sacct.txt"
+        sacct_file.write_text(
+            textwrap.dedent(
+                """\
+                JobID|JobName|State|Elapsed|Timelimit|AllocCPUS|NTasks|TotalCPU|MaxRSS
+                1001|AKNS-2017-06-15|OUT_OF_MEMORY|00:10:00|02:00:00|1||00:10:00|
+                1001.batch|batch|OUT_OF_MEMORY|00:10:00||1|1|00:10:00|2000M
+                """
+            )
+        )
+        advice = mohid_cmd.resources.advise("AKNS-2017-06-15", sacct_file=sacct_file)
+        assert advice["mem_per_cpu"] == 3000
+
+    def test_allocated_and_used_cpus_differ(self, tmp_path):
+        sacct_file = tmp_path / "sacct.txt"
+        sacct_file.write_text(
+            textwrap.dedent(
+                """\
+                JobID|JobName|State|Elapsed|Timelimit|AllocCPUS|NTasks|TotalCPU|MaxRSS
+                1001|AKNS-2017-06-15|COMPLETED|01:00:00|02:00:00|4||01:30:00|
+                1001.batch|batch|COMPLETED|01:00:00||4|1|01:30:00|8192M
+                """
+            )
+        )
+        advice = mohid_cmd.resources.advise("AKNS-2017-06-15", sacct_file=sacct_file)
+        assert advice["cpus_per_task"] == 2
+        # 8192 MiB * 1.25 / 2 CPUs rounded up to 250 MiB
+        assert advice["mem_per_cpu"] == 5250
+        assert advice["mem_per_cpu"] * advice["cpus_per_task"] >= 8192 * 1.25
+
+    def test_no_step_records(self, tmp_path):
+        sacct_file = tmp_path / "sacct.txt"
+        sacct_file.write_text(
+            textwrap.dedent(
+                """\
+                JobID|JobName|State|Elapsed|Timelimit|AllocCPUS|NTasks|TotalCPU|MaxRSS
+                1001|AKNS-2017-06-15|COMPLETED|01:00:00|02:00:00|1||00:59:00|
+                """
+            )
+        )
+        advice = mohid_cmd.resources.advise("AKNS-2017-06-15", sacct_file=sacct_file)
+        assert advice is None
+
+    def test_zero_elapsed_skipped(self, tmp_path):
+        sacct_file = tmp_path / "sacct.txt"
+        sacct_file.write_text(
+            textwrap.dedent(
+                """\
+                JobID|JobName|State|Elapsed|Timelimit|AllocCPUS|NTasks|TotalCPU|MaxRSS
+                1001|AKNS-2017-06-15|COMPLETED|00:00:00|02:00:00|1||00:00:00|
+                1001.batch|batch|COMPLETED|00:00:00||1|1|00:00:00|8000M
+                1002|AKNS-2017-06-16|COMPLETED|01:00:00|02:00:00|1||00:59:00|
+                1002.batch|batch|COMPLETED|01:00:00||1|1|00:59:00|2000M
+                """
+            )
+        )
+        advice = mohid_cmd.resources.advise("AKNS-*", sacct_file=sacct_file)
+        assert advice["n_jobs"] == 1
+        assert advice["mem_per_cpu"] == 2500
+        assert advice["walltime"] == 4800
+
+    def test_only_zero_elapsed(self, tmp_path):
+        sacct_file = tmp_path / "sacct.txt"
+        sacct_file.write_text(
+            textwrap.dedent(
+                """\
+                JobID|JobName|State|Elapsed|Timelimit|AllocCPUS|NTasks|TotalCPU|MaxRSS
+                1001|AKNS-2017-06-15|COMPLETED|00:00:00|02:00:00|1||00:00:00|
+                1001.batch|batch|COMPLETED|00:00:00||1|1|00:00:00|8000M
+                """
+            )
+        )
+        advice = mohid_cmd.resources.advise("AKNS-2017-06-15", sacct_file=sacct_file)
+        assert advice is None
+
+    @patch("mohid_cmd.resources.subprocess.run", autospec=True)
+    def test_run_sacct(self, m_run, sacct_file):
+        m_run.return_value = SimpleNamespace(stdout=sacct_file.read_text())
+        advice = mohid_cmd.resources.advise("AKNS-*", starttime="2021-01-01")
+        m_run.assert_called_once_with(
+            [
+                "sacct",
+                "--parsable2",
+                "--starttime=2021-01-01",
+                "--format=JobID,JobName,State,Elapsed,Timelimit,AllocCPUS,NTasks,TotalCPU,MaxRSS",
+            ],
+            check=True,
+            universal_newlines=True,
+            stdout=subprocess.PIPE,
+        )
+        assert advice["n_jobs"] == 2
+
+
+class TestScaleWalltime:
+    """Unit test for scale_walltime() function."""
+
+    def test_scale_walltime(self):
+        advice = {"walltime_fraction": 0.6}
+        assert mohid_cmd.resources.scale_walltime(10800, advice) == 6600
+
+
+class TestParseSacct:
+    """Unit tests for parse_sacct() function."""
+
+    def test_glost_job(self):
+        lines = textwrap.dedent(
+            """\
+            JobID|JobName|State|Elapsed|Timelimit|AllocCPUS|NTasks|TotalCPU|MaxRSS
+            1234|AKNS-spatial|TIMEOUT|1-00:00:00|1-00:00:00|64||30-00:00:00|
+            1234.batch|batch|CANCELLED|1-00:00:02||32|1|00:01.234|12000K
+            1234.0|glost_launch|CANCELLED|1-00:00:00||64|32|29-23:58:00|7.5G
+            """
+        ).splitlines()
+        jobs = list(mohid_cmd.resources.parse_sacct(lines))
+        assert len(jobs) == 1
+        assert jobs[0]["job_id"] == "1234"
+        assert jobs[0]["name"] == "AKNS-spatial"
+        assert jobs[0]["state"] == "TIMEOUT"
+        assert jobs[0]["elapsed"] == 86400
+        assert jobs[0]["timelimit"] == 86400
+        assert jobs[0]["cpus_per_task"] == 2
+        assert jobs[0]["cpus_used_per_task"] == pytest.approx(30 / 32)
+        assert jobs[0]["max_rss"] == 7.5 * 2**30
+
+    def test_unlimited_timelimit(self):
+        lines = textwrap.dedent(
+            """\
+            JobID|JobName|State|Elapsed|Timelimit|AllocCPUS|NTasks|TotalCPU|MaxRSS
+            1234|interactive|COMPLETED|00:30:00|UNLIMITED|1||00:10:00|
+            """
+        ).splitlines()
+        jobs = list(mohid_cmd.resources.parse_sacct(lines))
+        assert jobs[0]["timelimit"] is None
+        assert jobs[0]["max_rss"] == 0
+
+
+class TestParseDuration:
+    """Unit tests for _parse_duration() function."""
+
+    @pytest.mark.parametrize(
+        "duration, expected",
+        (
+            ("00:01.234", 1.234),
+            ("12:34", 754),
+            ("01:30:00", 5400),
+            ("2-01:00:00", 176400),
+        ),
+    )
+    def test_parse_duration(self, duration, expected):
+        assert mohid_cmd.resources._parse_duration(duration) == pytest.approx(expected)
+
+
+class TestParseSize:
+    """Unit tests for _parse_size() function."""
+
+    @pytest.mark.parametrize(
+        "size, expected",
+        (
+            ("", 0),
+            ("0", 0),
+            ("1024K", 2**20),
+            ("2.5M", 2.5 * 2**20),
+            ("1G", 2**30),
+        ),
+    )
+    def test_parse_size(self, size, expected):
+        assert mohid_cmd.resources._parse_size(size) == expected
@@ -14,6 +14,7 @@
 #  limitations under the License.
 """MOHID-Cmd run sub-command plug-in unit tests.
 """
+import json
 import logging
 import subprocess
 import textwrap
@@ -84,6 +85,47 @@ class TestParser:
         assert parser._actions[5].default == ""
         assert parser._actions[5].help
 
+    def test_tune_resources_option(self, run_cmd):
+        parser = run_cmd.get_parser("mohid run")
+        assert parser._actions[6].dest == "tune_resources"
+        assert parser._actions[6].option_strings == ["--tune-resources"]
+        assert parser._actions[6].const is True
+        assert parser._actions[6].default is False
+        assert parser._actions[6].help
+
+    def test_sacct_file_option(self, run_cmd):
+        parser = run_cmd.get_parser("mohid run")
+        assert parser._actions[7].dest == "sacct_file"
+        assert parser._actions[7].option_strings == ["--sacct-file"]
+        assert parser._actions[7].type == Path
+        assert parser._actions[7].default is None
+        assert parser._actions[7].help
+
+    def test_scaling_test_option(self, run_cmd):
+        parser = run_cmd.get_parser("mohid run")
+        assert parser._actions[8].dest == "scaling_test"
+        assert parser._actions[8].option_strings == ["--scaling-test"]
+        assert parser._actions[8].type == int
+        assert parser._actions[8].nargs == "+"
+        assert parser._actions[8].default == []
+        assert parser._actions[8].help
+
+    def test_executor_option(self, run_cmd):
+        parser = run_cmd.get_parser("mohid run")
+        assert parser._actions[9].dest == "executor"
+        assert parser._actions[9].option_strings == ["--executor"]
+        assert list(parser._actions[9].choices) == ["sbatch", "local"]
+        assert parser._actions[9].default == "sbatch"
+        assert parser._actions[9].help
+
+    def test_cpus_option(self, run_cmd):
+        parser = run_cmd.get_parser("mohid run")
+        assert parser._actions[10].dest == "cpus"
+        assert parser._actions[10].option_strings == ["--cpus"]
+        assert parser._actions[10].type == int
+        assert parser._actions[10].default is None
+        assert parser._actions[10].help
+
     def test_parsed_args(self, run_cmd):
         parser = run_cmd.get_parser("mohid run")
         parsed_args = parser.parse_args(["foo.yaml", "results/foo/"])
@@ -96,6 +138,11 @@ class TestParser:
         assert parsed_args.no_submit is False
         assert parsed_args.quiet is False
         assert parsed_args.tmp_run_dir == ""
+        assert parsed_args.tune_resources is False
+        assert parsed_args.sacct_file is None
+        assert parsed_args.scaling_test == []
+        assert parsed_args.executor == "sbatch"
+        assert parsed_args.cpus is None
 
     @pytest.mark.parametrize("flag", ["-q", "--quiet"])
     def test_parsed_args_quiet_options(self, flag, run_cmd):
@@ -115,6 +162,13 @@ class TestParser:
         )
         assert parsed_args.tmp_run_dir == "tmp_run_dir"
 
+    def test_parsed_args_scaling_test_option(self, run_cmd):
+        parser = run_cmd.get_parser("mohid run")
+        parsed_args = parser.parse_args(
+            ["foo.yaml", "results/foo/", "--scaling-test", "1", "2", "4"]
+        )
+        assert parsed_args.scaling_test == [1, 2, 4]
+
 
 class TestTakeAction:
     """Unit tests for `mohid run` sub-command take_action() method."""
@@ -153,7 +207,9 @@ class TestTakeAction:
 
             return CompletedProcess()
 
-        monkeypatch.setattr(mohid_cmd.run.subprocess, "run", mock_subprocess_run)
+        monkeypatch.setattr(
+            mohid_cmd.run.mohid_cmd.executors.subprocess, "run", mock_subprocess_run
+        )
 
     def test_take_action(
         self,
@@ -174,6 +230,11 @@ class TestTakeAction:
             no_submit=False,
             quiet=False,
             tmp_run_dir="",
+            tune_resources=False,
+            sacct_file=None,
+            scaling_test=[],
+            executor="sbatch",
+            cpus=None,
         )
         caplog.set_level(logging.INFO)
         run_cmd.take_action(parsed_args)
@@ -199,6 +260,11 @@ class TestTakeAction:
             no_submit=False,
             quiet=True,
             tmp_run_dir="",
+            tune_resources=False,
+            sacct_file=None,
+            scaling_test=[],
+            executor="sbatch",
+            cpus=None,
         )
         caplog.set_level(logging.INFO)
         run_cmd.take_action(parsed_args)
@@ -221,16 +287,21 @@ class TestTakeAction:
             no_submit=True,
             quiet=False,
             tmp_run_dir="",
+            tune_resources=False,
+            sacct_file=None,
+            scaling_test=[],
+            executor="sbatch",
+            cpus=None,
         )
         caplog.set_level(logging.INFO)
         run_cmd.take_action(parsed_args)
         assert len(caplog.records) == 2
 
 
-@patch("mohid_cmd.run.subprocess.run", autospec=True)
+@patch("mohid_cmd.run.mohid_cmd.executors.subprocess.run", autospec=True)
 @patch("mohid_cmd.run.nemo_cmd.resolved_path", spec=True)
 @patch("mohid_cmd.run._build_run_script", return_value="script", autospec=True)
-@patch("mohid_cmd.run.nemo_cmd.prepare.load_run_desc", spec=True)
+@patch("mohid_cmd.run.mohid_cmd.run_desc.RunDescription.load", autospec=True)
 @patch("mohid_cmd.run.mohid_cmd.prepare.prepare", spec=True)
 class TestRun:
     """Unit tests for `mohid run` run() function."""
@@ -243,11 +314,17 @@ class TestRun:
         p_results_dir = tmpdir.ensure_dir("results_dir")
         m_run().stdout = "submit_job_msg"
         submit_job_msg = mohid_cmd.run.run(Path("mohid.yaml"), Path(str(p_results_dir)))
-        m_prepare.assert_called_once_with(Path("mohid.yaml"), "")
         m_ld_run_desc.assert_called_once_with(Path("mohid.yaml"))
+        m_prepare.assert_called_once_with(
+            Path("mohid.yaml"), "", run_desc=m_ld_run_desc.return_value
+        )
         m_rslv_path.assert_called_once_with(Path(str(p_results_dir)))
         m_bld_run_script.assert_called_once_with(
-            m_ld_run_desc(), Path("mohid.yaml"), m_rslv_path(), m_prepare()
+            m_ld_run_desc.return_value,
+            Path("mohid.yaml"),
+            m_rslv_path(),
+            m_prepare(),
+            None,
         )
         m_rslv_path().mkdir.assert_called_once_with(parents=True, exist_ok=True)
         assert m_run.call_args_list[1] == call(
@@ -267,16 +344,78 @@ class TestRun:
         submit_job_msg = mohid_cmd.run.run(
             Path("mohid.yaml"), Path(str(p_results_dir)), no_submit=True
         )
-        m_prepare.assert_called_once_with(Path("mohid.yaml"), "")
         m_ld_run_desc.assert_called_once_with(Path("mohid.yaml"))
+        m_prepare.assert_called_once_with(
+            Path("mohid.yaml"), "", run_desc=m_ld_run_desc.return_value
+        )
         m_rslv_path.assert_called_once_with(Path(str(p_results_dir)))
         m_bld_run_script.assert_called_once_with(
-            m_ld_run_desc(), Path("mohid.yaml"), m_rslv_path(), m_prepare()
+            m_ld_run_desc.return_value,
+            Path("mohid.yaml"),
+            m_rslv_path(),
+            m_prepare(),
+            None,
         )
         m_rslv_path().mkdir.assert_called_once_with(parents=True, exist_ok=True)
         assert submit_job_msg is None
         assert not m_run.called
 
+    @patch("mohid_cmd.run.mohid_cmd.executors.get_executor", autospec=True)
+    def test_run_local_executor(
+        self,
+        m_get_executor,
+        m_prepare,
+        m_ld_run_desc,
+        m_bld_run_script,
+        m_rslv_path,
+        m_run,
+        tmpdir,
+    ):
+        p_tmp_run_dir = tmpdir.ensure_dir("tmp_run_dir")
+        m_prepare.return_value = Path(str(p_tmp_run_dir))
+        p_results_dir = tmpdir.ensure_dir("results_dir")
+        m_get_executor().submit.return_value = "Ran 1 task(s) locally"
+        submit_job_msg = mohid_cmd.run.run(
+            Path("mohid.yaml"), Path(str(p_results_dir)), executor="local", cpus=2
+        )
+        m_get_executor.assert_called_with("local", 2)
+        m_get_executor().submit.assert_called_once_with(
+            Path(str(p_tmp_run_dir.join("MOHID.sh")))
+        )
+        assert submit_job_msg == "Ran 1 task(s) locally"
+
+    @patch("mohid_cmd.run.mohid_cmd.resources.advise", autospec=True)
+    def test_run_sacct_file(
+        self,
+        m_advise,
+        m_prepare,
+        m_ld_run_desc,
+        m_bld_run_script,
+        m_rslv_path,
+        m_run,
+        tmpdir,
+    ):
+        p_tmp_run_dir = tmpdir.ensure_dir("tmp_run_dir")
+        m_prepare.return_value = Path(str(p_tmp_run_dir))
+        m_ld_run_desc.return_value = {"run_id": "AKNS-2017-06-15"}
+        p_results_dir = tmpdir.ensure_dir("results_dir")
+        mohid_cmd.run.run(
+            Path("mohid.yaml"),
+            Path(str(p_results_dir)),
+            no_submit=True,
+            sacct_file=Path("sacct.txt"),
+        )
+        m_advise.assert_called_once_with(
+            "AKNS-2017-06-15", sacct_file=Path("sacct.txt")
+        )
+        m_bld_run_script.assert_called_once_with(
+            m_ld_run_desc.return_value,
+            Path("mohid.yaml"),
+            m_rslv_path(),
+            m_prepare(),
+            m_advise.return_value,
+        )
+
 
 class TestBuildRunScript:
     """Unit test for _build_run_script() function."""
@@ -320,53 +459,88 @@ class TestBuildRunScript:
             RUN_DESC="mohid.yaml"
             WORK_DIR="tmp_run_dir"
             RESULTS_DIR="results_dir"
-            HDF5_TO_NETCDF4="${{HOME}}/.local/bin/hdf5-to-netcdf4"
+            CONVERT="${{HOME}}/.local/bin/mohid convert"
             GATHER="${{HOME}}/.local/bin/mohid gather"
+            TIMING="${{RESULTS_DIR}}/timing.jsonl"
 
             module load StdEnv/2016.4
             module load proj4-fortran/1.0
             module load python/3.8.2
             module load nco/4.6.6
 
+            nbytes() {{
+              local bytes
+              bytes=$(du -cbs "$@" 2>/dev/null | tail -n 1 | cut -f 1)
+              echo ${{bytes:-0}}
+            }}
+
+            timed() {{
+              local phase=$1 bytes=$2 wall wall_end mono_start mono_end exit_code
+              shift 2
+              wall=${{EPOCHREALTIME:-$(date +%s.%N)}}
+              read -r mono_start _ </proc/uptime
+              "$@"
+              exit_code=$?
+              read -r mono_end _ </proc/uptime
+              wall_end=${{EPOCHREALTIME:-$(date +%s.%N)}}
+              printf '{{"run_id": "%s", "phase": "%s", "host": "%s", "wall": %s, "wall_end": %s, "mono_start": %s, "mono_end": %s, "bytes": %s, "exit_code": %s}}\\n' \\
+                "${{RUN_ID}}" "${{phase}}" "${{HOSTNAME}}" "${{wall/,/.}}" "${{wall_end/,/.}}" "${{mono_start}}" "${{mono_end}}" "${{bytes}}" "${{exit_code}}" >>${{TIMING}}
+              return ${{exit_code}}
+            }}
+
             mkdir -p ${{RESULTS_DIR}}
             cd ${{WORK_DIR}}
             echo "working dir: $(pwd)" >${{RESULTS_DIR}}/stdout
 
+            NODE_LOCAL="${{SLURM_TMPDIR:-/tmp}}"
+            ln -sfn ${{NODE_LOCAL}} ${{WORK_DIR}}/node-local
+
             echo "Starting run at $(date)" >>${{RESULTS_DIR}}/stdout
-            {str(p_mohid_exe)} >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr
+            timed model 0 {str(p_mohid_exe)} >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr
             MOHID_EXIT_CODE=$?
             echo "Ended run at $(date)" >>${{RESULTS_DIR}}/stdout
 
-            TMPDIR="${{SLURM_TMPDIR}}"
+            TMPDIR="${{NODE_LOCAL}}"
             LAGRANGIAN="Lagrangian_DieselFuel_refined_${{RUN_ID}}"
-            if test -f ${{WORK_DIR}}/res/${{LAGRANGIAN}}.hdf5
+            if test -f ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5
             then
               echo "Results hdf5 to netCDF4 conversion started at $(date)" >>${{RESULTS_DIR}}/stdout
-              cp -v ${{WORK_DIR}}/res/${{LAGRANGIAN}}.hdf5 ${{SLURM_TMPDIR}}/ >>${{RESULTS_DIR}}/stdout && \\
-              ${{HDF5_TO_NETCDF4}} -v info \\
-                ${{SLURM_TMPDIR}}/${{LAGRANGIAN}}.hdf5 \\
-                ${{SLURM_TMPDIR}}/${{LAGRANGIAN}}.nc >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr && \\
-              mv -v ${{SLURM_TMPDIR}}/${{LAGRANGIAN}}.nc ${{WORK_DIR}}/ >>${{RESULTS_DIR}}/stdout && \\
-              rm -v ${{WORK_DIR}}/res/${{LAGRANGIAN}}.hdf5 >>${{RESULTS_DIR}}/stdout
+              if timed convert $(nbytes ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5) \\
+                  ${{CONVERT}} ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5 \\
+                  ${{NODE_LOCAL}}/${{LAGRANGIAN}}.nc \\
+                  >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr && \\
+                timed move $(nbytes ${{NODE_LOCAL}}/${{LAGRANGIAN}}.nc) \\
+                  mv -v ${{NODE_LOCAL}}/${{LAGRANGIAN}}.nc ${{WORK_DIR}}/ >>${{RESULTS_DIR}}/stdout
+              then
+                timed delete $(nbytes ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5) \\
+                  rm -v ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5 >>${{RESULTS_DIR}}/stdout
+              else
+                echo "Results hdf5 to netCDF4 conversion failed; keeping ${{LAGRANGIAN}}.hdf5" >>${{RESULTS_DIR}}/stdout
+                timed move $(nbytes ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5) \\
+                  mv -v ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5 ${{WORK_DIR}}/res/ >>${{RESULTS_DIR}}/stdout
+              fi
               echo "Results hdf5 to netCDF4 conversion ended at $(date)" >>${{RESULTS_DIR}}/stdout
             fi
 
             echo "Rename mass balance file to MassBalance_${{RUN_ID}}.sro" >>${{RESULTS_DIR}}/stdout
-            mv -v ${{WORK_DIR}}/resOilOutput.sro ${{WORK_DIR}}/MassBalance_${{RUN_ID}}.sro >>${{RESULTS_DIR}}/stdout
+            timed rename $(nbytes ${{WORK_DIR}}/resOilOutput.sro) \\
+              mv -v ${{WORK_DIR}}/resOilOutput.sro ${{WORK_DIR}}/MassBalance_${{RUN_ID}}.sro >>${{RESULTS_DIR}}/stdout
 
             echo "Delete large unused output files"  >>${{RESULTS_DIR}}/stdout
-            rm -v ${{WORK_DIR}}/res/Turbulence*.hdf5 ${{WORK_DIR}}/res*.elf5 ${{WORK_DIR}}/res*.ptf
+            timed delete $(nbytes ${{WORK_DIR}}/res/Turbulence*.hdf5 ${{WORK_DIR}}/res*.elf5 ${{WORK_DIR}}/res*.ptf) \\
+              rm -v ${{WORK_DIR}}/res/Turbulence*.hdf5 ${{WORK_DIR}}/res*.elf5 ${{WORK_DIR}}/res*.ptf
 
             echo "Results gathering started at $(date)" >>${{RESULTS_DIR}}/stdout
-            ${{GATHER}} ${{RESULTS_DIR}} --debug >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr
+            timed gather $(nbytes ${{WORK_DIR}}) \\
+              ${{GATHER}} ${{RESULTS_DIR}} --debug >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr
             echo "Results gathering ended at $(date)" >>${{RESULTS_DIR}}/stdout
 
-            chmod -v go+rx ${{RESULTS_DIR}} >>${{RESULTS_DIR}}/stdout
-            chmod -v g+rw ${{RESULTS_DIR}}/* >>${{RESULTS_DIR}}/stdout
-            chmod -v o+r ${{RESULTS_DIR}}/* >>${{RESULTS_DIR}}/stdout
+            timed permissions 0 chmod -v go+rx ${{RESULTS_DIR}} >>${{RESULTS_DIR}}/stdout
+            timed permissions 0 chmod -v g+rw ${{RESULTS_DIR}}/* >>${{RESULTS_DIR}}/stdout
+            timed permissions 0 chmod -v o+r ${{RESULTS_DIR}}/* >>${{RESULTS_DIR}}/stdout
 
             echo "Deleting run directory" >>${{RESULTS_DIR}}/stdout
-            rmdir -v $(pwd) >>${{RESULTS_DIR}}/stdout
+            timed cleanup 0 rmdir -v $(pwd) >>${{RESULTS_DIR}}/stdout
             echo "Finished at $(date)" >>${{RESULTS_DIR}}/stdout
             exit ${{MOHID_EXIT_CODE}}
             """
@@ -407,6 +581,104 @@ class TestSbatchDirectives:
         )
         assert sbatch_directives == expected
 
+    @pytest.mark.parametrize("walltime", [5400, "1:30:00"])
+    def test_walltime(self, walltime, run_desc):
+        run_desc["walltime"] = walltime
+        sbatch_directives = mohid_cmd.run._sbatch_directives(
+            run_desc, Path("results_dir")
+        )
+        assert "#SBATCH --time=1:30:00\n" in sbatch_directives
+
+    def test_sbatch_directives_resources(self, run_desc):
+        resources = {
+            "n_jobs": 3,
+            "mem_per_cpu": 4250,
+            "cpus_per_task": 1,
+            "walltime": 5400,
+            "walltime_fraction": 0.5,
+        }
+        sbatch_directives = mohid_cmd.run._sbatch_directives(
+            run_desc, Path("results_dir"), resources
+        )
+        assert "#SBATCH --cpus-per-task=1\n" in sbatch_directives
+        assert "#SBATCH --mem-per-cpu=4250m\n" in sbatch_directives
+        assert "#SBATCH --time=1:30:00\n" in sbatch_directives
+
+    def test_cpus_per_task(self, run_desc):
+        with patch.dict(run_desc, {"cpus per task": 4}):
+            sbatch_directives = mohid_cmd.run._sbatch_directives(
+                run_desc, Path("results_dir")
+            )
+        assert "#SBATCH --cpus-per-task=4\n" in sbatch_directives
+        assert "#SBATCH --mem-per-cpu=3625m\n" in sbatch_directives
+
+    def test_openmp_env(self, run_desc):
+        openmp = {"proc bind": "close", "places": "cores", "stacksize": "64M"}
+        with patch.dict(run_desc, {"cpus per task": 8, "openmp": openmp}):
+            sbatch_directives = mohid_cmd.run._sbatch_directives(
+                run_desc, Path("results_dir")
+            )
+        expected = textwrap.dedent(
+            """\
+            if ! test -z $SLURM_CPUS_PER_TASK
+            then
+              export OMP_NUM_THREADS=$SLURM_CPUS_PER_TASK
+            fi
+            export OMP_PROC_BIND=close
+            export OMP_PLACES=cores
+            export OMP_STACKSIZE=64M
+            """
+        )
+        assert sbatch_directives.endswith(expected)
+
+    def test_openmp_env_quoted(self, run_desc):
+        openmp = {"places": "{0,1,2,3},{4,5,6,7}"}
+        with patch.dict(run_desc, {"cpus per task": 4, "openmp": openmp}):
+            sbatch_directives = mohid_cmd.run._sbatch_directives(
+                run_desc, Path("results_dir")
+            )
+        assert sbatch_directives.endswith("export OMP_PLACES='{0,1,2,3},{4,5,6,7}'\n")
+
+    def test_unknown_openmp_key(self, run_desc, caplog):
+        with patch.dict(run_desc, {"openmp": {"schedule": "dynamic"}}):
+            with pytest.raises(SystemExit):
+                mohid_cmd.run._sbatch_directives(run_desc, Path("results_dir"))
+        assert caplog.records[0].levelname == "ERROR"
+        assert caplog.messages[0].startswith(
+            "unrecognized openmp key(s) in run description: schedule"
+        )
+
+
+class TestScalingTest:
+    """Unit tests for scaling_test() function."""
+
+    @patch("mohid_cmd.run._build_run_script", return_value="script", autospec=True)
+    @patch("mohid_cmd.run.mohid_cmd.prepare.prepare", autospec=True)
+    def test_scaling_test(self, m_prepare, m_bld_run_script, run_desc, tmp_path):
+        tmp_run_dirs = [tmp_path / "tmp_run_dir_1", tmp_path / "tmp_run_dir_4"]
+        for tmp_run_dir in tmp_run_dirs:
+            tmp_run_dir.mkdir()
+        m_prepare.side_effect = tmp_run_dirs
+        results_dir = tmp_path / "results_dir"
+
+        run_scripts = mohid_cmd.run.scaling_test(
+            tmp_path / "mohid.yaml", results_dir, [1, 4], quiet=True
+        )
+
+        assert run_scripts == [tmp_run_dir / "MOHID.sh" for tmp_run_dir in tmp_run_dirs]
+        assert (tmp_run_dirs[0] / "MOHID.sh").read_text() == "script"
+        assert (results_dir / "cpus-1").is_dir()
+        assert (results_dir / "cpus-4").is_dir()
+        run_desc_4 = m_bld_run_script.call_args_list[1][0][0]
+        assert run_desc_4["run_id"] == "MarathassaConstTS-cpus4"
+        assert run_desc_4["cpus per task"] == 4
+        for call, cpus_per_task in zip(m_prepare.call_args_list, (1, 4)):
+            prepare_run_desc = call[1]["run_desc"]
+            assert (
+                prepare_run_desc["run_id"] == f"MarathassaConstTS-cpus{cpus_per_task}"
+            )
+            assert prepare_run_desc["cpus per task"] == cpus_per_task
+
 
 class TestTdToHms:
     """Unit tests for td_to_hms() function."""
@@ -426,8 +698,9 @@ class TestDefinitions:
             RUN_DESC="mohid.yaml"
             WORK_DIR="tmp_run_dir"
             RESULTS_DIR="results_dir"
-            HDF5_TO_NETCDF4="${{HOME}}/.local/bin/hdf5-to-netcdf4"
+            CONVERT="${{HOME}}/.local/bin/mohid convert"
             GATHER="${{HOME}}/.local/bin/mohid gather"
+            TIMING="${{RESULTS_DIR}}/timing.jsonl"
             """
         )
         assert defns == expected
@@ -449,6 +722,57 @@ class TestModules:
         assert modules == expected
 
 
+class TestTimingFunctions:
+    """Unit test for _timing_functions() function."""
+
+    def test_timing_functions(self):
+        script = mohid_cmd.run._timing_functions()
+        expected = textwrap.dedent(
+            f"""\
+            nbytes() {{
+              local bytes
+              bytes=$(du -cbs "$@" 2>/dev/null | tail -n 1 | cut -f 1)
+              echo ${{bytes:-0}}
+            }}
+
+            timed() {{
+              local phase=$1 bytes=$2 wall wall_end mono_start mono_end exit_code
+              shift 2
+              wall=${{EPOCHREALTIME:-$(date +%s.%N)}}
+              read -r mono_start _ </proc/uptime
+              "$@"
+              exit_code=$?
+              read -r mono_end _ </proc/uptime
+              wall_end=${{EPOCHREALTIME:-$(date +%s.%N)}}
+              printf '{{"run_id": "%s", "phase": "%s", "host": "%s", "wall": %s, "wall_end": %s, "mono_start": %s, "mono_end": %s, "bytes": %s, "exit_code": %s}}\\n' \\
+                "${{RUN_ID}}" "${{phase}}" "${{HOSTNAME}}" "${{wall/,/.}}" "${{wall_end/,/.}}" "${{mono_start}}" "${{mono_end}}" "${{bytes}}" "${{exit_code}}" >>${{TIMING}}
+              return ${{exit_code}}
+            }}
+            """
+        )
+        assert script == expected
+
+    def test_timing_records(self, tmp_path):
+        timing_file = tmp_path / "timing.jsonl"
+        script = "\n".join(
+            (
+                f'RUN_ID="run-id"\nTIMING="{timing_file}"',
+                mohid_cmd.run._timing_functions(),
+                f"timed copy $(nbytes {timing_file}) true",
+                "timed model 0 false",
+                "exit 0",
+            )
+        )
+        subprocess.run(["bash", "-c", script], check=True)
+        records = [json.loads(line) for line in timing_file.read_text().splitlines()]
+        assert [record["phase"] for record in records] == ["copy", "model"]
+        assert [record["exit_code"] for record in records] == [0, 1]
+        assert records[0]["bytes"] == 0
+        assert records[0]["run_id"] == "run-id"
+        assert records[0]["mono_end"] >= records[0]["mono_start"]
+        assert records[0]["wall_end"] >= records[0]["wall"]
+
+
 class TestExecute:
     """Unit tests for _execute() function."""
 
@@ -468,38 +792,98 @@ class TestExecute:
             cd ${{WORK_DIR}}
             echo "working dir: $(pwd)" >${{RESULTS_DIR}}/stdout
 
+            NODE_LOCAL="${{SLURM_TMPDIR:-/tmp}}"
+            ln -sfn ${{NODE_LOCAL}} ${{WORK_DIR}}/node-local
+
             echo "Starting run at $(date)" >>${{RESULTS_DIR}}/stdout
-            {str(p_mohid_exe)} >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr
+            timed model 0 {str(p_mohid_exe)} >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr
             MOHID_EXIT_CODE=$?
             echo "Ended run at $(date)" >>${{RESULTS_DIR}}/stdout
 
-            TMPDIR="${{SLURM_TMPDIR}}"
+            TMPDIR="${{NODE_LOCAL}}"
             LAGRANGIAN="Lagrangian_DieselFuel_refined_${{RUN_ID}}"
-            if test -f ${{WORK_DIR}}/res/${{LAGRANGIAN}}.hdf5
+            if test -f ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5
             then
               echo "Results hdf5 to netCDF4 conversion started at $(date)" >>${{RESULTS_DIR}}/stdout
-              cp -v ${{WORK_DIR}}/res/${{LAGRANGIAN}}.hdf5 ${{SLURM_TMPDIR}}/ >>${{RESULTS_DIR}}/stdout && \\
-              ${{HDF5_TO_NETCDF4}} -v info \\
-                ${{SLURM_TMPDIR}}/${{LAGRANGIAN}}.hdf5 \\
-                ${{SLURM_TMPDIR}}/${{LAGRANGIAN}}.nc >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr && \\
-              mv -v ${{SLURM_TMPDIR}}/${{LAGRANGIAN}}.nc ${{WORK_DIR}}/ >>${{RESULTS_DIR}}/stdout && \\
-              rm -v ${{WORK_DIR}}/res/${{LAGRANGIAN}}.hdf5 >>${{RESULTS_DIR}}/stdout
+              if timed convert $(nbytes ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5) \\
+                  ${{CONVERT}} ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5 \\
+                  ${{NODE_LOCAL}}/${{LAGRANGIAN}}.nc \\
+                  >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr && \\
+                timed move $(nbytes ${{NODE_LOCAL}}/${{LAGRANGIAN}}.nc) \\
+                  mv -v ${{NODE_LOCAL}}/${{LAGRANGIAN}}.nc ${{WORK_DIR}}/ >>${{RESULTS_DIR}}/stdout
+              then
+                timed delete $(nbytes ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5) \\
+                  rm -v ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5 >>${{RESULTS_DIR}}/stdout
+              else
+                echo "Results hdf5 to netCDF4 conversion failed; keeping ${{LAGRANGIAN}}.hdf5" >>${{RESULTS_DIR}}/stdout
+                timed move $(nbytes ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5) \\
+                  mv -v ${{NODE_LOCAL}}/${{LAGRANGIAN}}.hdf5 ${{WORK_DIR}}/res/ >>${{RESULTS_DIR}}/stdout
+              fi
               echo "Results hdf5 to netCDF4 conversion ended at $(date)" >>${{RESULTS_DIR}}/stdout
             fi
 
             echo "Rename mass balance file to MassBalance_${{RUN_ID}}.sro" >>${{RESULTS_DIR}}/stdout
-            mv -v ${{WORK_DIR}}/resOilOutput.sro ${{WORK_DIR}}/MassBalance_${{RUN_ID}}.sro >>${{RESULTS_DIR}}/stdout
+            timed rename $(nbytes ${{WORK_DIR}}/resOilOutput.sro) \\
+              mv -v ${{WORK_DIR}}/resOilOutput.sro ${{WORK_DIR}}/MassBalance_${{RUN_ID}}.sro >>${{RESULTS_DIR}}/stdout
 
             echo "Delete large unused output files"  >>${{RESULTS_DIR}}/stdout
-            rm -v ${{WORK_DIR}}/res/Turbulence*.hdf5 ${{WORK_DIR}}/res*.elf5 ${{WORK_DIR}}/res*.ptf
+            timed delete $(nbytes ${{WORK_DIR}}/res/Turbulence*.hdf5 ${{WORK_DIR}}/res*.elf5 ${{WORK_DIR}}/res*.ptf) \\
+              rm -v ${{WORK_DIR}}/res/Turbulence*.hdf5 ${{WORK_DIR}}/res*.elf5 ${{WORK_DIR}}/res*.ptf
 
             echo "Results gathering started at $(date)" >>${{RESULTS_DIR}}/stdout
-            ${{GATHER}} ${{RESULTS_DIR}} --debug >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr
+            timed gather $(nbytes ${{WORK_DIR}}) \\
+              ${{GATHER}} ${{RESULTS_DIR}} --debug >>${{RESULTS_DIR}}/stdout 2>>${{RESULTS_DIR}}/stderr
             echo "Results gathering ended at $(date)" >>${{RESULTS_DIR}}/stdout
             """
         )
         assert script == expected
 
+    def test_execute_convert_options(self, run_desc, tmpdir):
+        p_mohid_repo = tmpdir.ensure_dir(run_desc["paths"]["mohid repo"])
+        p_partic_data = tmpdir.ensure_dir(run_desc["run data files"]["PARTIC_DATA"])
+        run_desc_patch = {
+            "paths": {"mohid repo": str(p_mohid_repo)},
+            "run data files": {"PARTIC_DATA": str(p_partic_data)},
+            "netcdf4": {"compression level": 1},
+        }
+        with patch.dict(run_desc, run_desc_patch):
+            script = mohid_cmd.run._execute(run_desc)
+        assert "  ${NODE_LOCAL}/${LAGRANGIAN}.nc --complevel 1 \\\n" in script
+
+
+class TestGatherOptions:
+    """Unit tests for _gather_options() function."""
+
+    def test_no_gather_section(self, run_desc):
+        assert mohid_cmd.run._gather_options(run_desc) == ""
+
+    @pytest.mark.parametrize("dedup, expected", ((True, " --dedup"), (False, "")))
+    def test_dedup(self, dedup, expected, run_desc):
+        with patch.dict(run_desc, {"gather": {"dedup": dedup}}):
+            assert mohid_cmd.run._gather_options(run_desc) == expected
+
+
+class TestConvertOptions:
+    """Unit tests for _convert_options() function."""
+
+    def test_no_netcdf4_section(self, run_desc):
+        assert mohid_cmd.run._convert_options(run_desc) == ""
+
+    def test_convert_options(self, run_desc):
+        netcdf4 = {
+            "output variables": ["OilConcentration_2D", "Beaching_Time"],
+            "output time stride": 3,
+            "chunk sizes": {"time": 12, "grid_y": 448},
+            "compression level": 2,
+            "workers": 4,
+        }
+        with patch.dict(run_desc, {"netcdf4": netcdf4}):
+            options = mohid_cmd.run._convert_options(run_desc)
+        assert options == (
+            " --var OilConcentration_2D --var Beaching_Time"
+            " --chunk time=12 --chunk grid_y=448 --time-stride 3 --complevel 2 --workers 4"
+        )
+
 
 class TestFixPermissions:
     """Unit tests for _fix_permissions() function."""
@@ -508,9 +892,9 @@ class TestFixPermissions:
         script = mohid_cmd.run._fix_permissions()
         expected = textwrap.dedent(
             """\
-            chmod -v go+rx ${RESULTS_DIR} >>${RESULTS_DIR}/stdout
-            chmod -v g+rw ${RESULTS_DIR}/* >>${RESULTS_DIR}/stdout
-            chmod -v o+r ${RESULTS_DIR}/* >>${RESULTS_DIR}/stdout
+            timed permissions 0 chmod -v go+rx ${RESULTS_DIR} >>${RESULTS_DIR}/stdout
+            timed permissions 0 chmod -v g+rw ${RESULTS_DIR}/* >>${RESULTS_DIR}/stdout
+            timed permissions 0 chmod -v o+r ${RESULTS_DIR}/* >>${RESULTS_DIR}/stdout
             """
         )
         assert script == expected
@@ -524,7 +908,7 @@ class TestCleanup:
         expected = textwrap.dedent(
             """\
             echo "Deleting run directory" >>${RESULTS_DIR}/stdout
-            rmdir -v $(pwd) >>${RESULTS_DIR}/stdout
+            timed cleanup 0 rmdir -v $(pwd) >>${RESULTS_DIR}/stdout
             echo "Finished at $(date)" >>${RESULTS_DIR}/stdout
             exit ${MOHID_EXIT_CODE}
             """
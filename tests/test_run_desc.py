@@ -0,0 +1,114 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd run description unit tests.
+"""
+import logging
+from pathlib import Path
+from unittest.mock import patch
+
+import nemo_cmd.prepare
+import pytest
+
+import mohid_cmd.run_desc
+
+
+@pytest.fixture
+def desc(run_desc, tmp_path):
+    return mohid_cmd.run_desc.RunDescription(run_desc, tmp_path / "mohid.yaml")
+
+
+class TestLoad:
+    """Unit tests for RunDescription.load() method."""
+
+    def test_load(self, run_desc, tmp_path):
+        desc = mohid_cmd.run_desc.RunDescription.load(tmp_path / "mohid.yaml")
+        assert desc == run_desc
+        assert desc.desc_file == tmp_path / "mohid.yaml"
+
+    def test_not_a_mapping(self, tmp_path, caplog):
+        desc_file = tmp_path / "list.yaml"
+        desc_file.write_text("- run_id\n")
+        caplog.set_level(logging.ERROR)
+        with pytest.raises(SystemExit):
+            mohid_cmd.run_desc.RunDescription.load(desc_file)
+        assert caplog.messages[0] == (
+            f"{desc_file} does not contain a run description mapping"
+        )
+
+
+class TestValue:
+    """Unit tests for RunDescription.value() method."""
+
+    def test_value(self, desc, tmp_path):
+        mohid_repo = desc.value(("paths", "mohid repo"), resolve_path=True)
+        assert mohid_repo == tmp_path / "MIDOSS-MOHID-CODE"
+
+    def test_memoized(self, desc):
+        with patch(
+            "mohid_cmd.run_desc.nemo_cmd.prepare.get_run_desc_value",
+            wraps=nemo_cmd.prepare.get_run_desc_value,
+        ) as m_get_run_desc_value:
+            first = desc.value(("paths", "mohid repo"), resolve_path=True)
+            second = desc.value(("paths", "mohid repo"), resolve_path=True)
+        assert first == second
+        assert m_get_run_desc_value.call_count == 1
+
+    def test_memoized_per_path_handling(self, desc):
+        assert desc.value(("paths", "mohid repo")) == desc["paths"]["mohid repo"]
+        assert isinstance(desc.value(("paths", "mohid repo"), resolve_path=True), Path)
+
+    def test_missing_key_not_memoized(self, desc):
+        for _ in range(2):
+            with pytest.raises(KeyError):
+                desc.value(("no such key",), fatal=False)
+
+    def test_set_item_discards_values(self, desc):
+        desc.value(("run_id",))
+        desc["run_id"] = "AKNS-2017-06-15"
+        assert desc.value(("run_id",)) == "AKNS-2017-06-15"
+
+    def test_update_discards_values(self, desc):
+        desc.value(("run_id",))
+        desc.update({"run_id": "AKNS-2017-06-15"})
+        assert desc.value(("run_id",)) == "AKNS-2017-06-15"
+
+
+class TestCopy:
+    """Unit test for RunDescription.copy() method."""
+
+    def test_copy(self, desc):
+        desc.value(("run_id",))
+        desc_copy = desc.copy()
+        desc_copy["run_id"] = "AKNS-2017-06-15"
+        assert isinstance(desc_copy, mohid_cmd.run_desc.RunDescription)
+        assert desc_copy.desc_file == desc.desc_file
+        assert desc.value(("run_id",)) == "MarathassaConstTS"
+        assert desc_copy.value(("run_id",)) == "AKNS-2017-06-15"
+
+
+class TestGetValue:
+    """Unit tests for get_value() function."""
+
+    def test_run_description(self, desc):
+        with patch.object(desc, "value") as m_value:
+            mohid_cmd.run_desc.get_value(desc, ("run_id",))
+        m_value.assert_called_once_with(
+            ("run_id",), expand_path=False, resolve_path=False, run_dir=None, fatal=True
+        )
+
+    def test_dict(self, run_desc):
+        assert (
+            mohid_cmd.run_desc.get_value(run_desc, ("run_id",)) == "MarathassaConstTS"
+        )
@@ -0,0 +1,106 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd Monte Carlo job directory scaffold generator unit tests.
+"""
+import os
+import stat
+
+import pytest
+
+import mohid_cmd.scaffold
+
+
+@pytest.fixture
+def context(tmp_path):
+    return {
+        "job_id": "AKNS-spatial",
+        "job_dir": tmp_path / "AKNS-spatial_2020-06-15T142000",
+        "runs_per_job": 3,
+    }
+
+
+class TestMakeJobDir:
+    """Unit tests for make_job_dir() function."""
+
+    def test_layout(self, context):
+        job_dir = mohid_cmd.scaffold.make_job_dir(context)
+        assert job_dir == context["job_dir"]
+        assert sorted(
+            os.fspath(path.relative_to(job_dir)) for path in job_dir.rglob("*")
+        ) == [
+            "forcing-yaml",
+            "forcing-yaml/README.rst",
+            "glost-job.sh",
+            "glost-tasks",
+            "glost-tasks.txt",
+            "glost-tasks/README.rst",
+            "mohid-yaml",
+            "mohid-yaml/README.rst",
+            "results",
+            "results/README.rst",
+            "run-task.sh",
+        ]
+
+    def test_task_list(self, context):
+        job_dir = mohid_cmd.scaffold.make_job_dir(context)
+        assert (job_dir / "glost-tasks.txt").read_text() == (
+            "bash $MONTE_CARLO/run-task.sh 0\n"
+            "bash $MONTE_CARLO/run-task.sh 1\n"
+            "bash $MONTE_CARLO/run-task.sh 2\n"
+            "\n"
+        )
+
+    def test_task_list_streamed(self, context):
+        context["runs_per_job"] = 10_001
+        job_dir = mohid_cmd.scaffold.make_job_dir(context)
+        tasks = (job_dir / "glost-tasks.txt").read_text().split()[2::3]
+        assert len(tasks) == context["runs_per_job"]
+        assert tasks == [f"{n}" for n in range(context["runs_per_job"])]
+
+    def test_context_rendered(self, context):
+        job_dir = mohid_cmd.scaffold.make_job_dir(context)
+        run_task = (job_dir / "run-task.sh").read_text()
+        assert 'RUN_ID="AKNS-spatial-$1"' in run_task
+        glost_job = (job_dir / "glost-job.sh").read_text()
+        # Default from cookiecutter.json
+        assert "#SBATCH --account=rrg-allen" in glost_job
+
+    def test_file_mode_copied(self, context):
+        job_dir = mohid_cmd.scaffold.make_job_dir(context)
+        tmpl_mode = (mohid_cmd.scaffold.JOB_DIR_TEMPLATE / "run-task.sh").stat()
+        assert stat.S_IMODE((job_dir / "run-task.sh").stat().st_mode) == stat.S_IMODE(
+            tmpl_mode.st_mode
+        )
+
+    def test_job_dir_exists(self, context):
+        context["job_dir"].mkdir()
+        with pytest.raises(FileExistsError):
+            mohid_cmd.scaffold.make_job_dir(context)
+
+
+class TestDefaultContext:
+    """Unit test for default_context() function."""
+
+    def test_default_context(self):
+        context = mohid_cmd.scaffold.default_context()
+        assert context["task_runner"] == "glost"
+        assert context["runs_per_job"] == 100
+
+
+class TestCountFiles:
+    """Unit test for count_files() function."""
+
+    def test_count_files(self):
+        assert mohid_cmd.scaffold.count_files() == 7
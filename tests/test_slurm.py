@@ -0,0 +1,161 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd slurm module unit tests.
+
+These tests use the stand-in sbatch, squeue, and sacct scripts in tests/fake_slurm/.
+"""
+import asyncio
+import logging
+
+import pytest
+
+import mohid_cmd.slurm
+
+
+class TestSubmitJobs:
+    """Unit tests for submit_jobs() function."""
+
+    def test_submit_jobs(self, fake_slurm):
+        sbatch_args = [[f"--job-name=AKNS-{i:03d}", "glost-job.sh"] for i in range(5)]
+        slurm_job_ids = mohid_cmd.slurm.submit_jobs(sbatch_args, min_interval=0)
+        assert sorted(slurm_job_ids) == ["1000", "1001", "1002", "1003", "1004"]
+        jobs = fake_slurm.jobs()
+        for args, slurm_job_id in zip(sbatch_args, slurm_job_ids):
+            assert jobs[slurm_job_id]["args"] == ["--parsable"] + args
+
+    def test_rate_limited(self, monkeypatch):
+        starts = []
+
+        async def mock_run(*cmd):
+            starts.append(asyncio.get_running_loop().time())
+            await asyncio.sleep(0.01)
+            return f"{1000 + len(starts)}\n"
+
+        monkeypatch.setattr(mohid_cmd.slurm, "_run", mock_run)
+        sbatch_args = [[f"--job-name=AKNS-{i:03d}", "glost-job.sh"] for i in range(4)]
+        mohid_cmd.slurm.submit_jobs(sbatch_args, max_concurrent=4, min_interval=0.05)
+        assert len(starts) == 4
+        for earlier, later in zip(starts, starts[1:]):
+            assert later - earlier >= 0.05
+
+    def test_concurrency_limited(self, monkeypatch):
+        running, max_running = [], []
+
+        async def mock_run(*cmd):
+            running.append(cmd)
+            max_running.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(cmd)
+            return "1000\n"
+
+        monkeypatch.setattr(mohid_cmd.slurm, "_run", mock_run)
+        sbatch_args = [[f"--job-name=AKNS-{i:03d}", "glost-job.sh"] for i in range(8)]
+        mohid_cmd.slurm.submit_jobs(sbatch_args, max_concurrent=3, min_interval=0)
+        assert max(max_running) == 3
+
+    def test_failed_submission(self, fake_slurm, monkeypatch, caplog):
+        monkeypatch.setenv("FAKE_SLURM_SBATCH_FAIL", "AKNS-001")
+        sbatch_args = [[f"--job-name=AKNS-{i:03d}", "glost-job.sh"] for i in range(3)]
+        caplog.set_level(logging.ERROR)
+        slurm_job_ids = mohid_cmd.slurm.submit_jobs(sbatch_args, min_interval=0)
+        assert slurm_job_ids[1] is None
+        assert None not in (slurm_job_ids[0], slurm_job_ids[2])
+        assert caplog.messages[0] == (
+            "sbatch --job-name=AKNS-001 glost-job.sh failed: "
+            "sbatch: error: Batch job submission failed"
+        )
+
+
+class TestRateLimiter:
+    """Unit test for RateLimiter class."""
+
+    def test_spacing(self):
+        async def starts():
+            limiter = mohid_cmd.slurm.RateLimiter(0.05)
+            times = []
+            for _ in range(3):
+                await limiter.wait()
+                times.append(asyncio.get_running_loop().time())
+            return times
+
+        times = asyncio.run(starts())
+        assert times[1] - times[0] >= 0.05
+        assert times[2] - times[1] >= 0.05
+
+
+class TestQueryStates:
+    """Unit tests for query_states() function."""
+
+    def test_active_and_finished_states(self, fake_slurm):
+        slurm_job_ids = mohid_cmd.slurm.submit_jobs(
+            [["--job-name=AKNS-000", "glost-job.sh"]] * 3, min_interval=0
+        )
+        fake_slurm.set_state(slurm_job_ids[1], "RUNNING")
+        fake_slurm.set_state(slurm_job_ids[2], "TIMEOUT")
+        states = mohid_cmd.slurm.query_states(slurm_job_ids + ["999"])
+        assert states == {
+            slurm_job_ids[0]: "PENDING",
+            slurm_job_ids[1]: "RUNNING",
+            slurm_job_ids[2]: "TIMEOUT",
+            "999": "UNKNOWN",
+        }
+
+    def test_batched_calls(self, fake_slurm, monkeypatch):
+        monkeypatch.setattr(mohid_cmd.slurm, "QUERY_BATCH_SIZE", 2)
+        mohid_cmd.slurm.query_states([str(job_id) for job_id in range(1000, 1005)])
+        assert len(fake_slurm.calls("squeue")) == 3
+        assert len(fake_slurm.calls("sacct")) == 3
+
+    def test_no_jobs(self, fake_slurm):
+        assert mohid_cmd.slurm.query_states([]) == {}
+        assert fake_slurm.calls("squeue") == []
+
+
+class TestParseStates:
+    """Unit tests for _parse_states() function."""
+
+    @pytest.mark.parametrize(
+        "stdout, expected",
+        (
+            ("1234|RUNNING\n", {"1234": "RUNNING"}),
+            ("1234|CANCELLED by 5678\n", {"1234": "CANCELLED"}),
+            ("1234|\n\n", {}),
+        ),
+    )
+    def test_parse_states(self, stdout, expected):
+        assert mohid_cmd.slurm._parse_states(stdout) == expected
+
+
+class TestJobRecords:
+    """Unit tests for record_jobs() and read_jobs() functions."""
+
+    def test_no_jobs_file(self, tmp_path):
+        assert mohid_cmd.slurm.read_jobs(tmp_path) == []
+
+    def test_round_trip(self, tmp_path):
+        jobs = [
+            {
+                "name": "AKNS-000",
+                "slurm_job_id": "1000",
+                "tasks": "shards/glost-tasks-000.txt",
+                "n_runs": 31,
+            },
+        ]
+        mohid_cmd.slurm.record_jobs(tmp_path, jobs)
+        mohid_cmd.slurm.record_jobs(tmp_path, [dict(jobs[0], slurm_job_id="1001")])
+        records = mohid_cmd.slurm.read_jobs(tmp_path)
+        assert [record["slurm_job_id"] for record in records] == ["1000", "1001"]
+        assert records[0]["tasks"] == "shards/glost-tasks-000.txt"
+        assert "submitted" in records[0]
@@ -0,0 +1,286 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd stats sub-command plug-in unit tests.
+"""
+import logging
+from pathlib import Path
+from types import SimpleNamespace
+
+import netCDF4
+import numpy
+import pytest
+
+import mohid_cmd.main
+import mohid_cmd.stats
+
+
+@pytest.fixture
+def stats_cmd():
+    return mohid_cmd.stats.Stats(mohid_cmd.main.MohidApp, [])
+
+
+@pytest.fixture
+def job_dir(tmp_path):
+    """Job directory with Lagrangian results files of 4 runs with 3 time steps
+    on a 2x3 grid with latitude coordinates;
+    run n has OilThickness_2D maximum n at grid point (0, 0) and 1 elsewhere,
+    and OilConcentration_3D of n everywhere.
+    """
+    job_dir = tmp_path / "AKNS-spatial_2019-11-24T170743"
+    for n in range(4):
+        results_dir = job_dir / "results" / f"AKNS-spatial-{n}"
+        results_dir.mkdir(parents=True)
+        lagrangian_file = results_dir / f"Lagrangian_AKNS_crude_AKNS-spatial-{n}.nc"
+        with netCDF4.Dataset(lagrangian_file, "w") as dataset:
+            dataset.createDimension("time", 3)
+            dataset.createDimension("grid_y", 2)
+            dataset.createDimension("grid_x", 3)
+            latitude = dataset.createVariable(
+                "latitude", "f8", ("grid_y", "grid_x"), fill_value=-999.0
+            )
+            latitude.units = "degrees_north"
+            latitude[:] = [[48.0, 48.0, 48.0], [48.5, 48.5, 48.5]]
+            thickness = dataset.createVariable(
+                "OilThickness_2D", "f4", ("time", "grid_y", "grid_x"), zlib=True
+            )
+            thickness.units = "m"
+            values = numpy.ones((3, 2, 3))
+            values[1, 0, 0] = n
+            values[2, 0, 0] = 0
+            thickness[:] = values
+            concentration = dataset.createVariable(
+                "OilConcentration_3D", "f4", ("time", "grid_y", "grid_x")
+            )
+            concentration[:] = numpy.full((3, 2, 3), n)
+    return job_dir
+
+
+class TestParser:
+    """Unit tests for `mohid stats` sub-command command-line parser."""
+
+    def test_get_parser(self, stats_cmd):
+        parser = stats_cmd.get_parser("mohid stats")
+        assert parser.prog == "mohid stats"
+
+    def test_job_dir_argument(self, stats_cmd):
+        parser = stats_cmd.get_parser("mohid stats")
+        assert parser._actions[1].dest == "job_dir"
+        assert parser._actions[1].metavar == "JOB_DIR"
+        assert parser._actions[1].type == Path
+        assert parser._actions[1].help
+
+    def test_var_option(self, stats_cmd):
+        parser = stats_cmd.get_parser("mohid stats")
+        assert parser._actions[2].dest == "var_names"
+        assert parser._actions[2].option_strings == ["--var"]
+        assert parser._actions[2].required
+        assert parser._actions[2].help
+
+    def test_time_reduction_option(self, stats_cmd):
+        parser = stats_cmd.get_parser("mohid stats")
+        assert parser._actions[3].dest == "how"
+        assert parser._actions[3].option_strings == ["--time-reduction"]
+        assert parser._actions[3].choices == ("max", "mean")
+        assert parser._actions[3].default == "max"
+        assert parser._actions[3].help
+
+    def test_threshold_option(self, stats_cmd):
+        parser = stats_cmd.get_parser("mohid stats")
+        assert parser._actions[4].dest == "thresholds"
+        assert parser._actions[4].option_strings == ["--threshold"]
+        assert parser._actions[4].type == float
+        assert parser._actions[4].default == []
+        assert parser._actions[4].help
+
+    def test_bins_option(self, stats_cmd):
+        parser = stats_cmd.get_parser("mohid stats")
+        assert parser._actions[5].dest == "bin_edges"
+        assert parser._actions[5].option_strings == ["--bins"]
+        assert parser._actions[5].type == float
+        assert parser._actions[5].nargs == "+"
+        assert parser._actions[5].help
+
+    def test_cpus_option(self, stats_cmd):
+        parser = stats_cmd.get_parser("mohid stats")
+        assert parser._actions[6].dest == "cpus"
+        assert parser._actions[6].type == int
+        assert parser._actions[6].default is None
+        assert parser._actions[6].help
+
+    def test_output_option(self, stats_cmd):
+        parser = stats_cmd.get_parser("mohid stats")
+        assert parser._actions[7].dest == "output"
+        assert parser._actions[7].type == Path
+        assert parser._actions[7].default is None
+        assert parser._actions[7].help
+
+    def test_parsed_args(self, stats_cmd):
+        parser = stats_cmd.get_parser("mohid stats")
+        parsed_args = parser.parse_args(
+            [
+                "job_dir/",
+                "--var",
+                "OilThickness_2D",
+                "--var",
+                "OilConcentration_3D",
+                "--threshold",
+                "0.5",
+                "--bins",
+                "0",
+                "1",
+                "10",
+            ]
+        )
+        assert parsed_args.job_dir == Path("job_dir/")
+        assert parsed_args.var_names == ["OilThickness_2D", "OilConcentration_3D"]
+        assert parsed_args.thresholds == [0.5]
+        assert parsed_args.bin_edges == [0, 1, 10]
+        assert parsed_args.output is None
+
+
+class TestTakeAction:
+    """Unit tests for `mohid stats` sub-command take_action() method."""
+
+    def test_take_action(self, stats_cmd, job_dir, caplog):
+        parsed_args = SimpleNamespace(
+            job_dir=job_dir,
+            var_names=["OilThickness_2D"],
+            how="max",
+            thresholds=[],
+            bin_edges=[],
+            cpus=1,
+            output=None,
+        )
+        caplog.set_level(logging.INFO)
+        stats_cmd.take_action(parsed_args)
+        assert (job_dir / mohid_cmd.stats.STATS_FILE).exists()
+        assert caplog.messages[0].startswith(
+            f"statistics of 4 runs stored in {job_dir / mohid_cmd.stats.STATS_FILE} in "
+        )
+
+
+class TestStats:
+    """Unit tests for stats() function."""
+
+    @pytest.mark.parametrize("cpus", [1, 2])
+    def test_stats(self, cpus, job_dir, tmp_path):
+        output = tmp_path / "stats.nc"
+        n_runs = mohid_cmd.stats.stats(
+            job_dir,
+            ["OilThickness_2D", "OilConcentration_3D"],
+            output,
+            thresholds=[1.5],
+            bin_edges=[0, 2, 4],
+            cpus=cpus,
+        )
+        assert n_runs == 4
+        with netCDF4.Dataset(output) as dataset:
+            thickness_max = numpy.ones((2, 3))
+            thickness_max[0, 0] = 3
+            numpy.testing.assert_allclose(
+                dataset["OilThickness_2D_max"][:], thickness_max
+            )
+            thickness_mean = numpy.ones((2, 3))
+            thickness_mean[0, 0] = (1 + 1 + 2 + 3) / 4
+            numpy.testing.assert_allclose(
+                dataset["OilThickness_2D_mean"][:], thickness_mean
+            )
+            assert dataset["OilThickness_2D_mean"].units == "m"
+            numpy.testing.assert_allclose(
+                dataset["OilConcentration_3D_variance"][:],
+                numpy.full((2, 3), numpy.var([0, 1, 2, 3], ddof=1)),
+            )
+            numpy.testing.assert_array_equal(
+                dataset["OilConcentration_3D_count"][:], numpy.full((2, 3), 4)
+            )
+            numpy.testing.assert_allclose(
+                dataset["OilConcentration_3D_exceedance_probability"][:],
+                numpy.full((1, 2, 3), 0.5),
+            )
+            numpy.testing.assert_array_equal(
+                dataset["OilConcentration_3D_histogram"][:],
+                [numpy.full((2, 3), 2), numpy.full((2, 3), 2)],
+            )
+            numpy.testing.assert_array_equal(dataset["threshold"][:], [1.5])
+            numpy.testing.assert_array_equal(dataset["bin_lower"][:], [0, 2])
+            numpy.testing.assert_array_equal(dataset["bin_upper"][:], [2, 4])
+            assert dataset.n_runs == 4
+            assert dataset.time_reduction == "max"
+
+    def test_grid_variables_copied(self, job_dir, tmp_path):
+        output = tmp_path / "stats.nc"
+        mohid_cmd.stats.stats(job_dir, ["OilThickness_2D"], output, cpus=1)
+        with netCDF4.Dataset(output) as dataset:
+            assert dataset["latitude"].dimensions == ("grid_y", "grid_x")
+            assert dataset["latitude"].units == "degrees_north"
+            assert dataset["latitude"]._FillValue == -999.0
+            numpy.testing.assert_array_equal(dataset["latitude"][:, 0], [48.0, 48.5])
+            assert "OilConcentration_3D" not in dataset.variables
+            assert "time" not in dataset.dimensions
+
+    def test_no_tmp_file_left(self, job_dir, tmp_path):
+        output = tmp_path / "stats.nc"
+        mohid_cmd.stats.stats(job_dir, ["OilThickness_2D"], output, cpus=1)
+        assert [path.name for path in tmp_path.iterdir() if path.is_file()] == [
+            "stats.nc"
+        ]
+
+    def test_no_lagrangian_files(self, tmp_path, caplog):
+        (tmp_path / "results").mkdir()
+        caplog.set_level(logging.ERROR)
+        with pytest.raises(SystemExit):
+            mohid_cmd.stats.stats(tmp_path, ["OilThickness_2D"], tmp_path / "stats.nc")
+        assert caplog.messages == [
+            f"no Lagrangian results files found in {tmp_path / 'results'}"
+        ]
+
+    def test_missing_variable(self, job_dir, tmp_path, caplog):
+        caplog.set_level(logging.ERROR)
+        with pytest.raises(SystemExit):
+            mohid_cmd.stats.stats(
+                job_dir, ["OilThickness_2D", "Beaching_Time"], tmp_path / "stats.nc"
+            )
+        assert caplog.messages[0].startswith("variable(s) not found in ")
+        assert caplog.messages[0].endswith(": Beaching_Time")
+
+
+class TestReduceFiles:
+    """Unit tests for reduce_files() function."""
+
+    def test_parallel_equals_serial(self, job_dir):
+        lagrangian_files = sorted(job_dir.glob("results/*/Lagrangian_*.nc"))
+        args = (["OilThickness_2D"], "mean", [0.5], [0, 1, 5])
+        serial = mohid_cmd.stats.reduce_files(lagrangian_files, *args, cpus=1)
+        parallel = mohid_cmd.stats.reduce_files(lagrangian_files, *args, cpus=3)
+        for stat in ("mean", "variance", "max", "n_valid", "exceedances", "histogram"):
+            numpy.testing.assert_allclose(
+                getattr(parallel["OilThickness_2D"], stat),
+                getattr(serial["OilThickness_2D"], stat),
+            )
+        assert parallel["OilThickness_2D"].n_runs == 4
+
+
+class TestReduceShard:
+    """Unit test for reduce_shard() function."""
+
+    def test_reduce_shard(self, job_dir):
+        lagrangian_files = sorted(job_dir.glob("results/*/Lagrangian_*.nc"))[:2]
+        partials = mohid_cmd.stats.reduce_shard(
+            lagrangian_files, ["OilConcentration_3D"], "max", [], []
+        )
+        assert partials["OilConcentration_3D"].n_runs == 2
+        numpy.testing.assert_allclose(
+            partials["OilConcentration_3D"].mean, numpy.full((2, 3), 0.5)
+        )
@@ -0,0 +1,185 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd status sub-command plug-in unit tests.
+"""
+import json
+import logging
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import mohid_cmd.main
+import mohid_cmd.slurm
+import mohid_cmd.status
+
+
+def _slurm_job_id(job_dir, name):
+    jobs = mohid_cmd.slurm.read_jobs(job_dir)
+    return next(job["slurm_job_id"] for job in jobs if job["name"] == name)
+
+
+@pytest.fixture
+def status_cmd():
+    return mohid_cmd.status.Status(mohid_cmd.main.MohidApp, [])
+
+
+@pytest.fixture
+def job_dir(tmp_path, fake_slurm):
+    job_dir = tmp_path / "AKNS-spatial_2020-06-15T142000"
+    job_dir.mkdir()
+    sbatch_args = [
+        [f"--job-name=AKNS-spatial-{i:03d}", "glost-job.sh"] for i in range(3)
+    ]
+    slurm_job_ids = mohid_cmd.slurm.submit_jobs(sbatch_args, min_interval=0)
+    mohid_cmd.slurm.record_jobs(
+        job_dir,
+        [
+            {
+                "name": f"AKNS-spatial-{i:03d}",
+                "slurm_job_id": slurm_job_id,
+                "tasks": f"shards/glost-tasks-{i:03d}.txt",
+                "n_runs": 2,
+            }
+            for i, slurm_job_id in enumerate(slurm_job_ids)
+        ],
+    )
+    for i, exit_code in enumerate((0, 0, 1)):
+        results_dir = job_dir / "results" / f"AKNS-spatial-{i}"
+        results_dir.mkdir(parents=True)
+        record = {
+            "run_id": f"AKNS-spatial-{i}",
+            "phase": "task",
+            "exit_code": exit_code,
+        }
+        (results_dir / "timing.jsonl").write_text(f"{json.dumps(record)}\n")
+    # Run that has started but not finished
+    (job_dir / "results" / "AKNS-spatial-3").mkdir()
+    return job_dir
+
+
+class TestParser:
+    """Unit tests for `mohid status` sub-command command-line parser."""
+
+    def test_get_parser(self, status_cmd):
+        parser = status_cmd.get_parser("mohid status")
+        assert parser.prog == "mohid status"
+
+    def test_cmd_description(self, status_cmd):
+        parser = status_cmd.get_parser("mohid status")
+        assert parser.description.strip().startswith(
+            "Show the states of the Slurm jobs that were submitted"
+        )
+
+    def test_job_dir_argument(self, status_cmd):
+        parser = status_cmd.get_parser("mohid status")
+        assert parser._actions[1].dest == "job_dir"
+        assert parser._actions[1].metavar == "JOB_DIR"
+        assert parser._actions[1].type == Path
+        assert parser._actions[1].help
+
+    def test_watch_option(self, status_cmd):
+        parser = status_cmd.get_parser("mohid status")
+        assert parser._actions[2].dest == "watch"
+        assert parser._actions[2].option_strings == ["--watch"]
+        assert parser._actions[2].type == float
+        assert parser._actions[2].default is None
+        assert parser._actions[2].help
+
+    def test_parsed_args(self, status_cmd):
+        parser = status_cmd.get_parser("mohid status")
+        parsed_args = parser.parse_args(["job_dir", "--watch", "60"])
+        assert parsed_args.job_dir == Path("job_dir")
+        assert parsed_args.watch == 60
+
+
+class TestTakeAction:
+    """Unit tests for `mohid status` sub-command take_action() method."""
+
+    def test_take_action(self, status_cmd, job_dir):
+        status_cmd.app.stdout = StringIO()
+        parsed_args = SimpleNamespace(job_dir=job_dir, watch=None)
+        status_cmd.take_action(parsed_args)
+        assert status_cmd.app.stdout.getvalue().startswith(f"Status of {job_dir}\n")
+
+    def test_watch_until_done(self, status_cmd, job_dir, fake_slurm, monkeypatch):
+        sleeps = []
+
+        def mock_sleep(seconds):
+            sleeps.append(seconds)
+            for slurm_job_id in fake_slurm.jobs():
+                fake_slurm.set_state(slurm_job_id, "COMPLETED")
+
+        monkeypatch.setattr(mohid_cmd.status.time, "sleep", mock_sleep)
+        status_cmd.app.stdout = StringIO()
+        parsed_args = SimpleNamespace(job_dir=job_dir, watch=30)
+        status_cmd.take_action(parsed_args)
+        assert sleeps == [30]
+        assert status_cmd.app.stdout.getvalue().count("Status of") == 2
+
+
+class TestGetStatus:
+    """Unit tests for get_status() function."""
+
+    def test_job_states(self, job_dir, fake_slurm):
+        fake_slurm.set_state(_slurm_job_id(job_dir, "AKNS-spatial-001"), "RUNNING")
+        fake_slurm.set_state(_slurm_job_id(job_dir, "AKNS-spatial-002"), "COMPLETED")
+        ensemble = mohid_cmd.status.get_status(job_dir)
+        assert [job["state"] for job in ensemble["jobs"]] == [
+            "PENDING",
+            "RUNNING",
+            "COMPLETED",
+        ]
+        assert ensemble["n_active"] == 2
+
+    def test_batched_queries(self, job_dir, fake_slurm):
+        mohid_cmd.status.get_status(job_dir)
+        assert len(fake_slurm.calls("squeue")) == 1
+        assert len(fake_slurm.calls("sacct")) == 1
+
+    def test_run_counts(self, job_dir):
+        ensemble = mohid_cmd.status.get_status(job_dir)
+        assert ensemble["n_runs"] == 6
+        assert ensemble["n_finished"] == 3
+        assert ensemble["n_failed"] == 1
+
+    def test_no_jobs_recorded(self, tmp_path, fake_slurm, caplog):
+        caplog.set_level(logging.WARNING)
+        ensemble = mohid_cmd.status.get_status(tmp_path)
+        assert caplog.messages[0] == f"no Slurm jobs recorded in {tmp_path}"
+        assert ensemble["jobs"] == []
+        assert ensemble["n_active"] == 0
+
+
+class TestFormatStatus:
+    """Unit test for format_status() function."""
+
+    def test_format_status(self, job_dir, fake_slurm):
+        slurm_job_id = _slurm_job_id(job_dir, "AKNS-spatial-002")
+        fake_slurm.set_state(slurm_job_id, "COMPLETED")
+        report = mohid_cmd.status.format_status(mohid_cmd.status.get_status(job_dir))
+        lines = report.splitlines()
+        assert lines[0] == f"Status of {job_dir}"
+        assert lines[2].split()[0] == "AKNS-spatial-000"
+        assert lines[4].split() == [
+            "AKNS-spatial-002",
+            slurm_job_id,
+            "COMPLETED",
+            "2",
+            "runs",
+        ]
+        assert lines[6] == "Slurm jobs: 3, 1 COMPLETED, 2 PENDING"
+        assert lines[7] == "Runs: 3 of 6 finished; 1 failed"
@@ -0,0 +1,159 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd file-based task queue unit tests.
+"""
+import concurrent.futures
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+import mohid_cmd.task_queue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    commands = [f"bash $MONTE_CARLO/run-task.sh {n}" for n in range(3)]
+    return mohid_cmd.task_queue.TaskQueue.create(tmp_path / "queue", commands)
+
+
+def _claim_all(queue_dir, worker_id):
+    queue = mohid_cmd.task_queue.TaskQueue(queue_dir)
+    names = []
+    while True:
+        task = queue.claim(worker_id)
+        if task is None:
+            return names
+        names.append(task.name)
+
+
+class TestCreate:
+    """Unit tests for TaskQueue.create() method."""
+
+    def test_state_dirs(self, queue):
+        for state in mohid_cmd.task_queue.STATES:
+            assert (queue.queue_dir / state).is_dir()
+
+    def test_pending_tasks(self, queue):
+        pending_dir = queue.queue_dir / "pending"
+        assert sorted(p.name for p in pending_dir.iterdir()) == [
+            "000000",
+            "000001",
+            "000002",
+        ]
+        record = json.loads((pending_dir / "000001").read_text())
+        assert record == {"task": "bash $MONTE_CARLO/run-task.sh 1"}
+
+
+class TestClaim:
+    """Unit tests for TaskQueue.claim() method."""
+
+    def test_claim(self, queue):
+        task = queue.claim("gra123.42")
+        assert task.name == "000000"
+        assert task.command == "bash $MONTE_CARLO/run-task.sh 0"
+        assert task.path == queue.queue_dir / "running" / "000000@gra123.42"
+        assert not (queue.queue_dir / "pending" / "000000").exists()
+
+    def test_empty_queue(self, queue):
+        for _ in range(3):
+            queue.claim("gra123.42")
+        assert queue.claim("gra123.42") is None
+
+    def test_concurrent_claims(self, tmp_path):
+        commands = [f"bash $MONTE_CARLO/run-task.sh {n}" for n in range(200)]
+        queue = mohid_cmd.task_queue.TaskQueue.create(tmp_path / "queue", commands)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=4) as pool:
+            claimed = list(
+                pool.map(
+                    _claim_all,
+                    [queue.queue_dir] * 4,
+                    [f"worker-{i}" for i in range(4)],
+                )
+            )
+        names = [name for worker_names in claimed for name in worker_names]
+        # Every task is claimed exactly once
+        assert sorted(names) == [f"{n:06d}" for n in range(200)]
+
+    def test_listing_cached(self, tmp_path):
+        commands = [f"bash $MONTE_CARLO/run-task.sh {n}" for n in range(100)]
+        queue = mohid_cmd.task_queue.TaskQueue.create(tmp_path / "queue", commands)
+        with patch(
+            "mohid_cmd.task_queue.os.listdir", wraps=os.listdir, autospec=True
+        ) as m_listdir:
+            names = [queue.claim("gra123.42").name for _ in range(100)]
+            assert queue.claim("gra123.42") is None
+        assert names == [f"{n:06d}" for n in range(100)]
+        # One listing for the tasks, and one to find that the queue is empty
+        assert m_listdir.call_count == 2
+
+    def test_claimed_by_other_worker(self, tmp_path):
+        commands = [f"bash $MONTE_CARLO/run-task.sh {n}" for n in range(4)]
+        queue_dir = tmp_path / "queue"
+        queue = mohid_cmd.task_queue.TaskQueue.create(queue_dir, commands)
+        assert queue.claim("gra123.42").name == "000000"
+        other = mohid_cmd.task_queue.TaskQueue(queue_dir)
+        assert other.claim("gra456.43").name == "000001"
+        assert queue.claim("gra123.42").name == "000002"
+
+    @pytest.mark.parametrize("rank, expected", ((0, 0), (1, 25), (2, 50), (3, 75)))
+    def test_rank_offset(self, rank, expected, tmp_path):
+        commands = [f"bash $MONTE_CARLO/run-task.sh {n}" for n in range(100)]
+        queue_dir = tmp_path / "queue"
+        mohid_cmd.task_queue.TaskQueue.create(queue_dir, commands)
+        queue = mohid_cmd.task_queue.TaskQueue(queue_dir, rank=rank, n_ranks=4)
+        assert queue.claim(f"worker-{rank}").name == f"{expected:06d}"
+
+
+class TestComplete:
+    """Unit tests for TaskQueue.complete() method."""
+
+    @pytest.mark.parametrize("exit_code, state", ((0, "done"), (1, "failed")))
+    def test_complete(self, exit_code, state, queue):
+        task = queue.claim("gra123.42")
+        queue.complete(task, exit_code, 12.5, "gra123.42")
+        record = json.loads((queue.queue_dir / state / task.name).read_text())
+        assert record == {
+            "task": "bash $MONTE_CARLO/run-task.sh 0",
+            "exit_code": exit_code,
+            "duration": 12.5,
+            "worker": "gra123.42",
+        }
+        assert not task.path.exists()
+
+
+class TestCounts:
+    """Unit test for TaskQueue.counts() method."""
+
+    def test_counts(self, queue):
+        queue.complete(queue.claim("gra123.42"), 0, 1.0, "gra123.42")
+        queue.claim("gra123.42")
+        assert queue.counts() == {"pending": 1, "running": 1, "done": 1, "failed": 0}
+
+
+class TestRecordUnfinished:
+    """Unit test for TaskQueue.record_unfinished() method."""
+
+    def test_record_unfinished(self, queue):
+        queue.complete(queue.claim("gra123.42"), 0, 1.0, "gra123.42")
+        queue.claim("gra123.42")
+        n_unfinished = queue.record_unfinished()
+        assert n_unfinished == 2
+        unfinished_file = queue.queue_dir / mohid_cmd.task_queue.UNFINISHED_FILE
+        assert unfinished_file.read_text().splitlines() == [
+            "bash $MONTE_CARLO/run-task.sh 2",
+            "bash $MONTE_CARLO/run-task.sh 1",
+        ]
@@ -0,0 +1,322 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd validate sub-command plug-in unit tests.
+"""
+import logging
+import textwrap
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+import yaml
+
+import mohid_cmd.main
+import mohid_cmd.validate
+
+
+@pytest.fixture
+def validate_cmd():
+    return mohid_cmd.validate.Validate(mohid_cmd.main.MohidApp, [])
+
+
+@pytest.fixture
+def desc_files(glost_run_desc, tmp_path):
+    mohid_yaml = tmp_path / "mohid-yaml"
+    mohid_yaml.mkdir()
+    for i in range(3):
+        (mohid_yaml / f"AKNS-spatial-{i}.yaml").write_text(
+            textwrap.dedent(
+                f"""\
+                run_id: AKNS-spatial-{i}
+                walltime: 3:00:00
+                paths:
+                  mohid repo: $PROJECT/$USER/MIDOSS/MIDOSS-MOHID-CODE/
+                  runs directory: $SCRATCH/MIDOSS/runs/
+                forcing:
+                  winds.hdf5: $SCRATCH/MIDOSS/forcing/{i}/winds.hdf5
+                bathymetry: $PROJECT/$USER/MIDOSS/MIDOSS-MOHID-grid/bathymetry.dat
+                run data files:
+                  PARTIC_DATA: $SCRATCH/MIDOSS/runs/AKNS-spatial/Lagrangian-{i}.dat
+                """
+            )
+        )
+    return tmp_path / "monte-carlo.yaml", mohid_yaml
+
+
+class TestParser:
+    """Unit tests for `mohid validate` sub-command command-line parser."""
+
+    def test_get_parser(self, validate_cmd):
+        parser = validate_cmd.get_parser("mohid validate")
+        assert parser.prog == "mohid validate"
+
+    def test_paths_argument(self, validate_cmd):
+        parser = validate_cmd.get_parser("mohid validate")
+        assert parser._actions[1].dest == "paths"
+        assert parser._actions[1].metavar == "PATH"
+        assert parser._actions[1].type == Path
+        assert parser._actions[1].nargs == "+"
+        assert parser._actions[1].help
+
+    def test_cpus_option(self, validate_cmd):
+        parser = validate_cmd.get_parser("mohid validate")
+        assert parser._actions[2].dest == "cpus"
+        assert parser._actions[2].option_strings == ["--cpus"]
+        assert parser._actions[2].type == int
+        assert parser._actions[2].default is None
+        assert parser._actions[2].help
+
+    def test_parsed_args(self, validate_cmd):
+        parser = validate_cmd.get_parser("mohid validate")
+        parsed_args = parser.parse_args(["a.yaml", "mohid-yaml/", "--cpus", "4"])
+        assert parsed_args.paths == [Path("a.yaml"), Path("mohid-yaml/")]
+        assert parsed_args.cpus == 4
+
+
+class TestTakeAction:
+    """Unit tests for `mohid validate` sub-command take_action() method."""
+
+    def test_valid(self, validate_cmd, desc_files, caplog):
+        caplog.set_level(logging.INFO)
+        parsed_args = SimpleNamespace(paths=list(desc_files), cpus=1)
+        validate_cmd.take_action(parsed_args)
+        assert caplog.messages == ["4 description file(s) are valid"]
+
+    def test_invalid(self, validate_cmd, desc_files, caplog):
+        job_desc_file, mohid_yaml = desc_files
+        run_desc_file = mohid_yaml / "AKNS-spatial-1.yaml"
+        run_desc = yaml.safe_load(run_desc_file.read_text())
+        del run_desc["bathymetry"]
+        run_desc_file.write_text(yaml.safe_dump(run_desc))
+        caplog.set_level(logging.ERROR)
+        parsed_args = SimpleNamespace(paths=[job_desc_file, mohid_yaml], cpus=1)
+        with pytest.raises(SystemExit):
+            validate_cmd.take_action(parsed_args)
+        assert caplog.messages == [
+            f'{run_desc_file}: "bathymetry" key not found',
+            "1 of 4 description file(s) are invalid",
+        ]
+
+
+class TestFindDescFiles:
+    """Unit tests for find_desc_files() function."""
+
+    def test_files_and_dirs(self, desc_files):
+        job_desc_file, mohid_yaml = desc_files
+        found = mohid_cmd.validate.find_desc_files([job_desc_file, mohid_yaml])
+        assert found == [
+            job_desc_file,
+            mohid_yaml / "AKNS-spatial-0.yaml",
+            mohid_yaml / "AKNS-spatial-1.yaml",
+            mohid_yaml / "AKNS-spatial-2.yaml",
+        ]
+
+    def test_not_found(self, tmp_path, caplog):
+        caplog.set_level(logging.ERROR)
+        with pytest.raises(SystemExit):
+            mohid_cmd.validate.find_desc_files([tmp_path / "foo.yaml"])
+        assert caplog.messages == [f"{tmp_path / 'foo.yaml'} not found"]
+
+
+class TestValidateFiles:
+    """Unit tests for validate_files() function."""
+
+    @pytest.mark.parametrize("cpus", [1, 2])
+    def test_validate_files(self, cpus, desc_files):
+        job_desc_file, mohid_yaml = desc_files
+        bad_file = mohid_yaml / "AKNS-spatial-3.yaml"
+        bad_file.write_text("run_id: [\n")
+        paths = mohid_cmd.validate.find_desc_files([job_desc_file, mohid_yaml])
+        results = mohid_cmd.validate.validate_files(paths, cpus=cpus)
+        assert [desc_file for desc_file, _ in results] == paths
+        assert [errors for _, errors in results][:-1] == [[], [], [], []]
+        (error,) = results[-1][1]
+        assert error.startswith("cannot be loaded: ")
+
+    def test_no_files(self):
+        assert mohid_cmd.validate.validate_files([]) == []
+
+
+class TestValidateFile:
+    """Unit tests for validate_file() function."""
+
+    def test_job_desc(self, glost_run_desc, tmp_path):
+        glost_run_desc["run walltime"] = "3 hours"
+        desc_file = tmp_path / "monte-carlo.yaml"
+        desc_file.write_text(yaml.safe_dump(glost_run_desc))
+        assert mohid_cmd.validate.validate_file(desc_file) == (
+            desc_file,
+            [
+                "\"run walltime\" value '3 hours' is not a walltime in seconds or H:MM:SS"
+            ],
+        )
+
+    def test_run_desc(self, run_desc, tmp_path):
+        desc_file = tmp_path / "mohid.yaml"
+        assert mohid_cmd.validate.validate_file(desc_file) == (desc_file, [])
+
+
+class TestValidateRunDesc:
+    """Unit tests for validate_run_desc() compiled schema check function."""
+
+    def test_valid(self, run_desc):
+        assert mohid_cmd.validate.validate_run_desc(run_desc) == []
+
+    def test_all_problems_reported(self, run_desc):
+        del run_desc["bathymetry"]
+        del run_desc["run data files"]["PARTIC_DATA"]
+        run_desc["walltime"] = "90 minutes"
+        run_desc["cpus per task"] = 0
+        assert mohid_cmd.validate.validate_run_desc(run_desc) == [
+            '"bathymetry" key not found',
+            "\"walltime\" value '90 minutes' is not a walltime in seconds or H:MM:SS",
+            '"run data files: PARTIC_DATA" key not found',
+            '"cpus per task" value 0 is not a positive integer',
+        ]
+
+    def test_nested_key_labels(self, run_desc):
+        run_desc["forcing"]["winds.hdf5"] = None
+        run_desc["vcs revisions"]["git"].append(42)
+        run_desc["openmp"] = {"places": ["cores"]}
+        assert mohid_cmd.validate.validate_run_desc(run_desc) == [
+            '"forcing: winds.hdf5" value None is not a path',
+            '"vcs revisions: git: 1" value 42 is not a path',
+            "\"openmp: places\" value ['cores'] is not a single value",
+        ]
+
+    def test_netcdf4(self, run_desc):
+        run_desc["netcdf4"] = {
+            "output variables": ["OilConcentration_2D"],
+            "output time stride": 2,
+            "chunk sizes": {"time": 24, "grid_y": 0},
+            "compression level": 12,
+            "threads": 4,
+        }
+        assert mohid_cmd.validate.validate_run_desc(run_desc) == [
+            '"netcdf4: chunk sizes: grid_y" value 0 is not a positive integer',
+            '"netcdf4: compression level" value 12 is not a zlib compression level '
+            "from 0 to 9",
+            '"netcdf4: threads" key is not recognized; expected one of: '
+            "output variables, output time stride, chunk sizes, compression level, "
+            "workers",
+        ]
+
+    def test_gather(self, run_desc):
+        run_desc["gather"] = {"dedup": "yes"}
+        assert mohid_cmd.validate.validate_run_desc(run_desc) == [
+            "\"gather: dedup\" value 'yes' is not true or false"
+        ]
+
+    def test_not_a_mapping(self):
+        assert mohid_cmd.validate.validate_run_desc(["run_id"]) == [
+            "description is not a mapping"
+        ]
+
+
+class TestValidateJobDesc:
+    """Unit tests for validate_job_desc() compiled schema check function."""
+
+    def test_valid(self, glost_run_desc):
+        assert mohid_cmd.validate.validate_job_desc(glost_run_desc) == []
+
+    def test_netcdf4(self, glost_run_desc):
+        glost_run_desc["netcdf4"] = {
+            "output variables": ["Thickness_2D", "Beaching_Time"],
+            "output time stride": 0,
+        }
+        assert mohid_cmd.validate.validate_job_desc(glost_run_desc) == [
+            '"netcdf4: output time stride" value 0 is not a positive integer'
+        ]
+
+    def test_problems(self, glost_run_desc):
+        glost_run_desc["mem per cpu"] = "lots"
+        glost_run_desc["paths"] = "forcing"
+        del glost_run_desc["mohid command"]
+        assert mohid_cmd.validate.validate_job_desc(glost_run_desc) == [
+            '"mohid command" key not found',
+            "\"mem per cpu\" value 'lots' is not a Slurm memory size like 14100M",
+            "\"paths\" value 'forcing' is not a mapping",
+        ]
+
+
+class TestCheckRunDesc:
+    """Unit tests for check_run_desc() function."""
+
+    def test_valid(self, run_desc, caplog):
+        mohid_cmd.validate.check_run_desc(run_desc, Path("mohid.yaml"))
+        assert not caplog.records
+
+    def test_invalid(self, run_desc, caplog):
+        del run_desc["run_id"]
+        del run_desc["walltime"]
+        caplog.set_level(logging.ERROR)
+        with pytest.raises(SystemExit):
+            mohid_cmd.validate.check_run_desc(run_desc, Path("mohid.yaml"))
+        assert caplog.messages == [
+            '"run_id" key not found',
+            '"walltime" key not found',
+            "2 problem(s) found in mohid.yaml - please check your run description YAML file",
+        ]
+
+
+class TestCheckJobDesc:
+    """Unit test for check_job_desc() function."""
+
+    def test_invalid(self, glost_run_desc, caplog):
+        glost_run_desc["nodes"] = "one"
+        caplog.set_level(logging.ERROR)
+        with pytest.raises(SystemExit):
+            mohid_cmd.validate.check_job_desc(glost_run_desc, Path("monte-carlo.yaml"))
+        assert caplog.messages[0] == "\"nodes\" value 'one' is not a positive integer"
+
+
+class TestCompileSchema:
+    """Unit tests for compile_schema() function."""
+
+    def test_optional_key(self):
+        validate = mohid_cmd.validate.compile_schema({"a": "string", "b?": "count"})
+        assert validate({"a": "x"}) == []
+        assert validate({"b": 1}) == ['"a" key not found']
+
+    def test_unrecognized_key(self):
+        validate = mohid_cmd.validate.compile_schema({"a": "string", "b?": "count"})
+        assert validate({"a": "x", "c": 1}) == [
+            '"c" key is not recognized; expected one of: a, b'
+        ]
+
+    def test_list(self):
+        validate = mohid_cmd.validate.compile_schema({"a": ["count"]})
+        assert validate({"a": 1}) == ['"a" value 1 is not a list']
+        assert validate({"a": [1, True]}) == [
+            '"a: 1" value True is not a positive integer'
+        ]
+
+
+class TestWalltimeSeconds:
+    """Unit tests for walltime_seconds() function."""
+
+    @pytest.mark.parametrize(
+        "walltime, expected",
+        [(5400, 5400), ("1:30:00", 5400), ("36:00:00", 129_600), ("0:00:05", 5)],
+    )
+    def test_walltime_seconds(self, walltime, expected):
+        assert mohid_cmd.validate.walltime_seconds(walltime) == expected
+
+    @pytest.mark.parametrize(
+        "walltime", [0, -60, True, 1.5, None, "1:30", "1:90:00", "0:00:00", "1h"]
+    )
+    def test_invalid(self, walltime):
+        with pytest.raises(ValueError):
+            mohid_cmd.validate.walltime_seconds(walltime)
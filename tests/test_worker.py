@@ -0,0 +1,201 @@
+#  Copyright 2018-2021 the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""MOHID-Cmd worker sub-command plug-in unit tests.
+"""
+import logging
+import signal
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+import mohid_cmd.main
+import mohid_cmd.task_queue
+import mohid_cmd.worker
+
+
+@pytest.fixture
+def worker_cmd():
+    return mohid_cmd.worker.Worker(mohid_cmd.main.MohidApp, [])
+
+
+@pytest.fixture
+def queue_dir(tmp_path):
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    commands = [f"touch {out_dir}/{n}" for n in range(4)] + ["exit 3"]
+    mohid_cmd.task_queue.TaskQueue.create(tmp_path / "queue", commands)
+    return tmp_path / "queue"
+
+
+class TestParser:
+    """Unit tests for `mohid worker` sub-command command-line parser."""
+
+    def test_get_parser(self, worker_cmd):
+        parser = worker_cmd.get_parser("mohid worker")
+        assert parser.prog == "mohid worker"
+
+    def test_cmd_description(self, worker_cmd):
+        parser = worker_cmd.get_parser("mohid worker")
+        assert parser.description.strip().startswith(
+            "Claim and execute tasks from the task queue in QUEUE_DIR"
+        )
+
+    def test_queue_dir_argument(self, worker_cmd):
+        parser = worker_cmd.get_parser("mohid worker")
+        assert parser._actions[1].dest == "queue_dir"
+        assert parser._actions[1].metavar == "QUEUE_DIR"
+        assert parser._actions[1].type == Path
+        assert parser._actions[1].help
+
+    def test_deadline_option(self, worker_cmd):
+        parser = worker_cmd.get_parser("mohid worker")
+        assert parser._actions[2].dest == "deadline"
+        assert parser._actions[2].option_strings == ["--deadline"]
+        assert parser._actions[2].type == float
+        assert parser._actions[2].default is None
+        assert parser._actions[2].help
+
+    def test_task_time_option(self, worker_cmd):
+        parser = worker_cmd.get_parser("mohid worker")
+        assert parser._actions[3].dest == "task_time"
+        assert parser._actions[3].option_strings == ["--task-time"]
+        assert parser._actions[3].type == float
+        assert parser._actions[3].default == 0
+        assert parser._actions[3].help
+
+    def test_drain_file_option(self, worker_cmd):
+        parser = worker_cmd.get_parser("mohid worker")
+        assert parser._actions[4].dest == "drain_file"
+        assert parser._actions[4].option_strings == ["--drain-file"]
+        assert parser._actions[4].type == Path
+        assert parser._actions[4].default is None
+        assert parser._actions[4].help
+
+    def test_margin_option(self, worker_cmd):
+        parser = worker_cmd.get_parser("mohid worker")
+        assert parser._actions[5].dest == "margin"
+        assert parser._actions[5].option_strings == ["--margin"]
+        assert parser._actions[5].type == float
+        assert parser._actions[5].default == mohid_cmd.worker.STOP_MARGIN
+        assert parser._actions[5].help
+
+    def test_parsed_args(self, worker_cmd):
+        parser = worker_cmd.get_parser("mohid worker")
+        parsed_args = parser.parse_args(
+            ["queue", "--deadline", "1600000000", "--task-time", "10800"]
+        )
+        assert parsed_args.queue_dir == Path("queue")
+        assert parsed_args.deadline == 1600000000
+        assert parsed_args.task_time == 10800
+        assert parsed_args.drain_file is None
+        assert parsed_args.margin == mohid_cmd.worker.STOP_MARGIN
+
+
+class TestTakeAction:
+    """Unit test for `mohid worker` sub-command take_action() method."""
+
+    @patch("mohid_cmd.worker.work", return_value="worker w ran 0 task(s), 0 failed")
+    def test_take_action(self, m_work, worker_cmd, caplog):
+        parsed_args = SimpleNamespace(
+            queue_dir=Path("queue"),
+            deadline=None,
+            task_time=0,
+            drain_file=None,
+            margin=300,
+        )
+        caplog.set_level(logging.INFO)
+        worker_cmd.take_action(parsed_args)
+        m_work.assert_called_once_with(
+            Path("queue"), deadline=None, task_time=0, drain_file=None, margin=300
+        )
+        assert caplog.messages[0] == "worker w ran 0 task(s), 0 failed"
+
+
+class TestWork:
+    """Unit tests for work() function."""
+
+    def test_empty_queue(self, queue_dir, caplog):
+        caplog.set_level(logging.WARNING)
+        summary = mohid_cmd.worker.work(queue_dir, worker_id="w0")
+        assert summary == "worker w0 ran 5 task(s), 1 failed"
+        for n in range(4):
+            assert (queue_dir.parent / "out" / f"{n}").exists()
+        queue = mohid_cmd.task_queue.TaskQueue(queue_dir)
+        assert queue.counts() == {"pending": 0, "running": 0, "done": 4, "failed": 1}
+        assert caplog.messages[0] == "task 000004 failed with exit code 3"
+
+    def test_stop_before_deadline(self, queue_dir):
+        # Not enough time left for a task of the expected duration
+        summary = mohid_cmd.worker.work(
+            queue_dir,
+            deadline=time.time() + 100,
+            task_time=60,
+            margin=60,
+            worker_id="w0",
+        )
+        assert summary == (
+            "worker w0 ran 0 task(s), 0 failed; "
+            "stopped before deadline with 5 task(s) unfinished"
+        )
+        unfinished_file = queue_dir / mohid_cmd.task_queue.UNFINISHED_FILE
+        assert len(unfinished_file.read_text().splitlines()) == 5
+
+    def test_estimate_from_task_durations(self, queue_dir, monkeypatch):
+        clock = {"time": 1000.0}
+        monkeypatch.setattr(mohid_cmd.worker.time, "time", lambda: clock["time"])
+
+        def mock_monotonic():
+            # Each task appears to take 50 seconds
+            clock["time"] += 50
+            return clock["time"]
+
+        monkeypatch.setattr(mohid_cmd.worker.time, "monotonic", mock_monotonic)
+        summary = mohid_cmd.worker.work(
+            queue_dir, deadline=1200, task_time=0, margin=60, worker_id="w0"
+        )
+        # 1st task ends at 1100, and 1100 + 50 + 60 margin > 1200,
+        # so the 2nd task isn't started
+        assert summary == (
+            "worker w0 ran 1 task(s), 0 failed; "
+            "stopped before deadline with 4 task(s) unfinished"
+        )
+
+    def test_drain_file(self, queue_dir, tmp_path):
+        drain_file = tmp_path / "drain" / "12345678"
+        drain_file.parent.mkdir()
+        drain_file.touch()
+        summary = mohid_cmd.worker.work(
+            queue_dir, drain_file=drain_file, worker_id="w0"
+        )
+        assert summary == (
+            "worker w0 ran 0 task(s), 0 failed; "
+            "stopped to drain with 5 task(s) unfinished"
+        )
+
+    def test_sigterm(self, tmp_path):
+        queue_dir = tmp_path / "term-queue"
+        # Stand in for Slurm signalling every process of the job step
+        mohid_cmd.task_queue.TaskQueue.create(
+            queue_dir, ["kill -TERM $PPID; exit 143", "true"]
+        )
+        summary = mohid_cmd.worker.work(queue_dir, worker_id="w0")
+        assert summary == (
+            "worker w0 ran 1 task(s), 1 failed; "
+            "stopped to drain with 1 task(s) unfinished"
+        )
+        assert signal.getsignal(signal.SIGTERM) == signal.SIG_DFL